@@ -426,7 +426,10 @@ private function runPythonPrediction($data)
     {
         try {
             $python_path = base_path('python');
-            $script_path = $python_path . '/predict_silent.py';
+            // predict_client.py meneruskan ke predict_server.py jika berjalan,
+            // jika tidak prediksi dijalankan langsung seperti predict_silent.py
+            $script_name = 'predict_client.py';
+            $script_path = $python_path . '/' . $script_name;
             
             Log::info('Python prediction started', [
                 'python_path' => $python_path,
@@ -463,18 +466,18 @@ private function runPythonPrediction($data)
             
             if (file_exists($python_executable)) {
                 // Gunakan Python dari virtual environment
-                $command = "cd " . escapeshellarg($python_path) . " && " . escapeshellarg($python_executable) . " predict_silent.py " . escapeshellarg($json_data);
+                $command = "cd " . escapeshellarg($python_path) . " && " . escapeshellarg($python_executable) . " " . $script_name . " " . escapeshellarg($json_data);
                 Log::info('Using virtual environment Python', ['python_executable' => $python_executable]);
             } else {
                 // Fallback ke system Python3
-                $command = "cd " . escapeshellarg($python_path) . " && python3 predict_silent.py " . escapeshellarg($json_data);
+                $command = "cd " . escapeshellarg($python_path) . " && python3 " . $script_name . " " . escapeshellarg($json_data);
                 Log::info('Using system Python3', ['fallback' => true]);
             }
             
             Log::info('Executing Python command', ['command' => $command]);
             
             // Test if Python script can be executed manually
-            $test_command = "cd " . escapeshellarg($python_path) . " && ls -la predict_silent.py 2>&1";
+            $test_command = "cd " . escapeshellarg($python_path) . " && ls -la " . $script_name . " 2>&1";
             $test_output = shell_exec($test_command);
             Log::info('Python script file check', ['test_output' => $test_output]);
             
@@ -484,7 +487,7 @@ private function runPythonPrediction($data)
             Log::info('Virtual environment test', ['venv_test_output' => $venv_test_output]);
             
             // Test Python script without arguments first
-            $simple_test_command = "cd " . escapeshellarg($python_path) . " && source .venv/bin/activate && python predict_silent.py 2>&1";
+            $simple_test_command = "cd " . escapeshellarg($python_path) . " && source .venv/bin/activate && python " . $script_name . " 2>&1";
             $simple_test_output = shell_exec($simple_test_command);
             Log::info('Python script simple test', ['simple_test_output' => $simple_test_output]);
             
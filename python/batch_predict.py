@@ -0,0 +1,249 @@
+"""
+Utilitas prediksi batch untuk script prediksi KNN
+Input: satu objek JSON per baris (JSON Lines) dari stdin atau file
+Output: satu hasil JSON per baris, urutan sama dengan input
+
+Untuk batch besar tersedia output kolom (--format): indeks kelas prediksi,
+confidence, matriks indeks kelas top-N dan probabilitasnya, dengan tabel
+nama kelas sekali saja. Ditulis sebagai .npz, direktori .npy, Arrow IPC
+(jika pyarrow terpasang) atau JSON kolom yang ringkas.
+"""
+
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+import service_metrics
+from stage_timings import PROCESS_START, stage
+
+OUTPUT_FORMATS = ('jsonl', 'npz', 'npy', 'arrow', 'json')
+# Column formats that cannot go to a text stream
+BINARY_FORMATS = ('npz', 'npy', 'arrow')
+
+def read_jsonl(source='-'):
+    """
+    Read one JSON object per line from a file path or stdin ('-')
+
+    Blank lines are skipped. Lines that are not a JSON object are kept
+    in place as an inline error result so output order matches input.
+
+    Returns:
+        tuple: (inputs, errors) - list of dicts (None for bad lines) and
+        a dict mapping row index to its error result
+    """
+    stream = sys.stdin if source in (None, '-') else open(source, encoding='utf-8')
+    inputs = []
+    errors = {}
+    try:
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                input_data = json.loads(line)
+            except json.JSONDecodeError:
+                errors[len(inputs)] = {"success": False, "error": "Invalid JSON input"}
+                inputs.append(None)
+                continue
+            if not isinstance(input_data, dict):
+                errors[len(inputs)] = {"success": False, "error": "Invalid JSON input: expected an object"}
+                inputs.append(None)
+                continue
+            inputs.append(input_data)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    return inputs, errors
+
+def run_batch(source, predict_batch, output=None):
+    """
+    Predict every row of a JSON Lines input with a single batch call
+
+    Args:
+        source (str): Input file path, or '-' for stdin
+        predict_batch (callable): Takes a list of input dicts and returns
+            one result dict per input, in the same order
+        output: Writable text stream (default: stdout)
+    """
+    output = output or sys.stdout
+    with stage('read_input'):
+        inputs, errors = read_jsonl(source)
+
+    valid_rows = [i for i, input_data in enumerate(inputs) if input_data is not None]
+    predictions = predict_batch([inputs[i] for i in valid_rows]) if valid_rows else []
+
+    results = [errors.get(i) for i in range(len(inputs))]
+    for i, result in zip(valid_rows, predictions):
+        results[i] = result
+
+    with stage('json_encode'):
+        encoded = ''.join(json.dumps(result) + '\n' for result in results)
+    output.write(encoded)
+    output.flush()
+    service_metrics.record_request(time.perf_counter() - PROCESS_START, results)
+
+def add_output_arguments(parser, default_top_n):
+    """Add --format, --output and --top-n to an entry point's argument parser"""
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='jsonl',
+                        help="Batch output: jsonl (one result per row) or columns as npz, npy (directory), "
+                             "arrow (IPC file) or json")
+    parser.add_argument('--output', metavar='PATH',
+                        help="Column output file or directory (default: stdout; required for npy)")
+    parser.add_argument('--top-n', type=int, default=default_top_n, help="Classes per row in the column output")
+
+def predict_columns(engine, transformer, inputs, top_n):
+    """
+    Columnar predictions for a batch, one vectorized pass from features to top-N
+
+    Rows that are None (unparseable input) or fail validation get
+    predicted -1, NaN probabilities and their message in errors.
+
+    Returns:
+        dict: classes (names, once), predicted (n,), confidence (n,) in
+        percent, top_classes (n, top_n), top_probability (n, top_n) in
+        percent and errors {row: message}
+    """
+    rows = [i for i, input_data in enumerate(inputs) if input_data is not None]
+    with stage('features'):
+        X, row_errors = transformer.transform([inputs[i] for i in rows])
+    errors = {i: "Invalid JSON input" for i, input_data in enumerate(inputs) if input_data is None}
+    errors.update({rows[j]: f"Prediction error: {error}" for j, error in row_errors.items()})
+    valid = np.array([rows[j] for j in range(len(rows)) if j not in row_errors], dtype=np.intp)
+    kept = np.array([j for j in range(len(rows)) if j not in row_errors], dtype=np.intp)
+
+    top_n = min(top_n, len(engine.classes))
+    class_dtype = np.int16 if len(engine.classes) < np.iinfo(np.int16).max else np.int32
+    columns = {
+        'classes': np.asarray(engine.classes).astype(str),
+        'predicted': np.full(len(inputs), -1, dtype=class_dtype),
+        'confidence': np.full(len(inputs), np.nan),
+        'top_classes': np.full((len(inputs), top_n), -1, dtype=class_dtype),
+        'top_probability': np.full((len(inputs), top_n), np.nan),
+        'errors': dict(sorted(errors.items()))
+    }
+    if len(valid):
+        probabilities = engine.predict_proba(X[kept])
+        with stage('top_n'):
+            top = engine.top_n(probabilities, top_n)
+            top_probability = np.take_along_axis(probabilities, top, axis=1) * 100
+        columns['predicted'][valid] = top[:, 0]
+        columns['confidence'][valid] = top_probability[:, 0]
+        columns['top_classes'][valid] = top
+        columns['top_probability'][valid] = top_probability
+    return columns
+
+def _error_arrays(errors):
+    return np.array(list(errors), dtype=np.int64), np.array(list(errors.values()), dtype=str)
+
+def _binary_arrays(columns):
+    """Arrays of a column result as stored in npz/npy: probabilities as float32"""
+    error_rows, error_messages = _error_arrays(columns['errors'])
+    return {
+        'classes': columns['classes'],
+        'predicted': columns['predicted'],
+        'confidence': columns['confidence'].astype(np.float32),
+        'top_classes': columns['top_classes'],
+        'top_probability': columns['top_probability'].astype(np.float32),
+        'error_rows': error_rows,
+        'error_messages': error_messages
+    }
+
+def _write_arrow(columns, path):
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ValueError("Arrow output needs pyarrow, which is not installed") from None
+
+    n, top_n = columns['top_classes'].shape
+    error_column = [None] * n
+    for row, message in columns['errors'].items():
+        error_column[row] = message
+    table = pa.table({
+        'predicted': columns['predicted'],
+        'confidence': columns['confidence'].astype(np.float32),
+        'top_classes': pa.FixedSizeListArray.from_arrays(columns['top_classes'].ravel(), top_n),
+        'top_probability': pa.FixedSizeListArray.from_arrays(columns['top_probability'].astype(np.float32).ravel(), top_n),
+        'error': pa.array(error_column, type=pa.string())
+    }, metadata={'classes': json.dumps(columns['classes'].tolist())})
+    sink = pa.OSFile(path, 'wb') if path is not None else sys.stdout.buffer
+    try:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    finally:
+        if path is not None:
+            sink.close()
+        else:
+            sink.flush()
+
+def write_columns(columns, output_format, path=None):
+    """
+    Write a predict_columns result
+
+    path None writes to stdout (binary formats to its byte stream); the
+    npy format writes one file per array into the directory path.
+    """
+    if output_format == 'npy':
+        if path is None:
+            raise ValueError("npy output needs --output DIRECTORY")
+        os.makedirs(path, exist_ok=True)
+        for name, array in _binary_arrays(columns).items():
+            np.save(os.path.join(path, name + '.npy'), array, allow_pickle=False)
+        return
+
+    if output_format == 'json':
+        confidence = np.round(columns['confidence'], 4).tolist()
+        top_probability = np.round(columns['top_probability'], 4).tolist()
+        # Failed rows: null instead of NaN, which is not valid JSON
+        for row in columns['errors']:
+            confidence[row] = None
+            top_probability[row] = None
+        encoded = json.dumps({
+            'classes': columns['classes'].tolist(),
+            'predicted': columns['predicted'].tolist(),
+            'confidence': confidence,
+            'top_classes': columns['top_classes'].tolist(),
+            'top_probability': top_probability,
+            'errors': {str(row): message for row, message in columns['errors'].items()}
+        }, separators=(',', ':'))
+        if path is None:
+            sys.stdout.write(encoded + '\n')
+            sys.stdout.flush()
+        else:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(encoded + '\n')
+        return
+
+    if output_format == 'arrow':
+        _write_arrow(columns, path)
+        return
+    if output_format != 'npz':
+        raise ValueError(f"Unknown column format: {output_format}")
+    if path is None:
+        np.savez(sys.stdout.buffer, **_binary_arrays(columns))
+        sys.stdout.buffer.flush()
+    else:
+        np.savez(path, **_binary_arrays(columns))
+
+def run_batch_columns(source, predict_columns, output_format, path=None):
+    """
+    Predict every row of a JSON Lines input and write columnar results
+
+    Args:
+        source (str): Input file path, or '-' for stdin
+        predict_columns (callable): Takes the list of inputs (None for
+            unparseable lines) and returns a predict_columns result
+        output_format (str): One of OUTPUT_FORMATS except jsonl
+        path (str): Output file or directory, None for stdout
+    """
+    with stage('read_input'):
+        inputs, errors = read_jsonl(source)
+    columns = predict_columns(inputs)
+    # Keep the reader's message for lines that are not a JSON object
+    columns['errors'].update({row: error['error'] for row, error in errors.items()})
+    with stage('encode'):
+        write_columns(columns, output_format, path)
+    service_metrics.record_column_request(time.perf_counter() - PROCESS_START, len(inputs), columns['errors'])
+    return columns
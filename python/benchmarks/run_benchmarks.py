@@ -0,0 +1,466 @@
+#!/usr/bin/env python3
+"""
+Benchmark jalur prediksi dan training KNN
+Semua data sintetis (synthetic_data.py), tidak perlu database. Script
+prediksi dijalankan dari salinan di direktori sementara dengan model
+sintetis, jadi data/ milik aplikasi tidak disentuh.
+
+Yang diukur:
+    cold_start  - satu proses CLI predict.py / predict_db.py / predict_silent.py
+                  (tanpa cache, dan dengan cache prediksi yang sudah terisi)
+    warm        - latensi satu prediksi dengan model sudah dimuat
+    batch       - throughput predict_batch untuk N = 1 .. 100k
+    micro_batch - request tunggal lewat MicroBatcher: latensi saat sepi dan
+                  throughput dengan 32 pemanggil bersamaan
+    load        - waktu load model per format (pickle, npz, artefak mmap/copy)
+    training    - waktu training DatabaseKNNPredictor vs jumlah baris
+
+Hasil ditulis sebagai JSON (beserta info mesin) dan dibandingkan dengan
+baseline; metrik yang lebih buruk dari toleransi ditandai sebagai regresi.
+
+Usage:
+    python benchmarks/run_benchmarks.py                    # hasil ke benchmarks/results/
+    python benchmarks/run_benchmarks.py --quick
+    python benchmarks/run_benchmarks.py --save-baseline    # simpan sebagai baseline
+    python benchmarks/run_benchmarks.py --tolerance 0.15
+"""
+
+import argparse
+import contextlib
+import datetime
+import glob
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PYTHON_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, PYTHON_DIR)
+
+import numpy as np
+
+from feature_schema import ACADEMIC_FIELDS, RENCANA_KULIAH_MAP
+from synthetic_data import FEATURE_NAMES, build_engine, class_names, generate
+
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+DEFAULT_TOLERANCE = 0.2
+
+FULL = {
+    'train_rows': 2000,
+    'repeat': 5,
+    'warm_repeat': 200,
+    'batch_sizes': [1, 10, 100, 1000, 10000, 100000],
+    'load_rows': 100000,
+    'micro_batch_requests': 5000,
+    'training_sizes': [1000, 5000, 20000]
+}
+QUICK = {
+    'train_rows': 500,
+    'repeat': 3,
+    'warm_repeat': 50,
+    'batch_sizes': [1, 10, 100, 1000],
+    'load_rows': 10000,
+    'micro_batch_requests': 1000,
+    'training_sizes': [1000, 5000]
+}
+
+STUDENT_SUBJECTS_CSV = ['matematika', 'fisika', 'kimia', 'biologi', 'b_indonesia', 'b_inggris',
+                        'sejarah', 'geografi', 'informatika', 'seni_budaya']
+STUDENT_MAJORS = ['Teknik Informatika', 'Manajemen', 'Keperawatan', 'Tata Boga', 'Farmasi', 'Ilmu Komunikasi']
+
+STUDENT_INPUT = {
+    "jenis_kelamin": "Laki-laki", "mata_pelajaran_dikuasai": ["Matematika", "Fisika", "Informatika"],
+    "minat_ipa": 0.9, "minat_ips": 0.2, "minat_bahasa": 0.4, "minat_seni": 0.1
+}
+
+RENCANA_NAMES = {code: name for name, code in RENCANA_KULIAH_MAP.items()}
+
+def machine_info():
+    """Where the numbers come from"""
+    info = {
+        'hostname': platform.node(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+        'numpy': np.__version__
+    }
+    try:
+        import sklearn
+        info['sklearn'] = sklearn.__version__
+    except ImportError:
+        pass
+    return info
+
+def summarize(samples):
+    """Median, min and p95 of a list of seconds"""
+    ordered = sorted(samples)
+    return {
+        'median': statistics.median(ordered),
+        'min': ordered[0],
+        'p95': ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    }
+
+def seconds(value):
+    return {'value': value, 'unit': 's', 'better': 'lower'}
+
+def rate(value):
+    return {'value': value, 'unit': 'rows/s', 'better': 'higher'}
+
+def silent_inputs(X):
+    """Input dicts as Laravel sends them to predict_silent.py / predict_db.py"""
+    inputs = []
+    for row in X:
+        item = {'jenis_kelamin': 'Laki-laki' if row[0] == 1 else 'Perempuan'}
+        item.update(zip(ACADEMIC_FIELDS, row[1:18].tolist()))
+        item['rencana_kuliah'] = RENCANA_NAMES.get(int(row[18]), 'Iya')
+        item['kategori_jurusan'] = 'Saintek' if row[19] == 1 else 'Soshum'
+        item['kategori_jurusan_encoded'] = int(row[19])
+        item['tingkat_keyakinan'] = float(row[20])
+        inputs.append(item)
+    return inputs
+
+def write_student_csv(path, n_rows, seed):
+    """Synthetic training_data.csv for the KNNPredictor (predict.py) model"""
+    rng = np.random.default_rng(seed)
+    major = rng.integers(0, len(STUDENT_MAJORS), n_rows)
+    subjects = (rng.random((n_rows, len(STUDENT_SUBJECTS_CSV))) < 0.3 + 0.1 * (major[:, None] % 3)).astype(int)
+    interests = np.clip(rng.normal(0.5, 0.2, (n_rows, 4)) + 0.1 * (major[:, None] % 2), 0, 1).round(2)
+    genders = np.array(['Laki-laki', 'Perempuan'])[rng.integers(0, 2, n_rows)]
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(','.join(['nama_lengkap', 'jenis_kelamin'] + STUDENT_SUBJECTS_CSV
+                         + ['minat_ipa', 'minat_ips', 'minat_bahasa', 'minat_seni', 'kategori_jurusan', 'jurusan_aktual']) + '\n')
+        for i in range(n_rows):
+            values = [f"Siswa {i}", genders[i]] + [str(v) for v in subjects[i]] + [str(v) for v in interests[i]]
+            category = 'Sains & Teknologi' if major[i] % 2 == 0 else 'Sosial & Humaniora'
+            f.write(','.join(values + [category, STUDENT_MAJORS[major[i]]]) + '\n')
+
+def make_sandbox(root, train_rows, seed):
+    """
+    Copy of the prediction scripts with synthetic models in its data/
+
+    Returns:
+        str: The sandbox directory
+    """
+    from knn_predictor import KNNPredictor
+    from model_store import save_artifact
+
+    sandbox = os.path.join(root, 'python')
+    os.makedirs(os.path.join(sandbox, 'data'))
+    for path in glob.glob(os.path.join(PYTHON_DIR, '*.py')):
+        shutil.copy(path, sandbox)
+
+    for profile, name in (('silent', 'knn_model_silent'), ('database', 'knn_model_db')):
+        X, y = generate(train_rows, profile, seed=seed)
+        save_artifact(build_engine(X, y, profile), os.path.join(sandbox, 'data', name + '.model'))
+
+    csv_path = os.path.join(root, 'student_training.csv')
+    write_student_csv(csv_path, train_rows, seed)
+    knn = KNNPredictor(k=7)
+    with contextlib.redirect_stdout(io.StringIO()):
+        knn.train(csv_path)
+        knn.save_model(os.path.join(sandbox, 'data', 'knn_model.pkl'))
+    return sandbox
+
+def run_cli(sandbox, script, args, env):
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-W', 'ignore', script] + args, cwd=sandbox, env=env,
+                          capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    last_line = proc.stdout.strip().splitlines()[-1] if proc.stdout.strip() else ''
+    if proc.returncode != 0 or '"success": true' not in last_line:
+        raise RuntimeError(f"{script} failed: {proc.stderr or proc.stdout}")
+    return elapsed
+
+def bench_cold_start(sandbox, repeat):
+    """Wall time of one CLI process, model loading included"""
+    env = dict(os.environ, PREDICTION_CACHE_PATH=os.path.join(sandbox, 'data', 'prediction_cache.sqlite'))
+    silent_input = json.dumps(silent_inputs(generate(1, 'silent', seed=7)[0])[0])
+    cases = {
+        'predict': ('predict.py', ['--no-cache', json.dumps(STUDENT_INPUT)]),
+        'predict_db': ('predict_db.py', ['--no-cache', silent_input]),
+        'predict_silent': ('predict_silent.py', ['--no-cache', silent_input]),
+        'predict.cached': ('predict.py', [json.dumps(STUDENT_INPUT)]),
+        'predict_db.cached': ('predict_db.py', [silent_input]),
+        'predict_silent.cached': ('predict_silent.py', [silent_input])
+    }
+    metrics = {}
+    for name, (script, args) in cases.items():
+        # First run warms the OS page cache (and fills the prediction cache)
+        run_cli(sandbox, script, args, env)
+        stats = summarize([run_cli(sandbox, script, args, env) for _ in range(repeat)])
+        metrics[f'cold_start.{name}.median'] = seconds(stats['median'])
+        metrics[f'cold_start.{name}.min'] = seconds(stats['min'])
+    return metrics
+
+def load_silent_predictor(sandbox):
+    from predict_silent import SilentKNNPredictor
+
+    predictor = SilentKNNPredictor()
+    if not predictor.load_model(os.path.join(sandbox, 'data', 'knn_model_silent.pkl')):
+        raise RuntimeError("Synthetic silent model could not be loaded")
+    return predictor
+
+def bench_warm(sandbox, repeat):
+    """Single prediction latency with the model already loaded"""
+    predictor = load_silent_predictor(sandbox)
+    inputs = silent_inputs(generate(repeat, 'silent', seed=11)[0])
+    samples = []
+    for item in inputs:
+        start = time.perf_counter()
+        predictor.predict(item)
+        samples.append(time.perf_counter() - start)
+    stats = summarize(samples)
+    return {
+        'warm.predict_silent.median': seconds(stats['median']),
+        'warm.predict_silent.p95': seconds(stats['p95'])
+    }
+
+def bench_batch(sandbox, sizes):
+    """Rows per second through predict_batch, feature building included"""
+    predictor = load_silent_predictor(sandbox)
+    all_inputs = silent_inputs(generate(max(sizes), 'silent', seed=13)[0])
+    metrics = {}
+    for n in sizes:
+        inputs = all_inputs[:n]
+        runs = max(1, min(20, 2000 // n))
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            predictor.predict_batch(inputs)
+            samples.append(time.perf_counter() - start)
+        metrics[f'batch.predict_silent.n{n}'] = rate(n / min(samples))
+    return metrics
+
+def bench_micro_batch(sandbox, n_requests, concurrency=32):
+    """Single requests through the micro-batching scheduler, idle and under concurrent load"""
+    import asyncio
+
+    from micro_batch import MicroBatcher
+
+    predictor = load_silent_predictor(sandbox)
+    inputs = silent_inputs(generate(n_requests, 'silent', seed=17)[0])
+
+    async def idle():
+        batcher = MicroBatcher(predictor.predict_batch)
+        samples = []
+        for item in inputs[:200]:
+            start = time.perf_counter()
+            await batcher.predict(item)
+            samples.append(time.perf_counter() - start)
+            # Let the window pass so every request finds the scheduler idle (the
+            # pause leaves caches colder than warm's back-to-back calls)
+            await asyncio.sleep(batcher.window)
+        return samples
+
+    async def loaded():
+        batcher = MicroBatcher(predictor.predict_batch)
+        remaining = iter(inputs)
+
+        async def caller():
+            for item in remaining:
+                await batcher.predict(item)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(caller() for _ in range(concurrency)))
+        return time.perf_counter() - start
+
+    stats = summarize(asyncio.run(idle()))
+    elapsed = asyncio.run(loaded())
+    return {
+        'micro_batch.predict_silent.idle_median': seconds(stats['median']),
+        f'micro_batch.predict_silent.c{concurrency}': rate(len(inputs) / elapsed)
+    }
+
+def bench_load(root, n_rows, repeat):
+    """Time to get a ready KNNEngine from each on-disk format"""
+    import joblib
+    from sklearn.neighbors import KNeighborsClassifier
+    from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+    from knn_engine import KNNEngine
+    from model_store import load_artifact, save_artifact
+
+    X, y = generate(n_rows, 'silent', seed=17)
+    names = class_names('silent')[y]
+    scaler = StandardScaler()
+    label_encoder = LabelEncoder()
+    model = KNeighborsClassifier(n_neighbors=7).fit(scaler.fit_transform(X), label_encoder.fit_transform(names))
+    model_data = {'model': model, 'scaler': scaler, 'label_encoder': label_encoder,
+                  'feature_names': list(FEATURE_NAMES), 'k': 7}
+
+    directory = os.path.join(root, 'load')
+    os.makedirs(directory)
+    pickle_path = os.path.join(directory, 'model.pkl')
+    npz_path = os.path.join(directory, 'model.npz')
+    artifact = os.path.join(directory, 'model.model')
+    joblib.dump(model_data, pickle_path)
+    engine = KNNEngine.from_model_data(model_data)
+    engine.save(npz_path)
+    save_artifact(engine, artifact)
+
+    loaders = {
+        'pickle': lambda: KNNEngine.from_model_data(joblib.load(pickle_path)),
+        'npz': lambda: KNNEngine.load(npz_path),
+        'artifact_mmap': lambda: load_artifact(artifact, mmap=True),
+        'artifact_copy': lambda: load_artifact(artifact, mmap=False)
+    }
+    metrics = {}
+    for name, loader in loaders.items():
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            loader()
+            samples.append(time.perf_counter() - start)
+        metrics[f'load.{name}.n{n_rows}'] = seconds(summarize(samples)['median'])
+    return metrics
+
+def synthetic_training_data(n_rows, seed):
+    """TrainingData with the columns training_data.py would extract, from generated rows"""
+    from training_data import TrainingData
+
+    X, y = generate(n_rows, 'database', seed=seed)
+    names = class_names('database')
+    present = np.unique(y)
+    return TrainingData(
+        gender=X[:, 0].astype(np.int8),
+        scores=X[:, 1:18].astype(np.float32),
+        rencana=X[:, 18].astype(np.int8),
+        kategori=X[:, 19].astype(np.int16),
+        kategori_classes=['Saintek', 'Soshum'],
+        keyakinan=X[:, 20].astype(np.float32),
+        target=np.searchsorted(present, y).astype(np.int32),
+        target_classes=[str(name) for name in names[present]]
+    )
+
+def bench_training(sizes, seed):
+    """DatabaseKNNPredictor.train_model on synthetic rows of each size"""
+    from predict_db import DatabaseKNNPredictor
+
+    metrics = {}
+    for n in sizes:
+        data = synthetic_training_data(n, seed)
+        predictor = DatabaseKNNPredictor()
+        predictor.load_training_data = lambda: data
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            trained = predictor.train_model()
+        elapsed = time.perf_counter() - start
+        if not trained or predictor.engine is None:
+            raise RuntimeError(f"Training on {n} synthetic rows failed")
+        metrics[f'training.predict_db.n{n}'] = seconds(elapsed)
+    return metrics
+
+def compare(metrics, baseline, tolerance):
+    """
+    Metrics worse than the baseline by more than the tolerance
+
+    Returns:
+        list: One dict per regression (name, baseline, current, change)
+    """
+    regressions = []
+    for name, metric in metrics.items():
+        base = baseline.get('metrics', {}).get(name)
+        if not base or not base['value']:
+            continue
+        change = metric['value'] / base['value'] - 1.0
+        worse = change > tolerance if metric['better'] == 'lower' else change < -tolerance / (1 + tolerance)
+        if worse:
+            regressions.append({'name': name, 'baseline': base['value'], 'current': metric['value'],
+                                'unit': metric['unit'], 'change': change})
+    return regressions
+
+def parse_args(argv=None):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Benchmark the KNN prediction and training paths")
+    parser.add_argument('--quick', action='store_true', help="Smaller sizes and fewer repeats")
+    parser.add_argument('--only', nargs='+',
+                        choices=['cold_start', 'warm', 'batch', 'micro_batch', 'load', 'training'],
+                        help="Run only these groups")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="Results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Baseline results to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="Also write the results as the baseline")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Relative slowdown flagged as a regression (default 0.2 = 20%%)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = dict(QUICK if args.quick else FULL, seed=args.seed)
+    groups = args.only or ['cold_start', 'warm', 'batch', 'micro_batch', 'load', 'training']
+
+    metrics = {}
+    root = tempfile.mkdtemp(prefix='knn-bench-')
+    try:
+        sandbox = make_sandbox(root, config['train_rows'], args.seed)
+        if 'cold_start' in groups:
+            metrics.update(bench_cold_start(sandbox, config['repeat']))
+        if 'warm' in groups:
+            metrics.update(bench_warm(sandbox, config['warm_repeat']))
+        if 'batch' in groups:
+            metrics.update(bench_batch(sandbox, config['batch_sizes']))
+        if 'micro_batch' in groups:
+            metrics.update(bench_micro_batch(sandbox, config['micro_batch_requests']))
+        if 'load' in groups:
+            metrics.update(bench_load(root, config['load_rows'], config['repeat']))
+        if 'training' in groups:
+            metrics.update(bench_training(config['training_sizes'], args.seed))
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    results = {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'machine': machine_info(),
+        'config': config,
+        'metrics': metrics
+    }
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        results['comparison'] = {
+            'baseline': args.baseline,
+            'tolerance': args.tolerance,
+            'same_machine': baseline.get('machine') == results['machine'],
+            'regressions': compare(metrics, baseline, args.tolerance)
+        }
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"bench-{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    for name, metric in metrics.items():
+        print(f"{name:<40} {metric['value']:>14.6g} {metric['unit']}")
+    print(f"\nResults written to {output}")
+
+    if baseline is None:
+        return 0
+    comparison = results['comparison']
+    if not comparison['same_machine']:
+        print("Note: baseline was recorded on a different machine or software versions")
+    for regression in comparison['regressions']:
+        print(f"REGRESSION {regression['name']}: {regression['baseline']:.6g} -> "
+              f"{regression['current']:.6g} {regression['unit']} ({regression['change']:+.1%})")
+    if comparison['regressions']:
+        return 1
+    print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
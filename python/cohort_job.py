@@ -0,0 +1,270 @@
+"""
+Prediksi jurusan massal langsung dari database (satu kelas atau semua siswa)
+Pengganti loop predictBulk di Laravel (satu query cek, satu proses Python
+dan satu PrediksiJurusan::create per siswa): semua siswa tanpa prediksi
+diambil dengan satu query anti-join, diprediksi per chunk dengan satu query
+KNN, lalu baris prediksi_jurusan ditulis dengan executemany, satu transaksi
+per chunk.
+
+Setelah setiap chunk di-commit, id siswa terakhir disimpan di file
+checkpoint (satu entry per scope: kelas atau all-missing). Job yang terhenti
+dan dijalankan lagi dengan scope yang sama melanjutkan dari checkpoint;
+entry scope tersebut dihapus setelah job selesai.
+
+Isi baris sama dengan yang ditulis PrediksiKNNController::predictBulk.
+"""
+
+import datetime
+import decimal
+import json
+import os
+import time
+
+from feature_schema import ACADEMIC_FIELDS
+
+DEFAULT_CHUNK_SIZE = 500
+DEFAULT_CHECKPOINT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'cohort_checkpoint.json')
+MODEL_VERSION = '2.0'
+# Failures kept in the report and checkpoint, the counts are always complete
+MAX_REPORTED_FAILURES = 100
+
+# Subjects stored in nilai_mata_pelajaran, default 75 as in the controller
+NILAI_SUBJECTS = ACADEMIC_FIELDS[:14]
+# preparePredictionData's subjects_map entries that exist as columns
+DIKUASAI_SUBJECTS = ['matematika', 'fisika', 'kimia', 'biologi', 'sejarah', 'geografi', 'seni_budaya']
+# survei_minat_bakat has no minat_* columns, so the controller always stores its default
+DEFAULT_MINAT = 3.0
+
+# Students without a prediksi_jurusan row (LEFT JOIN ... IS NULL anti-join),
+# with their first nilai_akademik and survei_minat_bakat rows like ->first()
+COHORT_QUERY = f"""
+SELECT
+    sl.id, sl.jenis_kelamin,
+    na.id AS nilai_id,
+    {', '.join(f"na.{field}" for field in ACADEMIC_FIELDS)},
+    smb.id AS survei_id,
+    smb.rencana_kuliah, smb.jurusan_diminati, smb.kategori_jurusan, smb.tingkat_keyakinan
+FROM siswa_lengkap sl
+LEFT JOIN (SELECT siswa_lengkap_id, MIN(id) AS id FROM nilai_akademik GROUP BY siswa_lengkap_id) nf
+    ON nf.siswa_lengkap_id = sl.id
+LEFT JOIN nilai_akademik na ON na.id = nf.id
+LEFT JOIN (SELECT siswa_lengkap_id, MIN(id) AS id FROM survei_minat_bakat GROUP BY siswa_lengkap_id) sf
+    ON sf.siswa_lengkap_id = sl.id
+LEFT JOIN survei_minat_bakat smb ON smb.id = sf.id
+LEFT JOIN prediksi_jurusan pj ON pj.siswa_lengkap_id = sl.id
+WHERE pj.id IS NULL
+AND sl.id > {{p}}
+"""
+
+# Positions in a COHORT_QUERY row
+_ID = 0
+_GENDER = 1
+_NILAI_ID = 2
+_SCORES = slice(3, 20)
+_SURVEI_ID = 20
+_RENCANA = 21
+_JURUSAN_DIMINATI = 22
+_KATEGORI = 23
+_KEYAKINAN = 24
+
+INSERT_COLUMNS = [
+    'siswa_lengkap_id', 'nilai_mata_pelajaran', 'mata_pelajaran_dikuasai',
+    'minat_ipa', 'minat_ips', 'minat_bahasa', 'minat_seni', 'minat_olahraga',
+    'jurusan_prediksi', 'kategori_jurusan_prediksi', 'confidence_score', 'alternatif_jurusan',
+    'model_version', 'parameter_input', 'tanggal_prediksi', 'created_at', 'updated_at'
+]
+
+def cohort_query(placeholder, kelas=None, after_id=0):
+    """COHORT_QUERY for one kelas (or every student) after a checkpoint, with its parameters"""
+    sql = COHORT_QUERY.format(p=placeholder)
+    params = [int(after_id)]
+    if kelas is not None:
+        sql += f"AND sl.kelas = {placeholder}\n"
+        params.append(kelas)
+    return sql + "ORDER BY sl.id\n", params
+
+def _plain(value):
+    """DECIMAL columns come back as Decimal; keep inputs JSON-serializable"""
+    return float(value) if isinstance(value, decimal.Decimal) else value
+
+def student_input(row):
+    """
+    Prediction input for one query row, as preparePredictionData builds it
+
+    Returns:
+        tuple: (input dict, None) or (None, failure message)
+    """
+    if row[_NILAI_ID] is None:
+        return None, 'Siswa belum memiliki data nilai akademik'
+    if row[_SURVEI_ID] is None:
+        return None, 'Siswa belum mengisi survei minat bakat'
+
+    scores = {field: _plain(value) for field, value in zip(ACADEMIC_FIELDS, row[_SCORES])}
+    data = {'jenis_kelamin': row[_GENDER]}
+    data.update({field: 75 if value is None else value for field, value in scores.items()})
+    kategori = row[_KATEGORI]
+    data.update({
+        'rencana_kuliah': row[_RENCANA] or 'Iya',
+        'jurusan_diminati': row[_JURUSAN_DIMINATI] or 'Belum ditentukan',
+        'kategori_jurusan': kategori or 'Saintek',
+        'kategori_jurusan_encoded': 1 if kategori == 'Saintek' else 0,
+        'tingkat_keyakinan': 75 if row[_KEYAKINAN] is None else _plain(row[_KEYAKINAN]),
+        # subjects_map defaults missing scores to 0, not 75
+        'mata_pelajaran_dikuasai': [s for s in DIKUASAI_SUBJECTS if (scores[s] or 0) >= 75]
+    })
+    return data, None
+
+def prediksi_row(siswa_id, data, result, k, timestamp):
+    """INSERT_COLUMNS values for one successful prediction"""
+    prediction = result['data']
+    analysis = prediction.get('academic_analysis') or {}
+    nilai = {subject: data[subject] for subject in NILAI_SUBJECTS}
+    parameter_input = {
+        'k_neighbors': k,
+        'algorithm': 'KNN',
+        'features_used': 21,
+        'input_data': data,
+        'academic_analysis': analysis
+    }
+    return (
+        siswa_id,
+        json.dumps(nilai),
+        json.dumps([subject for subject, score in nilai.items() if score >= 80]),
+        DEFAULT_MINAT, DEFAULT_MINAT, DEFAULT_MINAT, DEFAULT_MINAT, DEFAULT_MINAT,
+        prediction['predicted_major'],
+        analysis.get('academic_strength', 'Umum'),
+        round(prediction['confidence'] / 100, 4),
+        json.dumps(prediction.get('recommendations', [])),
+        MODEL_VERSION,
+        # The controller json_encodes an array into an 'array' cast column: stored encoded twice
+        json.dumps(json.dumps(parameter_input)),
+        timestamp, timestamp, timestamp
+    )
+
+def insert_sql(placeholder):
+    return "INSERT INTO prediksi_jurusan ({}) VALUES ({})".format(
+        ', '.join(INSERT_COLUMNS), ', '.join([placeholder] * len(INSERT_COLUMNS)))
+
+def write_rows(conn, sql, rows):
+    """Insert rows with executemany in a single transaction"""
+    cursor = conn.cursor()
+    try:
+        cursor.executemany(sql, rows)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def _read_checkpoints(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def load_checkpoint(path, scope):
+    """Progress of an interrupted run with the same scope, or None"""
+    return _read_checkpoints(path).get(scope)
+
+def save_checkpoint(path, scope, state):
+    """
+    Record the progress of one scope, keeping other scopes' entries
+
+    Written atomically (temp file + rename); no entries left removes the file.
+    """
+    checkpoints = _read_checkpoints(path)
+    if state is None:
+        checkpoints.pop(scope, None)
+    else:
+        checkpoints[scope] = state
+    if not checkpoints:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoints, f)
+    os.replace(tmp_path, path)
+
+def run_cohort(predictor, pool, kelas=None, chunk_size=DEFAULT_CHUNK_SIZE, checkpoint_path=DEFAULT_CHECKPOINT_PATH,
+               restart=False):
+    """
+    Predict and store every student of a kelas (None: all) without a prediction
+
+    Args:
+        predictor: Loaded DatabaseKNNPredictor (anything with predict_batch and k)
+        pool (db_pool.ConnectionPool): Pool to read students and write predictions
+        kelas (str): Only students of this kelas; None for the whole school
+        chunk_size (int): Students per prediction call and per transaction
+        checkpoint_path (str): Progress file, None to run without one
+        restart (bool): Ignore an existing checkpoint
+
+    Returns:
+        dict: Counts, failures and timing of the run
+    """
+    started = time.perf_counter()
+    scope = 'all-missing' if kelas is None else f"kelas:{kelas}"
+    state = None
+    if checkpoint_path and not restart:
+        state = load_checkpoint(checkpoint_path, scope)
+    resumed = state is not None
+    state = state or {'last_id': 0, 'predicted': 0, 'failed': 0, 'failures': []}
+    resumed_from = state['last_id']
+
+    sql, params = cohort_query(pool.placeholder, kelas, state['last_id'])
+    insert = insert_sql(pool.placeholder)
+    with pool.lease() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql, params)
+            students = cursor.fetchall()
+        finally:
+            cursor.close()
+        query_seconds = time.perf_counter() - started
+
+        for start in range(0, len(students), chunk_size):
+            chunk = students[start:start + chunk_size]
+            ids, inputs, failures = [], [], []
+            for row in chunk:
+                data, error = student_input(row)
+                if error is None:
+                    ids.append(row[_ID])
+                    inputs.append(data)
+                else:
+                    failures.append({'siswa_id': row[_ID], 'message': error})
+
+            timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            records = []
+            for siswa_id, data, result in zip(ids, inputs, predictor.predict_batch(inputs) if inputs else []):
+                if result['success']:
+                    records.append(prediksi_row(siswa_id, data, result, predictor.k, timestamp))
+                else:
+                    failures.append({'siswa_id': siswa_id, 'message': result['error']})
+            if records:
+                write_rows(conn, insert, records)
+
+            state['last_id'] = chunk[-1][_ID]
+            state['predicted'] += len(records)
+            state['failed'] += len(failures)
+            state['failures'] = (state['failures'] + failures)[:MAX_REPORTED_FAILURES]
+            if checkpoint_path:
+                save_checkpoint(checkpoint_path, scope, state)
+
+    if checkpoint_path:
+        save_checkpoint(checkpoint_path, scope, None)
+
+    return {
+        'success': True,
+        'scope': scope,
+        'selected': len(students),
+        'predicted': state['predicted'],
+        'failed': state['failed'],
+        'failures': state['failures'],
+        'resumed': resumed,
+        'resumed_from_id': resumed_from,
+        'query_seconds': round(query_seconds, 3),
+        'elapsed_seconds': round(time.perf_counter() - started, 3)
+    }
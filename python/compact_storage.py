@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Mode penyimpanan compact untuk data training KNN
+Nilai mentah setiap fitur disimpan sebagai kode integer kecil:
+    nilai = offset + kode * step
+dengan step per fitur (1 untuk nilai rapor dan kode kategori, 0.1 untuk
+minat_*, dst). Step dipilih yang lossless jika muat di tipe kode (uint8
+atau uint16), jika tidak step terhalus yang masih muat. Label disimpan
+sebagai uint8/uint16.
+
+Jarak dihitung dalam float32 langsung dari kode per blok baris training
+(blok kecil muat di cache), lalu shortlist beberapa kandidat terdekat
+dihitung ulang dalam float64 sehingga urutan tetangga dan tie tetap sama
+dengan pencarian float64. accuracy_check() membandingkan hasilnya dengan
+engine float64 dan dilaporkan saat konversi.
+
+Usage:
+    python compact_storage.py <model.pkl|model.model> [--dtype uint16] [--allow-lossy]
+"""
+
+import argparse
+import json
+import sys
+
+import numpy as np
+
+from knn_engine import DISTANCE_BLOCK_SIZE, KNNEngine
+
+# Candidate steps, coarse to fine
+STEPS = (1.0, 0.5, 0.25, 0.1, 0.05, 0.01)
+CODE_DTYPES = {'uint8': np.uint8, 'uint16': np.uint16}
+# Training rows converted to float32 at a time (16384 x 21 x 4 B fits in L2)
+TRAINING_BLOCK_ROWS = 16384
+# Candidates beyond k re-ranked in float64
+SHORTLIST_EXTRA = 8
+
+def choose_encoding(raw, dtype=np.uint8):
+    """
+    Offset and step of every feature column
+
+    Returns:
+        tuple: (offset, step, lossless) arrays, one entry per feature
+
+    Raises:
+        ValueError: A feature spans more codes than the dtype holds even at step 1
+    """
+    cap = np.iinfo(dtype).max
+    offsets, steps, lossless = [], [], []
+    for f, column in enumerate(np.asarray(raw, dtype=np.float64).T):
+        choice = None
+        for step in STEPS:
+            offset = np.floor(column.min() / step + 1e-9) * step
+            if (column.max() - offset) / step > cap + 1e-6:
+                break
+            codes = (column - offset) / step
+            exact = bool(np.allclose(codes, np.round(codes), rtol=0, atol=1e-6))
+            choice = (offset, step, exact)
+            if exact:
+                break
+        if choice is None:
+            raise ValueError(f"Feature {f} spans more than {cap} steps of {STEPS[0]}")
+        offsets.append(choice[0])
+        steps.append(choice[1])
+        lossless.append(choice[2])
+    return np.array(offsets), np.array(steps), np.array(lossless)
+
+def label_dtype(n_classes):
+    return np.uint8 if n_classes <= 256 else np.uint16
+
+class DecodedRows:
+    """
+    Scaled training rows of a compact engine for knn_index queries, which
+    only read X[ids]: each lookup decodes the requested rows from the codes,
+    bit for bit equal to the same rows of CompactKNNEngine.X
+    """
+
+    def __init__(self, codes, w, b):
+        self.codes = codes
+        self.w = w
+        self.b = b
+
+    def __getitem__(self, rows):
+        return self.codes[rows] * self.w + self.b
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+class CompactKNNEngine(KNNEngine):
+    """
+    KNNEngine over integer-coded training rows
+
+    The scaled float64 matrix (X, X_norms) is only built on demand for
+    paths that need it (index building, updates, the parallel executor).
+    Index queries decode just the rows they visit (see DecodedRows).
+    """
+
+    storage = 'compact'
+
+    def __init__(self, codes, offset, step, labels, classes, k, mean, inv_std, weights='uniform', metadata=None,
+                 norms=None, index=None):
+        """
+        Args:
+            codes (numpy.ndarray): (n, F) uint8/uint16 feature codes
+            offset, step (numpy.ndarray): (F,) raw value = offset + code * step
+            norms (numpy.ndarray): (n,) float32 squared norms of code * w, computed if omitted
+        """
+        if weights not in ('uniform', 'distance'):
+            raise ValueError(f"Unsupported weights: {weights}")
+
+        self.codes = np.asarray(codes)
+        self.offset = np.asarray(offset, dtype=np.float64)
+        self.step = np.asarray(step, dtype=np.float64)
+        self.labels = np.asarray(labels)
+        self.classes = np.asarray(classes)
+        self.k = int(k)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.inv_std = np.asarray(inv_std, dtype=np.float64)
+        self.weights = weights
+        self.metadata = dict(metadata or {})
+        self.p = self.metadata.get('p', 2)
+        if self.p != 2:
+            raise ValueError(f"Compact storage needs a euclidean model, not Minkowski p={self.p}")
+        self.index = index
+
+        # Scaled training row = codes * w + b
+        self.w = self.step * self.inv_std
+        self.b = (self.offset - self.mean) * self.inv_std
+        self._w32 = self.w.astype(np.float32)
+        self.norms = self._code_norms() if norms is None else np.asarray(norms, dtype=np.float32)
+        self.rows = DecodedRows(self.codes, self.w, self.b)
+        self._X = None
+        self._X_norms = None
+
+    @classmethod
+    def from_engine(cls, engine, dtype=np.uint8):
+        """Encode a float64 engine's training rows"""
+        raw = np.asarray(engine.X) / engine.inv_std + engine.mean
+        offset, step, lossless = choose_encoding(raw, dtype)
+        codes = np.round((raw - offset) / step).astype(dtype)
+        compact = cls(
+            codes, offset, step, np.asarray(engine.labels).astype(label_dtype(len(engine.classes))),
+            engine.classes, engine.k, engine.mean, engine.inv_std, engine.weights, engine.metadata
+        )
+        compact.lossless = lossless
+        return compact
+
+    def _code_norms(self):
+        norms = np.empty(len(self.codes), dtype=np.float32)
+        for start in range(0, len(self.codes), TRAINING_BLOCK_ROWS):
+            block = self.codes[start:start + TRAINING_BLOCK_ROWS].astype(np.float32) * self._w32
+            norms[start:start + len(block)] = np.einsum('ij,ij->i', block, block)
+        return norms
+
+    @property
+    def X(self):
+        """Scaled float64 training matrix, materialized on first use"""
+        if self._X is None:
+            self._X = self.codes * self.w + self.b
+        return self._X
+
+    @property
+    def X_norms(self):
+        if self._X_norms is None:
+            X = self.X
+            self._X_norms = np.einsum('ij,ij->i', X, X)
+        return self._X_norms
+
+    @property
+    def n_features(self):
+        return self.codes.shape[1]
+
+    def arrays(self):
+        """On-disk arrays of the compact artifact"""
+        return {
+            'codes': np.ascontiguousarray(self.codes),
+            'offset': self.offset,
+            'step': self.step,
+            'norms': np.ascontiguousarray(self.norms, dtype=np.float32),
+            'mean': self.mean,
+            'inv_std': self.inv_std,
+            'labels': np.ascontiguousarray(self.labels),
+            'classes': np.asarray(self.classes).astype(str)
+        }
+
+    def kneighbors(self, X_scaled, n_neighbors=None):
+        """Nearest neighbors like KNNEngine.kneighbors, without the float64 matrix"""
+        if self.index is None:
+            return self.brute_kneighbors(X_scaled, n_neighbors)
+        X_scaled = np.atleast_2d(np.asarray(X_scaled, dtype=np.float64))
+        return self.index.query(self.rows, X_scaled, min(n_neighbors or self.k, len(self.codes)))
+
+    def brute_kneighbors(self, X_scaled, n_neighbors=None):
+        """
+        Exact nearest neighbors from the codes
+
+        float32 distances over cache-sized blocks of training rows give a
+        shortlist of k + SHORTLIST_EXTRA candidates per query; those are
+        ranked by float64 distance and training row, like KNNEngine.
+        """
+        Q = np.atleast_2d(np.asarray(X_scaled, dtype=np.float64)) - self.b
+        n = len(self.codes)
+        n_neighbors = min(n_neighbors or self.k, n)
+
+        distances = np.empty((len(Q), n_neighbors))
+        indices = np.empty((len(Q), n_neighbors), dtype=np.intp)
+        block = max(1, DISTANCE_BLOCK_SIZE // min(n, TRAINING_BLOCK_ROWS))
+        for start in range(0, len(Q), block):
+            stop = start + block
+            distances[start:stop], indices[start:stop] = self._search(
+                Q[start:stop], n_neighbors, min(n, n_neighbors + SHORTLIST_EXTRA))
+        return distances, indices
+
+    def _search(self, Q, n_neighbors, m):
+        candidates, bound, tolerance = self._shortlist(Q, m)
+        distances, indices = self._rerank(Q, candidates, n_neighbors)
+        if m < len(self.codes):
+            # Rows left out are >= bound in float32; if that is not clearly
+            # beyond the k-th distance (float32 error, exact ties) widen the shortlist
+            unsure = distances[:, -1] ** 2 + tolerance >= bound
+            if unsure.any():
+                distances[unsure], indices[unsure] = self._search(
+                    Q[unsure], n_neighbors, min(len(self.codes), 4 * m))
+        return distances, indices
+
+    def _shortlist(self, Q, m):
+        """(candidates, float32 distance bound of the rest, float32 error bound) of m rows per query"""
+        # ||q' - w*c||^2 = ||q'||^2 - 2 (q'*w).c + ||w*c||^2, in float32
+        Qw = (Q * self.w).astype(np.float32)
+        q_norms = np.einsum('ij,ij->i', Q, Q)
+        q_norms32 = q_norms.astype(np.float32)[:, None]
+        found_i, found_d = [], []
+        for start in range(0, len(self.codes), TRAINING_BLOCK_ROWS):
+            codes = self.codes[start:start + TRAINING_BLOCK_ROWS].astype(np.float32)
+            sq_dist = Qw @ codes.T
+            sq_dist *= -2
+            sq_dist += self.norms[start:start + len(codes)]
+            sq_dist += q_norms32
+            take = min(m, len(codes))
+            if take < len(codes):
+                part = np.argpartition(sq_dist, take - 1, axis=1)[:, :take]
+            else:
+                part = np.broadcast_to(np.arange(len(codes)), sq_dist.shape)
+            found_i.append(part + start)
+            found_d.append(np.take_along_axis(sq_dist, part, axis=1))
+
+        candidates, sq_dist = np.hstack(found_i), np.hstack(found_d)
+        if candidates.shape[1] > m:
+            best = np.argpartition(sq_dist, m - 1, axis=1)[:, :m]
+            candidates = np.take_along_axis(candidates, best, axis=1)
+            sq_dist = np.take_along_axis(sq_dist, best, axis=1)
+        tolerance = 1e-5 * (q_norms + float(self.norms.max(initial=0))) + 1e-9
+        return candidates, sq_dist.max(axis=1), tolerance
+
+    def _rerank(self, Q, candidates, n_neighbors):
+        # Direct float64 differences: duplicate training rows tie exactly
+        diff = self.codes[candidates] * self.w - Q[:, None, :]
+        sq_dist = np.einsum('qmf,qmf->qm', diff, diff)
+        order = np.lexsort((candidates, sq_dist), axis=1)[:, :n_neighbors]
+        return np.sqrt(np.take_along_axis(sq_dist, order, axis=1)), np.take_along_axis(candidates, order, axis=1)
+
+def accuracy_check(reference, compact, n_random=1000, seed=0):
+    """
+    Compare a compact engine with the float64 engine it was made from
+
+    Probes are the training rows plus random points around them, as in
+    knn_engine.verify_export.
+
+    Returns:
+        dict: Agreement of neighbors, labels and probabilities
+    """
+    rng = np.random.default_rng(seed)
+    X_train = np.asarray(reference.X) / reference.inv_std + reference.mean
+    picks = X_train[rng.integers(0, len(X_train), n_random)]
+    X_probe = np.vstack([X_train, picks + rng.normal(0, 1, picks.shape) / reference.inv_std * 0.5])
+
+    expected_d, expected_i = reference.kneighbors(reference.transform(X_probe))
+    actual_d, actual_i = compact.kneighbors(compact.transform(X_probe))
+    expected = reference.vote(expected_d, expected_i)
+    actual = compact.vote(actual_d, actual_i)
+    return {
+        'n_probes': len(X_probe),
+        'neighbor_agreement': float(np.mean(np.all(expected_i == actual_i, axis=1))),
+        'label_agreement': float(np.mean(np.argmax(expected, axis=1) == np.argmax(actual, axis=1))),
+        'max_distance_diff': float(np.max(np.abs(expected_d - actual_d))),
+        'max_proba_diff': float(np.max(np.abs(expected - actual)))
+    }
+
+def storage_report(engine):
+    """Bytes held by the arrays an engine predicts from"""
+    if engine.storage == 'compact':
+        arrays = engine.arrays()
+    else:
+        arrays = {'X': engine.X, 'X_norms': engine.X_norms, 'labels': engine.labels}
+    return {name: int(np.asarray(array).nbytes) for name, array in arrays.items()}
+
+def compact_model(model_path, dtype='uint8', allow_lossy=False):
+    """
+    Rewrite a model's artifact in compact storage, with the accuracy check
+
+    Features whose values are not all multiples of a step that fits the
+    code type are rounded; unless allow_lossy, the artifact is then left
+    as it is and the report says why.
+    """
+    from model_store import load_engine, replace_engine
+
+    reference = load_engine(model_path, mmap=False)
+    if reference.storage == 'compact':
+        reference = KNNEngine(reference.X, reference.labels, reference.classes, reference.k, reference.mean,
+                              reference.inv_std, reference.weights, reference.metadata)
+    compact = CompactKNNEngine.from_engine(reference, CODE_DTYPES[dtype])
+    compact.index = reference.index
+    accuracy = accuracy_check(reference, compact)
+
+    before = sum(storage_report(reference).values())
+    after = sum(storage_report(compact).values())
+    lossy = [str(name) for name, exact in zip(compact.metadata.get('feature_names') or range(compact.n_features),
+                                              compact.lossless) if not exact]
+    if lossy and not allow_lossy:
+        return {
+            'success': False,
+            'error': f"Features not exactly representable as {dtype} codes: {', '.join(lossy)}",
+            'lossy_features': lossy,
+            'accuracy': accuracy
+        }
+    replace_engine(compact, model_path)
+    return {
+        'success': True,
+        'model_path': model_path,
+        'dtype': dtype,
+        'n_samples': int(len(compact.codes)),
+        'n_features': int(compact.n_features),
+        'lossy_features': lossy,
+        'bytes_before': before,
+        'bytes_after': after,
+        'ratio': round(before / after, 2),
+        'accuracy': accuracy
+    }
+
+def main(argv=None):
+    """Main function for command line usage"""
+    parser = argparse.ArgumentParser(description="Convert a model artifact to compact storage")
+    parser.add_argument('model', help="Model path (.pkl, .npz or .model directory)")
+    parser.add_argument('--dtype', choices=sorted(CODE_DTYPES), default='uint8', help="Feature code type")
+    parser.add_argument('--allow-lossy', action='store_true', help="Round features that do not fit the codes exactly")
+    args = parser.parse_args(argv)
+
+    try:
+        result = compact_model(args.model, args.dtype, args.allow_lossy)
+    except Exception as e:
+        result = {"success": False, "error": f"Compact error: {str(e)}"}
+    print(json.dumps(result, indent=2))
+    return 0 if result['success'] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+"""
+Pool koneksi database bersama untuk DatabaseKNNPredictor dan SilentKNNPredictor
+Konfigurasi dibaca sekali per proses dari .env Laravel. Koneksi dipinjam
+lewat context manager dan dikembalikan ke pool setelah dipakai, sehingga
+proses long-running atau batch tidak membuka koneksi TCP + auth baru
+untuk setiap operasi.
+
+MySQL/MariaDB memakai mysql.connector.pooling. DB_CONNECTION=sqlite
+(default Laravel) memakai file SQLite yang sama dengan aplikasi, dan juga
+dipakai sebagai pengganti MySQL di test.
+
+Usage:
+    from db_pool import get_pool
+
+    with get_pool().lease() as conn:
+        cursor = conn.cursor()
+"""
+
+import contextlib
+import os
+import threading
+import time
+
+LARAVEL_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+DEFAULT_POOL_SIZE = 5
+# Seconds to wait for a free connection before giving up
+DEFAULT_LEASE_TIMEOUT = 10.0
+
+class PoolExhausted(Exception):
+    """No connection became free within the lease timeout"""
+
+_config = None
+_pool = None
+_lock = threading.Lock()
+
+def load_config(env_path=None):
+    """
+    Database settings from the Laravel .env file
+
+    Parsed on the first call only; later calls return the same dict.
+    """
+    global _config
+    if _config is not None:
+        return _config
+
+    try:
+        from dotenv import load_dotenv
+
+        load_dotenv(env_path or os.path.join(LARAVEL_ROOT, '.env'))
+    except ImportError:
+        pass
+
+    driver = os.getenv('DB_CONNECTION', 'mysql')
+    if driver == 'sqlite':
+        database = os.getenv('DB_DATABASE') or os.path.join(LARAVEL_ROOT, 'database', 'database.sqlite')
+    else:
+        database = os.getenv('DB_DATABASE', 'sistem_annur')
+
+    _config = {
+        'driver': driver,
+        'host': os.getenv('DB_HOST', 'localhost'),
+        'port': int(os.getenv('DB_PORT', 3306)),
+        'database': database,
+        'user': os.getenv('DB_USERNAME', 'root'),
+        'password': os.getenv('DB_PASSWORD', ''),
+        'pool_size': int(os.getenv('DB_POOL_SIZE', DEFAULT_POOL_SIZE))
+    }
+    return _config
+
+class ConnectionPool:
+    """Base pool: leases healthy connections and counts what it does"""
+
+    # Parameter marker of the driver's SQL dialect
+    placeholder = '%s'
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, lease_timeout=DEFAULT_LEASE_TIMEOUT):
+        self.pool_size = pool_size
+        self.lease_timeout = lease_timeout
+        self.pid = os.getpid()
+        self.stats = {'leases': 0, 'opened': 0, 'replaced': 0}
+
+    @contextlib.contextmanager
+    def lease(self):
+        """Borrow a connection for the duration of a with block"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def acquire(self):
+        deadline = time.monotonic() + self.lease_timeout
+        while True:
+            conn = self._take()
+            if conn is not None:
+                break
+            if time.monotonic() >= deadline:
+                raise PoolExhausted(f"No free database connection after {self.lease_timeout}s (pool size {self.pool_size})")
+            time.sleep(0.01)
+
+        conn = self._check(conn)
+        self.stats['leases'] += 1
+        return conn
+
+    def release(self, conn):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def _take(self):
+        """A free connection, or None when all are leased"""
+        raise NotImplementedError
+
+    def _check(self, conn):
+        """Health check on lease: the connection itself, a replacement, or an error"""
+        raise NotImplementedError
+
+class MySQLPool(ConnectionPool):
+    """mysql.connector.pooling with a ping health check on every lease"""
+
+    def __init__(self, config, pool_size=DEFAULT_POOL_SIZE, lease_timeout=DEFAULT_LEASE_TIMEOUT):
+        from mysql.connector import errors, pooling
+
+        super().__init__(pool_size, lease_timeout)
+        self._errors = errors
+        self._pool = pooling.MySQLConnectionPool(
+            pool_name=f"knn_{os.getpid()}",
+            pool_size=pool_size,
+            host=config['host'],
+            port=config['port'],
+            database=config['database'],
+            user=config['user'],
+            password=config['password']
+        )
+        self.stats['opened'] = pool_size
+
+    def _take(self):
+        try:
+            return self._pool.get_connection()
+        except self._errors.PoolError:
+            return None
+
+    def _check(self, conn):
+        try:
+            if not conn.is_connected():
+                self.stats['replaced'] += 1
+            conn.ping(reconnect=True, attempts=2, delay=0)
+        except self._errors.Error:
+            # Server unreachable: give the slot back and report the failure
+            conn.close()
+            raise
+        return conn
+
+    def release(self, conn):
+        # Closing a pooled connection returns it to the pool
+        conn.close()
+
+class SQLitePool(ConnectionPool):
+    """Pool of sqlite3 connections to one database file"""
+
+    placeholder = '?'
+
+    def __init__(self, database, pool_size=DEFAULT_POOL_SIZE, lease_timeout=DEFAULT_LEASE_TIMEOUT):
+        super().__init__(pool_size, lease_timeout)
+        self.database = database
+        self._idle = []
+        self._open = 0
+        self._guard = threading.Lock()
+
+    def _connect(self):
+        import sqlite3
+
+        self.stats['opened'] += 1
+        return sqlite3.connect(self.database, check_same_thread=False)
+
+    def _take(self):
+        with self._guard:
+            if self._idle:
+                return self._idle.pop()
+            if self._open < self.pool_size:
+                self._open += 1
+                return self._connect()
+        return None
+
+    def _check(self, conn):
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return conn
+        except Exception:
+            with contextlib.suppress(Exception):
+                conn.close()
+            self.stats['replaced'] += 1
+            return self._connect()
+
+    def release(self, conn):
+        with contextlib.suppress(Exception):
+            conn.rollback()
+        with self._guard:
+            self._idle.append(conn)
+
+    def close(self):
+        with self._guard:
+            for conn in self._idle:
+                conn.close()
+            self._open -= len(self._idle)
+            self._idle = []
+
+def create_pool(config=None):
+    """Build the pool matching a config from load_config()"""
+    config = config or load_config()
+    if config['driver'] == 'sqlite':
+        return SQLitePool(config['database'], config['pool_size'])
+    return MySQLPool(config, config['pool_size'])
+
+def get_pool():
+    """
+    The process-wide pool, created on first use
+
+    A forked child (prediction server workers) gets its own pool instead
+    of sharing the parent's sockets.
+    """
+    global _pool
+    with _lock:
+        if _pool is None or _pool.pid != os.getpid():
+            _pool = create_pool()
+        return _pool
+
+def set_pool(pool):
+    """Replace the process-wide pool (e.g. with an SQLitePool in tests)"""
+    global _pool
+    with _lock:
+        if _pool is not None and _pool.pid == os.getpid():
+            _pool.close()
+        _pool = pool
@@ -0,0 +1,224 @@
+"""
+Skema fitur untuk ketiga predictor KNN
+Setiap fitur dideklarasikan sekali: key sumber di input JSON, map encoding
+(jenis_kelamin, rencana_kuliah, kategori_jurusan), nilai default dan batas
+clip. Skema disimpan bersama model (metadata engine) lalu di-compile menjadi
+transformer yang mengubah N dict input menjadi array (N, F) kolom per kolom.
+
+Contoh satu fitur:
+    {"name": "matematika", "source": "matematika", "default": 75, "clip": [0, 100]}
+    {"name": "jenis_kelamin_encoded", "source": "jenis_kelamin",
+     "encoding": {"Laki-laki": 1}, "unknown": 0}
+"""
+
+import numpy as np
+
+ACADEMIC_FIELDS = [
+    'matematika', 'bahasa_indonesia', 'bahasa_inggris',
+    'fisika', 'kimia', 'biologi', 'sejarah', 'geografi',
+    'ekonomi', 'sosiologi', 'pkn', 'seni_budaya',
+    'prakarya', 'pjok', 'peminatan_1', 'peminatan_2',
+    'rata_rata_keseluruhan'
+]
+
+STUDENT_SUBJECTS = [
+    'matematika', 'fisika', 'kimia', 'biologi', 'b_indonesia',
+    'b_inggris', 'sejarah', 'geografi', 'informatika', 'seni_budaya'
+]
+
+STUDENT_INTERESTS = ['minat_ipa', 'minat_ips', 'minat_bahasa', 'minat_seni']
+
+GENDER_MAP = {'Laki-laki': 1}
+RENCANA_KULIAH_MAP = {'Iya': 2, 'Masih ragu': 1, 'Tidak': 0}
+KATEGORI_JURUSAN_MAP = {'Saintek': 1}
+
+# Value of features a model expects but no schema declares
+PADDING_VALUE = 75.0
+
+class FeatureSchema:
+    """Ordered feature declarations, JSON-serializable so they can live in model metadata"""
+
+    def __init__(self, features):
+        """
+        Args:
+            features (list): One dict per feature, in model column order, with
+                'name', 'source' (input key, None for a constant), 'default',
+                and optionally 'encoding', 'unknown', 'clip' and 'required'
+        """
+        self.features = [dict(feature) for feature in features]
+
+    @property
+    def names(self):
+        return [feature['name'] for feature in self.features]
+
+    def to_dict(self):
+        return {'features': [dict(feature) for feature in self.features]}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['features'])
+
+    @classmethod
+    def from_metadata(cls, metadata, fallback):
+        """
+        Schema stored with a model, or the predictor's default schema
+        restricted to the model's feature names (models saved before
+        schemas were stored)
+        """
+        if metadata.get('feature_schema'):
+            return cls.from_dict(metadata['feature_schema'])
+        return fallback.select(metadata['feature_names'])
+
+    def select(self, names):
+        """Schema for the given feature names, in that order; undeclared names become constants"""
+        by_name = {feature['name']: feature for feature in self.features}
+        return FeatureSchema([
+            by_name.get(name, {'name': name, 'source': None, 'default': PADDING_VALUE})
+            for name in names
+        ])
+
+    def compile(self):
+        return FeatureTransformer(self)
+
+class FeatureTransformer:
+    """Vectorized input dicts -> feature matrix conversion for one schema"""
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.n_features = len(schema.features)
+        self._columns = []
+        for feature in schema.features:
+            clip = feature.get('clip')
+            self._columns.append((
+                feature['name'],
+                feature.get('source'),
+                feature.get('default'),
+                feature.get('encoding'),
+                feature.get('unknown', 0),
+                (float(clip[0]), float(clip[1])) if clip else None,
+                bool(feature.get('required'))
+            ))
+
+    def transform(self, inputs):
+        """
+        Convert a list of input dicts to an (N, F) float array
+
+        Each column is gathered and converted in one pass. Rows with a
+        missing required field or a value that is not a finite number are
+        reported instead of failing the whole batch; their matrix row is
+        left as zeros.
+
+        Returns:
+            tuple: (X, errors) - the feature matrix and a dict mapping row
+            index to an error message
+        """
+        n_rows = len(inputs)
+        X = np.zeros((n_rows, self.n_features))
+        errors = {}
+
+        rows = []
+        for i, row in enumerate(inputs):
+            if isinstance(row, dict):
+                rows.append(row)
+            else:
+                errors[i] = "Invalid input: expected an object"
+                rows.append({})
+
+        for j, (name, source, default, encoding, unknown, clip, required) in enumerate(self._columns):
+            if source is None:
+                X[:, j] = default
+                continue
+
+            if required:
+                for i, row in enumerate(rows):
+                    if source not in row and i not in errors:
+                        errors[i] = f"Missing required field: {source}"
+
+            values = [row.get(source, default) for row in rows]
+            if encoding is not None:
+                X[:, j] = self._encode(values, encoding, unknown)
+            else:
+                X[:, j] = self._to_float(values, source, errors)
+
+            if clip is not None:
+                np.clip(X[:, j], clip[0], clip[1], out=X[:, j])
+
+        for i in errors:
+            X[i] = 0.0
+        return X, errors
+
+    @staticmethod
+    def _encode(values, encoding, unknown):
+        try:
+            return [encoding.get(value, unknown) for value in values]
+        except TypeError:
+            # Unhashable values (lists, dicts) are never in the map
+            return [encoding.get(value, unknown) if isinstance(value, (str, int, float, bool)) else unknown
+                    for value in values]
+
+    @staticmethod
+    def _to_float(values, source, errors):
+        try:
+            column = np.array(values, dtype=float)
+            if column.ndim == 1:
+                bad = np.flatnonzero(~np.isfinite(column))
+                for i in bad:
+                    errors.setdefault(int(i), f"Invalid value for {source}: {values[i]!r}")
+                column[bad] = 0.0
+                return column
+        except (TypeError, ValueError):
+            pass
+
+        # Slow path only when the column has a bad value: find the rows
+        column = np.zeros(len(values))
+        for i, value in enumerate(values):
+            try:
+                column[i] = float(value)
+            except (TypeError, ValueError):
+                errors.setdefault(i, f"Invalid value for {source}: {value!r}")
+                continue
+            if not np.isfinite(column[i]):
+                errors.setdefault(i, f"Invalid value for {source}: {value!r}")
+                column[i] = 0.0
+        return column
+
+def silent_schema():
+    """Features of the SilentKNNPredictor (predict_silent.py) model"""
+    return FeatureSchema(
+        [{'name': 'jenis_kelamin_encoded', 'source': 'jenis_kelamin', 'default': None,
+          'encoding': GENDER_MAP, 'unknown': 0}]
+        + [{'name': field, 'source': field, 'default': 75} for field in ACADEMIC_FIELDS]
+        + [{'name': 'rencana_kuliah_encoded', 'source': 'rencana_kuliah', 'default': 'Iya',
+            'encoding': RENCANA_KULIAH_MAP, 'unknown': 2},
+           {'name': 'kategori_jurusan_encoded', 'source': 'kategori_jurusan', 'default': 'Saintek',
+            'encoding': KATEGORI_JURUSAN_MAP, 'unknown': 0},
+           {'name': 'tingkat_keyakinan', 'source': 'tingkat_keyakinan', 'default': 75}]
+    )
+
+def database_schema():
+    """Features of the DatabaseKNNPredictor (predict_db.py) model; scores are clipped to 0-100"""
+    return FeatureSchema(
+        [{'name': 'jenis_kelamin_encoded', 'source': 'jenis_kelamin', 'default': None,
+          'encoding': GENDER_MAP, 'unknown': 0}]
+        + [{'name': field, 'source': field, 'default': 75, 'clip': [0, 100]} for field in ACADEMIC_FIELDS]
+        + [{'name': 'rencana_kuliah_encoded', 'source': 'rencana_kuliah', 'default': 'Iya',
+            'encoding': RENCANA_KULIAH_MAP, 'unknown': 2},
+           # Callers send the category already encoded, as stored in prediksi_jurusan
+           {'name': 'kategori_jurusan_encoded', 'source': 'kategori_jurusan_encoded', 'default': 1},
+           {'name': 'tingkat_keyakinan', 'source': 'tingkat_keyakinan', 'default': 80, 'clip': [0, 100]}]
+    )
+
+def student_schema(gender_classes):
+    """
+    Features of the KNNPredictor (knn_predictor.py) model
+
+    Args:
+        gender_classes (list): Gender labels in LabelEncoder order
+    """
+    return FeatureSchema(
+        [{'name': 'jenis_kelamin_encoded', 'source': 'jenis_kelamin', 'default': None,
+          'encoding': {str(name): code for code, name in enumerate(gender_classes)},
+          'unknown': 0, 'required': True}]
+        + [{'name': subject, 'source': subject, 'default': 0} for subject in STUDENT_SUBJECTS]
+        + [{'name': interest, 'source': interest, 'default': 0.0} for interest in STUDENT_INTERESTS]
+    )
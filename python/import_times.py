@@ -0,0 +1,84 @@
+"""
+Diagnostik waktu import untuk script prediksi (--print-import-times)
+Script dijalankan ulang dengan `python -X importtime`, lalu waktu import
+dijumlahkan per package tingkat atas dan dicetak ke stderr.
+Output prediksi di stdout tidak berubah.
+"""
+
+import os
+import sys
+
+FLAG = '--print-import-times'
+
+# Packages that must never be needed to serve a prediction
+TRAINING_ONLY_PACKAGES = ['pandas', 'mysql', 'dotenv']
+
+def parse_importtime(stderr_text):
+    """
+    Sum `-X importtime` self times per top-level package
+
+    Returns:
+        tuple: (totals, other_lines) - microseconds per package and the
+        stderr lines that did not come from -X importtime
+    """
+    totals = {}
+    other_lines = []
+    for line in stderr_text.splitlines():
+        if not line.startswith('import time:'):
+            other_lines.append(line)
+            continue
+
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3:
+            continue
+        try:
+            self_us = int(parts[0])
+        except ValueError:
+            # Header line: "self [us] | cumulative | imported package"
+            continue
+
+        package = parts[2].strip().split('.')[0]
+        totals[package] = totals.get(package, 0) + self_us
+    return totals, other_lines
+
+def format_report(totals, wall_time, top=15):
+    """Render the per-package breakdown as text"""
+    lines = ["Import times (self time per top-level package):"]
+    ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)
+    for package, micros in ranked[:top]:
+        lines.append(f"  {package:<24} {micros / 1000:9.1f} ms")
+    if len(ranked) > top:
+        rest = sum(micros for _, micros in ranked[top:])
+        lines.append(f"  {f'({len(ranked) - top} others)':<24} {rest / 1000:9.1f} ms")
+    lines.append(f"  {'total imports':<24} {sum(totals.values()) / 1000:9.1f} ms")
+    lines.append(f"  {'wall time':<24} {wall_time * 1000:9.1f} ms")
+
+    loaded = [package for package in TRAINING_ONLY_PACKAGES if package in totals]
+    lines.append(f"Training-only packages loaded: {', '.join(loaded) if loaded else 'none'}")
+    return '\n'.join(lines)
+
+def run_with_import_times(script_path, argv):
+    """
+    Re-run a script under -X importtime and report where startup time goes
+
+    stdin and stdout are passed through, so this works for single and
+    --batch predictions alike. The report is written to stderr.
+
+    Returns:
+        int: Exit code of the child process
+    """
+    import subprocess
+    import time
+
+    argv = [arg for arg in argv if arg != FLAG]
+    command = [sys.executable, '-X', 'importtime', os.path.abspath(script_path)] + argv
+
+    start = time.perf_counter()
+    proc = subprocess.run(command, stderr=subprocess.PIPE, text=True)
+    wall_time = time.perf_counter() - start
+
+    totals, other_lines = parse_importtime(proc.stderr)
+    if other_lines:
+        print('\n'.join(other_lines), file=sys.stderr)
+    print(format_report(totals, wall_time), file=sys.stderr)
+    return proc.returncode
@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+Engine inferensi KNN berbasis NumPy saja (tanpa scikit-learn)
+Model sklearn yang sudah ditraining di-export menjadi array biasa:
+matriks training yang sudah di-scale, norm tiap baris, mean dan inverse std
+scaler, label integer, nama kelas dan k. Hasil predict/predict_proba sama
+dengan KNeighborsClassifier (metric euclidean, atau minkowski dengan p lain
+yang disimpan di metadata['p']). Pencarian tetangga memakai brute force,
+atau index dari knn_index yang dipilih saat training.
+
+Usage:
+    python knn_engine.py export <model.pkl> [output.npz]
+"""
+
+import json
+import os
+import sys
+
+import numpy as np
+
+from stage_timings import stage
+
+ENGINE_FORMAT = 'knn-engine'
+ENGINE_VERSION = 1
+
+# Upper bound on query x training distance entries held in memory at once
+DISTANCE_BLOCK_SIZE = 1 << 22
+# Relative rounding error of the squared euclidean distance expansion
+EXPANSION_TOLERANCE = 1e-12
+# Up to this many classes a full row sort is faster than partitioning for top_n
+FULL_SORT_MAX_CLASSES = 48
+
+class KNNEngine:
+    """KNN classifier on plain NumPy arrays"""
+
+    # Artifact layout written by model_store
+    storage = 'float64'
+
+    def __init__(self, X, labels, classes, k, mean, inv_std, weights='uniform', metadata=None, X_norms=None,
+                 index=None):
+        """
+        Args:
+            X (numpy.ndarray): (n, F) scaled training matrix
+            labels (numpy.ndarray): (n,) class index of each training row
+            classes (array-like): Class names, indexed by labels
+            k (int): Number of neighbors
+            mean (numpy.ndarray): (F,) scaler mean
+            inv_std (numpy.ndarray): (F,) 1 / scaler scale
+            weights (str): 'uniform' or 'distance'
+            metadata (dict): JSON-serializable predictor settings; 'p' is the
+                Minkowski power of the distance (default 2, euclidean)
+            X_norms (numpy.ndarray): (n,) squared row norms of X, computed if omitted
+            index: Neighbor index from knn_index, None for brute force
+        """
+        if weights not in ('uniform', 'distance'):
+            raise ValueError(f"Unsupported weights: {weights}")
+
+        self.X = np.asarray(X, dtype=np.float64)
+        self.labels = np.asarray(labels, dtype=np.intp)
+        self.classes = np.asarray(classes)
+        self.k = int(k)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.inv_std = np.asarray(inv_std, dtype=np.float64)
+        self.weights = weights
+        self.metadata = dict(metadata or {})
+        self.p = self.metadata.get('p', 2)
+        if not self.p >= 1:
+            raise ValueError(f"Unsupported Minkowski p: {self.p}")
+        self.X_norms = np.einsum('ij,ij->i', self.X, self.X) if X_norms is None else np.asarray(X_norms, dtype=np.float64)
+        self.index = index
+
+    @property
+    def n_features(self):
+        return self.X.shape[1]
+
+    @classmethod
+    def from_sklearn(cls, model, scaler, label_encoder=None, metadata=None):
+        """
+        Compile a fitted KNeighborsClassifier + StandardScaler into arrays
+
+        Only reads fitted attributes, so sklearn itself is not imported here.
+        """
+        metric = getattr(model, 'effective_metric_', model.metric)
+        p = {'euclidean': 2, 'manhattan': 1}.get(metric, getattr(model, 'p', 2))
+        if metric not in ('euclidean', 'manhattan', 'minkowski') or p is None or p < 1:
+            raise ValueError(f"Unsupported metric for export: {metric} (p={p})")
+        if p != 2:
+            metadata = dict(metadata or {}, p=p)
+
+        classes = model.classes_
+        if label_encoder is not None:
+            # model.classes_ are encoded labels seen during fit
+            classes = label_encoder.classes_[model.classes_]
+
+        n_features = model._fit_X.shape[1]
+        mean = scaler.mean_ if getattr(scaler, 'mean_', None) is not None else np.zeros(n_features)
+        scale = scaler.scale_ if getattr(scaler, 'scale_', None) is not None else np.ones(n_features)
+
+        return cls(
+            X=model._fit_X,
+            labels=model._y,
+            classes=classes,
+            k=model.n_neighbors,
+            mean=mean,
+            inv_std=1.0 / np.asarray(scale, dtype=np.float64),
+            weights=model.weights,
+            metadata=metadata
+        )
+
+    @classmethod
+    def from_model_data(cls, model_data):
+        """Build an engine from the dict saved by any of the three predictors"""
+        label_encoder = model_data.get('label_encoder', model_data.get('major_encoder'))
+        feature_names = model_data.get('feature_names', model_data.get('feature_columns', []))
+
+        metadata = {
+            'k': int(model_data.get('k', model_data['model'].n_neighbors)),
+            'feature_names': [str(name) for name in feature_names]
+        }
+        for key in ('feature_schema', 'watermark', 'pending_ids', 'kategori_classes', 'scaler_stats', 'index', 'tuning'):
+            if model_data.get(key) is not None:
+                metadata[key] = model_data[key]
+        if model_data.get('gender_encoder') is not None:
+            metadata['gender_classes'] = [str(name) for name in model_data['gender_encoder'].classes_]
+
+        engine = cls.from_sklearn(model_data['model'], model_data['scaler'], label_encoder, metadata)
+        engine.restore_index()
+        return engine
+
+    def transform(self, X):
+        """Standardize raw feature rows"""
+        return (np.asarray(X, dtype=np.float64) - self.mean) * self.inv_std
+
+    def choose_index(self, **options):
+        """
+        Benchmark the index kinds for this training set and keep the fastest
+
+        The report (kind, params, recall, timings) is stored as
+        metadata['index'] so it is saved with the model.
+        """
+        from knn_index import select_index
+
+        self.index, self.metadata['index'] = select_index(self, **options)
+        return self.metadata['index']
+
+    def restore_index(self):
+        """Rebuild the index recorded in metadata (pickle and .npz sources store no index arrays)"""
+        info = self.metadata.get('index')
+        if self.index is None and info and info['kind'] != 'brute':
+            from knn_index import build_index
+
+            params = dict(info['params'])
+            if info['kind'] == 'collapsed':
+                params.update(labels=self.labels, n_classes=len(self.classes))
+            self.index = build_index(info['kind'], self.X, **params)
+
+    def kneighbors(self, X_scaled, n_neighbors=None):
+        """
+        Nearest neighbors by Minkowski distance (euclidean unless metadata['p']
+        says otherwise), through the index if any
+
+        Ties at equal distance are broken by training row order.
+
+        Returns:
+            tuple: (distances, indices), each (N, n_neighbors), nearest first
+        """
+        if self.index is None:
+            return self.brute_kneighbors(X_scaled, n_neighbors)
+        X_scaled = np.atleast_2d(np.asarray(X_scaled, dtype=np.float64))
+        return self.index.query(self.X, X_scaled, min(n_neighbors or self.k, len(self.X)))
+
+    def brute_kneighbors(self, X_scaled, n_neighbors=None):
+        """Exact nearest neighbors by scanning every training row"""
+        X_scaled = np.atleast_2d(np.asarray(X_scaled, dtype=np.float64))
+        n_neighbors = min(n_neighbors or self.k, len(self.X))
+
+        distances = np.empty((len(X_scaled), n_neighbors))
+        indices = np.empty((len(X_scaled), n_neighbors), dtype=np.intp)
+
+        block = max(1, DISTANCE_BLOCK_SIZE // max(1, len(self.X)))
+        if self.p != 2:
+            # Per-feature differences are materialized
+            block = max(1, block // max(1, self.n_features))
+        for start in range(0, len(X_scaled), block):
+            stop = start + block
+            distances[start:stop], indices[start:stop] = self._kneighbors_block(X_scaled[start:stop], n_neighbors)
+        return distances, indices
+
+    def _minkowski_block(self, Q):
+        """sum |q - x|^p of every query and training row (the distance to the power p)"""
+        diff = np.abs(Q[:, None, :] - self.X[None, :, :])
+        if self.p != 1:
+            diff **= self.p
+        return diff.sum(axis=2)
+
+    def _kneighbors_block(self, Q, n_neighbors):
+        if self.p != 2:
+            # Ranked by the distance to the power p, which keeps the order
+            sq_dist = self._minkowski_block(Q)
+            slack = np.zeros(len(Q))
+        else:
+            # ||q - x||^2 = ||q||^2 - 2 q.x + ||x||^2, using the precomputed training norms
+            q_norms = np.einsum('ij,ij->i', Q, Q)
+            sq_dist = Q @ self.X.T
+            sq_dist *= -2
+            sq_dist += self.X_norms
+            sq_dist += q_norms[:, None]
+            np.maximum(sq_dist, 0, out=sq_dist)
+            # The expansion can round equal training rows slightly apart;
+            # rows within its error count as tied and are re-ranked exactly
+            slack = EXPANSION_TOLERANCE * (q_norms + self.X_norms.max(initial=0))
+
+        if n_neighbors == sq_dist.shape[1]:
+            return self._rerank(Q, np.broadcast_to(np.arange(n_neighbors), sq_dist.shape), sq_dist, n_neighbors)
+
+        rows = np.arange(len(Q))[:, None]
+        ind = np.argpartition(sq_dist, n_neighbors - 1, axis=1)[:, :n_neighbors]
+        distances, indices = self._rerank(Q, ind, sq_dist, n_neighbors)
+
+        # argpartition picks arbitrarily among rows tied with the k-th
+        # distance; redo those rows so the lowest training index wins
+        kth = sq_dist[rows, ind].max(axis=1) + slack
+        near = sq_dist <= kth[:, None]
+        for r in np.flatnonzero(np.count_nonzero(near, axis=1) > n_neighbors):
+            candidates = np.flatnonzero(near[r])[None, :]
+            d, i = self._rerank(Q[r:r + 1], candidates, sq_dist[r:r + 1], n_neighbors)
+            distances[r], indices[r] = d[0], i[0]
+        return distances, indices
+
+    def _rerank(self, Q, candidates, sq_dist, n_neighbors):
+        """Nearest candidates of each query, ordered by (distance, training index)"""
+        if self.p != 2:
+            d = np.take_along_axis(sq_dist, candidates, axis=1)
+        else:
+            # Direct differences, one feature at a time: duplicate training rows tie exactly
+            d = np.zeros(candidates.shape)
+            for f in range(self.n_features):
+                diff = self.X[candidates, f] - Q[:, f:f + 1]
+                d += diff * diff
+        order = np.lexsort((candidates, d), axis=1)[:, :n_neighbors]
+        d = np.take_along_axis(d, order, axis=1)
+        return d ** (1.0 / self.p) if self.p != 2 else np.sqrt(d), np.take_along_axis(candidates, order, axis=1)
+
+    def vote(self, distances, indices):
+        """Class probabilities from neighbor labels, like predict_proba"""
+        n_queries = len(indices)
+        if self.weights == 'uniform':
+            weights = np.ones(indices.shape)
+        else:
+            with np.errstate(divide='ignore'):
+                weights = 1.0 / distances
+            # Exact matches take all the weight, as in sklearn
+            inf_mask = np.isinf(weights)
+            inf_rows = inf_mask.any(axis=1)
+            weights[inf_rows] = inf_mask[inf_rows]
+
+        n_classes = len(self.classes)
+        flat = (np.arange(n_queries)[:, None] * n_classes + self.labels[indices]).ravel()
+        proba = np.bincount(flat, weights=weights.ravel(), minlength=n_queries * n_classes)
+        proba = proba.reshape(n_queries, n_classes)
+
+        normalizer = proba.sum(axis=1)[:, None]
+        normalizer[normalizer == 0.0] = 1.0
+        return proba / normalizer
+
+    def predict_proba(self, X):
+        """Class probabilities for raw (unscaled) feature rows"""
+        with stage('scale'):
+            X_scaled = self.transform(X)
+        if self.weights == 'uniform' and hasattr(self.index, 'proba'):
+            # Collapsed duplicates vote with their class histograms
+            with stage('neighbors'):
+                return self.index.proba(X_scaled, min(self.k, len(self.labels)), self.labels, len(self.classes))
+        with stage('neighbors'):
+            distances, indices = self.kneighbors(X_scaled)
+        with stage('vote'):
+            return self.vote(distances, indices)
+
+    def predict(self, X):
+        """Predicted class index for raw feature rows"""
+        return np.argmax(self.predict_proba(X), axis=1)
+
+    def top_n(self, probabilities, n):
+        """
+        Top-n class indices per row, highest probability first (ties by class order)
+
+        A partition over the whole matrix finds the n-th probability of each
+        row; classes above it plus the lowest tied ones are picked and only
+        those n columns are sorted. Same result as a stable argsort.
+        """
+        probabilities = np.asarray(probabilities)
+        n_classes = probabilities.shape[1]
+        n = min(n, n_classes)
+        if n == n_classes or n_classes <= FULL_SORT_MAX_CLASSES:
+            return np.argsort(-probabilities, axis=1, kind='stable')[:, :n]
+        nth = -np.partition(-probabilities, n - 1, axis=1)[:, n - 1]
+        above = probabilities > nth[:, None]
+        at = probabilities == nth[:, None]
+        room = n - np.count_nonzero(above, axis=1)
+        chosen = above | (at & (np.cumsum(at, axis=1) <= room[:, None]))
+        top = np.nonzero(chosen)[1].reshape(-1, n)
+
+        # top is in class order, so a stable sort keeps ties by class
+        order = np.argsort(-np.take_along_axis(probabilities, top, axis=1), axis=1, kind='stable')
+        return np.take_along_axis(top, order, axis=1)
+
+    def save(self, path):
+        """Write all arrays to a single .npz file (no pickle)"""
+        header = {
+            'format': ENGINE_FORMAT,
+            'version': ENGINE_VERSION,
+            'k': self.k,
+            'weights': self.weights,
+            'metadata': self.metadata
+        }
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'wb') as f:
+            np.savez(
+                f,
+                header=np.array(json.dumps(header)),
+                X=self.X,
+                X_norms=self.X_norms,
+                mean=self.mean,
+                inv_std=self.inv_std,
+                labels=self.labels,
+                classes=self.classes.astype(str)
+            )
+
+    @classmethod
+    def load(cls, path):
+        """Load an engine written by save()"""
+        with np.load(path, allow_pickle=False) as data:
+            header = json.loads(str(data['header']))
+            if header.get('format') != ENGINE_FORMAT or header.get('version') != ENGINE_VERSION:
+                raise ValueError(f"Unsupported engine file: {path}")
+            engine = cls(
+                X=data['X'],
+                labels=data['labels'],
+                classes=data['classes'],
+                k=header['k'],
+                mean=data['mean'],
+                inv_std=data['inv_std'],
+                weights=header['weights'],
+                metadata=header['metadata'],
+                X_norms=data['X_norms']
+            )
+        engine.restore_index()
+        return engine
+
+def export_path(model_path):
+    """Path of the exported engine file for a model file"""
+    return os.path.splitext(model_path)[0] + '.npz'
+
+def verify_export(model_data, engine, n_random=1000, seed=0):
+    """
+    Compare engine output with the sklearn model on training rows and
+    random points around them
+
+    Returns:
+        dict: Agreement statistics
+    """
+    model = model_data['model']
+    scaler = model_data['scaler']
+
+    rng = np.random.default_rng(seed)
+    X_train = model._fit_X / engine.inv_std + engine.mean
+    picks = X_train[rng.integers(0, len(X_train), n_random)]
+    noise = rng.normal(0, 1, picks.shape) / engine.inv_std * 0.5
+    X_probe = np.vstack([X_train, picks + noise])
+
+    expected = model.predict_proba(scaler.transform(X_probe))
+    actual = engine.predict_proba(X_probe)
+    return {
+        'n_probes': len(X_probe),
+        'label_agreement': float(np.mean(np.argmax(expected, axis=1) == np.argmax(actual, axis=1))),
+        'proba_exact_rows': float(np.mean(np.all(expected == actual, axis=1))),
+        'max_proba_diff': float(np.max(np.abs(expected - actual)))
+    }
+
+def export_model(model_path, output_path=None):
+    """Export a predictor pickle to a NumPy-only engine file"""
+    import joblib
+
+    model_data = joblib.load(model_path)
+    engine = KNNEngine.from_model_data(model_data)
+    output_path = output_path or export_path(model_path)
+    engine.save(output_path)
+
+    return {
+        'success': True,
+        'model_path': model_path,
+        'output_path': output_path,
+        'n_samples': int(len(engine.X)),
+        'n_features': int(engine.n_features),
+        'n_classes': int(len(engine.classes)),
+        'k': engine.k,
+        'verification': verify_export(model_data, engine)
+    }
+
+def main():
+    """Main function for command line usage"""
+    if len(sys.argv) < 3 or sys.argv[1] != 'export':
+        print("Usage: python knn_engine.py export <model.pkl> [output.npz]")
+        return
+
+    try:
+        result = export_model(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None)
+    except Exception as e:
+        result = {"success": False, "error": f"Export error: {str(e)}"}
+    print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    main()
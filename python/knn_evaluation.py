@@ -0,0 +1,129 @@
+"""
+Evaluasi KNN leave-one-out untuk banyak nilai k sekaligus
+Graf tetangga dihitung sekali pada k_max untuk seluruh data training,
+dengan setiap titik dikeluarkan dari tetangganya sendiri. Akurasi LOO,
+laporan per kelas dan confusion matrix untuk setiap k <= k_max diturunkan
+dari graf yang sama (prefix k tetangga pertama), jadi pemilihan k cukup
+satu kali komputasi tetangga, bukan satu per k dan per fold.
+"""
+
+import numpy as np
+
+from knn_engine import KNNEngine
+
+DEFAULT_K_MAX = 15
+
+def loo_neighbors(X_scaled, k_max):
+    """
+    Neighbor graph of every training row, excluding the row itself
+
+    Ties are broken by training row order, as in a fit without the row.
+
+    Returns:
+        tuple: (distances, indices), each (n, k_max), nearest first
+    """
+    X_scaled = np.asarray(X_scaled, dtype=np.float64)
+    n = len(X_scaled)
+    k_max = min(k_max, n - 1)
+    engine = KNNEngine(X_scaled, np.zeros(n), [0], k_max + 1, np.zeros(X_scaled.shape[1]), np.ones(X_scaled.shape[1]))
+    distances, indices = engine.kneighbors(X_scaled)
+
+    # Drop the row itself wherever it landed (duplicates can come first);
+    # a row crowded out by more than k_max duplicates just loses the last slot
+    others = indices != np.arange(n)[:, None]
+    others[others.sum(axis=1) > k_max, -1] = False
+    return distances[others].reshape(n, k_max), indices[others].reshape(n, k_max)
+
+def sweep_votes(distances, indices, labels, n_classes, weights='uniform'):
+    """
+    Class votes for every k at once
+
+    Returns:
+        numpy.ndarray: (n, k_max, n_classes); [:, k - 1] holds the votes of
+        the first k neighbors
+    """
+    n, k_max = indices.shape
+    if weights == 'uniform':
+        w = np.ones(indices.shape)
+    else:
+        with np.errstate(divide='ignore'):
+            w = 1.0 / distances
+    votes = np.zeros((n, k_max, n_classes))
+    np.put_along_axis(votes, labels[indices][:, :, None], w[:, :, None], axis=2)
+    np.cumsum(votes, axis=1, out=votes)
+
+    if weights == 'distance':
+        # Exact matches among the first k take all the weight, as in sklearn
+        exact = np.isinf(w)
+        if exact.any():
+            exact_votes = np.zeros((n, k_max, n_classes))
+            np.put_along_axis(exact_votes, labels[indices][:, :, None], exact[:, :, None].astype(float), axis=2)
+            np.cumsum(exact_votes, axis=1, out=exact_votes)
+            has_exact = exact_votes.sum(axis=2, keepdims=True) > 0
+            votes = np.where(has_exact, exact_votes, votes)
+    return votes
+
+def confusion_matrix(y_true, y_pred, n_classes):
+    """(n_classes, n_classes) counts, rows = true class, columns = predicted"""
+    return np.bincount(y_true * n_classes + y_pred, minlength=n_classes * n_classes).reshape(n_classes, n_classes)
+
+def class_report(confusion, classes):
+    """Precision, recall, F1 and support per class from a confusion matrix"""
+    true_positive = np.diag(confusion).astype(float)
+    predicted = confusion.sum(axis=0)
+    support = confusion.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(predicted > 0, true_positive / predicted, 0.0)
+        recall = np.where(support > 0, true_positive / support, 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+    return {
+        str(name): {
+            'precision': float(precision[c]),
+            'recall': float(recall[c]),
+            'f1-score': float(f1[c]),
+            'support': int(support[c])
+        }
+        for c, name in enumerate(classes)
+    }
+
+def loo_sweep(X_scaled, y, classes, k_max=DEFAULT_K_MAX, weights='uniform'):
+    """
+    Leave-one-out evaluation of every k from 1 to k_max
+
+    Args:
+        X_scaled (numpy.ndarray): (n, F) standardized training rows
+        y (numpy.ndarray): (n,) class index of each row
+        classes (array-like): Class names, indexed by y
+        k_max (int): Largest k evaluated (capped at n - 1)
+        weights (str): 'uniform' or 'distance' vote weighting
+
+    Returns:
+        dict: best_k, best_accuracy and per-k accuracy, class report and
+        confusion matrix; the best k is the smallest one with the highest
+        accuracy
+    """
+    y = np.asarray(y, dtype=np.intp)
+    n_classes = len(classes)
+    distances, indices = loo_neighbors(X_scaled, k_max)
+
+    # argmax takes the lowest class index on ties, as KNeighborsClassifier does
+    predictions = sweep_votes(distances, indices, y, n_classes, weights).argmax(axis=2)
+    accuracies = (predictions == y[:, None]).mean(axis=0)
+
+    results = {}
+    for k in range(1, indices.shape[1] + 1):
+        confusion = confusion_matrix(y, predictions[:, k - 1], n_classes)
+        results[k] = {
+            'accuracy': float(accuracies[k - 1]),
+            'classification_report': class_report(confusion, classes),
+            'confusion_matrix': confusion.tolist()
+        }
+
+    best_k = int(np.argmax(accuracies)) + 1
+    return {
+        'best_k': best_k,
+        'best_accuracy': float(accuracies[best_k - 1]),
+        'n_samples': int(len(y)),
+        'classes': [str(name) for name in classes],
+        'results': results
+    }
@@ -0,0 +1,556 @@
+"""
+Index pencarian tetangga untuk KNNEngine
+Secara default engine memakai brute force (satu perkalian matriks per
+batch query). Untuk data training besar engine bisa memakai index lain:
+
+    kd_tree    - exact, bounding box sejajar sumbu per node
+    ball_tree  - exact, bola (centroid + radius) per node
+    ivf        - approximate: data dikelompokkan dengan k-means, query
+                 hanya memeriksa nprobe cluster terdekat
+    collapsed  - exact: baris training identik digabung menjadi satu entry
+                 (multiplicity + histogram label per kelas); pencarian di
+                 baris unik memakai salah satu index di atas
+
+Semua index hanya berisi array NumPy, jadi bisa disimpan di artefak model
+dan di-memory-map. Index dipilih saat training oleh select_index() dari
+jumlah baris, dimensi dan benchmark query yang diukur; recall terhadap
+pencarian exact dilaporkan untuk mode approximate.
+"""
+
+import time
+
+import numpy as np
+
+INDEX_KINDS = ('brute', 'kd_tree', 'ball_tree', 'ivf', 'collapsed')
+
+# Below this many training rows brute force is used without benchmarking
+MIN_INDEX_ROWS = 10000
+DEFAULT_LEAF_SIZE = 40
+# Approximate indexes must find at least this fraction of the exact neighbors
+DEFAULT_MIN_RECALL = 0.99
+DEFAULT_BENCHMARK_QUERIES = 200
+# Queries timed first; candidates over SLOWDOWN_LIMIT x brute force stop there
+PROBE_QUERIES = 20
+SLOWDOWN_LIMIT = 4
+# Duplicate rows are collapsed from this many training rows per distinct row
+MIN_COLLAPSE_RATIO = 1.5
+
+def _merge(best_d, best_i, d, i, k):
+    """k smallest of two candidate sets by (distance, training index)"""
+    d = np.concatenate([best_d, d])
+    i = np.concatenate([best_i, i])
+    order = np.lexsort((i, d))[:k]
+    return d[order], i[order]
+
+class TreeIndex:
+    """Exact binary space-partitioning tree (KD-tree or ball tree) over row ranges"""
+
+    def __init__(self, kind, perm, node_start, node_end, node_left, node_right, bound_a, bound_b, leaf_size):
+        """
+        Args:
+            kind (str): 'kd_tree' or 'ball_tree'
+            perm (numpy.ndarray): Training row ids ordered so every node is a contiguous range
+            node_start, node_end (numpy.ndarray): Range of each node in perm
+            node_left, node_right (numpy.ndarray): Child node ids, -1 for leaves
+            bound_a, bound_b (numpy.ndarray): kd_tree: per-node box minimum and
+                maximum (nodes, F); ball_tree: centers (nodes, F) and radii (nodes,)
+        """
+        self.kind = kind
+        self.perm = perm
+        self.node_start = node_start
+        self.node_end = node_end
+        self.node_left = node_left
+        self.node_right = node_right
+        self.bound_a = bound_a
+        self.bound_b = bound_b
+        self.leaf_size = leaf_size
+
+    @property
+    def params(self):
+        return {'leaf_size': self.leaf_size}
+
+    @classmethod
+    def build(cls, kind, X, leaf_size=DEFAULT_LEAF_SIZE):
+        """Split on the widest dimension at the median until nodes hold at most leaf_size rows"""
+        X = np.asarray(X)
+        perm = np.arange(len(X))
+        start, end, left, right, bound_a, bound_b = [], [], [], [], [], []
+
+        def add_node(s, e):
+            rows = X[perm[s:e]]
+            if kind == 'kd_tree':
+                bound_a.append(rows.min(axis=0))
+                bound_b.append(rows.max(axis=0))
+            else:
+                center = rows.mean(axis=0)
+                bound_a.append(center)
+                bound_b.append(np.sqrt(((rows - center) ** 2).sum(axis=1).max()))
+            start.append(s)
+            end.append(e)
+            left.append(-1)
+            right.append(-1)
+            return len(start) - 1, rows
+
+        stack = [(0, len(X))]
+        parents = [None]
+        while stack:
+            s, e = stack.pop()
+            parent = parents.pop()
+            node, rows = add_node(s, e)
+            if parent is not None:
+                parent_id, side = parent
+                (left if side == 0 else right)[parent_id] = node
+            if e - s <= leaf_size:
+                continue
+
+            dim = int(np.argmax(rows.max(axis=0) - rows.min(axis=0)))
+            mid = (e - s) // 2
+            order = np.argpartition(rows[:, dim], mid)
+            perm[s:e] = perm[s:e][order]
+            stack.extend([(s + mid, e), (s, s + mid)])
+            parents.extend([(node, 1), (node, 0)])
+
+        return cls(
+            kind, perm,
+            np.array(start, dtype=np.intp), np.array(end, dtype=np.intp),
+            np.array(left, dtype=np.intp), np.array(right, dtype=np.intp),
+            np.array(bound_a), np.array(bound_b), leaf_size
+        )
+
+    def arrays(self):
+        return {
+            'perm': self.perm, 'node_start': self.node_start, 'node_end': self.node_end,
+            'node_left': self.node_left, 'node_right': self.node_right,
+            'bound_a': self.bound_a, 'bound_b': self.bound_b
+        }
+
+    @classmethod
+    def from_arrays(cls, kind, params, arrays):
+        return cls(kind, leaf_size=params['leaf_size'], **arrays)
+
+    def _lower_bound(self, node, q):
+        """Squared distance from q to the closest point a node can contain"""
+        if self.kind == 'kd_tree':
+            gap = np.maximum(self.bound_a[node] - q, 0) + np.maximum(q - self.bound_b[node], 0)
+            return float(gap @ gap)
+        diff = self.bound_a[node] - q
+        gap = max(0.0, float(np.sqrt(diff @ diff)) - float(self.bound_b[node]))
+        return gap * gap
+
+    def query(self, X, Q, k):
+        distances = np.empty((len(Q), k))
+        indices = np.empty((len(Q), k), dtype=np.intp)
+        for row, q in enumerate(Q):
+            best_d = np.full(k, np.inf)
+            best_i = np.full(k, -1, dtype=np.intp)
+            stack = [(0.0, 0)]
+            while stack:
+                bound, node = stack.pop()
+                # Equal bounds are still visited: ties are broken by training row
+                if bound > best_d[-1]:
+                    continue
+                left = self.node_left[node]
+                if left < 0:
+                    ids = self.perm[self.node_start[node]:self.node_end[node]]
+                    diff = X[ids] - q
+                    best_d, best_i = _merge(best_d, best_i, np.einsum('ij,ij->i', diff, diff), ids, k)
+                    continue
+                right = self.node_right[node]
+                children = sorted([(self._lower_bound(left, q), left), (self._lower_bound(right, q), right)],
+                                  reverse=True)
+                stack.extend(children)
+            distances[row] = np.sqrt(best_d)
+            indices[row] = best_i
+        return distances, indices
+
+class IVFIndex:
+    """Approximate inverted-file index: k-means lists, nprobe nearest lists searched"""
+
+    kind = 'ivf'
+
+    def __init__(self, centroids, perm, offsets, nprobe, seed=0):
+        self.centroids = centroids
+        self.perm = perm
+        self.offsets = offsets
+        self.nprobe = int(nprobe)
+        self.seed = seed
+
+    @property
+    def params(self):
+        return {'nlist': int(len(self.centroids)), 'nprobe': self.nprobe, 'seed': self.seed}
+
+    @classmethod
+    def build(cls, X, nlist=None, nprobe=8, seed=0, n_iter=10):
+        """Lloyd k-means on a sample, then every row goes to its nearest centroid's list"""
+        X = np.asarray(X)
+        n = len(X)
+        nlist = int(nlist or max(1, round(np.sqrt(n))))
+        rng = np.random.default_rng(seed)
+        sample = X[rng.choice(n, min(n, 64 * nlist), replace=False)]
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+
+        for _ in range(n_iter):
+            assign = cls._nearest(sample, centroids)
+            counts = np.bincount(assign, minlength=nlist)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            empty = counts == 0
+            centroids[~empty] = sums[~empty] / counts[~empty, None]
+            # Re-seed empty lists with random sample rows
+            centroids[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+
+        assign = np.concatenate([cls._nearest(X[s:s + 65536], centroids) for s in range(0, n, 65536)])
+        perm = np.argsort(assign, kind='stable')
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=nlist))])
+        return cls(centroids, perm, offsets, min(nprobe, nlist), seed)
+
+    @staticmethod
+    def _centroid_distances(Q, centroids):
+        d = Q @ centroids.T
+        d *= -2
+        d += np.einsum('ij,ij->i', centroids, centroids)
+        return d
+
+    @classmethod
+    def _nearest(cls, Q, centroids):
+        return np.argmin(cls._centroid_distances(Q, centroids), axis=1)
+
+    def arrays(self):
+        return {'centroids': self.centroids, 'perm': self.perm, 'offsets': self.offsets}
+
+    @classmethod
+    def from_arrays(cls, kind, params, arrays):
+        return cls(nprobe=params['nprobe'], seed=params.get('seed', 0), **arrays)
+
+    def query(self, X, Q, k):
+        distances = np.empty((len(Q), k))
+        indices = np.empty((len(Q), k), dtype=np.intp)
+        nlist = len(self.centroids)
+        order = np.argsort(self._centroid_distances(Q, self.centroids), axis=1)
+        for row, q in enumerate(Q):
+            probe = self.nprobe
+            while True:
+                lists = order[row, :probe]
+                ids = np.concatenate([self.perm[self.offsets[c]:self.offsets[c + 1]] for c in lists])
+                # Too few rows in the probed lists: widen the search
+                if len(ids) >= k or probe >= nlist:
+                    break
+                probe = min(nlist, probe * 2)
+            diff = X[ids] - q
+            d = np.einsum('ij,ij->i', diff, diff)
+            top = np.lexsort((ids, d))[:k]
+            distances[row] = np.sqrt(d[top])
+            indices[row] = ids[top]
+        return distances, indices
+
+def collapse_rows(X, labels, n_classes):
+    """
+    Group identical training rows
+
+    Returns:
+        tuple: (first, offsets, members, histogram); groups are ordered by
+        their first row, members[offsets[g]:offsets[g + 1]] are the rows of
+        group g in ascending order and histogram[g] their class counts
+    """
+    _, first, inverse = np.unique(np.asarray(X), axis=0, return_index=True, return_inverse=True)
+    order = np.argsort(first)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    group = rank[inverse.ravel()]
+
+    members = np.argsort(group, kind='stable')
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(group, minlength=len(order)))])
+    histogram = np.bincount(group * n_classes + np.asarray(labels), minlength=len(order) * n_classes)
+    return first[order], offsets, members, histogram.reshape(len(order), n_classes)
+
+class CollapsedIndex:
+    """
+    Exact search over the distinct training rows
+
+    Each distinct row carries its multiplicity and a per-class histogram.
+    The nearest distinct rows are found by an inner index (None: brute
+    force) and expanded to training rows, so neighbors, distances and ties
+    are the same as over the full training set.
+    """
+
+    kind = 'collapsed'
+
+    def __init__(self, rows, offsets, members, histogram, inner=None):
+        """
+        Args:
+            rows (numpy.ndarray): (groups, F) distinct rows, ordered by first training row
+            offsets, members (numpy.ndarray): Training rows of each group, ascending
+            histogram (numpy.ndarray): (groups, classes) label counts of each group
+            inner: Index over rows, None for brute force
+        """
+        self.rows = rows
+        self.offsets = offsets
+        self.members = members
+        self.histogram = histogram
+        self.inner = inner
+        self.multiplicity = np.diff(offsets)
+        self._brute = None
+
+    @property
+    def params(self):
+        if self.inner is None:
+            return {'inner': {'kind': 'brute', 'params': {}}}
+        return {'inner': {'kind': self.inner.kind, 'params': self.inner.params}}
+
+    @classmethod
+    def build(cls, X, labels, n_classes, inner=None):
+        """Collapse X and build the inner index ({'kind', 'params'}) over the distinct rows"""
+        X = np.asarray(X)
+        first, offsets, members, histogram = collapse_rows(X, labels, n_classes)
+        rows = X[first]
+        inner = inner or {'kind': 'brute', 'params': {}}
+        return cls(rows, offsets, members, histogram, build_index(inner['kind'], rows, **inner['params']))
+
+    def arrays(self):
+        arrays = {'rows': self.rows, 'offsets': self.offsets, 'members': self.members, 'histogram': self.histogram}
+        if self.inner is not None:
+            arrays.update({'inner.' + name: array for name, array in self.inner.arrays().items()})
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, kind, params, arrays):
+        inner_arrays = {name[len('inner.'):]: array for name, array in arrays.items() if name.startswith('inner.')}
+        inner = params['inner']
+        return cls(
+            arrays['rows'], arrays['offsets'], arrays['members'], arrays['histogram'],
+            None if inner['kind'] == 'brute' else index_from_arrays(inner['kind'], inner['params'], inner_arrays)
+        )
+
+    def _groups(self, Q, k):
+        """k nearest distinct rows, by (distance, group)"""
+        if self.inner is not None:
+            return self.inner.query(self.rows, Q, k)
+        if self._brute is None:
+            from knn_engine import KNNEngine
+
+            dim = self.rows.shape[1]
+            self._brute = KNNEngine(self.rows, np.zeros(len(self.rows), dtype=np.intp), [], 1, np.zeros(dim), np.ones(dim))
+        return self._brute.brute_kneighbors(Q, k)
+
+    def _expand(self, distances, groups, k):
+        """
+        Training rows of the nearest groups, k nearest by (distance, row)
+
+        The k nearest training rows always lie in the k nearest groups: a
+        group ranked after k others has k rows (their first ones) before
+        all of its own. Only the first k rows of a group can be needed.
+        """
+        j = np.arange(k)
+        valid = j < np.minimum(self.multiplicity[groups], k)[..., None]
+        ids = self.members[np.where(valid, self.offsets[groups][..., None] + j, 0)]
+        ids = np.where(valid, ids, len(self.members)).reshape(len(groups), -1)
+        d = np.where(valid, distances[..., None], np.inf).reshape(len(groups), -1)
+        order = np.lexsort((ids, d), axis=1)[:, :k]
+        return np.take_along_axis(d, order, axis=1), np.take_along_axis(ids, order, axis=1)
+
+    def query(self, X, Q, k):
+        Q = np.atleast_2d(np.asarray(Q, dtype=np.float64))
+        distances, groups = self._groups(Q, min(k, len(self.rows)))
+        return self._expand(distances, groups, k)
+
+    def proba(self, Q, k, labels, n_classes):
+        """
+        Uniform-weight class probabilities without expanding every neighbor
+
+        Groups before the one reaching k rows vote with their histogram,
+        that group with its lowest rows. When another of the nearest groups
+        is at the same distance their rows interleave by training index;
+        those queries are expanded as in query().
+        """
+        Q = np.atleast_2d(np.asarray(Q, dtype=np.float64))
+        distances, groups = self._groups(Q, min(k, len(self.rows)))
+        rows = np.arange(len(Q))
+
+        multiplicity = self.multiplicity[groups]
+        reached = np.cumsum(multiplicity, axis=1)
+        boundary = np.argmax(reached >= k, axis=1)
+        full = np.arange(groups.shape[1]) < boundary[:, None]
+        counts = np.einsum('ng,ngc->nc', full.astype(np.int64), self.histogram[groups])
+
+        # Lowest rows of the boundary group
+        needed = k - (reached[rows, boundary] - multiplicity[rows, boundary])
+        j = np.arange(k)
+        valid = j < needed[:, None]
+        ids = self.members[np.where(valid, self.offsets[groups[rows, boundary]][:, None] + j, 0)]
+        flat = (rows[:, None] * n_classes + labels[ids]).ravel()
+        counts = counts + np.bincount(flat, weights=valid.ravel(), minlength=len(Q) * n_classes).reshape(-1, n_classes)
+
+        tied = np.count_nonzero(distances == distances[rows, boundary][:, None], axis=1) > 1
+        if tied.any():
+            _, ids = self._expand(distances[tied], groups[tied], k)
+            flat = (np.arange(len(ids))[:, None] * n_classes + labels[ids]).ravel()
+            counts[tied] = np.bincount(flat, minlength=len(ids) * n_classes).reshape(-1, n_classes)
+        return counts / float(k)
+
+def describe_compression(report):
+    """One line on duplicate compression for the training log"""
+    collapse = report['collapse']
+    state = 'collapsed' if collapse['used'] else collapse.get('reason', f"below {MIN_COLLAPSE_RATIO}x, not collapsed")
+    return (f"Distinct training rows: {collapse['n_groups']} of {report['n_samples']} "
+            f"(compression {collapse['ratio']}x, {state})")
+
+def build_index(kind, X, **params):
+    """Build an index of the given kind over scaled rows; None means brute force"""
+    if kind == 'brute':
+        return None
+    if kind in ('kd_tree', 'ball_tree'):
+        return TreeIndex.build(kind, X, **params)
+    if kind == 'ivf':
+        return IVFIndex.build(X, **params)
+    if kind == 'collapsed':
+        return CollapsedIndex.build(X, **params)
+    raise ValueError(f"Unknown index kind: {kind}")
+
+def index_from_arrays(kind, params, arrays):
+    """Rebuild an index object from arrays stored in an artifact"""
+    if kind in ('kd_tree', 'ball_tree'):
+        return TreeIndex.from_arrays(kind, params, arrays)
+    if kind == 'ivf':
+        return IVFIndex.from_arrays(kind, params, arrays)
+    if kind == 'collapsed':
+        return CollapsedIndex.from_arrays(kind, params, arrays)
+    raise ValueError(f"Unknown index kind: {kind}")
+
+def candidate_kinds(n, dim):
+    """
+    Index kinds worth benchmarking for n rows of dim features
+
+    Trees prune well only when n is large against 2^dim (KD) or for
+    moderate dimensions (ball); IVF needs enough rows to form lists.
+    """
+    if n < MIN_INDEX_ROWS:
+        return ['brute']
+    kinds = ['brute']
+    if dim <= 16 or n >= 2 ** dim:
+        kinds.append('kd_tree')
+    if dim <= 32:
+        kinds.append('ball_tree')
+    kinds.append('ivf')
+    return kinds
+
+def recall(exact, approx):
+    """Fraction of exact neighbor ids an approximate search returned"""
+    hits = sum(len(np.intersect1d(e, a)) for e, a in zip(exact, approx))
+    return hits / exact.size
+
+def _time_queries(query, Q):
+    start = time.perf_counter()
+    result = query(Q)
+    return (time.perf_counter() - start) / len(Q), result
+
+def _measure(index, X, Q, k, exact, limit):
+    """
+    Per-query time and recall of an index on the benchmark queries
+
+    A first slice of PROBE_QUERIES decides: an index already slower than
+    limit seconds per query is not timed on the rest.
+    """
+    query = lambda batch: index.query(X, batch, k)
+    per_query, (_, found) = _time_queries(query, Q[:PROBE_QUERIES])
+    if per_query <= limit and len(Q) > PROBE_QUERIES:
+        per_query, (_, found) = _time_queries(query, Q)
+    return {'ms_per_query': per_query * 1000, 'recall': recall(exact[:len(found)], found), 'n_queries': len(found)}
+
+def select_index(engine, kinds=None, min_recall=DEFAULT_MIN_RECALL, n_queries=DEFAULT_BENCHMARK_QUERIES, seed=0,
+                 collapse=True):
+    """
+    Choose the fastest index for an engine's training set
+
+    Each candidate is built and timed on training rows with a little noise
+    (queries look like real students near the data). Approximate indexes
+    only qualify at min_recall or above; for IVF the smallest nprobe that
+    reaches it is used.
+
+    With collapse, identical rows are counted first; from MIN_COLLAPSE_RATIO
+    rows per distinct row the index is a CollapsedIndex and the candidates
+    are benchmarked on the distinct rows.
+
+    Returns:
+        tuple: (index or None for brute force, report dict with the chosen
+        kind, its params, recall, the per-candidate benchmark and the
+        duplicate compression)
+    """
+    X = engine.X
+    n, dim = X.shape
+    if engine.p != 2:
+        # Trees, IVF and the collapsed search rank by euclidean distance
+        reason = f"Minkowski p={engine.p}: indexes are euclidean"
+        report = {'kind': 'brute', 'params': {}, 'recall': 1.0, 'n_samples': int(n), 'n_features': int(dim),
+                  'reason': reason}
+        if collapse:
+            n_groups = len(collapse_rows(X, engine.labels, len(engine.classes))[0])
+            report['collapse'] = {'n_groups': int(n_groups), 'ratio': round(n / n_groups, 3), 'used': False,
+                                  'reason': reason}
+        return None, report
+    if collapse:
+        first, offsets, members, histogram = collapse_rows(X, engine.labels, len(engine.classes))
+        compression = {'n_groups': int(len(first)), 'ratio': round(n / len(first), 3)}
+        if n / len(first) < MIN_COLLAPSE_RATIO:
+            index, report = select_index(engine, kinds, min_recall, n_queries, seed, collapse=False)
+            return index, dict(report, collapse=dict(compression, used=False))
+
+        from knn_engine import KNNEngine
+
+        rows = np.asarray(X[first])
+        distinct = KNNEngine(rows, np.zeros(len(rows), dtype=np.intp), [], engine.k, np.zeros(dim), np.ones(dim))
+        inner, report = select_index(distinct, kinds, min_recall, n_queries, seed, collapse=False)
+        index = CollapsedIndex(rows, offsets, members, histogram, inner)
+        report.update(kind='collapsed', params=index.params, n_samples=int(n), collapse=dict(compression, used=True))
+        return index, report
+
+    k = min(engine.k, n)
+    kinds = kinds or candidate_kinds(n, dim)
+    report = {'kind': 'brute', 'params': {}, 'recall': 1.0, 'n_samples': int(n), 'n_features': int(dim)}
+    if kinds == ['brute']:
+        report['reason'] = f"fewer than {MIN_INDEX_ROWS} rows" if n < MIN_INDEX_ROWS else 'only candidate'
+        return None, report
+
+    rng = np.random.default_rng(seed)
+    n_queries = min(n_queries, n)
+    Q = np.asarray(X[rng.integers(0, n, n_queries)]) + rng.normal(0, 0.1, (n_queries, dim))
+    brute_time, (_, exact) = _time_queries(lambda batch: engine.brute_kneighbors(batch, k), Q)
+    # Candidates this much slower than brute force are cut short
+    limit = brute_time * SLOWDOWN_LIMIT
+
+    benchmark = {'brute': {'ms_per_query': brute_time * 1000, 'recall': 1.0, 'n_queries': n_queries}}
+    best = (brute_time, 'brute', None)
+    for kind in kinds:
+        if kind == 'brute':
+            continue
+        start = time.perf_counter()
+        index = build_index(kind, X, seed=seed) if kind == 'ivf' else build_index(kind, X)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        if kind == 'ivf':
+            # Smallest nprobe reaching the recall target, while still faster than brute force
+            nprobe = 1
+            while True:
+                index.nprobe = nprobe
+                entry = dict(_measure(index, X, Q, k, exact, limit), nprobe=nprobe)
+                if entry['recall'] >= min_recall or entry['ms_per_query'] / 1000 > brute_time:
+                    break
+                if nprobe >= len(index.centroids):
+                    break
+                nprobe = min(len(index.centroids), nprobe * 2)
+        else:
+            entry = _measure(index, X, Q, k, exact, limit)
+        entry['build_ms'] = build_ms
+        benchmark[kind] = entry
+
+        if entry['recall'] >= min_recall and entry['ms_per_query'] / 1000 < best[0]:
+            best = (entry['ms_per_query'] / 1000, kind, index)
+
+    _, kind, index = best
+    report.update({
+        'kind': kind,
+        'params': index.params if index is not None else {},
+        'recall': benchmark[kind]['recall'],
+        'min_recall': min_recall,
+        'benchmark': benchmark
+    })
+    return index, report
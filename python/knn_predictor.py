@@ -6,16 +6,17 @@ Created by: Sistem Annur
 Date: 2024
 """
 
-import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler, LabelEncoder, OneHotEncoder
-from sklearn.neighbors import KNeighborsClassifier
-from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
-import joblib
 import json
 import sys
 import os
+from knn_engine import KNNEngine
+from knn_index import describe_compression
+from knn_evaluation import DEFAULT_K_MAX, loo_sweep
+from feature_schema import FeatureSchema, student_schema
+from model_store import load_engine, model_exists, save_engine
+from stage_timings import stage
+from training_files import TRAINING_COLUMNS, feature_matrix, read_training_data
 
 class KNNPredictor:
     def __init__(self, k=3):
@@ -26,26 +27,86 @@ class KNNPredictor:
             k (int): Number of neighbors to use
         """
         self.k = k
-        self.model = KNeighborsClassifier(n_neighbors=k)
+        # sklearn estimators are created by init_estimators() when training;
+        # predictions use the fitted ones restored by load_model()
+        self.model = None
+        self.scaler = None
+        self.gender_encoder = None
+        self.category_encoder = None
+        self.major_encoder = None
+        self.feature_columns = []
+        self.gender_classes = []
+        # Input dicts -> feature matrix, compiled from the model's schema
+        self.feature_schema = None
+        self.feature_transformer = None
+        # NumPy-only engine used for every prediction
+        self.engine = None
+        self.is_trained = False
+        
+    def init_estimators(self):
+        """
+        Create unfitted sklearn estimators
+        
+        sklearn is imported here rather than at module level so that the
+        prediction scripts start without loading the training stack.
+        """
+        from sklearn.preprocessing import StandardScaler, LabelEncoder
+        from sklearn.neighbors import KNeighborsClassifier
+        
+        self.model = KNeighborsClassifier(n_neighbors=self.k)
         self.scaler = StandardScaler()
         self.gender_encoder = LabelEncoder()
         self.category_encoder = LabelEncoder()
         self.major_encoder = LabelEncoder()
-        self.feature_columns = []
-        self.is_trained = False
         
-    def load_data(self, file_path):
+    def compile_engine(self):
+        """
+        Export the fitted sklearn model to the NumPy inference engine
+        
+        Returns:
+            KNNEngine: Engine holding the scaled training matrix and labels
+        """
+        self.gender_classes = [str(name) for name in self.gender_encoder.classes_]
+        schema = student_schema(self.gender_classes).select(self.feature_columns)
+        self.engine = KNNEngine.from_sklearn(
+            self.model, self.scaler, self.major_encoder,
+            metadata={
+                'k': self.k,
+                'feature_names': list(self.feature_columns),
+                'gender_classes': self.gender_classes,
+                'feature_schema': schema.to_dict()
+            }
+        )
+        print(describe_compression(self.engine.choose_index()))
+        self.compile_features()
+        return self.engine
+        
+    def compile_features(self):
+        """
+        Compile the model's feature schema into the input transformer
+        
+        Models saved without a schema get the default student schema for
+        their feature columns and gender classes.
         """
-        Load training data from CSV file
+        self.feature_schema = FeatureSchema.from_metadata(
+            self.engine.metadata, student_schema(self.gender_classes)
+        )
+        self.feature_transformer = self.feature_schema.compile()
+        
+    def load_data(self, file_path, workers=None):
+        """
+        Load training data with the typed schema of training_files
         
         Args:
-            file_path (str): Path to training data CSV file
+            file_path: CSV (read in chunks), Parquet or Feather file, or
+                several shards as a glob, directory or list of paths
+            workers (int): Threads reading shards, None for every core
             
         Returns:
             pandas.DataFrame: Loaded data
         """
         try:
-            data = pd.read_csv(file_path)
+            data = read_training_data(file_path, columns=TRAINING_COLUMNS, workers=workers)
             print(f"Data loaded successfully: {len(data)} records")
             return data
         except Exception as e:
@@ -62,12 +123,8 @@ class KNNPredictor:
         Returns:
             tuple: (X, y) - Features and target
         """
-        # Create a copy to avoid modifying original data
-        df = data.copy()
-        
-        # Encode categorical variables
-        df['jenis_kelamin_encoded'] = self.gender_encoder.fit_transform(df['jenis_kelamin'])
-        df['kategori_jurusan_encoded'] = self.category_encoder.fit_transform(df['kategori_jurusan'])
+        # Encode categorical variables without copying or modifying the frame
+        self.category_encoder.fit(data['kategori_jurusan'])
         
         # Define feature columns (excluding nama_lengkap, kategori_jurusan, jurusan_aktual)
         self.feature_columns = [
@@ -78,11 +135,13 @@ class KNNPredictor:
             'minat_ipa', 'minat_ips', 'minat_bahasa', 'minat_seni'
         ]
         
-        # Extract features
-        X = df[self.feature_columns]
+        # Extract features straight into one float64 matrix
+        X = np.empty((len(data), len(self.feature_columns)), order='F')
+        X[:, 0] = self.gender_encoder.fit_transform(data['jenis_kelamin'])
+        feature_matrix(data, self.feature_columns[1:], out=X[:, 1:])
         
         # Extract target (jurusan_aktual)
-        y = self.major_encoder.fit_transform(df['jurusan_aktual'])
+        y = self.major_encoder.fit_transform(data['jurusan_aktual'])
         
         # Scale features
         X_scaled = self.scaler.fit_transform(X)
@@ -99,12 +158,16 @@ class KNNPredictor:
         Returns:
             dict: Training results
         """
+        from sklearn.model_selection import train_test_split
+        from sklearn.metrics import accuracy_score, classification_report
+        
         # Load data
         data = self.load_data(data_path)
         if data is None:
             return {"success": False, "error": "Failed to load data"}
         
         # Preprocess data
+        self.init_estimators()
         X, y = self.preprocess_data(data)
         
         # Split data for validation
@@ -114,6 +177,7 @@ class KNNPredictor:
         
         # Train model
         self.model.fit(X_train, y_train)
+        self.compile_engine()
         self.is_trained = True
         
         # Evaluate model
@@ -145,9 +209,47 @@ class KNNPredictor:
             "accuracy": accuracy,
             "n_training_samples": len(X_train),
             "n_test_samples": len(X_test),
+            "compression": self.engine.metadata['index']['collapse'],
             "classification_report": report
         }
     
+    def select_k(self, data_path, k_max=DEFAULT_K_MAX):
+        """
+        Choose k by leave-one-out over a single neighbor graph, then fit
+        the model on every row with that k
+        
+        Args:
+            data_path (str): Path to training data
+            k_max (int): Largest k evaluated
+            
+        Returns:
+            dict: Training results with the LOO sweep of every k <= k_max
+        """
+        from sklearn.neighbors import KNeighborsClassifier
+        
+        data = self.load_data(data_path)
+        if data is None:
+            return {"success": False, "error": "Failed to load data"}
+        
+        self.init_estimators()
+        X, y = self.preprocess_data(data)
+        sweep = loo_sweep(X, y, self.major_encoder.classes_, k_max=k_max)
+        
+        self.k = sweep['best_k']
+        self.model = KNeighborsClassifier(n_neighbors=self.k)
+        self.model.fit(X, y)
+        self.compile_engine()
+        self.is_trained = True
+        
+        return {
+            "success": True,
+            "k": self.k,
+            "accuracy": sweep['best_accuracy'],
+            "n_training_samples": len(X),
+            "compression": self.engine.metadata['index']['collapse'],
+            "sweep": sweep
+        }
+    
     def predict_single(self, student_data):
         """
         Predict major for a single student
@@ -161,84 +263,102 @@ class KNNPredictor:
         if not self.is_trained:
             return {"success": False, "error": "Model is not trained yet"}
         
-        try:
-            # Prepare input data
-            input_data = {}
-            
-            # Encode gender
-            if student_data['jenis_kelamin'] in self.gender_encoder.classes_:
-                input_data['jenis_kelamin_encoded'] = self.gender_encoder.transform([student_data['jenis_kelamin']])[0]
-            else:
-                # Default to most common gender if not found
-                input_data['jenis_kelamin_encoded'] = 0
-            
-            # Add academic scores (0 or 1)
-            subjects = ['matematika', 'fisika', 'kimia', 'biologi', 'b_indonesia', 
-                       'b_inggris', 'sejarah', 'geografi', 'informatika', 'seni_budaya']
-            for subject in subjects:
-                input_data[subject] = student_data.get(subject, 0)
-            
-            # Add interest scores (0.0 - 1.0)
-            interests = ['minat_ipa', 'minat_ips', 'minat_bahasa', 'minat_seni']
-            for interest in interests:
-                input_data[interest] = student_data.get(interest, 0.0)
-            
-            # Create feature vector
-            feature_vector = np.array([[input_data[col] for col in self.feature_columns]])
-            
-            # Scale features
-            feature_vector_scaled = self.scaler.transform(feature_vector)
-            
-            # Make prediction
-            prediction = self.model.predict(feature_vector_scaled)[0]
-            probabilities = self.model.predict_proba(feature_vector_scaled)[0]
-            
-            # Get top k predictions with probabilities
-            top_k_indices = np.argsort(probabilities)[::-1][:self.k]
-            
-            predictions = []
-            for i, idx in enumerate(top_k_indices):
-                major = self.major_encoder.inverse_transform([idx])[0]
-                probability = probabilities[idx]
-                predictions.append({
-                    "rank": i + 1,
-                    "jurusan": major,
-                    "probability": float(probability),
-                    "confidence": float(probability * 100)
-                })
-            
-            # Get predicted major name
-            predicted_major = self.major_encoder.inverse_transform([prediction])[0]
-            
-            # Find nearest neighbors for explanation
-            distances, indices = self.model.kneighbors(feature_vector_scaled)
-            
-            result = {
-                "success": True,
-                "predicted_major": predicted_major,
-                "confidence": float(probabilities[prediction] * 100),
-                "top_predictions": predictions,
-                "k_value": self.k,
-                "nearest_neighbors_count": len(indices[0])
-            }
+        # One neighbor query gives the label, probabilities, ranking and
+        # the neighbors themselves
+        return self.predict_batch([student_data])[0]
+    
+    def predict_batch(self, students):
+        """
+        Predict majors for many students with one scaler transform and
+        one neighbor query
+        
+        The neighbor distances and indices from that query are returned
+        with each result instead of being recomputed for explanations.
+        
+        Args:
+            students (list): Student data dicts
             
-            return result
+        Returns:
+            list: One prediction result per student, same order as input
+        """
+        if not self.is_trained:
+            return [{"success": False, "error": "Model is not trained yet"} for _ in students]
+        
+        results = [None] * len(students)
+        
+        # Build every feature row in one vectorized pass
+        with stage('features'):
+            X, errors = self.feature_transformer.transform(students)
+        for i, error in errors.items():
+            results[i] = {"success": False, "error": f"Prediction error: {error}"}
+        valid = [i for i in range(len(students)) if i not in errors]
+        
+        if not valid:
+            return results
+        
+        try:
+            # Scale features and run one neighbor query for the whole batch;
+            # the vote, ranking and neighbor details all come from it
+            with stage('scale'):
+                X_scaled = self.engine.transform(X[valid])
+            with stage('neighbors'):
+                distances, indices = self.engine.kneighbors(X_scaled)
+            with stage('vote'):
+                probabilities = self.engine.vote(distances, indices)
+            predictions = np.argmax(probabilities, axis=1)
+            top_k_indices = np.argsort(probabilities, axis=1)[:, ::-1][:, :self.k]
             
+            # Class names for every rank of every row in one lookup
+            predicted_majors = self.engine.classes[predictions]
+            top_k_majors = self.engine.classes[top_k_indices]
+            top_k_probabilities = np.take_along_axis(probabilities, top_k_indices, axis=1)
         except Exception as e:
-            return {"success": False, "error": f"Prediction error: {str(e)}"}
+            for i in valid:
+                results[i] = {"success": False, "error": f"Prediction error: {str(e)}"}
+            return results
+        
+        with stage('format'):
+            for row, i in enumerate(valid):
+                top_predictions = []
+                for rank, (major, probability) in enumerate(zip(top_k_majors[row], top_k_probabilities[row])):
+                    top_predictions.append({
+                        "rank": rank + 1,
+                        "jurusan": str(major),
+                        "probability": float(probability),
+                        "confidence": float(probability * 100)
+                    })
+                
+                results[i] = {
+                    "success": True,
+                    "predicted_major": str(predicted_majors[row]),
+                    "confidence": float(probabilities[row, predictions[row]] * 100),
+                    "top_predictions": top_predictions,
+                    "k_value": self.k,
+                    "nearest_neighbors_count": len(indices[row]),
+                    # Row ids index the model's training matrix, nearest first
+                    "nearest_neighbors": [
+                        {"training_row": int(index), "distance": float(distance)}
+                        for index, distance in zip(indices[row], distances[row])
+                    ]
+                }
+        
+        return results
     
     def save_model(self, model_path="knn_model.pkl"):
         """
         Save trained model to file
         
         Args:
-            model_path (str): Path to save model
+            model_path (str): Path to save model (the engine artifact is
+                written next to it as a .model directory)
         """
         if not self.is_trained:
             print("Model is not trained yet")
             return False
         
         try:
+            import joblib
+            
             model_data = {
                 'model': self.model,
                 'scaler': self.scaler,
@@ -246,10 +366,13 @@ class KNNPredictor:
                 'category_encoder': self.category_encoder,
                 'major_encoder': self.major_encoder,
                 'feature_columns': self.feature_columns,
-                'k': self.k
+                'feature_schema': self.feature_schema.to_dict(),
+                'k': self.k,
+                'index': self.engine.metadata.get('index')
             }
             
             joblib.dump(model_data, model_path)
+            save_engine(self.engine, model_path)
             print(f"Model saved to {model_path}")
             return True
         except Exception as e:
@@ -260,19 +383,20 @@ class KNNPredictor:
         """
         Load trained model from file
         
+        The memory-mapped artifact next to the pickle is used when it is
+        up to date; otherwise the pickle (or .npz export) is converted once
+        and cached, so sklearn is only needed for that first conversion.
+        
         Args:
             model_path (str): Path to load model from
         """
         try:
-            model_data = joblib.load(model_path)
+            self.engine = load_engine(model_path)
             
-            self.model = model_data['model']
-            self.scaler = model_data['scaler']
-            self.gender_encoder = model_data['gender_encoder']
-            self.category_encoder = model_data['category_encoder']
-            self.major_encoder = model_data['major_encoder']
-            self.feature_columns = model_data['feature_columns']
-            self.k = model_data['k']
+            self.feature_columns = self.engine.metadata['feature_names']
+            self.gender_classes = self.engine.metadata.get('gender_classes', [])
+            self.k = self.engine.metadata['k']
+            self.compile_features()
             self.is_trained = True
             
             print(f"Model loaded from {model_path}")
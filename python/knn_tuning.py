@@ -0,0 +1,272 @@
+"""
+Tuning hyperparameter KNN dengan stratified k-fold cross-validation
+Grid: k, bobot vote (uniform/distance), pangkat Minkowski p dan subset
+fitur. Untuk setiap fold, p dan subset fitur, graf tetangga dihitung sekali
+sampai k terbesar; akurasi setiap k dan kedua pembobotan diturunkan dari
+graf yang sama (sweep_votes dari knn_evaluation). Tugas (fold, p, subset)
+dijalankan paralel di process pool.
+
+Usage:
+    report = cross_validate(X, y, feature_names, workers=4)
+    report['best']   # {'k': 7, 'weights': 'distance', 'p': 1, 'features': 'all', ...}
+"""
+
+import multiprocessing
+import time
+
+import numpy as np
+
+from feature_schema import ACADEMIC_FIELDS
+from knn_engine import KNNEngine
+from knn_evaluation import DEFAULT_K_MAX, sweep_votes
+
+DEFAULT_FOLDS = 5
+DEFAULT_WEIGHTS = ('uniform', 'distance')
+# Earlier values win ties, so the current defaults are kept unless beaten
+DEFAULT_P_VALUES = (2, 1)
+SURVEY_FIELDS = ['rencana_kuliah_encoded', 'kategori_jurusan_encoded', 'tingkat_keyakinan']
+
+def default_subsets(feature_names):
+    """Named feature subsets tried by default: all, and without gender, survey or both"""
+    names = list(feature_names)
+    drops = {
+        'all': [],
+        'without_gender': ['jenis_kelamin_encoded'],
+        'without_survey': SURVEY_FIELDS,
+        'academic': [name for name in names if name not in ACADEMIC_FIELDS]
+    }
+    subsets = {}
+    for label, dropped in drops.items():
+        kept = [name for name in names if name not in dropped]
+        if kept and kept not in subsets.values():
+            subsets[label] = kept
+    return subsets
+
+def minkowski_p(value):
+    """Parse a Minkowski power (>= 1); whole numbers stay int so they match sklearn's p"""
+    p = float(value)
+    if not p >= 1:
+        raise ValueError(f"Minkowski p must be at least 1, got {value}")
+    return int(p) if p.is_integer() else p
+
+def stratified_folds(y, n_folds, seed=0):
+    """
+    Fold number of every row; each class is shuffled and dealt round-robin,
+    so every fold gets the same share of each class (within one row)
+    """
+    y = np.asarray(y)
+    rng = np.random.default_rng(seed)
+    folds = np.empty(len(y), dtype=np.intp)
+    start = 0
+    for c in np.unique(y):
+        rows = rng.permutation(np.flatnonzero(y == c))
+        # Continue the deal where the previous class stopped to balance fold sizes
+        folds[rows] = (start + np.arange(len(rows))) % n_folds
+        start += len(rows)
+    return folds
+
+def standardize(X_train, X_test):
+    """Scale both sides with the training side's mean and std, as StandardScaler does"""
+    mean = X_train.mean(axis=0)
+    scale = X_train.std(axis=0)
+    scale[scale == 0.0] = 1.0
+    return (X_train - mean) / scale, (X_test - mean) / scale
+
+def fold_correct(X, y, folds, fold, columns, p, k_max, weights, n_classes):
+    """
+    Correct predictions on one held-out fold for every k and weighting
+
+    Returns:
+        numpy.ndarray: (len(weights), k_max) counts of correct predictions,
+        [w, k - 1] for the first k neighbors
+    """
+    test = folds == fold
+    X_train, X_test = standardize(X[~test][:, columns], X[test][:, columns])
+    y_train, y_test = y[~test], y[test]
+    dim = X_train.shape[1]
+    engine = KNNEngine(X_train, y_train, np.arange(n_classes), k_max, np.zeros(dim), np.ones(dim),
+                       metadata={'p': p})
+    distances, indices = engine.brute_kneighbors(X_test, k_max)
+
+    correct = np.zeros((len(weights), k_max), dtype=np.int64)
+    for w, weighting in enumerate(weights):
+        # argmax takes the lowest class index on ties, as KNeighborsClassifier does
+        predictions = sweep_votes(distances, indices, y_train, n_classes, weighting).argmax(axis=2)
+        correct[w, :indices.shape[1]] = (predictions == y_test[:, None]).sum(axis=0)
+    return correct
+
+# Worker process state, set up once by _init_worker
+_worker_data = None
+
+def _init_worker(data):
+    global _worker_data
+    try:
+        from threadpoolctl import threadpool_limits
+
+        # One BLAS thread per worker: the pool already uses every core
+        threadpool_limits(1)
+    except ImportError:
+        pass
+    _worker_data = data
+
+def _run_task(task):
+    fold, columns, p = task
+    data = _worker_data
+    return fold_correct(data['X'], data['y'], data['folds'], fold, columns, p, data['k_max'], data['weights'],
+                        data['n_classes'])
+
+def cross_validate(X, y, feature_names, k_max=DEFAULT_K_MAX, weights=DEFAULT_WEIGHTS, p_values=DEFAULT_P_VALUES,
+                   subsets=None, n_folds=DEFAULT_FOLDS, seed=0, workers=None):
+    """
+    Stratified k-fold accuracy of every grid point
+
+    Args:
+        X (numpy.ndarray): (n, F) unscaled training rows; each fold is
+            standardized with its own training part
+        y (numpy.ndarray): (n,) class index of each row
+        feature_names (list): Names of the columns of X
+        k_max (int): k from 1 to k_max is evaluated (capped at the smallest training part)
+        weights (tuple): Vote weightings
+        p_values (tuple): Minkowski powers
+        subsets (dict): Name -> feature names, default default_subsets()
+        n_folds (int): Number of folds (capped at the largest class size)
+        workers (int): Pool size, None or 0 for every usable core
+
+    Returns:
+        dict: best configuration, mean and std accuracy of every grid
+        point, grid, fold count and wall time; among equal accuracies the
+        earliest subset, p and weighting and the smallest k win
+    """
+    from parallel_predict import default_workers
+
+    started = time.perf_counter()
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.intp)
+    feature_names = list(feature_names)
+    subsets = subsets or default_subsets(feature_names)
+    weights = tuple(weights)
+    p_values = tuple(minkowski_p(p) for p in p_values)
+    for label, names in subsets.items():
+        unknown = sorted(set(names) - set(feature_names))
+        if unknown:
+            raise ValueError(f"Unknown features in subset {label}: {', '.join(unknown)}")
+
+    n_classes = int(y.max()) + 1
+    n_folds = max(2, min(int(n_folds), int(np.bincount(y).max())))
+    folds = stratified_folds(y, n_folds, seed)
+    k_max = max(1, min(int(k_max), len(y) - int(np.bincount(folds).max())))
+
+    columns = {label: [feature_names.index(name) for name in names] for label, names in subsets.items()}
+    tasks = [(fold, columns[label], p) for label in subsets for p in p_values for fold in range(n_folds)]
+    data = {'X': X, 'y': y, 'folds': folds, 'k_max': k_max, 'weights': weights, 'n_classes': n_classes}
+
+    workers = min(max(1, int(workers or default_workers())), len(tasks))
+    if workers == 1:
+        correct = [fold_correct(X, y, folds, fold, cols, p, k_max, weights, n_classes) for fold, cols, p in tasks]
+    else:
+        with multiprocessing.get_context().Pool(workers, initializer=_init_worker, initargs=(data,)) as pool:
+            correct = pool.map(_run_task, tasks)
+
+    fold_sizes = np.bincount(folds, minlength=n_folds)
+    results = []
+    best = None
+    for t in range(0, len(tasks), n_folds):
+        fold_ids = [task[0] for task in tasks[t:t + n_folds]]
+        # (folds, weights, k) accuracies of one subset and p
+        accuracy = np.stack(correct[t:t + n_folds]) / fold_sizes[fold_ids][:, None, None]
+        mean, std = accuracy.mean(axis=0), accuracy.std(axis=0)
+        label = list(subsets)[t // (n_folds * len(p_values))]
+        p = tasks[t][2]
+        for w, weighting in enumerate(weights):
+            for k in range(1, k_max + 1):
+                result = {'features': label, 'p': p, 'weights': weighting, 'k': k,
+                          'accuracy': float(mean[w, k - 1]), 'std': float(std[w, k - 1])}
+                results.append(result)
+                if best is None or result['accuracy'] > best['accuracy']:
+                    best = result
+
+    return {
+        'best': dict(best, feature_names=list(subsets[best['features']])),
+        'results': results,
+        'grid': {'k_max': k_max, 'weights': list(weights), 'p': list(p_values),
+                 'features': {label: list(names) for label, names in subsets.items()}},
+        'n_folds': n_folds,
+        'n_samples': int(len(y)),
+        'seed': seed,
+        'workers': workers,
+        'wall_seconds': round(time.perf_counter() - started, 3)
+    }
+
+def fit_best(predictor, X, y_names, feature_names, report):
+    """
+    Refit a predictor with the best configuration of a CV report
+
+    Uses the predictors' own training recipe: 80/20 split (random_state
+    42), StandardScaler and KNeighborsClassifier on the training part,
+    then the NumPy engine. The report goes into the engine metadata (and
+    so into the saved artifact) together with the hold-out accuracy.
+
+    Returns:
+        dict: The report, with holdout_accuracy and the total wall time
+    """
+    from sklearn.model_selection import train_test_split
+
+    started = time.perf_counter()
+    best = report['best']
+    columns = [list(feature_names).index(name) for name in best['feature_names']]
+    predictor.k, predictor.weights, predictor.p = best['k'], best['weights'], best['p']
+    predictor.feature_names = list(best['feature_names'])
+
+    predictor.init_estimators()
+    predictor.label_encoder.fit(y_names)
+    X_train, X_test, y_train, y_test = train_test_split(
+        np.asarray(X, dtype=np.float64)[:, columns], predictor.label_encoder.transform(y_names),
+        test_size=0.2, random_state=42
+    )
+    X_train_scaled = predictor.scaler.fit_transform(X_train)
+    predictor.model.fit(X_train_scaled, y_train)
+    predictor.compile_engine()
+
+    report = dict(report)
+    report['holdout_accuracy'] = float(predictor.model.score(predictor.scaler.transform(X_test), y_test))
+    report['wall_seconds'] = round(report['wall_seconds'] + time.perf_counter() - started, 3)
+    predictor.engine.metadata['tuning'] = report
+    return report
+
+def add_tuning_arguments(parser):
+    """Grid, fold and pool options shared by the predictors' tune commands"""
+    parser.add_argument('--folds', type=int, default=DEFAULT_FOLDS, help="Stratified folds")
+    parser.add_argument('--k-max', type=int, default=DEFAULT_K_MAX, help="Evaluate k = 1..K_MAX")
+    parser.add_argument('--weights', nargs='+', choices=DEFAULT_WEIGHTS, default=list(DEFAULT_WEIGHTS),
+                        help="Vote weightings to try")
+    parser.add_argument('--p', nargs='+', type=minkowski_p, default=list(DEFAULT_P_VALUES), metavar='P',
+                        help="Minkowski powers to try (2 = euclidean, 1 = manhattan)")
+    parser.add_argument('--subset', action='append', default=[], metavar='NAME=F1,F2,...',
+                        help="Feature subset to try (repeatable); default: all, without gender/survey, academic")
+    parser.add_argument('--seed', type=int, default=0, help="Fold assignment seed")
+    parser.add_argument('--workers', type=int, default=0,
+                        help="Processes running fold tasks (0 = all cores)")
+
+def tuning_options(args):
+    """cross_validate() keyword arguments from parsed tune arguments"""
+    subsets = {}
+    for spec in args.subset:
+        label, _, names = spec.partition('=')
+        if not names:
+            raise ValueError(f"Expected NAME=F1,F2,... for --subset, got {spec!r}")
+        subsets[label] = [name.strip() for name in names.split(',') if name.strip()]
+    return {
+        'k_max': args.k_max,
+        'weights': tuple(dict.fromkeys(args.weights)),
+        'p_values': tuple(dict.fromkeys(args.p)),
+        'subsets': subsets or None,
+        'n_folds': args.folds,
+        'seed': args.seed,
+        'workers': args.workers
+    }
+
+def summarize(report, n_top=10):
+    """The report without the full result table, with its n_top best grid points"""
+    summary = {key: value for key, value in report.items() if key != 'results'}
+    summary['top_results'] = sorted(report['results'], key=lambda result: -result['accuracy'])[:n_top]
+    return summary
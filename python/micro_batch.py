@@ -0,0 +1,123 @@
+"""
+Micro-batching asyncio untuk prediksi tunggal yang datang bersamaan
+Request tunggal dari banyak klien dikumpulkan menjadi satu batch, sampai
+ukuran maksimum (max_batch) atau jendela latensi singkat (window, default
+2 ms), lalu dijalankan sebagai satu predict_batch (satu transform scaler
+dan satu query tetangga). Hasil dikembalikan ke masing-masing pemanggil.
+
+Request yang datang saat server sepi (tidak ada request lain dalam satu
+window terakhir) langsung dijalankan tanpa menunggu, jadi latensi request
+tunggal tidak bertambah. Batch dijalankan di thread event loop: kerjanya
+CPU-bound, dan paralelisme server datang dari worker prefork.
+
+Usage:
+    batcher = MicroBatcher(predictor.predict_batch, max_batch=64, window=0.002)
+    result = await batcher.predict(input_data)   # atau batcher.submit() -> Future
+    batcher.stats()                              # distribusi ukuran batch
+"""
+
+import asyncio
+import bisect
+import itertools
+from collections import Counter
+
+DEFAULT_MAX_BATCH = 64
+DEFAULT_WINDOW = 0.002
+STATS_QUANTILES = (0.5, 0.9, 0.99)
+
+class MicroBatcher:
+    """Gathers concurrent predict() calls of one event loop into predict_batch calls"""
+
+    def __init__(self, predict_batch, max_batch=DEFAULT_MAX_BATCH, window=DEFAULT_WINDOW, on_batch=None):
+        """
+        Args:
+            predict_batch (callable): list of inputs -> list of results, same order
+            max_batch (int): A batch runs as soon as it has this many requests
+            window (float): Longest wait in seconds for more requests; 0
+                runs every request on its own
+            on_batch (callable): Called with the size of every batch run
+        """
+        self.predict_batch = predict_batch
+        self.max_batch = max(1, int(max_batch))
+        self.window = max(0.0, float(window))
+        self.on_batch = on_batch
+        self.pending = []
+        self.timer = None
+        self.last_arrival = float('-inf')
+        self.batch_sizes = Counter()
+
+    def submit(self, input_data):
+        """
+        Queue one input; must be called from the event loop
+
+        Returns:
+            asyncio.Future: Its result, already done when the input ran at once
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((input_data, future))
+
+        now = loop.time()
+        # Nothing else arrived within a window: waiting would only add latency
+        idle = self.timer is None and now - self.last_arrival >= self.window
+        self.last_arrival = now
+        if idle or len(self.pending) >= self.max_batch:
+            self.dispatch()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.window, self.dispatch)
+        return future
+
+    async def predict(self, input_data):
+        """Result of one input, computed in a batch with the requests around it"""
+        return await self.submit(input_data)
+
+    def dispatch(self):
+        """Run the waiting requests as one batch and hand every caller its result"""
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        # Callers that went away (closed connection) are not computed
+        batch = [(input_data, future) for input_data, future in self.pending if not future.done()]
+        self.pending = []
+        if not batch:
+            return
+
+        self.batch_sizes[len(batch)] += 1
+        try:
+            results = self.predict_batch([input_data for input_data, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+        else:
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+        if self.on_batch is not None:
+            self.on_batch(len(batch))
+
+    def stats(self):
+        """
+        Batch size distribution since start
+
+        Returns:
+            dict: request and batch counts, mean/max and p50/p90/p99 batch
+            size, and {size: number of batches}
+        """
+        sizes = sorted(self.batch_sizes)
+        counts = [self.batch_sizes[size] for size in sizes]
+        n_batches = sum(counts)
+        n_requests = sum(size * count for size, count in zip(sizes, counts))
+        cumulative = list(itertools.accumulate(counts))
+        quantiles = {}
+        for q in STATS_QUANTILES:
+            if n_batches:
+                quantiles[f'p{round(q * 100)}'] = sizes[bisect.bisect_left(cumulative, q * n_batches)]
+        return {
+            'requests': n_requests,
+            'batches': n_batches,
+            'mean_batch_size': round(n_requests / n_batches, 3) if n_batches else None,
+            'max_batch_size': sizes[-1] if sizes else None,
+            'batch_size_quantiles': quantiles,
+            'batch_sizes': {str(size): count for size, count in zip(sizes, counts)},
+            'window_ms': self.window * 1000,
+            'max_batch': self.max_batch
+        }
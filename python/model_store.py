@@ -0,0 +1,293 @@
+"""
+Format artefak model KNN yang bisa di-memory-map
+Satu direktori berisi header.json (format, versi, metadata, sumber) dan
+satu file .npy mentah per array. Worker membuka array dengan
+np.load(mmap_mode='r') sehingga beberapa proses berbagi page cache yang
+sama dan waktu load tidak bergantung pada ukuran data training.
+
+Layout:
+    knn_model_silent.model/
+        header.json
+        X.npy  X_norms.npy  mean.npy  inv_std.npy  labels.npy  classes.npy
+        index.<nama>.npy      (hanya jika engine memakai index knn_index)
+
+Artefak compact (compact_storage.py, header 'storage': 'compact') berisi
+codes.npy offset.npy step.npy norms.npy sebagai ganti X.npy dan X_norms.npy.
+Mode ini dipertahankan saat artefak dibuat ulang dari pickle atau di-update.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+
+from compact_storage import CompactKNNEngine
+from knn_engine import KNNEngine, export_path
+from knn_index import index_from_arrays
+
+ARTIFACT_FORMAT = 'knn-artifact'
+ARTIFACT_VERSION = 1
+ARTIFACT_SUFFIX = '.model'
+HEADER_FILE = 'header.json'
+ARRAY_NAMES = ['X', 'X_norms', 'mean', 'inv_std', 'labels', 'classes']
+INDEX_PREFIX = 'index.'
+
+def artifact_path(model_path):
+    """Path of the artifact directory cached next to a model file"""
+    if model_path.endswith(ARTIFACT_SUFFIX):
+        return model_path
+    return os.path.splitext(model_path)[0] + ARTIFACT_SUFFIX
+
+def source_stamp(path):
+    """Identify a source file version by size and mtime"""
+    stat = os.stat(path)
+    return {'name': os.path.basename(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def read_header(path):
+    """Read and check an artifact header, or None if it is not a usable artifact"""
+    try:
+        with open(os.path.join(path, HEADER_FILE), encoding='utf-8') as f:
+            header = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if header.get('format') != ARTIFACT_FORMAT or header.get('version') != ARTIFACT_VERSION:
+        return None
+    return header
+
+def detect_format(path):
+    """Return 'artifact', 'npz', 'pickle' or None for a model path"""
+    if os.path.isdir(path):
+        return 'artifact' if read_header(path) is not None else None
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        magic = f.read(4)
+    if magic == b'PK\x03\x04':
+        return 'npz'
+    return 'pickle'
+
+def engine_arrays(engine):
+    """The arrays of an engine in their on-disk dtypes"""
+    if engine.storage == 'compact':
+        return engine.arrays()
+    return {
+        'X': np.ascontiguousarray(engine.X, dtype=np.float64),
+        'X_norms': np.ascontiguousarray(engine.X_norms, dtype=np.float64),
+        'mean': np.ascontiguousarray(engine.mean, dtype=np.float64),
+        'inv_std': np.ascontiguousarray(engine.inv_std, dtype=np.float64),
+        'labels': np.ascontiguousarray(engine.labels, dtype=np.int64),
+        'classes': np.asarray(engine.classes).astype(str)
+    }
+
+def content_hash(engine, arrays=None):
+    """
+    SHA-256 of everything a prediction depends on: the arrays, k, the
+    vote weighting and the metadata (feature schema included)
+    """
+    digest = hashlib.sha256()
+    for name, array in (arrays or engine_arrays(engine)).items():
+        digest.update(f"{name}:{array.dtype.str}:{array.shape};".encode())
+        digest.update(memoryview(array).cast('B'))
+    settings = {'k': engine.k, 'weights': engine.weights, 'metadata': engine.metadata}
+    digest.update(json.dumps(settings, sort_keys=True).encode())
+    return digest.hexdigest()
+
+def save_artifact(engine, path, source=None):
+    """
+    Write an engine as an artifact directory
+
+    The directory is built under a temporary name and swapped in with
+    renames, so concurrent readers never see a half-written artifact.
+    Readers that already mapped the old files keep working.
+    """
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    arrays = engine_arrays(engine)
+    index_arrays = engine.index.arrays() if engine.index is not None else {}
+    try:
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_path, name + '.npy'), array, allow_pickle=False)
+        for name, array in index_arrays.items():
+            np.save(os.path.join(tmp_path, INDEX_PREFIX + name + '.npy'), array, allow_pickle=False)
+
+        header = {
+            'format': ARTIFACT_FORMAT,
+            'version': ARTIFACT_VERSION,
+            'k': engine.k,
+            'weights': engine.weights,
+            'metadata': engine.metadata,
+            'source': source,
+            'content_hash': content_hash(engine, arrays),
+            'arrays': {name: {'dtype': array.dtype.str, 'shape': list(array.shape)} for name, array in arrays.items()}
+        }
+        header['storage'] = engine.storage
+        if engine.index is not None:
+            header['index'] = {'kind': engine.index.kind, 'params': engine.index.params, 'arrays': sorted(index_arrays)}
+        # Header last: an artifact without it is never considered valid
+        with open(os.path.join(tmp_path, HEADER_FILE), 'w', encoding='utf-8') as f:
+            json.dump(header, f, indent=2)
+
+        old_path = None
+        if os.path.exists(path):
+            old_path = f"{path}.old-{os.getpid()}"
+            os.rename(path, old_path)
+        os.rename(tmp_path, path)
+        if old_path:
+            shutil.rmtree(old_path, ignore_errors=True)
+    finally:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+    return path
+
+def load_artifact(path, mmap=True):
+    """
+    Open an artifact directory as a KNNEngine
+
+    With mmap=True the arrays are read-only memory maps: loading is O(1)
+    in the training-set size and pages are shared between processes.
+    """
+    header = read_header(path)
+    if header is None:
+        raise ValueError(f"Not a {ARTIFACT_FORMAT} v{ARTIFACT_VERSION} artifact: {path}")
+
+    mmap_mode = 'r' if mmap else None
+    arrays = {
+        name: np.load(os.path.join(path, name + '.npy'), mmap_mode=mmap_mode, allow_pickle=False)
+        for name in header.get('arrays', ARRAY_NAMES)
+    }
+    index = None
+    if header.get('index'):
+        info = header['index']
+        index = index_from_arrays(info['kind'], info['params'], {
+            name: np.load(os.path.join(path, INDEX_PREFIX + name + '.npy'), mmap_mode=mmap_mode, allow_pickle=False)
+            for name in info['arrays']
+        })
+    if header.get('storage') == 'compact':
+        return CompactKNNEngine(
+            codes=arrays['codes'],
+            offset=arrays['offset'],
+            step=arrays['step'],
+            labels=arrays['labels'],
+            classes=arrays['classes'],
+            k=header['k'],
+            mean=arrays['mean'],
+            inv_std=arrays['inv_std'],
+            weights=header['weights'],
+            metadata=header['metadata'],
+            norms=arrays['norms'],
+            index=index
+        )
+    return KNNEngine(
+        X=arrays['X'],
+        labels=arrays['labels'],
+        classes=arrays['classes'],
+        k=header['k'],
+        mean=arrays['mean'],
+        inv_std=arrays['inv_std'],
+        weights=header['weights'],
+        metadata=header['metadata'],
+        X_norms=arrays['X_norms'],
+        index=index
+    )
+
+def is_fresh(artifact, source_path):
+    """True if the artifact was converted from the current version of source_path"""
+    header = read_header(artifact)
+    if header is None:
+        return False
+    if not os.path.exists(source_path):
+        return True
+    return header.get('source') == source_stamp(source_path)
+
+def fresh_artifact(model_path):
+    """
+    Artifact directory load_engine would open as is, without converting
+    the pickle or export first; None if there is none
+    """
+    if detect_format(model_path) == 'artifact':
+        return model_path
+
+    artifact = artifact_path(model_path)
+    npz_path = export_path(model_path)
+    for source_path in (model_path, npz_path):
+        if os.path.exists(source_path):
+            return artifact if is_fresh(artifact, source_path) else None
+    return artifact if read_header(artifact) is not None else None
+
+def model_exists(model_path):
+    """True if a model is available in any supported format"""
+    return any(os.path.exists(path) for path in (model_path, artifact_path(model_path), export_path(model_path)))
+
+def with_storage(engine, header):
+    """
+    Re-encode a rebuilt engine in the storage mode of the artifact it
+    replaces; rows that no longer fit the compact codes keep float64
+    """
+    if not header or header.get('storage') != 'compact' or engine.storage == 'compact':
+        return engine
+    try:
+        compact = CompactKNNEngine.from_engine(engine, np.dtype(header['arrays']['codes']['dtype']))
+    except ValueError:
+        return engine
+    compact.index = engine.index
+    return compact
+
+def save_engine(engine, model_path):
+    """Cache the engine as the artifact for a freshly written model file"""
+    source = source_stamp(model_path) if os.path.exists(model_path) else None
+    artifact = artifact_path(model_path)
+    return save_artifact(with_storage(engine, read_header(artifact)), artifact, source=source)
+
+def replace_engine(engine, model_path):
+    """
+    Swap in an updated engine for a model path
+
+    The source stamp of the current artifact is kept, so the update is not
+    mistaken for a stale conversion and the pickle is not re-read.
+    """
+    artifact = artifact_path(model_path)
+    header = read_header(artifact)
+    return save_artifact(with_storage(engine, header), artifact, source=header.get('source') if header else None)
+
+def load_engine(model_path, mmap=True):
+    """
+    Load the inference engine for a model path, whatever its format
+
+    Order: an up-to-date artifact directory next to the model, then the
+    .npz export, then the pickle. Exports and pickles are converted once
+    and cached as an artifact directory so later loads skip unpickling.
+    """
+    if detect_format(model_path) == 'artifact':
+        return load_artifact(model_path, mmap=mmap)
+
+    artifact = artifact_path(model_path)
+    npz_path = export_path(model_path)
+    if os.path.exists(model_path):
+        source_path = model_path
+    elif os.path.exists(npz_path):
+        source_path = npz_path
+    else:
+        source_path = None
+
+    if source_path is None or is_fresh(artifact, source_path):
+        return load_artifact(artifact, mmap=mmap)
+
+    if detect_format(source_path) == 'npz':
+        engine = KNNEngine.load(source_path)
+    elif os.path.exists(npz_path) and os.path.getmtime(npz_path) >= os.path.getmtime(source_path):
+        engine = KNNEngine.load(npz_path)
+    else:
+        import joblib
+        engine = KNNEngine.from_model_data(joblib.load(source_path))
+
+    try:
+        save_artifact(with_storage(engine, read_header(artifact)), artifact, source=source_stamp(source_path))
+    except OSError:
+        # Read-only data directory: serve from memory without caching
+        return engine
+    return load_artifact(artifact, mmap=mmap)
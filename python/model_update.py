@@ -0,0 +1,170 @@
+"""
+Update inkremental untuk engine KNN
+KNN tidak punya parameter yang dilatih, jadi baris berlabel baru cukup
+ditambahkan ke index. Statistik scaler (n, mean, M2) diperbarui secara
+streaming; selama pergeseran (drift) terhadap scaler yang dipakai index
+masih di bawah threshold, baris baru di-scale dengan scaler lama. Jika
+melewati threshold seluruh index di-standardisasi ulang sekali.
+Estimator sklearn untuk file pickle bisa dibangun ulang dari engine hasil
+update (sklearn_estimators), jadi pickle dan artefak tetap sama isinya.
+"""
+
+import numpy as np
+
+from knn_engine import KNNEngine
+
+# Largest shift, in fitted standard deviations, tolerated before re-standardizing
+DEFAULT_DRIFT_THRESHOLD = 0.1
+
+def raw_rows(engine):
+    """Unscaled training rows of an engine"""
+    return np.asarray(engine.X) / engine.inv_std + engine.mean
+
+def batch_stats(X):
+    """Streaming scaler statistics of a block of raw rows"""
+    X = np.asarray(X, dtype=np.float64)
+    mean = X.mean(axis=0) if len(X) else np.zeros(X.shape[1])
+    return {'n': int(len(X)), 'mean': mean, 'm2': ((X - mean) ** 2).sum(axis=0)}
+
+def merge_stats(a, b):
+    """Combine two sets of statistics (Chan et al. parallel variance)"""
+    n = a['n'] + b['n']
+    if n == 0:
+        return dict(a)
+    delta = b['mean'] - a['mean']
+    mean = a['mean'] + delta * (b['n'] / n)
+    m2 = a['m2'] + b['m2'] + delta ** 2 * (a['n'] * b['n'] / n)
+    return {'n': n, 'mean': mean, 'm2': m2}
+
+def stats_to_metadata(stats):
+    return {'n': stats['n'], 'mean': [float(v) for v in stats['mean']], 'm2': [float(v) for v in stats['m2']]}
+
+def scaler_stats(engine):
+    """
+    Scaler statistics of everything in the index
+
+    Read from the metadata when a previous fit or update stored them,
+    otherwise computed once from the unscaled index rows.
+    """
+    stored = engine.metadata.get('scaler_stats')
+    if stored:
+        return {'n': int(stored['n']), 'mean': np.asarray(stored['mean']), 'm2': np.asarray(stored['m2'])}
+    return batch_stats(raw_rows(engine))
+
+def scale_of(stats):
+    """StandardScaler's scale_ for the statistics (zero variance gives 1)"""
+    scale = np.sqrt(stats['m2'] / max(stats['n'], 1))
+    scale[scale == 0.0] = 1.0
+    return scale
+
+def scaling(stats):
+    """(mean, inv_std) the way StandardScaler derives them"""
+    return stats['mean'], 1.0 / scale_of(stats)
+
+def drift(engine, stats):
+    """Largest mean or scale shift of the statistics against the engine's scaler, in fitted std units"""
+    mean, inv_std = scaling(stats)
+    mean_shift = np.abs(mean - engine.mean) * engine.inv_std
+    scale_shift = np.abs(engine.inv_std / inv_std - 1.0)
+    return float(max(mean_shift.max(), scale_shift.max()))
+
+def extend_classes(engine, names):
+    """
+    Class table with any new names merged in, kept sorted like LabelEncoder
+
+    Returns:
+        tuple: (classes, labels) - the new table and the index labels
+        renumbered against it
+    """
+    classes = np.array(sorted(set(str(c) for c in engine.classes) | set(str(n) for n in names)))
+    remap = np.searchsorted(classes, np.asarray(engine.classes).astype(str))
+    return classes, remap[np.asarray(engine.labels)]
+
+def append_rows(engine, X_raw, y_names, drift_threshold=DEFAULT_DRIFT_THRESHOLD):
+    """
+    Add labelled rows to an engine without refitting
+
+    Args:
+        engine (KNNEngine): Current engine
+        X_raw (numpy.ndarray): (m, F) unscaled feature rows
+        y_names (array-like): Major name of each row
+        drift_threshold (float): Re-standardize the whole index when the
+            scaler statistics move more than this; None never does
+
+    Returns:
+        tuple: (KNNEngine, report dict)
+    """
+    X_raw = np.asarray(X_raw, dtype=np.float64)
+    stats = merge_stats(scaler_stats(engine), batch_stats(X_raw))
+    shift = drift(engine, stats)
+
+    classes, labels = extend_classes(engine, y_names)
+    new_labels = np.searchsorted(classes, np.asarray(y_names).astype(str))
+
+    restandardize = drift_threshold is not None and shift > drift_threshold
+    if restandardize:
+        mean, inv_std = scaling(stats)
+        X = (np.vstack([raw_rows(engine), X_raw]) - mean) * inv_std
+        X_norms = None
+    else:
+        mean, inv_std = engine.mean, engine.inv_std
+        X_new = (X_raw - mean) * inv_std
+        X = np.vstack([np.asarray(engine.X), X_new])
+        X_norms = np.concatenate([np.asarray(engine.X_norms), np.einsum('ij,ij->i', X_new, X_new)])
+
+    metadata = dict(engine.metadata)
+    metadata['scaler_stats'] = stats_to_metadata(stats)
+
+    updated = KNNEngine(
+        X=X,
+        labels=np.concatenate([labels, new_labels]),
+        classes=classes,
+        k=engine.k,
+        mean=mean,
+        inv_std=inv_std,
+        weights=engine.weights,
+        metadata=metadata,
+        X_norms=X_norms
+    )
+    # Same index kind and parameters as before, rebuilt over the grown matrix
+    updated.restore_index()
+    report = {
+        'n_added': int(len(X_raw)),
+        'n_samples': int(len(X)),
+        'new_classes': sorted(set(classes.tolist()) - set(np.asarray(engine.classes).astype(str).tolist())),
+        'drift': shift,
+        'restandardized': restandardize
+    }
+    return updated, report
+
+def sklearn_estimators(engine, scaler=None):
+    """
+    Fitted sklearn estimators that KNNEngine.from_sklearn turns back into
+    the same engine, for rewriting a model pickle after an update
+
+    Args:
+        engine (KNNEngine): Updated engine
+        scaler: The pickle's StandardScaler, kept when the engine still
+            scales with it; None builds one from the stored scaler statistics
+
+    Returns:
+        tuple: (KNeighborsClassifier, StandardScaler, LabelEncoder)
+    """
+    from sklearn.neighbors import KNeighborsClassifier
+    from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+    model = KNeighborsClassifier(n_neighbors=engine.k, weights=engine.weights, p=engine.p)
+    model.fit(np.asarray(engine.X), np.asarray(engine.labels))
+    label_encoder = LabelEncoder()
+    label_encoder.classes_ = np.asarray(engine.classes)
+
+    if scaler is None:
+        stats = scaler_stats(engine)
+        scaler = StandardScaler()
+        scaler.mean_ = np.asarray(stats['mean'], dtype=np.float64)
+        scaler.var_ = np.asarray(stats['m2'], dtype=np.float64) / max(stats['n'], 1)
+        # scale_of, not 1 / inv_std: from_sklearn's 1 / scale_ then gives inv_std bit for bit
+        scaler.scale_ = scale_of(stats)
+        scaler.n_samples_seen_ = stats['n']
+        scaler.n_features_in_ = engine.n_features
+    return model, scaler, label_encoder
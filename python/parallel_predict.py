@@ -0,0 +1,248 @@
+"""
+Eksekusi batch prediksi KNN paralel di beberapa proses
+Matriks training yang sudah di-scale, norm baris, label (dan array index
+jika ada) disalin sekali ke multiprocessing.shared_memory. Setiap worker
+hanya memetakan blok yang sama, jadi tidak ada salinan model per worker.
+Matriks query dan hasil (jarak, indeks tetangga) juga berada di shared
+memory: query dibagi menjadi chunk baris, setiap worker menulis hasil
+chunk-nya langsung ke posisinya, sehingga urutan hasil sama dengan input.
+
+Voting tetap di proses utama (murah dibanding pencarian tetangga), jadi
+hasil predict_proba sama dengan KNNEngine biasa.
+
+Usage:
+    engine = ParallelEngine(predictor.engine, workers=8)
+    predictor.engine = engine      # predict_batch memakai pool
+    ...
+    engine.close()
+"""
+
+import multiprocessing
+import os
+import weakref
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from knn_engine import KNNEngine
+from stage_timings import stage
+
+# Below this many query rows the pool is not worth its overhead
+MIN_PARALLEL_ROWS = 256
+# Chunks per worker: a few so faster workers pick up the slack
+CHUNKS_PER_WORKER = 4
+MAX_CHUNK_ROWS = 4096
+
+def default_workers():
+    """Usable cores of this process"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+class SharedArray:
+    """Describes a NumPy array living in a named shared memory block"""
+
+    def __init__(self, name, shape, dtype):
+        self.name = name
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype).str
+
+    @classmethod
+    def create(cls, array):
+        """Copy an array into a new block; returns (descriptor, block)"""
+        array = np.ascontiguousarray(array)
+        block = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+        return cls(block.name, array.shape, array.dtype), block
+
+    @classmethod
+    def allocate(cls, shape, dtype):
+        """New uninitialized block; returns (descriptor, block)"""
+        nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        block = shared_memory.SharedMemory(create=True, size=max(1, nbytes))
+        return cls(block.name, shape, dtype), block
+
+    def view(self, block):
+        return np.ndarray(self.shape, dtype=self.dtype, buffer=block.buf)
+
+def _attach(name):
+    """Open an existing block; only the creating process unlinks it"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13: the attach is registered with the resource tracker the
+        # pool inherited from the parent, where the name is already known
+        return shared_memory.SharedMemory(name=name)
+
+# Worker process state, set up once by _init_worker
+_worker_engine = None
+_worker_blocks = {}
+_worker_limits = None
+
+def _init_worker(layout):
+    """Map the shared training arrays and build a query-only engine on top of them"""
+    global _worker_engine, _worker_limits
+    try:
+        from threadpoolctl import threadpool_limits
+
+        # One BLAS thread per worker: the pool already uses every core
+        _worker_limits = threadpool_limits(1)
+    except ImportError:
+        pass
+
+    arrays = {}
+    for name, shared in layout['arrays'].items():
+        _worker_blocks[name] = _attach(shared.name)
+        arrays[name] = shared.view(_worker_blocks[name])
+
+    index = None
+    if layout['index'] is not None:
+        from knn_index import index_from_arrays
+
+        index = index_from_arrays(layout['index']['kind'], layout['index']['params'],
+                                  {name[len('index.'):]: array for name, array in arrays.items()
+                                   if name.startswith('index.')})
+    n_features = arrays['X'].shape[1]
+    _worker_engine = KNNEngine(
+        X=arrays['X'], labels=arrays['labels'], classes=[], k=layout['k'],
+        mean=np.zeros(n_features), inv_std=np.ones(n_features), metadata={'p': layout['p']},
+        X_norms=arrays['X_norms'], index=index
+    )
+
+def _kneighbors_chunk(task):
+    """Neighbors of query rows [start, stop), written straight into the shared outputs"""
+    queries, distances, indices, start, stop, n_neighbors = task
+    blocks = [_attach(shared.name) for shared in (queries, distances, indices)]
+    try:
+        Q, D, I = (shared.view(block) for shared, block in zip((queries, distances, indices), blocks))
+        D[start:stop], I[start:stop] = _worker_engine.kneighbors(Q[start:stop], n_neighbors)
+        del Q, D, I
+    finally:
+        for block in blocks:
+            block.close()
+    return stop - start
+
+def _release(pool, blocks):
+    if pool is not None:
+        pool.terminate()
+        pool.join()
+    for block in blocks:
+        block.close()
+        block.unlink()
+
+class ParallelEngine:
+    """
+    KNNEngine front end that runs neighbor queries in a process pool
+
+    Everything except kneighbors (transform, vote, classes, metadata, ...)
+    is the wrapped engine's. The pool and the shared copies of the
+    training arrays are created on the first batch large enough to use
+    them, and released by close() or at interpreter exit.
+    """
+
+    def __init__(self, engine, workers=None, chunk_rows=None):
+        """
+        Args:
+            engine (KNNEngine): Engine to parallelize
+            workers (int): Pool size, default every usable core
+            chunk_rows (int): Query rows per task, default split evenly
+        """
+        self.engine = engine
+        self.workers = max(1, int(workers or default_workers()))
+        self.chunk_rows = chunk_rows
+        self._pool = None
+        self._blocks = []
+        self._finalizer = None
+
+    def __getattr__(self, name):
+        return getattr(self.engine, name)
+
+    def _start(self):
+        engine = self.engine
+        arrays = {
+            'X': np.asarray(engine.X, dtype=np.float64),
+            'X_norms': np.asarray(engine.X_norms, dtype=np.float64),
+            'labels': np.asarray(engine.labels, dtype=np.intp)
+        }
+        index = None
+        if engine.index is not None:
+            index = {'kind': engine.index.kind, 'params': engine.index.params}
+            arrays.update({'index.' + name: array for name, array in engine.index.arrays().items()})
+
+        layout = {'k': engine.k, 'p': engine.p, 'index': index, 'arrays': {}}
+        for name, array in arrays.items():
+            layout['arrays'][name], block = SharedArray.create(array)
+            self._blocks.append(block)
+
+        self._pool = multiprocessing.get_context().Pool(self.workers, initializer=_init_worker, initargs=(layout,))
+        self._finalizer = weakref.finalize(self, _release, self._pool, self._blocks)
+
+    def chunks(self, n_rows):
+        """(start, stop) row ranges of one batch"""
+        size = self.chunk_rows or min(MAX_CHUNK_ROWS, -(-n_rows // (self.workers * CHUNKS_PER_WORKER)))
+        return [(start, min(n_rows, start + size)) for start in range(0, n_rows, size)]
+
+    def kneighbors(self, X_scaled, n_neighbors=None):
+        """Same result as KNNEngine.kneighbors, computed chunk-wise across the pool"""
+        X_scaled = np.atleast_2d(np.asarray(X_scaled, dtype=np.float64))
+        if self.workers == 1 or len(X_scaled) < MIN_PARALLEL_ROWS:
+            return self.engine.kneighbors(X_scaled, n_neighbors)
+        if self._pool is None:
+            self._start()
+
+        n_neighbors = min(n_neighbors or self.engine.k, len(self.engine.X))
+        shape = (len(X_scaled), n_neighbors)
+        queries, q_block = SharedArray.create(X_scaled)
+        distances, d_block = SharedArray.allocate(shape, np.float64)
+        indices, i_block = SharedArray.allocate(shape, np.intp)
+        blocks = [q_block, d_block, i_block]
+        try:
+            tasks = [(queries, distances, indices, start, stop, n_neighbors)
+                     for start, stop in self.chunks(len(X_scaled))]
+            self._pool.map(_kneighbors_chunk, tasks)
+            return distances.view(d_block).copy(), indices.view(i_block).copy()
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+    def predict_proba(self, X):
+        """Class probabilities for raw feature rows, neighbors found in parallel"""
+        with stage('scale'):
+            X_scaled = self.engine.transform(X)
+        with stage('neighbors'):
+            distances, indices = self.kneighbors(X_scaled)
+        with stage('vote'):
+            return self.engine.vote(distances, indices)
+
+    def predict(self, X):
+        return np.argmax(self.predict_proba(X), axis=1)
+
+    def close(self):
+        """Stop the workers and free the shared memory"""
+        if self._finalizer is not None:
+            self._finalizer()
+        self._pool = None
+        self._blocks = []
+        self._finalizer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def use_workers(predictor, workers):
+    """
+    Route a loaded predictor's batch queries through a process pool
+
+    workers: 1 (or None) keeps the single-process engine, 0 means every core.
+
+    Returns:
+        ParallelEngine or None
+    """
+    if workers is None or workers == 1 or predictor is None:
+        return None
+    predictor.engine = ParallelEngine(predictor.engine, workers or None)
+    return predictor.engine
@@ -2,116 +2,218 @@
 """
 Script untuk prediksi jurusan menggunakan model KNN yang sudah ditraining
 Digunakan oleh Laravel controller melalui command line
+Hasil prediksi disimpan di cache persisten (prediction_cache.py); baris
+yang sudah ada di cache dijawab tanpa memuat model.
 """
 
+import argparse
+import contextlib
 import sys
 import json
 import os
+# Before numpy: importing it marks the start of the "imports" timing stage
+import stage_timings
 from knn_predictor import KNNPredictor
+from feature_schema import STUDENT_SUBJECTS, student_schema
+from batch_predict import run_batch
+from import_times import run_with_import_times
+from prediction_cache import open_cache
+from stage_timings import add_arguments as add_timing_arguments, emit, report_stderr, stage, start as start_timings
+
+REQUIRED_FIELDS = ['jenis_kelamin', 'mata_pelajaran_dikuasai', 'minat_ipa', 'minat_ips', 'minat_bahasa', 'minat_seni']
+
+def validate_input(input_data):
+    """Return an error message for the first missing required field, or None"""
+    for field in REQUIRED_FIELDS:
+        if field not in input_data:
+            return f"Missing required field: {field}"
+    return None
+
+def to_student_data(input_data):
+    """Convert validated input to the KNNPredictor student format"""
+    # Format data untuk prediksi
+    student_data = {
+        'jenis_kelamin': input_data['jenis_kelamin'],
+        'minat_ipa': float(input_data['minat_ipa']),
+        'minat_ips': float(input_data['minat_ips']),
+        'minat_bahasa': float(input_data['minat_bahasa']),
+        'minat_seni': float(input_data['minat_seni'])
+    }
+
+    # Set mata pelajaran dikuasai (default 0, set 1 for mastered subjects).
+    # Matching is case insensitive with spaces for underscores, so the
+    # lowercased list is built once rather than once per subject.
+    mastered_subjects_lower = {s.lower() for s in input_data['mata_pelajaran_dikuasai']}
+    for subject in STUDENT_SUBJECTS:
+        student_data[subject] = 1 if subject.replace('_', ' ') in mastered_subjects_lower else 0
+    
+    return student_data
+
+def format_result(prediction_result):
+    """Convert a KNNPredictor result to the response format used by Laravel"""
+    if not prediction_result['success']:
+        return {
+            "success": False,
+            "error": prediction_result['error']
+        }
+
+    # Convert top_predictions to recommendations format
+    recommendations = []
+    for pred in prediction_result['top_predictions']:
+        recommendations.append({
+            'major': pred['jurusan'],
+            'probability': pred['confidence']  # Already in percentage
+        })
+
+    return {
+        "success": True,
+        "data": {
+            "predicted_major": prediction_result['predicted_major'],
+            "confidence": prediction_result['confidence'],
+            "recommendations": recommendations,
+            "nearest_neighbors": prediction_result['nearest_neighbors']
+        }
+    }
+
+class ResponsePredictor:
+    """KNNPredictor answering in the Laravel response format, as the prediction cache stores it"""
+
+    def __init__(self, knn):
+        self.knn = knn
+
+    def predict_batch(self, students):
+        return [format_result(result) for result in self.knn.predict_batch(students)]
+
+def fallback_schema(metadata):
+    """Feature schema of models saved without one, as KNNPredictor.compile_features builds it"""
+    return student_schema(metadata.get('gender_classes', []))
+
+def predict_batch(predict_students, inputs):
+    """
+    Validate every row, then predict all valid rows in one call
+
+    Args:
+        predict_students (callable): list of student dicts -> responses,
+            e.g. ResponsePredictor(knn).predict_batch
+    """
+    results = [None] * len(inputs)
+    students = []
+    valid = []
+
+    for i, input_data in enumerate(inputs):
+        error = validate_input(input_data)
+        if error:
+            results[i] = {"success": False, "error": error}
+            continue
+        try:
+            students.append(to_student_data(input_data))
+            valid.append(i)
+        except Exception as e:
+            results[i] = {"success": False, "error": f"Prediction error: {str(e)}"}
+
+    for i, result in zip(valid, predict_students(students)):
+        results[i] = result
+
+    return results
+
+def parse_args(argv=None):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Predict a major with the trained KNN model")
+    parser.add_argument('input_json', nargs='?', help="Student data as a JSON object")
+    parser.add_argument('--batch', nargs='?', const='-', metavar='FILE',
+                        help="Read one JSON object per line from FILE (default: stdin), write one result per line")
+    parser.add_argument('--print-import-times', action='store_true',
+                        help="Report import time per package on stderr (prediction output is unchanged)")
+    add_timing_arguments(parser)
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Bypass the persistent prediction cache (always load the model)")
+    return parser.parse_args(argv)
 
 def main():
     """Main function untuk prediksi via command line"""
-    
-    if len(sys.argv) < 2:
+    args = parse_args()
+
+    if args.print_import_times:
+        sys.exit(run_with_import_times(__file__, sys.argv[1:]))
+
+    start_timings(args)
+
+    if args.input_json is None and args.batch is None:
         result = {
             "success": False,
             "error": "Missing input data. Usage: python predict.py '<json_data>'"
         }
-        print(json.dumps(result))
+        emit(result, args)
         return
-    
+
     try:
-        # Parse input JSON
-        input_data = json.loads(sys.argv[1])
-        
-        # Validasi input data
-        required_fields = ['jenis_kelamin', 'mata_pelajaran_dikuasai', 'minat_ipa', 'minat_ips', 'minat_bahasa', 'minat_seni']
-        for field in required_fields:
-            if field not in input_data:
+        if args.batch is None:
+            # Parse input JSON
+            input_data = json.loads(args.input_json)
+
+            # Validasi input data
+            error = validate_input(input_data)
+            if error:
                 result = {
                     "success": False,
-                    "error": f"Missing required field: {field}"
+                    "error": error
                 }
-                print(json.dumps(result))
+                emit(result, args)
                 return
-        
+
         # Path ke model yang sudah ditraining
         model_path = os.path.join(os.path.dirname(__file__), 'data', 'knn_model.pkl')
-        
+
         if not os.path.exists(model_path):
             result = {
                 "success": False,
                 "error": "Model file not found. Please train the model first."
             }
-            print(json.dumps(result))
+            emit(result, args)
             return
-        
+
         # Load model dan lakukan prediksi
-        knn = KNNPredictor()
-        knn.load_model(model_path)
-        
-        # Format data untuk prediksi
-        student_data = {
-            'jenis_kelamin': input_data['jenis_kelamin'],
-            'minat_ipa': float(input_data['minat_ipa']),
-            'minat_ips': float(input_data['minat_ips']),
-            'minat_bahasa': float(input_data['minat_bahasa']),
-            'minat_seni': float(input_data['minat_seni'])
-        }
-        
-        # Set mata pelajaran dikuasai (default 0, set 1 for mastered subjects)
-        all_subjects = ['matematika', 'fisika', 'kimia', 'biologi', 'b_indonesia', 
-                       'b_inggris', 'sejarah', 'geografi', 'informatika', 'seni_budaya']
-        
-        for subject in all_subjects:
-            # Check if subject is in the mastered list (case insensitive)
-            mastered_subjects_lower = [s.lower() for s in input_data['mata_pelajaran_dikuasai']]
-            if subject.lower().replace('_', ' ') in mastered_subjects_lower or \
-               subject.replace('_', ' ').title() in input_data['mata_pelajaran_dikuasai']:
-                student_data[subject] = 1
-            else:
-                student_data[subject] = 0
-        
-        prediction_result = knn.predict_single(student_data)
-        
-        if prediction_result['success']:
-            # Convert top_predictions to recommendations format
-            recommendations = []
-            for pred in prediction_result['top_predictions']:
-                recommendations.append({
-                    'major': pred['jurusan'],
-                    'probability': pred['confidence']  # Already in percentage
-                })
-            
-            result = {
-                "success": True,
-                "data": {
-                    "predicted_major": prediction_result['predicted_major'],
-                    "confidence": prediction_result['confidence'],
-                    "recommendations": recommendations
-                }
-            }
+        def load():
+            knn = KNNPredictor()
+            with stage('model_load'):
+                if args.batch is None:
+                    knn.load_model(model_path)
+                else:
+                    # load_model prints a status line; keep stdout clean for JSON Lines
+                    with contextlib.redirect_stdout(sys.stderr):
+                        knn.load_model(model_path)
+            return ResponsePredictor(knn)
+
+        cache = None if args.no_cache else open_cache()
+        if cache is not None:
+            # Rows already in the cache are answered without loading the model
+            def predict_students(students):
+                return cache.predict_batch(model_path, students, fallback_schema, load)
         else:
-            result = {
-                "success": False,
-                "error": prediction_result['error']
-            }
-        
-        print(json.dumps(result, ensure_ascii=False))
-        
+            predict_students = load().predict_batch
+
+        if args.batch is not None:
+            run_batch(args.batch, lambda inputs: predict_batch(predict_students, inputs))
+            report_stderr(args.request_id)
+            return
+
+        result = predict_students([to_student_data(input_data)])[0]
+
+        emit(result, args, ensure_ascii=False)
+
     except json.JSONDecodeError:
         result = {
             "success": False,
             "error": "Invalid JSON input"
         }
-        print(json.dumps(result))
-        
+        emit(result, args)
+
     except Exception as e:
         result = {
             "success": False,
             "error": f"Prediction error: {str(e)}"
         }
-        print(json.dumps(result))
+        emit(result, args)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
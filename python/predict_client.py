@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Client tipis untuk predict_server.py
+Kontrak command line sama dengan predict_silent.py: python predict_client.py '<json_data>'
+Jika server tidak berjalan, prediksi dijalankan langsung lewat predict_silent.py.
+Server yang berjalan tapi lambat (timeout) atau error dijawab dengan JSON
+error, tanpa memuat model lagi di proses ini.
+"""
+
+import json
+import os
+import socket
+import sys
+
+from server_address import socket_path
+
+DEFAULT_TIMEOUT = 10.0
+
+class ServerUnavailable(Exception):
+    """No prediction server accepts connections (not started, or stopped)"""
+
+def connect(connector):
+    """Open the connection; only failures here mean the server is not running"""
+    try:
+        connector()
+    except (FileNotFoundError, ConnectionRefusedError) as e:
+        raise ServerUnavailable(str(e)) from e
+
+def request_unix(payload, socket_path, timeout):
+    """Send one JSON line over the Unix socket and read one JSON line back"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        connect(lambda: sock.connect(socket_path))
+        sock.sendall(payload.encode('utf-8') + b'\n')
+        with sock.makefile('rb') as reader:
+            line = reader.readline()
+
+    if not line:
+        raise ConnectionError("Empty response from prediction server")
+    return line.decode('utf-8').strip()
+
+def request_http(payload, url, timeout):
+    """POST the JSON payload to <url>/predict"""
+    import http.client
+    from urllib.parse import urlsplit
+
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=timeout)
+    try:
+        connect(conn.connect)
+        conn.request('POST', '/predict', body=payload.encode('utf-8'),
+                     headers={'Content-Type': 'application/json'})
+        response = conn.getresponse()
+        body = response.read()
+    finally:
+        conn.close()
+
+    if response.status != 200:
+        raise ConnectionError(f"Prediction server returned HTTP {response.status}")
+    return body.decode('utf-8').strip()
+
+def send_request(payload):
+    """Forward the request to the prediction server configured in the environment"""
+    timeout = float(os.getenv('PREDICT_SERVER_TIMEOUT', DEFAULT_TIMEOUT))
+    url = os.getenv('PREDICT_SERVER_URL')
+    if url:
+        return request_http(payload, url, timeout)
+    return request_unix(payload, socket_path(), timeout)
+
+def main():
+    """Main function for command line usage"""
+
+    if len(sys.argv) < 2:
+        result = {
+            "success": False,
+            "error": "Missing input data"
+        }
+        print(json.dumps(result))
+        return
+
+    try:
+        # Re-encode so the request is always a single line
+        payload = json.dumps(json.loads(sys.argv[1]))
+    except json.JSONDecodeError:
+        result = {
+            "success": False,
+            "error": "Invalid JSON input"
+        }
+        print(json.dumps(result))
+        return
+
+    try:
+        response = send_request(payload)
+    except ServerUnavailable:
+        # Server not running: predict in this process
+        import predict_silent
+        predict_silent.main()
+        return
+    except TimeoutError:
+        # The server has the request; predicting here too would only add load
+        response = json.dumps({"success": False, "error": "Prediction server timed out"})
+    except OSError as e:
+        response = json.dumps({"success": False, "error": f"Prediction server error: {str(e)}"})
+
+    print(response)
+
+if __name__ == "__main__":
+    main()
@@ -5,142 +5,131 @@ Menggunakan struktur data siswa_lengkap, nilai_akademik, dan survei_minat_bakat
 Implementasi algoritma K-Nearest Neighbors untuk prediksi jurusan kuliah
 """
 
+import argparse
+import contextlib
 import sys
 import json
 import os
-import mysql.connector
-import pandas as pd
+import time
+# Before numpy: importing it marks the start of the "imports" timing stage
+import stage_timings
 import numpy as np
-from sklearn.neighbors import KNeighborsClassifier
-from sklearn.preprocessing import StandardScaler, LabelEncoder
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score
-import joblib
 import warnings
+from batch_predict import add_output_arguments, predict_columns, run_batch, run_batch_columns
+from cohort_job import DEFAULT_CHECKPOINT_PATH, DEFAULT_CHUNK_SIZE, run_cohort
+from db_pool import get_pool
+from knn_engine import KNNEngine
+from knn_index import describe_compression
+from feature_schema import ACADEMIC_FIELDS, FeatureSchema, database_schema
+from model_store import detect_format, load_engine, model_exists, replace_engine, save_engine
+from prediction_cache import ModelUnavailable, open_cache
+from service_metrics import record_model_load
+from stage_timings import add_arguments as add_timing_arguments, emit, report_stderr, stage, start as start_timings
+from model_update import DEFAULT_DRIFT_THRESHOLD, append_rows, sklearn_estimators
+from training_data import FEATURE_NAMES as TRAINING_FEATURE_NAMES, stream_training_data
+from import_times import run_with_import_times
 warnings.filterwarnings('ignore')
 
 class DatabaseKNNPredictor:
-    def __init__(self, k=5):
+    def __init__(self, k=5, pool=None):
         self.k = k
-        self.model = KNeighborsClassifier(n_neighbors=k)
+        # Vote weighting and Minkowski p, changed by the tune command
+        self.weights = 'uniform'
+        self.p = 2
+        # Database connection pool, see db_pool.py
+        self.pool = pool
+        # sklearn estimators are created only when training (see init_estimators);
+        # the predict path gets fitted ones from load_model
+        self.model = None
+        self.scaler = None
+        self.label_encoder = None
+        self.feature_names = []
+        # Input dicts -> feature matrix, compiled from the model's schema
+        self.feature_schema = None
+        self.feature_transformer = None
+        # NumPy-only engine used for every prediction
+        self.engine = None
+        # Database state the model was trained on, for incremental updates
+        self.watermark = None
+        self.pending_ids = []
+        self.kategori_classes = None
+        
+    def init_estimators(self):
+        """Create unfitted sklearn estimators - imported lazily, training only"""
+        from sklearn.neighbors import KNeighborsClassifier
+        from sklearn.preprocessing import StandardScaler, LabelEncoder
+        
+        self.model = KNeighborsClassifier(n_neighbors=self.k, weights=self.weights, p=self.p)
         self.scaler = StandardScaler()
         self.label_encoder = LabelEncoder()
-        self.feature_names = []
         
-    def get_db_config(self):
-        """Get database configuration from Laravel .env file"""
-        try:
-            from dotenv import load_dotenv
-            
-            # Load .env file from Laravel root
-            env_path = os.path.join(os.path.dirname(__file__), '..', '.env')
-            load_dotenv(env_path)
-            
-            return {
-                'host': os.getenv('DB_HOST', 'localhost'),
-                'port': int(os.getenv('DB_PORT', 3306)),
-                'database': os.getenv('DB_DATABASE', 'sistem_annur'),
-                'user': os.getenv('DB_USERNAME', 'root'),
-                'password': os.getenv('DB_PASSWORD', '')
-            }
-        except Exception as e:
-            print(f"Error reading database config: {e}")
-            # Default config
-            return {
-                'host': 'localhost',
-                'port': 3306,
-                'database': 'sistem_annur',
-                'user': 'root',
-                'password': ''
+    def compile_engine(self):
+        """Export the fitted sklearn model to the NumPy inference engine"""
+        schema = database_schema().select(self.feature_names)
+        self.engine = KNNEngine.from_sklearn(
+            self.model, self.scaler, self.label_encoder,
+            metadata={'k': self.k, 'feature_names': list(self.feature_names), 'feature_schema': schema.to_dict()}
+        )
+        print(describe_compression(self.engine.choose_index()))
+        self.engine.metadata.update(self.update_state())
+        self.compile_features()
+        
+    def update_state(self):
+        """Watermark, kategori codes and scaler statistics stored for update()"""
+        n = int(self.scaler.n_samples_seen_)
+        state = {
+            'scaler_stats': {
+                'n': n,
+                'mean': [float(v) for v in self.scaler.mean_],
+                'm2': [float(v) * n for v in self.scaler.var_]
             }
+        }
+        if self.watermark is not None:
+            state['watermark'] = int(self.watermark)
+            state['pending_ids'] = [int(i) for i in self.pending_ids]
+            state['kategori_classes'] = list(self.kategori_classes)
+        return state
         
-    def connect_database(self):
-        """Connect to MySQL database"""
-        try:
-            config = self.get_db_config()
-            conn = mysql.connector.connect(**config)
-            return conn
-        except Exception as e:
-            print(f"Database connection error: {e}")
-            return None
+    def compile_features(self):
+        """Compile the model's feature schema into the input transformer"""
+        self.feature_schema = FeatureSchema.from_metadata(self.engine.metadata, database_schema())
+        self.feature_transformer = self.feature_schema.compile()
+        # Positions of the academic scores used by analyze_academics
+        self.academic_columns = [self.feature_schema.names.index(field) for field in ACADEMIC_FIELDS]
+        
+    def db_pool(self):
+        """Connection pool for training queries (shared process-wide unless one was given)"""
+        return self.pool or get_pool()
     
     def load_training_data(self):
-        """Load training data from MySQL database"""
-        conn = self.connect_database()
-        if not conn:
-            return None
-            
+        """Stream training data from MySQL into typed NumPy columns"""
         try:
-            # Query untuk mengambil data training dari database
-            # Kita akan menggunakan data siswa yang sudah ada prediksi manual sebagai training data
-            query = """
-            SELECT 
-                sl.jenis_kelamin,
-                na.matematika, na.bahasa_indonesia, na.bahasa_inggris,
-                na.fisika, na.kimia, na.biologi, na.sejarah, na.geografi, 
-                na.ekonomi, na.sosiologi, na.pkn, na.seni_budaya, 
-                na.prakarya, na.pjok, na.peminatan_1, na.peminatan_2,
-                na.rata_rata_keseluruhan,
-                smb.rencana_kuliah, smb.jurusan_diminati, smb.kategori_jurusan,
-                smb.tingkat_keyakinan,
-                pj.jurusan_prediksi as target_jurusan
-            FROM siswa_lengkap sl
-            LEFT JOIN nilai_akademik na ON sl.id = na.siswa_lengkap_id
-            LEFT JOIN survei_minat_bakat smb ON sl.id = smb.siswa_lengkap_id  
-            LEFT JOIN prediksi_jurusan pj ON sl.id = pj.siswa_lengkap_id
-            WHERE pj.jurusan_prediksi IS NOT NULL
-            AND na.rata_rata_keseluruhan IS NOT NULL
-            AND smb.rencana_kuliah IS NOT NULL
-            """
-            
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute(query)
-            results = cursor.fetchall()
-            
-            cursor.close()
-            conn.close()
-            
-            if len(results) == 0:
-                print("No training data found in database")
-                return None
-                
-            df = pd.DataFrame(results)
-            print(f"Loaded {len(df)} training records from database")
-            return df
-            
+            with self.db_pool().lease() as conn:
+                data, dropped = stream_training_data(conn)
         except Exception as e:
             print(f"Error loading training data: {e}")
-            if conn:
-                conn.close()
             return None
+        
+        if len(data) == 0:
+            print("No training data found in database")
+            return None
+        
+        print(f"Loaded {len(data)} training records from database ({dropped} skipped with missing values)")
+        return data
     
-    def preprocess_data(self, df):
-        """Preprocess data for training"""
+    def preprocess_data(self, data):
+        """
+        Preprocess data for training
+        
+        Gender and rencana_kuliah are already encoded during extraction;
+        unknown values become 0 and kategori_jurusan codes follow sorted
+        order, as the DataFrame .map/fillna/LabelEncoder steps did.
+        """
         try:
-            # Handle missing values
-            df = df.dropna()
+            self.feature_names = list(TRAINING_FEATURE_NAMES)
             
-            # Encode categorical variables
-            df['jenis_kelamin_encoded'] = df['jenis_kelamin'].map({'Laki-laki': 1, 'Perempuan': 0})
-            df['rencana_kuliah_encoded'] = df['rencana_kuliah'].map({'Iya': 2, 'Masih ragu': 1, 'Tidak': 0})
-            df['kategori_jurusan_encoded'] = LabelEncoder().fit_transform(df['kategori_jurusan'].fillna('Unknown'))
-            
-            # Select features
-            feature_cols = [
-                'jenis_kelamin_encoded', 'matematika', 'bahasa_indonesia', 'bahasa_inggris',
-                'fisika', 'kimia', 'biologi', 'sejarah', 'geografi', 
-                'ekonomi', 'sosiologi', 'pkn', 'seni_budaya', 
-                'prakarya', 'pjok', 'peminatan_1', 'peminatan_2',
-                'rata_rata_keseluruhan', 'rencana_kuliah_encoded', 
-                'kategori_jurusan_encoded', 'tingkat_keyakinan'
-            ]
-            
-            # Filter existing columns
-            available_cols = [col for col in feature_cols if col in df.columns]
-            self.feature_names = available_cols
-            
-            X = df[available_cols].fillna(0)
-            y = df['target_jurusan']
+            X = data.features()
+            y = data.labels()
             
             return X, y
             
@@ -151,18 +140,24 @@ class DatabaseKNNPredictor:
     def train_model(self):
         """Train KNN model with data from database"""
         try:
+            from sklearn.model_selection import train_test_split
+            
             # Load training data
-            df = self.load_training_data()
-            if df is None or len(df) < 5:
+            data = self.load_training_data()
+            if data is None or len(data) < 5:
                 print("Insufficient training data, using enhanced dummy model")
                 return self.create_enhanced_dummy_model()
             
             # Preprocess data
-            X, y = self.preprocess_data(df)
+            X, y = self.preprocess_data(data)
+            self.watermark = data.watermark
+            self.pending_ids = data.pending
+            self.kategori_classes = data.kategori_classes
             if X is None or len(X) < 5:
                 return self.create_dummy_model()
             
             # Encode target labels
+            self.init_estimators()
             self.label_encoder.fit(y)
             y_encoded = self.label_encoder.transform(y)
             
@@ -175,6 +170,7 @@ class DatabaseKNNPredictor:
             
             # Train model
             self.model.fit(X_train_scaled, y_train)
+            self.compile_engine()
             
             # Calculate accuracy
             train_accuracy = self.model.score(X_train_scaled, y_train)
@@ -193,108 +189,14 @@ class DatabaseKNNPredictor:
     def create_enhanced_dummy_model(self):
         """Create enhanced dummy model based on realistic academic data patterns"""
         try:
-            np.random.seed(42)
-            n_samples = 200
+            from sklearn.model_selection import train_test_split
+            from synthetic_data import class_names, generate
             
-            # Define realistic jurusan options
-            majors = [
-                'Teknik Informatika', 'Teknik Sipil', 'Teknik Mesin', 'Teknik Elektro',
-                'Kedokteran', 'Farmasi', 'Keperawatan', 'Kedokteran Gigi',
-                'Manajemen', 'Akuntansi', 'Ekonomi Pembangunan', 'Administrasi Bisnis',
-                'Hukum', 'Ilmu Politik', 'Hubungan Internasional', 'Komunikasi',
-                'Psikologi', 'Sosiologi', 'Pendidikan', 'Sastra Inggris'
-            ]
-            
-            # Create realistic training data
-            data_samples = []
-            
-            for i in range(n_samples):
-                # Random gender
-                gender = np.random.choice(['Laki-laki', 'Perempuan'])
-                gender_encoded = 1 if gender == 'Laki-laki' else 0
-                
-                # Generate academic scores with realistic patterns
-                base_score = np.random.normal(75, 10)  # Base around 75
-                
-                # Subject scores with some correlation
-                math = max(50, min(100, base_score + np.random.normal(0, 5)))
-                physics = max(50, min(100, math + np.random.normal(-5, 8)))
-                chemistry = max(50, min(100, math + np.random.normal(-3, 6)))
-                biology = max(50, min(100, base_score + np.random.normal(2, 7)))
-                
-                indonesian = max(50, min(100, base_score + np.random.normal(0, 5)))
-                english = max(50, min(100, base_score + np.random.normal(-2, 6)))
-                history = max(50, min(100, base_score + np.random.normal(1, 5)))
-                geography = max(50, min(100, base_score + np.random.normal(0, 6)))
-                economics = max(50, min(100, base_score + np.random.normal(-1, 5)))
-                sociology = max(50, min(100, base_score + np.random.normal(1, 5)))
-                civic = max(50, min(100, base_score + np.random.normal(0, 4)))
-                arts = max(50, min(100, base_score + np.random.normal(3, 8)))
-                craft = max(50, min(100, base_score + np.random.normal(2, 6)))
-                sports = max(50, min(100, base_score + np.random.normal(5, 10)))
-                
-                specialization1 = max(50, min(100, base_score + np.random.normal(3, 7)))
-                specialization2 = max(50, min(100, base_score + np.random.normal(2, 6)))
-                
-                average = (math + physics + chemistry + biology + indonesian + english + 
-                          history + geography + economics + sociology + civic + arts + 
-                          craft + sports + specialization1 + specialization2) / 16
-                
-                # College plan based on academic performance
-                if average >= 80:
-                    college_plan = np.random.choice(['Iya', 'Masih ragu'], p=[0.8, 0.2])
-                elif average >= 70:
-                    college_plan = np.random.choice(['Iya', 'Masih ragu', 'Tidak'], p=[0.6, 0.3, 0.1])
-                else:
-                    college_plan = np.random.choice(['Iya', 'Masih ragu', 'Tidak'], p=[0.4, 0.4, 0.2])
-                
-                college_encoded = {'Iya': 2, 'Masih ragu': 1, 'Tidak': 0}[college_plan]
-                
-                # Category based on strengths
-                science_score = (math + physics + chemistry + biology) / 4
-                social_score = (history + geography + economics + sociology) / 4
-                
-                if science_score > social_score + 5:
-                    category = 'Saintek'
-                elif social_score > science_score + 5:
-                    category = 'Soshum'
-                else:
-                    category = np.random.choice(['Saintek', 'Soshum'])
-                
-                category_encoded = 1 if category == 'Saintek' else 0
-                
-                # Confidence level
-                confidence = max(30, min(100, np.random.normal(75, 15)))
-                
-                # Select major based on category and scores
-                if category == 'Saintek':
-                    if math >= 80 and physics >= 75:
-                        major = np.random.choice(['Teknik Informatika', 'Teknik Elektro', 'Teknik Mesin'])
-                    elif biology >= 80 and chemistry >= 75:
-                        major = np.random.choice(['Kedokteran', 'Farmasi', 'Keperawatan'])
-                    else:
-                        major = np.random.choice(['Teknik Sipil', 'Kedokteran Gigi', 'Teknik Mesin'])
-                else:
-                    if economics >= 80:
-                        major = np.random.choice(['Manajemen', 'Akuntansi', 'Ekonomi Pembangunan'])
-                    elif sociology >= 80 or history >= 80:
-                        major = np.random.choice(['Hukum', 'Ilmu Politik', 'Komunikasi'])
-                    else:
-                        major = np.random.choice(['Psikologi', 'Pendidikan', 'Sastra Inggris'])
-                
-                # Create feature vector
-                features = [
-                    gender_encoded, math, indonesian, english, physics, chemistry, biology,
-                    history, geography, economics, sociology, civic, arts, craft, sports,
-                    specialization1, specialization2, average, college_encoded, 
-                    category_encoded, confidence
-                ]
-                
-                data_samples.append((features, major))
+            self.init_estimators()
             
-            # Convert to arrays
-            X_dummy = np.array([sample[0] for sample in data_samples])
-            y_dummy = np.array([sample[1] for sample in data_samples])
+            # Realistic academic patterns, generated as whole arrays
+            X_dummy, y_codes = generate(200, 'database', seed=42)
+            y_dummy = class_names('database')[y_codes]
             
             self.feature_names = [
                 'jenis_kelamin_encoded', 'matematika', 'bahasa_indonesia', 'bahasa_inggris',
@@ -318,6 +220,7 @@ class DatabaseKNNPredictor:
             
             # Train model
             self.model.fit(X_train_scaled, y_train)
+            self.compile_engine()
             
             # Evaluate model
             train_accuracy = self.model.score(X_train_scaled, y_train)
@@ -335,135 +238,257 @@ class DatabaseKNNPredictor:
             print(f"Error creating enhanced dummy model: {e}")
             return False
     
+    def analyze_academics(self, features):
+        """Science vs social averages from a built feature vector"""
+        academic_scores = features[self.academic_columns]
+        
+        # Calculate some additional metrics for better prediction
+        avg_score = np.mean(academic_scores[:-1])  # Exclude rata_rata_keseluruhan
+        science_subjects = [academic_scores[0], academic_scores[3], academic_scores[4], academic_scores[5]]  # math, physics, chemistry, biology
+        social_subjects = [academic_scores[6], academic_scores[7], academic_scores[8], academic_scores[9]]  # history, geography, economics, sociology
+        
+        science_avg = np.mean(science_subjects)
+        social_avg = np.mean(social_subjects)
+        
+        return {
+            'overall_average': round(avg_score, 2),
+            'science_average': round(science_avg, 2),
+            'social_average': round(social_avg, 2),
+            'academic_strength': 'Saintek' if science_avg > social_avg else 'Soshum'
+        }
+    
     def predict(self, input_data):
         """Make prediction for new data using KNN algorithm"""
+        print("Processing prediction for input data...")
+        
+        result = self.predict_batch([input_data])[0]
+        
+        if result['success']:
+            data = result['data']
+            analysis = data['academic_analysis']
+            print(f"Prediction completed: {data['predicted_major']} (confidence: {data['confidence']:.1f}%)")
+            print(f"Academic average: {analysis['overall_average']:.1f}, Science: {analysis['science_average']:.1f}, Social: {analysis['social_average']:.1f}")
+        else:
+            print(result['error'])
+        
+        return result
+    
+    def predict_batch(self, inputs):
+        """
+        Make predictions for many students using one scaler transform
+        and one KNN neighbor query. Errors are reported per row.
+        """
+        results = [None] * len(inputs)
+        
+        # Build every feature row in one vectorized pass
+        with stage('features'):
+            X, errors = self.feature_transformer.transform(inputs)
+        for i, error in errors.items():
+            results[i] = {
+                'success': False,
+                'error': f"Prediction error: {error}"
+            }
+        valid = [i for i in range(len(inputs)) if i not in errors]
+        
+        if not valid:
+            return results
+        
         try:
-            print("Processing prediction for input data...")
-            
-            # Prepare feature vector in exact order as training
-            features = []
-            
-            # 1. Gender encoding
-            gender_val = 1 if input_data.get('jenis_kelamin') == 'Laki-laki' else 0
-            features.append(gender_val)
-            
-            # 2-18. Academic scores (17 subjects)
-            academic_fields = [
-                'matematika', 'bahasa_indonesia', 'bahasa_inggris',
-                'fisika', 'kimia', 'biologi', 'sejarah', 'geografi', 
-                'ekonomi', 'sosiologi', 'pkn', 'seni_budaya', 
-                'prakarya', 'pjok', 'peminatan_1', 'peminatan_2',
-                'rata_rata_keseluruhan'
-            ]
-            
-            academic_scores = []
-            for field in academic_fields:
-                score = float(input_data.get(field, 75))  # Default to 75
-                score = max(0, min(100, score))  # Ensure valid range
-                academic_scores.append(score)
-                features.append(score)
-            
-            # 19. College plan encoding
-            rencana_map = {'Iya': 2, 'Masih ragu': 1, 'Tidak': 0}
-            rencana_val = rencana_map.get(input_data.get('rencana_kuliah', 'Iya'), 2)
-            features.append(rencana_val)
-            
-            # 20. Category encoding
-            kategori_val = float(input_data.get('kategori_jurusan_encoded', 1))
-            features.append(kategori_val)
-            
-            # 21. Confidence level
-            confidence_val = float(input_data.get('tingkat_keyakinan', 80))
-            confidence_val = max(0, min(100, confidence_val))  # Ensure valid range
-            features.append(confidence_val)
-            
-            # Ensure we have exactly the right number of features
-            expected_features = len(self.feature_names)
-            if len(features) != expected_features:
-                print(f"Feature count mismatch: got {len(features)}, expected {expected_features}")
-                # Pad or trim to match
-                while len(features) < expected_features:
-                    features.append(75.0)  # Default value
-                features = features[:expected_features]
-            
-            print(f"Feature vector prepared: {len(features)} features")
-            
-            # Convert to numpy array and reshape
-            X = np.array(features, dtype=float).reshape(1, -1)
-            
-            # Scale features using the same scaler as training
-            X_scaled = self.scaler.transform(X)
-            
-            # Make prediction using KNN
-            prediction = self.model.predict(X_scaled)[0]
-            probabilities = self.model.predict_proba(X_scaled)[0]
-            
-            # Get predicted major name
-            predicted_major = self.label_encoder.inverse_transform([prediction])[0]
-            
-            # Calculate confidence (probability of top prediction)
-            max_prob = np.max(probabilities)
-            confidence = float(max_prob * 100)
-            
-            # Get all class names
-            class_names = self.label_encoder.classes_
-            
-            # Create recommendations sorted by probability
-            recommendations = []
-            prob_pairs = list(zip(probabilities, class_names))
-            prob_pairs.sort(reverse=True, key=lambda x: x[0])
-            
-            # Take top 7 recommendations
-            for prob, major_name in prob_pairs[:7]:
-                recommendations.append({
-                    'major': major_name,
-                    'probability': float(prob * 100)
-                })
-            
-            # Calculate some additional metrics for better prediction
-            avg_score = np.mean(academic_scores[:-1])  # Exclude rata_rata_keseluruhan
-            science_subjects = [academic_scores[0], academic_scores[3], academic_scores[4], academic_scores[5]]  # math, physics, chemistry, biology
-            social_subjects = [academic_scores[6], academic_scores[7], academic_scores[8], academic_scores[9]]  # history, geography, economics, sociology
-            
-            science_avg = np.mean(science_subjects)
-            social_avg = np.mean(social_subjects)
-            
-            print(f"Prediction completed: {predicted_major} (confidence: {confidence:.1f}%)")
-            print(f"Academic average: {avg_score:.1f}, Science: {science_avg:.1f}, Social: {social_avg:.1f}")
-            
-            return {
-                'success': True,
-                'data': {
-                    'predicted_major': predicted_major,
-                    'confidence': round(confidence, 2),
-                    'recommendations': recommendations,
-                    'academic_analysis': {
-                        'overall_average': round(avg_score, 2),
-                        'science_average': round(science_avg, 2),
-                        'social_average': round(social_avg, 2),
-                        'academic_strength': 'Saintek' if science_avg > social_avg else 'Soshum'
+            # Scale features using the training scaler statistics and
+            # run one KNN neighbor query for the whole batch
+            rows = X[valid]
+            probabilities = self.engine.predict_proba(rows)
+            class_names = self.engine.classes
+            
+            # Recommendations sorted by probability (stable, like list.sort)
+            top_indices = np.argsort(-probabilities, axis=1, kind='stable')[:, :7]
+        except Exception as e:
+            for i in valid:
+                results[i] = {
+                    'success': False,
+                    'error': f"Prediction error: {str(e)}"
+                }
+            return results
+        
+        with stage('format'):
+            for row, i in enumerate(valid):
+                row_probabilities = probabilities[row]
+                
+                # Calculate confidence (probability of top prediction)
+                confidence = float(np.max(row_probabilities) * 100)
+                
+                recommendations = [
+                    {
+                        'major': str(class_names[idx]),
+                        'probability': float(row_probabilities[idx] * 100)
+                    }
+                    for idx in top_indices[row]
+                ]
+                
+                results[i] = {
+                    'success': True,
+                    'data': {
+                        'predicted_major': str(class_names[np.argmax(row_probabilities)]),
+                        'confidence': round(confidence, 2),
+                        'recommendations': recommendations,
+                        'academic_analysis': self.analyze_academics(rows[row])
                     }
                 }
-            }
-            
+        
+        return results
+    
+    def update(self, model_path, drift_threshold=DEFAULT_DRIFT_THRESHOLD):
+        """
+        Append prediksi_jurusan rows added since the model was trained
+        
+        Only rows above the stored watermark (highest prediksi_jurusan.id
+        already read) are fetched, so the cost follows the amount of new
+        data, plus the pending ids whose grades or survey were still
+        missing; they are added once complete, or given up once they are
+        PENDING_MAX_LAG ids behind the watermark. New majors extend the class
+        table. The index is re-standardized when the scaler statistics
+        drift past the threshold (None disables, 0 forces it). The pickle
+        and the artifact are both rewritten (see save_update).
+        
+        Returns:
+            dict: Update report
+        """
+        if not self.load_model(model_path):
+            return {"success": False, "error": "Model not found. Train the model first."}
+        
+        watermark = self.engine.metadata.get('watermark')
+        if watermark is None:
+            return {"success": False, "error": "Model has no database watermark. Run a full training first."}
+        
+        pending = self.engine.metadata.get('pending_ids', [])
+        try:
+            with self.db_pool().lease() as conn:
+                data, dropped = stream_training_data(conn, watermark=watermark, pending=pending)
         except Exception as e:
-            print(f"Prediction error: {str(e)}")
-            return {
-                'success': False,
-                'error': f"Prediction error: {str(e)}"
-            }
+            return {"success": False, "error": f"Error loading new rows: {e}"}
+        
+        if not len(data) and data.pending == list(pending) and (data.watermark or 0) <= watermark:
+            return {"success": True, "n_added": 0, "n_samples": int(len(self.engine.X)), "watermark": int(watermark),
+                    "pending": len(pending), "pending_expired": 0}
+        
+        if len(data):
+            kategori_classes = data.align_kategori(self.engine.metadata.get('kategori_classes', []))
+            engine, report = append_rows(self.engine, data.features(), data.labels(), drift_threshold)
+            engine.metadata['kategori_classes'] = kategori_classes
+        else:
+            # Only pending ids were read back, still incomplete (or deleted)
+            engine = self.engine
+            report = {'n_added': 0, 'n_samples': int(len(engine.X)), 'new_classes': [], 'drift': 0.0,
+                      'restandardized': False}
+        engine.metadata['watermark'] = int(max(watermark, data.watermark or watermark))
+        engine.metadata['pending_ids'] = data.pending
+        
+        self.save_update(engine, model_path, report['restandardized'])
+        self.engine = engine
+        self.compile_features()
+        
+        report.update({
+            'success': True,
+            'n_skipped': dropped,
+            'previous_watermark': int(watermark),
+            'watermark': engine.metadata['watermark'],
+            'pending': len(data.pending),
+            'pending_expired': data.expired
+        })
+        return report
+    
+    def save_update(self, engine, model_path, restandardized):
+        """
+        Write an updated engine to the model pickle and its artifact
+        
+        The pickle gets estimators rebuilt from the engine, so converting
+        it again (artifact deleted, another machine) gives the same engine.
+        Its scaler is kept unless the index was re-standardized. Without a
+        pickle (artifact-only deployment) only the artifact is replaced.
+        """
+        if detect_format(model_path) != 'pickle':
+            replace_engine(engine, model_path)
+            return
+        
+        import joblib
+        
+        model_data = joblib.load(model_path)
+        model_data['model'], model_data['scaler'], model_data['label_encoder'] = sklearn_estimators(
+            engine, None if restandardized else model_data['scaler'])
+        for key in ('watermark', 'pending_ids', 'kategori_classes', 'scaler_stats'):
+            model_data[key] = engine.metadata.get(key)
+        joblib.dump(model_data, model_path)
+        save_engine(engine, model_path)
+    
+    def tune(self, model_path, **options):
+        """
+        Cross-validate k, vote weighting, Minkowski p and feature subsets,
+        then train and save the model with the best configuration
+        
+        Uses the database training data, or the enhanced dummy data when
+        there is too little of it (as train_model does). Every subset must
+        keep the academic scores used by analyze_academics. Options are
+        passed to knn_tuning.cross_validate.
+        
+        Returns:
+            dict: Tuning report (best configuration, top grid points, wall time)
+        """
+        from knn_tuning import cross_validate, default_subsets, fit_best, summarize
+        
+        feature_names = list(TRAINING_FEATURE_NAMES)
+        subsets = options.pop('subsets', None) or default_subsets(feature_names)
+        for label, names in subsets.items():
+            missing = [field for field in ACADEMIC_FIELDS if field not in names]
+            if missing:
+                return {"success": False, "error": f"Feature subset {label} drops academic fields: {', '.join(missing)}"}
+        
+        data = self.load_training_data()
+        if data is None or len(data) < 5:
+            from synthetic_data import class_names, generate
+            
+            print("Insufficient training data, tuning on enhanced dummy data")
+            X, y_codes = generate(200, 'database', seed=42)
+            y_names = class_names('database')[y_codes]
+            source = 'dummy'
+        else:
+            X, y_names = data.features(), data.labels()
+            self.watermark = data.watermark
+            self.pending_ids = data.pending
+            self.kategori_classes = data.kategori_classes
+            source = 'database'
+        
+        y = np.unique(np.asarray(y_names).astype(str), return_inverse=True)[1]
+        report = cross_validate(X, y, feature_names, subsets=subsets, **options)
+        report['source'] = source
+        report = fit_best(self, X, y_names, feature_names, report)
+        os.makedirs(os.path.dirname(model_path), exist_ok=True)
+        if not self.save_model(model_path):
+            return {"success": False, "error": "Error saving tuned model"}
+        
+        return dict(summarize(report), success=True, model_path=model_path)
+    
+    def predict_columns(self, inputs, top_n=7):
+        """Columnar predictions (class indices and probabilities, see batch_predict.predict_columns)"""
+        return predict_columns(self.engine, self.feature_transformer, inputs, top_n)
     
     def save_model(self, model_path):
-        """Save trained model"""
+        """Save trained model and its memory-mapped engine artifact"""
         try:
+            import joblib
+            
             model_data = {
                 'model': self.model,
                 'scaler': self.scaler,
                 'label_encoder': self.label_encoder,
                 'feature_names': self.feature_names,
-                'k': self.k
+                'feature_schema': self.feature_schema.to_dict(),
+                'k': self.k,
+                'index': self.engine.metadata.get('index'),
+                'tuning': self.engine.metadata.get('tuning')
             }
+            model_data.update(self.update_state())
             joblib.dump(model_data, model_path)
+            save_engine(self.engine, model_path)
             print(f"Model saved to {model_path}")
             return True
         except Exception as e:
@@ -471,18 +496,17 @@ class DatabaseKNNPredictor:
             return False
     
     def load_model(self, model_path):
-        """Load trained model"""
+        """Load trained model (memory-mapped artifact, converted from the pickle on first load)"""
         try:
-            if not os.path.exists(model_path):
+            if not model_exists(model_path):
                 print(f"Model file not found: {model_path}")
                 return False
                 
-            model_data = joblib.load(model_path)
-            self.model = model_data['model']
-            self.scaler = model_data['scaler']
-            self.label_encoder = model_data['label_encoder']
-            self.feature_names = model_data['feature_names']
-            self.k = model_data.get('k', 5)
+            self.engine = load_engine(model_path)
+            self.feature_names = self.engine.metadata['feature_names']
+            self.k = self.engine.metadata.get('k', 5)
+            self.weights, self.p = self.engine.weights, self.engine.p
+            self.compile_features()
             
             # Silent loading - remove print for JSON output
             return True
@@ -490,66 +514,238 @@ class DatabaseKNNPredictor:
             print(f"Error loading model: {e}")
             return False
 
+def parse_args(argv=None):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="KNN major prediction using the Laravel MySQL database")
+    parser.add_argument('input_json', nargs='?', help="Student data as a JSON object")
+    parser.add_argument('--batch', nargs='?', const='-', metavar='FILE',
+                        help="Read one JSON object per line from FILE (default: stdin), write one result per line")
+    parser.add_argument('--print-import-times', action='store_true',
+                        help="Report import time per package on stderr (prediction output is unchanged)")
+    add_timing_arguments(parser)
+    add_output_arguments(parser, default_top_n=7)
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Bypass the persistent prediction cache (always load the model)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Batch mode: processes sharing the training matrix for neighbor queries (0 = all cores)")
+    return parser.parse_args(argv)
+
+def parse_update_args(argv=None):
+    """Parse arguments of the update command"""
+    parser = argparse.ArgumentParser(prog='predict_db.py update',
+                                     description="Append prediksi_jurusan rows added since the last training or update")
+    parser.add_argument('--model', help="Model path (default: data/knn_model_db.pkl)")
+    parser.add_argument('--drift-threshold', type=float, default=DEFAULT_DRIFT_THRESHOLD,
+                        help="Re-standardize the index when scaler statistics move more than this many std units")
+    parser.add_argument('--restandardize', action='store_true', help="Always re-standardize the whole index")
+    parser.add_argument('--no-restandardize', action='store_true', help="Never re-standardize, only append")
+    return parser.parse_args(argv)
+
+def run_update(argv):
+    """Run the update command and print its JSON report"""
+    args = parse_update_args(argv)
+    model_path = args.model or os.path.join(os.path.dirname(__file__), 'data', 'knn_model_db.pkl')
+    if args.restandardize:
+        threshold = 0.0
+    elif args.no_restandardize:
+        threshold = None
+    else:
+        threshold = args.drift_threshold
+    
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            result = DatabaseKNNPredictor().update(model_path, drift_threshold=threshold)
+    except Exception as e:
+        result = {"success": False, "error": f"Update error: {str(e)}"}
+    print(json.dumps(result))
+    return 0 if result['success'] else 1
+
+def parse_cohort_args(argv=None):
+    """Parse arguments of the cohort command"""
+    parser = argparse.ArgumentParser(prog='predict_db.py cohort',
+                                     description="Predict and store majors for every student without a prediction")
+    scope = parser.add_mutually_exclusive_group(required=True)
+    scope.add_argument('--kelas', help="Only students of this kelas")
+    scope.add_argument('--all-missing', action='store_true', help="Every student in the school")
+    parser.add_argument('--model', help="Model path (default: data/knn_model_db.pkl)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="Students per prediction call and per insert transaction")
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT_PATH,
+                        help="Progress file an interrupted run resumes from")
+    parser.add_argument('--restart', action='store_true', help="Ignore the checkpoint and start from the first student")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Processes sharing the training matrix for neighbor queries (0 = all cores)")
+    return parser.parse_args(argv)
+
+def run_cohort_command(argv):
+    """Run the cohort command and print its JSON report"""
+    args = parse_cohort_args(argv)
+    model_path = args.model or os.path.join(os.path.dirname(__file__), 'data', 'knn_model_db.pkl')
+    
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            predictor = load_predictor(model_path)
+        if predictor is None:
+            result = {"success": False, "error": "Failed to train model"}
+        else:
+            if args.workers != 1:
+                from parallel_predict import use_workers
+                use_workers(predictor, args.workers)
+            result = run_cohort(predictor, predictor.db_pool(), kelas=args.kelas, chunk_size=args.chunk_size,
+                                checkpoint_path=args.checkpoint, restart=args.restart)
+    except Exception as e:
+        result = {"success": False, "error": f"Cohort error: {str(e)}"}
+    print(json.dumps(result))
+    return 0 if result['success'] else 1
+
+def parse_tune_args(argv=None):
+    """Parse arguments of the tune command"""
+    from knn_tuning import add_tuning_arguments
+    
+    parser = argparse.ArgumentParser(prog='predict_db.py tune',
+                                     description="Cross-validate KNN settings and save the model with the best ones")
+    parser.add_argument('--model', help="Model path (default: data/knn_model_db.pkl)")
+    add_tuning_arguments(parser)
+    return parser.parse_args(argv)
+
+def run_tune(argv):
+    """Run the tune command and print its JSON report"""
+    from knn_tuning import tuning_options
+    
+    args = parse_tune_args(argv)
+    model_path = args.model or os.path.join(os.path.dirname(__file__), 'data', 'knn_model_db.pkl')
+    
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            result = DatabaseKNNPredictor().tune(model_path, **tuning_options(args))
+    except Exception as e:
+        result = {"success": False, "error": f"Tune error: {str(e)}"}
+    print(json.dumps(result))
+    return 0 if result['success'] else 1
+
+def load_predictor(model_path):
+    """Load the model, training and saving a new one if it does not exist"""
+    started = time.perf_counter()
+    # Initialize predictor
+    predictor = DatabaseKNNPredictor()
+    
+    # Try to load existing model
+    if predictor.load_model(model_path):
+        print("Model loaded successfully")
+        record_model_load(time.perf_counter() - started, model_path)
+        return predictor
+    
+    print("Model not found. Training new model...")
+    # Train new model
+    if not predictor.train_model():
+        return None
+    
+    # Save the model
+    os.makedirs(os.path.dirname(model_path), exist_ok=True)
+    predictor.save_model(model_path)
+    print("Model trained and saved successfully")
+    record_model_load(time.perf_counter() - started, model_path)
+    return predictor
+
 def main():
     """Main function for command line usage"""
+    if sys.argv[1:2] == ['update']:
+        sys.exit(run_update(sys.argv[2:]))
+    if sys.argv[1:2] == ['cohort']:
+        sys.exit(run_cohort_command(sys.argv[2:]))
+    if sys.argv[1:2] == ['tune']:
+        sys.exit(run_tune(sys.argv[2:]))
+    
+    args = parse_args()
+    
+    if args.print_import_times:
+        sys.exit(run_with_import_times(__file__, sys.argv[1:]))
     
-    if len(sys.argv) < 2:
+    start_timings(args)
+    
+    if args.input_json is None and args.batch is None:
         result = {
             "success": False,
             "error": "Missing input data. Usage: python predict_db.py '<json_data>'"
         }
-        print(json.dumps(result))
+        emit(result, args)
         return
     
     try:
         # Parse input data
-        input_data = json.loads(sys.argv[1])
+        if args.batch is None:
+            input_data = json.loads(args.input_json)
         
         # Path configurations
         base_dir = os.path.dirname(__file__)
         model_path = os.path.join(base_dir, 'data', 'knn_model_db.pkl')
         
-        # Initialize predictor
-        predictor = DatabaseKNNPredictor()
-        
-        # Try to load existing model
-        model_loaded = predictor.load_model(model_path)
-        
-        if not model_loaded:
-            print("Model not found. Training new model...")
-            # Train new model
-            success = predictor.train_model()
-            if success:
-                # Save the model
-                os.makedirs(os.path.dirname(model_path), exist_ok=True)
-                predictor.save_model(model_path)
-                print("Model trained and saved successfully")
+        def load():
+            with stage('model_load'):
+                if args.batch is None:
+                    return load_predictor(model_path)
+                # Keep stdout clean for JSON Lines, progress goes to stderr
+                with contextlib.redirect_stdout(sys.stderr):
+                    predictor = load_predictor(model_path)
+            if args.workers != 1:
+                from parallel_predict import use_workers
+                use_workers(predictor, args.workers)
+            return predictor
+        
+        if args.batch is not None and args.format != 'jsonl':
+            # Column output is for large runs: one pass over the model, no cache
+            predictor = load()
+            if predictor is None:
+                raise ModelUnavailable(model_path)
+            run_batch_columns(args.batch, lambda inputs: predictor.predict_columns(inputs, args.top_n),
+                              args.format, args.output)
+            report_stderr(args.request_id)
+            return
+        
+        cache = None if args.no_cache else open_cache()
+        if cache is not None:
+            # Rows already in the cache are answered without loading the model
+            def predict_batch(inputs):
+                return cache.predict_batch(model_path, inputs, database_schema(), load)
+            
+            if args.batch is not None:
+                run_batch(args.batch, predict_batch)
+                report_stderr(args.request_id)
             else:
-                result = {
-                    "success": False,
-                    "error": "Failed to train model"
-                }
-                print(json.dumps(result))
-                return
-        else:
-            print("Model loaded successfully")
+                emit(predict_batch([input_data])[0], args)
+            return
+        
+        predictor = load()
+        if predictor is None:
+            raise ModelUnavailable(model_path)
+        
+        if args.batch is not None:
+            run_batch(args.batch, predictor.predict_batch)
+            report_stderr(args.request_id)
+            return
         
         # Make prediction
         result = predictor.predict(input_data)
-        print(json.dumps(result))
+        emit(result, args)
         
+    except ModelUnavailable:
+        result = {
+            "success": False,
+            "error": "Failed to train model"
+        }
+        emit(result, args)
     except json.JSONDecodeError:
         result = {
             "success": False,
             "error": "Invalid JSON input"
         }
-        print(json.dumps(result))
+        emit(result, args)
     except Exception as e:
         result = {
             "success": False,
             "error": f"Unexpected error: {str(e)}"
         }
-        print(json.dumps(result))
+        emit(result, args)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,578 @@
+#!/usr/bin/env python3
+"""
+Server prediksi jurusan yang berjalan terus-menerus (long-running)
+Model KNN silent dimuat sekali, lalu beberapa worker process (prefork)
+melayani request lewat Unix socket atau HTTP localhost.
+Format response sama persis dengan output predict_silent.py
+
+Dengan --micro-batch setiap worker menjalankan event loop asyncio:
+request tunggal yang datang bersamaan dikumpulkan (maksimal --max-batch
+atau selama --batch-window ms) dan diprediksi dalam satu batch, lihat
+micro_batch.py. Request saat server sepi tetap langsung dijawab.
+"""
+
+import argparse
+import asyncio
+import collections
+import errno
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import service_metrics
+from micro_batch import DEFAULT_MAX_BATCH, DEFAULT_WINDOW, MicroBatcher
+from predict_silent import load_predictor
+from server_address import DEFAULT_SOCKET_PATH, socket_path as configured_socket_path
+
+DEFAULT_WORKERS = 4
+LISTEN_BACKLOG = 128
+# Longest request line or HTTP request read by the micro-batching workers
+MAX_REQUEST_BYTES = 1 << 20
+READ_SIZE = 65536
+# Unsent response bytes at which a micro-batching worker stops reading more requests of a connection
+WRITE_BUFFER_LIMIT = 65536
+# Longest a client may leave its responses unread before the connection is dropped
+WRITE_TIMEOUT = 10.0
+
+def decode_request(payload):
+    """(input data, None), or (None, error result) when the payload is not JSON"""
+    try:
+        return json.loads(payload), None
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None, {
+            "success": False,
+            "error": "Invalid JSON input"
+        }
+
+def unexpected_error(e):
+    return {
+        "success": False,
+        "error": f"Unexpected error: {str(e)}"
+    }
+
+def finish_request(started, result):
+    """JSON-encode a result and record the request"""
+    response = json.dumps(result)
+
+    metrics = service_metrics.registry()
+    if metrics is not None:
+        metrics.request(time.perf_counter() - started, [result])
+        metrics.maybe_flush()
+    return response
+
+def handle_request(predictor, payload):
+    """Decode one JSON request and return the JSON-encoded prediction"""
+    started = time.perf_counter()
+    input_data, result = decode_request(payload)
+    if result is None:
+        try:
+            result = predictor.predict(input_data)
+        except Exception as e:
+            result = unexpected_error(e)
+    return finish_request(started, result)
+
+def submit_request(batcher, payload):
+    """handle_request() for the event loop: Future of the response, predicted in a micro-batch"""
+    started = time.perf_counter()
+    response = asyncio.get_running_loop().create_future()
+    input_data, result = decode_request(payload)
+    if result is not None:
+        response.set_result(finish_request(started, result))
+        return response
+
+    def finish(prediction):
+        try:
+            result = prediction.result()
+        except Exception as e:
+            result = unexpected_error(e)
+        response.set_result(finish_request(started, result))
+
+    prediction = batcher.submit(input_data)
+    if prediction.done():
+        # Ran at once (idle server): answer without another loop iteration
+        finish(prediction)
+    else:
+        prediction.add_done_callback(finish)
+    return response
+
+def not_found():
+    return 404, 'application/json', json.dumps({"success": False, "error": "Not found"})
+
+def route_get(path, extra=None):
+    """
+    (status, content type, body) of a GET request: /health, /metrics
+
+    Args:
+        extra (dict): Extra fields for the /health response
+    """
+    if path == '/metrics':
+        # Prometheus text of every process; other workers' last FLUSH_INTERVAL seconds are not in yet
+        service_metrics.flush()
+        try:
+            return 200, service_metrics.CONTENT_TYPE, service_metrics.exposition()
+        except Exception as e:
+            return 500, 'application/json', json.dumps({"success": False, "error": f"Metrics unavailable: {str(e)}"})
+    if path != '/health':
+        return not_found()
+
+    health = {"success": True, "status": "ok", "pid": os.getpid()}
+    health.update(extra or {})
+    return 200, 'application/json', json.dumps(health)
+
+class UnixPredictionHandler(socketserver.StreamRequestHandler):
+    """Newline-delimited JSON: one request per line, one response per line"""
+
+    def handle(self):
+        for line in self.rfile:
+            line = line.strip()
+            if not line:
+                continue
+            response = handle_request(self.server.predictor, line)
+            self.wfile.write(response.encode('utf-8') + b'\n')
+
+class HTTPPredictionHandler(BaseHTTPRequestHandler):
+    """POST /predict with a JSON body, GET /health for liveness checks, GET /metrics for Prometheus"""
+
+    def do_POST(self):
+        if self.path != '/predict':
+            self.send_body(*not_found())
+            return
+
+        length = int(self.headers.get('Content-Length', 0))
+        payload = self.rfile.read(length)
+        self.send_body(200, 'application/json', handle_request(self.server.predictor, payload))
+
+    def do_GET(self):
+        self.send_body(*route_get(self.path))
+
+    def send_body(self, status, content_type, body):
+        """Write a response body"""
+        body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Silent mode for production - no access log"""
+        pass
+
+class UnixBatchedProtocol(asyncio.Protocol):
+    """UnixPredictionHandler on the event loop: responses keep the order of the lines"""
+
+    def __init__(self, batcher):
+        self.batcher = batcher
+        self.transport = None
+        self.buffer = b''
+        self.waiting = collections.deque()
+        self.eof = False
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def eof_received(self):
+        # Lines still in a micro-batch are answered before closing
+        self.eof = True
+        self.write_ready()
+
+    def data_received(self, data):
+        *lines, self.buffer = (self.buffer + data).split(b'\n')
+        if len(self.buffer) > MAX_REQUEST_BYTES:
+            self.transport.close()
+            return
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            response = submit_request(self.batcher, line)
+            self.waiting.append(response)
+            if not response.done():
+                response.add_done_callback(self.write_ready)
+        self.write_ready()
+
+    def write_ready(self, _=None):
+        """Write the finished responses at the head of the queue"""
+        while self.waiting and self.waiting[0].done():
+            response = self.waiting.popleft().result()
+            if not self.transport.is_closing():
+                self.transport.write(response.encode('utf-8') + b'\n')
+        if self.eof and not self.waiting:
+            self.transport.close()
+
+class HTTPBatchedProtocol(asyncio.Protocol):
+    """HTTPPredictionHandler on the event loop: one HTTP/1.0 request per connection"""
+
+    def __init__(self, batcher):
+        self.batcher = batcher
+        self.transport = None
+        self.buffer = b''
+        self.handled = False
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def eof_received(self):
+        if not self.handled:
+            self.transport.close()
+
+    def data_received(self, data):
+        if self.handled:
+            return
+        self.buffer += data
+        head, separator, body = self.buffer.partition(b'\r\n\r\n')
+        if len(self.buffer) > MAX_REQUEST_BYTES:
+            self.respond(413, 'application/json', json.dumps({"success": False, "error": "Request too large"}))
+            return
+        if not separator:
+            return
+
+        lines = head.decode('latin-1').split('\r\n')
+        headers = {name.strip().lower(): value.strip() for name, _, value in (line.partition(':') for line in lines[1:])}
+        request_line = lines[0].split()
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            length = None
+        if len(request_line) < 2 or length is None:
+            self.respond(400, 'application/json', json.dumps({"success": False, "error": "Bad request"}))
+            return
+        if len(body) < length:
+            return
+        self.handled = True
+
+        method, path = request_line[0], request_line[1]
+        if method == 'POST' and path == '/predict':
+            response = submit_request(self.batcher, body[:length])
+            if response.done():
+                self.respond(200, 'application/json', response.result())
+            else:
+                response.add_done_callback(lambda response: self.respond(200, 'application/json', response.result()))
+        elif method == 'POST':
+            self.respond(*not_found())
+        elif method == 'GET':
+            self.respond(*route_get(path, {"micro_batch": self.batcher.stats()}))
+        else:
+            self.respond(501, 'application/json', json.dumps({"success": False, "error": f"Unsupported method ({method})"}))
+
+    def respond(self, status, content_type, body):
+        """Write the response and close the connection"""
+        self.handled = True
+        if self.transport.is_closing():
+            return
+        body = body.encode('utf-8')
+        self.transport.write(f"HTTP/1.0 {status} {HTTPStatus(status).phrase}\r\nContent-Type: {content_type}\r\n"
+                             f"Content-Length: {len(body)}\r\n\r\n".encode('latin-1') + body)
+        self.transport.close()
+
+class SocketTransport:
+    """
+    The part of an asyncio transport the batched protocols use, over a
+    plain non-blocking socket
+
+    asyncio's own transports take a task and several loop iterations to
+    set up each connection, which is more than an idle request's
+    prediction saves; here the accepted socket is read at once.
+
+    Writes never block the loop: what the socket does not take is
+    buffered and sent when it becomes writable. Past WRITE_BUFFER_LIMIT
+    unsent bytes the connection is not read until the buffer drains, and
+    a client that takes nothing for WRITE_TIMEOUT is dropped.
+    """
+
+    def __init__(self, loop, sock, protocol):
+        self.loop = loop
+        self.sock = sock
+        self.fd = sock.fileno()
+        self.protocol = protocol
+        self.closed = False
+        # close() was called while responses were still buffered
+        self.closing = False
+        self.reading = False
+        self.eof = False
+        self.unsent = bytearray()
+        self.stall_timer = None
+
+    def start(self):
+        self.protocol.connection_made(self)
+        self.resume_reading()
+        # The request usually arrives together with the connection
+        self.read_ready()
+
+    def pause_reading(self):
+        if self.reading:
+            self.reading = False
+            self.loop.remove_reader(self.fd)
+
+    def resume_reading(self):
+        if not self.reading and not (self.closed or self.closing or self.eof):
+            self.reading = True
+            self.loop.add_reader(self.fd, self.read_ready)
+
+    def read_ready(self):
+        if not self.reading:
+            return
+        try:
+            data = self.sock.recv(READ_SIZE)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            self.abort()
+            return
+        if data:
+            self.protocol.data_received(data)
+        else:
+            self.eof = True
+            self.pause_reading()
+            self.protocol.eof_received()
+
+    def write(self, data):
+        if self.closed or self.closing:
+            return
+        if not self.unsent:
+            try:
+                sent = self.sock.send(data)
+            except (BlockingIOError, InterruptedError):
+                sent = 0
+            except OSError:
+                self.abort()
+                return
+            if sent == len(data):
+                return
+            data = data[sent:]
+            self.loop.add_writer(self.fd, self.write_ready)
+            self.stall_timer = self.loop.call_later(WRITE_TIMEOUT, self.abort)
+        self.unsent += data
+        if len(self.unsent) > WRITE_BUFFER_LIMIT:
+            # The client is not reading its responses: stop taking requests from it
+            self.pause_reading()
+
+    def write_ready(self):
+        """Writer callback: send what is buffered"""
+        try:
+            sent = self.sock.send(self.unsent)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            self.abort()
+            return
+        del self.unsent[:sent]
+        if self.unsent:
+            if sent:
+                self.stall_timer.cancel()
+                self.stall_timer = self.loop.call_later(WRITE_TIMEOUT, self.abort)
+            return
+        self.loop.remove_writer(self.fd)
+        self.stall_timer.cancel()
+        self.stall_timer = None
+        if self.closing:
+            self.abort()
+        else:
+            self.resume_reading()
+
+    def is_closing(self):
+        return self.closed or self.closing
+
+    def close(self):
+        """Close once the buffered responses are sent"""
+        if self.unsent and not self.closed:
+            self.closing = True
+            self.pause_reading()
+        else:
+            self.abort()
+
+    def abort(self):
+        """Close at once, dropping anything not sent"""
+        if self.closed:
+            return
+        self.closed = True
+        self.pause_reading()
+        if self.stall_timer is not None:
+            self.loop.remove_writer(self.fd)
+            self.stall_timer.cancel()
+            self.stall_timer = None
+        self.unsent.clear()
+        self.sock.close()
+
+def accept_connections(loop, listener, protocol_factory):
+    """Reader callback of the listening socket shared by the workers"""
+    while True:
+        try:
+            sock, _ = listener.accept()
+        except (BlockingIOError, InterruptedError):
+            # Another worker took it, or the backlog is empty
+            return
+        except OSError:
+            return
+        sock.setblocking(False)
+        SocketTransport(loop, sock, protocol_factory()).start()
+
+async def serve_batched(server, max_batch=DEFAULT_MAX_BATCH, window=DEFAULT_WINDOW):
+    """
+    Serve the bound socket of a create_server() server from an event loop,
+    predicting concurrent requests in micro-batches
+    """
+    batcher = MicroBatcher(server.predictor.predict_batch, max_batch, window,
+                           on_batch=service_metrics.record_micro_batch)
+    if isinstance(server, socketserver.UnixStreamServer):
+        protocol = UnixBatchedProtocol
+    else:
+        protocol = HTTPBatchedProtocol
+    loop = asyncio.get_running_loop()
+    listener = server.socket
+    listener.setblocking(False)
+    loop.add_reader(listener.fileno(), accept_connections, loop, listener, lambda: protocol(batcher))
+
+    metrics = service_metrics.registry()
+    try:
+        # Connections are served from reader callbacks; this loop only makes
+        # idle workers flush, like service_actions of serve_forever
+        while True:
+            await asyncio.sleep(service_metrics.FLUSH_INTERVAL)
+            if metrics is not None:
+                metrics.maybe_flush()
+    finally:
+        loop.remove_reader(listener.fileno())
+
+class UnixPredictionServer(socketserver.UnixStreamServer):
+    # socketserver listens with a backlog of 5, too few for a burst of clients
+    request_queue_size = LISTEN_BACKLOG
+
+class HTTPPredictionServer(HTTPServer):
+    request_queue_size = LISTEN_BACKLOG
+
+def create_server(socket_path=None, host=None, port=None):
+    """Bind a Unix socket server, or a HTTP server when a port is given"""
+    if port:
+        return HTTPPredictionServer((host or '127.0.0.1', port), HTTPPredictionHandler)
+
+    socket_path = socket_path or DEFAULT_SOCKET_PATH
+    if os.path.exists(socket_path) and stale_socket(socket_path):
+        # Stale socket left behind by a previous run
+        os.unlink(socket_path)
+    return UnixPredictionServer(socket_path, UnixPredictionHandler)
+
+def stale_socket(socket_path):
+    """
+    Probe an existing socket path: True when nobody listens on it any more.
+    Raise when a server still answers; anything else is left for bind() to refuse.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(socket_path)
+        except ConnectionRefusedError:
+            return True
+        except OSError:
+            return False
+    raise OSError(errno.EADDRINUSE, f"Prediction server already listening on {socket_path}")
+
+def serve(server, workers=DEFAULT_WORKERS, micro_batch=None):
+    """
+    Fork worker processes that share the bound socket and the loaded model
+
+    The parent only supervises: it restarts workers that die and stops
+    all of them on SIGTERM/SIGINT.
+
+    Args:
+        micro_batch (dict): serve_batched() options (max_batch, window);
+            None serves one request at a time per worker
+    """
+    children = set()
+    stopping = False
+
+    def spawn_worker():
+        pid = os.fork()
+        if pid == 0:
+            # Leave serve_forever through the finally below, which writes the metrics
+            signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            metrics = service_metrics.registry()
+            if metrics is not None:
+                # Runs every poll interval, so idle workers flush too
+                server.service_actions = metrics.maybe_flush
+            try:
+                if micro_batch is not None:
+                    asyncio.run(serve_batched(server, **micro_batch))
+                else:
+                    server.serve_forever()
+            finally:
+                # os._exit skips atexit: write the last metrics deltas here
+                service_metrics.flush()
+                os._exit(0)
+        children.add(pid)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    # The model load was recorded here; children must not inherit the deltas
+    service_metrics.flush()
+    # Every worker polls the shared listener. Non-blocking, the ones that lose
+    # the accept race get BlockingIOError (ignored by socketserver) and go back
+    # to polling and service_actions instead of blocking in accept() until the
+    # next connection. Accepted sockets are still blocking.
+    server.socket.setblocking(False)
+    for _ in range(workers):
+        spawn_worker()
+
+    while children:
+        try:
+            pid, _ = os.wait()
+        except ChildProcessError:
+            break
+        children.discard(pid)
+        if not stopping:
+            spawn_worker()
+
+    server.server_close()
+    if isinstance(server, socketserver.UnixStreamServer) and os.path.exists(server.server_address):
+        os.unlink(server.server_address)
+
+def main():
+    """Main function for command line usage"""
+    parser = argparse.ArgumentParser(description="Long-running KNN prediction server")
+    parser.add_argument('--socket', default=configured_socket_path(),
+                        help="Unix socket path (default: data/predict_server.sock)")
+    parser.add_argument('--host', default='127.0.0.1', help="HTTP bind address, used with --port")
+    parser.add_argument('--port', type=int, default=None, help="Serve HTTP on localhost instead of a Unix socket")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="Number of preforked worker processes")
+    parser.add_argument('--model', default=None, help="Model path (default: data/knn_model_silent.pkl)")
+    parser.add_argument('--micro-batch', action='store_true',
+                        help="Predict concurrent requests of a worker together (asyncio scheduler)")
+    parser.add_argument('--batch-window', type=float, default=DEFAULT_WINDOW * 1000,
+                        help="Longest wait for more requests in milliseconds (default: %(default)s)")
+    parser.add_argument('--max-batch', type=int, default=DEFAULT_MAX_BATCH,
+                        help="Requests per micro-batch at most (default: %(default)s)")
+    args = parser.parse_args()
+
+    # Load once in the parent so forked workers share the model pages
+    predictor = load_predictor(args.model)
+    if predictor is None:
+        print(json.dumps({"success": False, "error": "Failed to create model"}))
+        sys.exit(1)
+
+    try:
+        server = create_server(args.socket, args.host, args.port)
+    except OSError as e:
+        print(json.dumps({"success": False, "error": f"Failed to start server: {str(e)}"}))
+        sys.exit(1)
+    server.predictor = predictor
+    micro_batch = {'max_batch': args.max_batch, 'window': args.batch_window / 1000} if args.micro_batch else None
+    serve(server, max(1, args.workers), micro_batch)
+
+if __name__ == "__main__":
+    main()
@@ -4,214 +4,107 @@ Script untuk prediksi jurusan menggunakan KNN dengan data dari database MySQL La
 Silent mode untuk production - hanya output JSON
 """
 
+import argparse
 import sys
 import json
 import os
-import mysql.connector
-import pandas as pd
+import time
+# Before numpy: importing it marks the start of the "imports" timing stage
+import stage_timings
 import numpy as np
-from sklearn.neighbors import KNeighborsClassifier
-from sklearn.preprocessing import StandardScaler, LabelEncoder
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score
-import joblib
 import warnings
+from batch_predict import add_output_arguments, predict_columns, run_batch, run_batch_columns
+from db_pool import get_pool
+from knn_engine import KNNEngine
+from knn_index import describe_compression
+from feature_schema import FeatureSchema, silent_schema
+from model_store import load_engine, model_exists, save_engine
+from prediction_cache import ModelUnavailable, open_cache
+from service_metrics import record_model_load
+from stage_timings import add_arguments as add_timing_arguments, emit, report_stderr, stage, start as start_timings
+from training_data import stream_training_data
+from import_times import run_with_import_times
 warnings.filterwarnings('ignore')
 
 class SilentKNNPredictor:
-    def __init__(self, k=7):
+    def __init__(self, k=7, pool=None):
         self.k = k
-        self.model = KNeighborsClassifier(n_neighbors=k)
-        self.scaler = StandardScaler()
-        self.label_encoder = LabelEncoder()
+        # Vote weighting and Minkowski p, changed by the tune command
+        self.weights = 'uniform'
+        self.p = 2
+        # Database connection pool, see db_pool.py
+        self.pool = pool
+        # sklearn estimators are created only when training (see init_estimators);
+        # the predict path gets fitted ones from load_model
+        self.model = None
+        self.scaler = None
+        self.label_encoder = None
         self.feature_names = []
+        # Input dicts -> feature matrix, compiled from the model's schema
+        self.feature_schema = None
+        self.feature_transformer = None
+        # NumPy-only engine used for every prediction
+        self.engine = None
         self.silent = True  # Silent mode for production
         
+    def init_estimators(self):
+        """Create unfitted sklearn estimators - imported lazily, training only"""
+        from sklearn.neighbors import KNeighborsClassifier
+        from sklearn.preprocessing import StandardScaler, LabelEncoder
+        
+        self.model = KNeighborsClassifier(n_neighbors=self.k, weights=self.weights, p=self.p)
+        self.scaler = StandardScaler()
+        self.label_encoder = LabelEncoder()
+        
+    def compile_engine(self):
+        """Export the fitted sklearn model to the NumPy inference engine"""
+        schema = silent_schema().select(self.feature_names)
+        self.engine = KNNEngine.from_sklearn(
+            self.model, self.scaler, self.label_encoder,
+            metadata={'k': self.k, 'feature_names': list(self.feature_names), 'feature_schema': schema.to_dict()}
+        )
+        self.log(describe_compression(self.engine.choose_index()))
+        self.compile_features()
+        
+    def compile_features(self):
+        """Compile the model's feature schema into the input transformer"""
+        self.feature_schema = FeatureSchema.from_metadata(self.engine.metadata, silent_schema())
+        self.feature_transformer = self.feature_schema.compile()
+        
     def log(self, message):
         """Log message only if not in silent mode"""
         if not self.silent:
             print(message)
         
-    def get_db_config(self):
-        """Get database configuration from Laravel .env file"""
-        try:
-            from dotenv import load_dotenv
-            
-            # Load .env file from Laravel root
-            env_path = os.path.join(os.path.dirname(__file__), '..', '.env')
-            load_dotenv(env_path)
-            
-            return {
-                'host': os.getenv('DB_HOST', 'localhost'),
-                'port': int(os.getenv('DB_PORT', 3306)),
-                'database': os.getenv('DB_DATABASE', 'sistem_annur'),
-                'user': os.getenv('DB_USERNAME', 'root'),
-                'password': os.getenv('DB_PASSWORD', '')
-            }
-        except:
-            # Default config
-            return {
-                'host': 'localhost',
-                'port': 3306,
-                'database': 'sistem_annur',
-                'user': 'root',
-                'password': ''
-            }
-        
-    def connect_database(self):
-        """Connect to MySQL database"""
-        try:
-            config = self.get_db_config()
-            conn = mysql.connector.connect(**config)
-            return conn
-        except:
-            return None
+    def db_pool(self):
+        """Connection pool for training queries (shared process-wide unless one was given)"""
+        return self.pool or get_pool()
     
     def load_training_data(self):
-        """Load training data from MySQL database"""
-        conn = self.connect_database()
-        if not conn:
-            return None
-            
+        """Stream training data from MySQL into typed NumPy columns"""
         try:
-            query = """
-            SELECT 
-                sl.jenis_kelamin,
-                na.matematika, na.bahasa_indonesia, na.bahasa_inggris,
-                na.fisika, na.kimia, na.biologi, na.sejarah, na.geografi, 
-                na.ekonomi, na.sosiologi, na.pkn, na.seni_budaya, 
-                na.prakarya, na.pjok, na.peminatan_1, na.peminatan_2,
-                na.rata_rata_keseluruhan,
-                smb.rencana_kuliah, smb.jurusan_diminati, smb.kategori_jurusan,
-                smb.tingkat_keyakinan,
-                pj.jurusan_prediksi as target_jurusan
-            FROM siswa_lengkap sl
-            LEFT JOIN nilai_akademik na ON sl.id = na.siswa_lengkap_id
-            LEFT JOIN survei_minat_bakat smb ON sl.id = smb.siswa_lengkap_id  
-            LEFT JOIN prediksi_jurusan pj ON sl.id = pj.siswa_lengkap_id
-            WHERE pj.jurusan_prediksi IS NOT NULL
-            AND na.rata_rata_keseluruhan IS NOT NULL
-            AND smb.rencana_kuliah IS NOT NULL
-            """
-            
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute(query)
-            results = cursor.fetchall()
-            
-            cursor.close()
-            conn.close()
-            
-            if len(results) == 0:
-                return None
-                
-            df = pd.DataFrame(results)
-            return df
-            
+            with self.db_pool().lease() as conn:
+                data, dropped = stream_training_data(conn)
         except:
-            if conn:
-                conn.close()
             return None
+        
+        if len(data) == 0:
+            return None
+        
+        self.log(f"Loaded {len(data)} training records ({dropped} skipped with missing values)")
+        return data
     
     def create_enhanced_dummy_model(self):
         """Create enhanced dummy model with realistic data patterns"""
         try:
-            np.random.seed(42)
-            n_samples = 500
+            from sklearn.model_selection import train_test_split
+            from synthetic_data import class_names, generate
             
-            # Indonesian university majors with realistic distribution
-            majors = [
-                'Teknik Informatika', 'Manajemen', 'Akuntansi', 'Teknik Sipil', 
-                'Kedokteran', 'Psikologi', 'Hukum', 'Farmasi', 'Teknik Elektro',
-                'Ekonomi Pembangunan', 'Ilmu Komunikasi', 'Sastra Inggris',
-                'Matematika', 'Fisika', 'Kimia', 'Biologi', 'Teknik Mesin',
-                'Arsitektur', 'Pendidikan', 'Ilmu Politik'
-            ]
+            self.init_estimators()
             
-            # Generate realistic academic data
-            X_dummy = []
-            y_dummy = []
-            
-            for _ in range(n_samples):
-                # Gender (0=Perempuan, 1=Laki-laki)
-                gender = np.random.choice([0, 1])
-                
-                # Academic scores (60-100)
-                base_score = np.random.normal(77, 8)
-                math_score = max(60, min(100, base_score + np.random.normal(0, 5)))
-                indo_score = max(60, min(100, base_score + np.random.normal(0, 3)))
-                eng_score = max(60, min(100, base_score + np.random.normal(0, 4)))
-                
-                # Science subjects
-                physics_score = max(60, min(100, math_score + np.random.normal(-2, 4)))
-                chemistry_score = max(60, min(100, math_score + np.random.normal(-1, 4)))
-                biology_score = max(60, min(100, base_score + np.random.normal(0, 5)))
-                
-                # Social subjects  
-                history_score = max(60, min(100, base_score + np.random.normal(0, 4)))
-                geography_score = max(60, min(100, base_score + np.random.normal(0, 4)))
-                economics_score = max(60, min(100, base_score + np.random.normal(2, 4)))
-                sociology_score = max(60, min(100, base_score + np.random.normal(1, 4)))
-                
-                # Other subjects
-                pkn_score = max(60, min(100, base_score + np.random.normal(3, 3)))
-                arts_score = max(60, min(100, base_score + np.random.normal(0, 6)))
-                craft_score = max(60, min(100, base_score + np.random.normal(2, 5)))
-                sports_score = max(60, min(100, base_score + np.random.normal(5, 4)))
-                
-                # Specialization subjects
-                spec1_score = max(60, min(100, base_score + np.random.normal(5, 5)))
-                spec2_score = max(60, min(100, base_score + np.random.normal(4, 5)))
-                
-                # Overall average
-                overall_avg = np.mean([math_score, indo_score, eng_score, physics_score, 
-                                     chemistry_score, biology_score, history_score])
-                
-                # Survey data
-                college_plan = np.random.choice([0, 1, 2], p=[0.1, 0.2, 0.7])  # Tidak, Ragu, Iya
-                category = np.random.choice([0, 1])  # Soshum, Saintek
-                confidence = np.random.normal(75, 15)
-                confidence = max(50, min(100, confidence))
-                
-                # Features vector
-                features = [
-                    gender, math_score, indo_score, eng_score, physics_score,
-                    chemistry_score, biology_score, history_score, geography_score,
-                    economics_score, sociology_score, pkn_score, arts_score,
-                    craft_score, sports_score, spec1_score, spec2_score,
-                    overall_avg, college_plan, category, confidence
-                ]
-                
-                # Determine major based on academic strengths
-                science_avg = np.mean([math_score, physics_score, chemistry_score, biology_score])
-                social_avg = np.mean([history_score, geography_score, economics_score, sociology_score])
-                
-                if science_avg > social_avg + 5:
-                    # STEM majors
-                    major_pool = ['Teknik Informatika', 'Teknik Sipil', 'Teknik Elektro', 
-                                'Teknik Mesin', 'Matematika', 'Fisika', 'Kimia', 'Farmasi']
-                    if math_score > 80:
-                        major_pool.extend(['Teknik Informatika', 'Teknik Elektro'])
-                    if biology_score > 80:
-                        major_pool.extend(['Kedokteran', 'Farmasi', 'Biologi'])
-                elif social_avg > science_avg + 5:
-                    # Social majors
-                    major_pool = ['Manajemen', 'Akuntansi', 'Hukum', 'Ilmu Politik',
-                                'Ekonomi Pembangunan', 'Ilmu Komunikasi', 'Psikologi']
-                    if economics_score > 80:
-                        major_pool.extend(['Manajemen', 'Akuntansi', 'Ekonomi Pembangunan'])
-                else:
-                    # Balanced - all majors possible
-                    major_pool = majors
-                
-                # Select major
-                major = np.random.choice(major_pool)
-                
-                X_dummy.append(features)
-                y_dummy.append(major)
-            
-            # Convert to arrays
-            X_dummy = np.array(X_dummy)
-            y_dummy = np.array(y_dummy)
+            # Realistic academic patterns, generated as whole arrays
+            X_dummy, y_codes = generate(500, 'silent', seed=42)
+            y_dummy = class_names('silent')[y_codes]
             
             # Set feature names
             self.feature_names = [
@@ -237,207 +130,319 @@ class SilentKNNPredictor:
             
             # Train model
             self.model.fit(X_train_scaled, y_train_encoded)
+            self.compile_engine()
             
             return True
             
         except Exception as e:
             return False
     
+    def analyze_academics(self, input_data):
+        """Summarize science vs social strength for one student"""
+        science_scores = [
+            input_data.get('fisika', 75),
+            input_data.get('kimia', 75), 
+            input_data.get('biologi', 75)
+        ]
+        social_scores = [
+            input_data.get('sejarah', 75),
+            input_data.get('geografi', 75),
+            input_data.get('ekonomi', 75),
+            input_data.get('sosiologi', 75)
+        ]
+        
+        overall_avg = float(input_data.get('rata_rata_keseluruhan', 75))
+        science_avg = float(np.mean(science_scores))
+        social_avg = float(np.mean(social_scores))
+        
+        if science_avg > social_avg + 3:
+            strength = "Saintek"
+        elif social_avg > science_avg + 3:
+            strength = "Soshum"
+        else:
+            strength = "Balanced"
+        
+        return {
+            'overall_average': overall_avg,
+            'science_average': science_avg,
+            'social_average': social_avg,
+            'academic_strength': strength
+        }
+    
     def predict(self, input_data):
         """Make prediction for new data"""
-        try:
-            # Prepare feature vector
-            features = []
-            
-            # Gender encoding
-            gender_val = 1 if input_data.get('jenis_kelamin') == 'Laki-laki' else 0
-            features.append(gender_val)
-            
-            # Academic scores with defaults
-            academic_fields = [
-                'matematika', 'bahasa_indonesia', 'bahasa_inggris',
-                'fisika', 'kimia', 'biologi', 'sejarah', 'geografi', 
-                'ekonomi', 'sosiologi', 'pkn', 'seni_budaya', 
-                'prakarya', 'pjok', 'peminatan_1', 'peminatan_2',
-                'rata_rata_keseluruhan'
-            ]
-            
-            for field in academic_fields:
-                features.append(float(input_data.get(field, 75)))
-            
-            # Survey data
-            rencana_map = {'Iya': 2, 'Masih ragu': 1, 'Tidak': 0}
-            rencana_val = rencana_map.get(input_data.get('rencana_kuliah', 'Iya'), 2)
-            features.append(rencana_val)
-            
-            category_val = 1 if input_data.get('kategori_jurusan', 'Saintek') == 'Saintek' else 0
-            features.append(category_val)
-            features.append(float(input_data.get('tingkat_keyakinan', 75)))
-            
-            # Ensure correct feature count
-            while len(features) < len(self.feature_names):
-                features.append(75.0)
-            features = features[:len(self.feature_names)]
-            
-            # Scale features
-            X = np.array(features).reshape(1, -1)
-            X_scaled = self.scaler.transform(X)
-            
-            # Make prediction
-            prediction = self.model.predict(X_scaled)[0]
-            probabilities = self.model.predict_proba(X_scaled)[0]
-            
-            # Get predicted major name
-            predicted_major = self.label_encoder.inverse_transform([prediction])[0]
-            
-            # Get confidence
-            confidence = float(np.max(probabilities) * 100)
-            
-            # Get top 7 recommendations
-            top_indices = np.argsort(probabilities)[::-1][:7]
-            recommendations = []
-            
-            for idx in top_indices:
-                major_name = self.label_encoder.inverse_transform([idx])[0]
-                probability = float(probabilities[idx] * 100)
-                recommendations.append({
-                    'major': major_name,
-                    'probability': probability
-                })
-            
-            # Academic analysis
-            math_score = input_data.get('matematika', 75)
-            science_scores = [
-                input_data.get('fisika', 75),
-                input_data.get('kimia', 75), 
-                input_data.get('biologi', 75)
-            ]
-            social_scores = [
-                input_data.get('sejarah', 75),
-                input_data.get('geografi', 75),
-                input_data.get('ekonomi', 75),
-                input_data.get('sosiologi', 75)
-            ]
-            
-            overall_avg = float(input_data.get('rata_rata_keseluruhan', 75))
-            science_avg = float(np.mean(science_scores))
-            social_avg = float(np.mean(social_scores))
-            
-            if science_avg > social_avg + 3:
-                strength = "Saintek"
-            elif social_avg > science_avg + 3:
-                strength = "Soshum"
-            else:
-                strength = "Balanced"
-            
-            return {
-                'success': True,
-                'data': {
-                    'predicted_major': predicted_major,
-                    'confidence': confidence,
-                    'recommendations': recommendations,
-                    'academic_analysis': {
-                        'overall_average': overall_avg,
-                        'science_average': science_avg,
-                        'social_average': social_avg,
-                        'academic_strength': strength
-                    }
-                }
+        return self.predict_batch([input_data])[0]
+    
+    def predict_batch(self, inputs):
+        """
+        Make predictions for many students with one scaler transform
+        and one neighbor query. Errors are reported per row.
+        """
+        results = [None] * len(inputs)
+        
+        # Build every feature row in one vectorized pass
+        with stage('features'):
+            X, errors = self.feature_transformer.transform(inputs)
+        for i, error in errors.items():
+            results[i] = {
+                'success': False,
+                'error': f"Prediction error: {error}"
             }
+        valid = [i for i in range(len(inputs)) if i not in errors]
+        
+        if not valid:
+            return results
+        
+        try:
+            # Scale features and run one neighbor query for the whole batch
+            probabilities = self.engine.predict_proba(X[valid])
+            class_names = self.engine.classes
             
+            # Top 7 recommendations; ties go to the lower class index, like
+            # predicted_major's argmax and the column output
+            top_indices = self.engine.top_n(probabilities, 7)
         except Exception as e:
-            return {
-                'success': False,
-                'error': f"Prediction error: {str(e)}"
-            }
+            for i in valid:
+                results[i] = {
+                    'success': False,
+                    'error': f"Prediction error: {str(e)}"
+                }
+            return results
+        
+        with stage('format'):
+            for row, i in enumerate(valid):
+                try:
+                    row_probabilities = probabilities[row]
+                    recommendations = [
+                        {
+                            'major': str(class_names[idx]),
+                            'probability': float(row_probabilities[idx] * 100)
+                        }
+                        for idx in top_indices[row]
+                    ]
+                    
+                    results[i] = {
+                        'success': True,
+                        'data': {
+                            'predicted_major': str(class_names[np.argmax(row_probabilities)]),
+                            'confidence': float(np.max(row_probabilities) * 100),
+                            'recommendations': recommendations,
+                            'academic_analysis': self.analyze_academics(inputs[i])
+                        }
+                    }
+                except Exception as e:
+                    results[i] = {
+                        'success': False,
+                        'error': f"Prediction error: {str(e)}"
+                    }
+        
+        return results
+    
+    def tune(self, model_path, **options):
+        """
+        Cross-validate k, vote weighting, Minkowski p and feature subsets on
+        the enhanced dummy data, then train and save the best configuration
+        
+        Options are passed to knn_tuning.cross_validate.
+        
+        Returns:
+            dict: Tuning report (best configuration, top grid points, wall time)
+        """
+        from knn_tuning import cross_validate, fit_best, summarize
+        from synthetic_data import FEATURE_NAMES, class_names, generate
+        
+        X, y = generate(500, 'silent', seed=42)
+        report = cross_validate(X, y, FEATURE_NAMES, **options)
+        report['source'] = 'dummy'
+        report = fit_best(self, X, class_names('silent')[y], FEATURE_NAMES, report)
+        if not self.save_model(model_path):
+            return {"success": False, "error": "Error saving tuned model"}
+        
+        return dict(summarize(report), success=True, model_path=model_path)
+    
+    def predict_columns(self, inputs, top_n=7):
+        """Columnar predictions (class indices and probabilities, see batch_predict.predict_columns)"""
+        return predict_columns(self.engine, self.feature_transformer, inputs, top_n)
     
     def save_model(self, model_path):
-        """Save trained model"""
+        """Save trained model and its memory-mapped engine artifact"""
         try:
+            import joblib
+            
             model_data = {
                 'model': self.model,
                 'scaler': self.scaler,
                 'label_encoder': self.label_encoder,
                 'feature_names': self.feature_names,
-                'k': self.k
+                'feature_schema': self.feature_schema.to_dict(),
+                'k': self.k,
+                'index': self.engine.metadata.get('index'),
+                'tuning': self.engine.metadata.get('tuning')
             }
             os.makedirs(os.path.dirname(model_path), exist_ok=True)
             joblib.dump(model_data, model_path)
+            save_engine(self.engine, model_path)
             return True
         except:
             return False
     
     def load_model(self, model_path):
-        """Load trained model"""
+        """Load trained model (memory-mapped artifact, converted from the pickle on first load)"""
         try:
-            if not os.path.exists(model_path):
+            if not model_exists(model_path):
                 return False
                 
-            model_data = joblib.load(model_path)
-            self.model = model_data['model']
-            self.scaler = model_data['scaler']
-            self.label_encoder = model_data['label_encoder']
-            self.feature_names = model_data['feature_names']
-            self.k = model_data.get('k', 7)
+            self.engine = load_engine(model_path)
+            self.feature_names = self.engine.metadata['feature_names']
+            self.k = self.engine.metadata.get('k', 7)
+            self.weights, self.p = self.engine.weights, self.engine.p
+            self.compile_features()
             
             return True
         except:
             return False
 
+def default_model_path():
+    """Path of the model file used by the silent predictor"""
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'knn_model_silent.pkl')
+
+def load_predictor(model_path=None):
+    """Load the silent predictor, creating and saving a dummy model if none exists"""
+    model_path = model_path or default_model_path()
+    started = time.perf_counter()
+    
+    # Initialize predictor
+    predictor = SilentKNNPredictor()
+    
+    # Try to load existing model
+    if not predictor.load_model(model_path):
+        # Train new model (using dummy data since no real training data)
+        if not predictor.create_enhanced_dummy_model():
+            return None
+        predictor.save_model(model_path)
+    
+    record_model_load(time.perf_counter() - started, model_path)
+    return predictor
+
+def parse_args(argv=None):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Silent KNN prediction - JSON output only")
+    parser.add_argument('input_json', nargs='?', help="Student data as a JSON object")
+    parser.add_argument('--batch', nargs='?', const='-', metavar='FILE',
+                        help="Read one JSON object per line from FILE (default: stdin), write one result per line")
+    parser.add_argument('--print-import-times', action='store_true',
+                        help="Report import time per package on stderr (prediction output is unchanged)")
+    add_timing_arguments(parser)
+    add_output_arguments(parser, default_top_n=7)
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Bypass the persistent prediction cache (always load the model)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Batch mode: processes sharing the training matrix for neighbor queries (0 = all cores)")
+    return parser.parse_args(argv)
+
+def parse_tune_args(argv=None):
+    """Parse arguments of the tune command"""
+    from knn_tuning import add_tuning_arguments
+    
+    parser = argparse.ArgumentParser(prog='predict_silent.py tune',
+                                     description="Cross-validate KNN settings and save the model with the best ones")
+    parser.add_argument('--model', help="Model path (default: data/knn_model_silent.pkl)")
+    add_tuning_arguments(parser)
+    return parser.parse_args(argv)
+
+def run_tune(argv):
+    """Run the tune command and print its JSON report"""
+    from knn_tuning import tuning_options
+    
+    args = parse_tune_args(argv)
+    try:
+        result = SilentKNNPredictor().tune(args.model or default_model_path(), **tuning_options(args))
+    except Exception as e:
+        result = {"success": False, "error": f"Tune error: {str(e)}"}
+    print(json.dumps(result))
+    return 0 if result['success'] else 1
+
 def main():
     """Main function for command line usage"""
+    if sys.argv[1:2] == ['tune']:
+        sys.exit(run_tune(sys.argv[2:]))
     
-    if len(sys.argv) < 2:
+    args = parse_args()
+    
+    if args.print_import_times:
+        sys.exit(run_with_import_times(__file__, sys.argv[1:]))
+    
+    start_timings(args)
+    
+    if args.input_json is None and args.batch is None:
         result = {
             "success": False,
             "error": "Missing input data"
         }
-        print(json.dumps(result))
+        emit(result, args)
         return
     
     try:
         # Parse input data
-        input_data = json.loads(sys.argv[1])
+        if args.batch is None:
+            input_data = json.loads(args.input_json)
         
-        # Path configurations
-        base_dir = os.path.dirname(__file__)
-        model_path = os.path.join(base_dir, 'data', 'knn_model_silent.pkl')
+        def load():
+            with stage('model_load'):
+                predictor = load_predictor()
+            if args.batch is not None and args.workers != 1:
+                from parallel_predict import use_workers
+                use_workers(predictor, args.workers)
+            return predictor
         
-        # Initialize predictor
-        predictor = SilentKNNPredictor()
+        if args.batch is not None and args.format != 'jsonl':
+            # Column output is for large runs: one pass over the model, no cache
+            predictor = load()
+            if predictor is None:
+                raise ModelUnavailable(default_model_path())
+            run_batch_columns(args.batch, lambda inputs: predictor.predict_columns(inputs, args.top_n),
+                              args.format, args.output)
+            report_stderr(args.request_id)
+            return
         
-        # Try to load existing model
-        model_loaded = predictor.load_model(model_path)
+        cache = None if args.no_cache else open_cache()
+        if cache is not None:
+            # Rows already in the cache are answered without loading the model
+            def predict_batch(inputs):
+                return cache.predict_batch(default_model_path(), inputs, silent_schema(), load)
+        else:
+            predictor = load()
+            if predictor is None:
+                raise ModelUnavailable(default_model_path())
+            predict_batch = predictor.predict_batch
         
-        if not model_loaded:
-            # Train new model (using dummy data since no real training data)
-            success = predictor.create_enhanced_dummy_model()
-            if success:
-                predictor.save_model(model_path)
-            else:
-                result = {
-                    "success": False,
-                    "error": "Failed to create model"
-                }
-                print(json.dumps(result))
-                return
+        if args.batch is not None:
+            run_batch(args.batch, predict_batch)
+            report_stderr(args.request_id)
+            return
         
         # Make prediction
-        result = predictor.predict(input_data)
-        print(json.dumps(result))
+        result = predict_batch([input_data])[0]
+        emit(result, args)
         
+    except ModelUnavailable:
+        result = {
+            "success": False,
+            "error": "Failed to create model"
+        }
+        emit(result, args)
     except json.JSONDecodeError:
         result = {
             "success": False,
             "error": "Invalid JSON input"
         }
-        print(json.dumps(result))
+        emit(result, args)
     except Exception as e:
         result = {
             "success": False,
             "error": f"Unexpected error: {str(e)}"
         }
-        print(json.dumps(result))
+        emit(result, args)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
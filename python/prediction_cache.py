@@ -0,0 +1,267 @@
+"""
+Cache hasil prediksi persisten di disk untuk script prediksi CLI
+Satu file SQLite (default data/prediction_cache.sqlite) dipakai bersama
+oleh semua proses. Key = hash vektor fitur yang sudah dinormalisasi
+(output FeatureTransformer) + content hash artefak model, sehingga model
+yang ditraining ulang atau di-update otomatis tidak memakai entry lama.
+Jumlah entry dibatasi dengan eviction LRU. Jika semua baris sudah ada di
+cache, model tidak dimuat sama sekali.
+
+Usage:
+    python prediction_cache.py stats
+    python prediction_cache.py clear
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+from feature_schema import FeatureSchema
+from model_store import HEADER_FILE, content_hash, fresh_artifact, load_artifact, read_header
+from service_metrics import record_cache
+from stage_timings import stage
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'prediction_cache.sqlite')
+DEFAULT_MAX_ENTRIES = 100000
+
+# Keys per statement, well below SQLite's host parameter limit
+_CHUNK = 500
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, model TEXT NOT NULL, result TEXT NOT NULL,"
+    " last_used INTEGER NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)",
+    "CREATE INDEX IF NOT EXISTS entries_model ON entries (model)",
+    "CREATE TABLE IF NOT EXISTS models (path TEXT PRIMARY KEY, stamp TEXT NOT NULL, hash TEXT NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+]
+
+class ModelUnavailable(Exception):
+    """Some rows missed the cache and no model could be loaded or created"""
+
+def row_key(model_hash, row):
+    """Cache key of one normalized feature row under a model"""
+    row = np.ascontiguousarray(row, dtype=np.float64)
+    return hashlib.blake2b(model_hash.encode() + row.tobytes(), digest_size=16).hexdigest()
+
+class PredictionCache:
+    """LRU-bounded store of prediction results, shared between processes"""
+
+    def __init__(self, path=None, max_entries=None):
+        self.path = path or os.getenv('PREDICTION_CACHE_PATH', DEFAULT_CACHE_PATH)
+        self.max_entries = int(max_entries or os.getenv('PREDICTION_CACHE_SIZE', DEFAULT_MAX_ENTRIES))
+        # Counters of this process; totals over all processes are in stats()
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # Autocommit; writes that belong together use explicit transactions
+        self.conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        for statement in SCHEMA:
+            self.conn.execute(statement)
+
+    def close(self):
+        self.conn.close()
+
+    def model_hash(self, model_path):
+        """
+        Content hash and header of the model's artifact, read without
+        loading the arrays
+
+        Returns:
+            tuple: (hash, header), or (None, None) when the model has to
+            be loaded (and its artifact converted) first
+        """
+        artifact = fresh_artifact(model_path)
+        header = read_header(artifact) if artifact else None
+        if header is None:
+            return None, None
+
+        stat = os.stat(os.path.join(artifact, HEADER_FILE))
+        stamp = f"{stat.st_size}:{stat.st_mtime_ns}"
+        artifact = os.path.abspath(artifact)
+        known = self.conn.execute("SELECT stamp, hash FROM models WHERE path = ?", (artifact,)).fetchone()
+
+        model = header.get('content_hash')
+        if model is None:
+            # Artifact written before headers carried a hash: hash it once per version
+            model = known[1] if known and known[0] == stamp else content_hash(load_artifact(artifact))
+
+        if known != (stamp, model):
+            try:
+                with self.conn:
+                    self.conn.execute('BEGIN IMMEDIATE')
+                    if known and known[1] != model:
+                        # The model changed: entries of the old version are dead weight
+                        self.conn.execute("DELETE FROM entries WHERE model = ?", (known[1],))
+                    self.conn.execute("INSERT OR REPLACE INTO models VALUES (?, ?, ?)", (artifact, stamp, model))
+            except sqlite3.Error:
+                # Busy cache: invalidation is only housekeeping, keys already differ
+                pass
+        return model, header
+
+    def lookup(self, keys):
+        """Cached results of the given keys, as a dict key -> result"""
+        found = {}
+        keys = list(dict.fromkeys(keys))
+        try:
+            for start in range(0, len(keys), _CHUNK):
+                part = keys[start:start + _CHUNK]
+                rows = self.conn.execute(
+                    "SELECT key, result FROM entries WHERE key IN (%s)" % ','.join('?' * len(part)), part
+                ).fetchall()
+                found.update((key, json.loads(result)) for key, result in rows)
+
+            if found:
+                now = time.time_ns()
+                with self.conn:
+                    self.conn.execute('BEGIN IMMEDIATE')
+                    self.conn.executemany("UPDATE entries SET last_used = ? WHERE key = ?",
+                                          [(now, key) for key in found])
+        except sqlite3.Error:
+            # A busy cache never fails a prediction; what was read is still valid
+            pass
+        return found
+
+    def store(self, model_hash, items):
+        """Save (key, result) pairs, evicting the least recently used entries over the bound"""
+        now = time.time_ns()
+        try:
+            with self.conn:
+                self.conn.execute('BEGIN IMMEDIATE')
+                self.conn.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                                      [(key, model_hash, json.dumps(result), now) for key, result in items])
+                excess = self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - self.max_entries
+                if excess > 0:
+                    self.conn.execute("DELETE FROM entries WHERE key IN "
+                                      "(SELECT key FROM entries ORDER BY last_used LIMIT ?)", (excess,))
+        except sqlite3.Error:
+            pass
+
+    def count(self, hits, misses):
+        """Add to this process's and the shared hit/miss counters"""
+        self.hits += hits
+        self.misses += misses
+        record_cache(hits, misses)
+        try:
+            with self.conn:
+                self.conn.execute('BEGIN IMMEDIATE')
+                self.conn.executemany(
+                    "INSERT INTO counters VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                    [('hits', hits), ('misses', misses)]
+                )
+        except sqlite3.Error:
+            pass
+
+    def stats(self):
+        """Entry count and hit/miss counters over all processes"""
+        counters = dict(self.conn.execute("SELECT name, value FROM counters").fetchall())
+        hits = counters.get('hits', 0)
+        misses = counters.get('misses', 0)
+        return {
+            'path': self.path,
+            'entries': self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0],
+            'max_entries': self.max_entries,
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': hits / (hits + misses) if hits + misses else 0.0
+        }
+
+    def clear(self):
+        """Drop every entry and reset the counters"""
+        with self.conn:
+            self.conn.execute('BEGIN IMMEDIATE')
+            for table in ('entries', 'models', 'counters'):
+                self.conn.execute(f"DELETE FROM {table}")
+
+    def predict_batch(self, model_path, inputs, fallback_schema, load_predictor):
+        """
+        Predict a batch, loading the model only for rows not in the cache
+
+        Args:
+            model_path (str): Model file the predictor loads
+            inputs (list): Input dicts
+            fallback_schema (FeatureSchema): Schema for models without a
+                stored one, as the predictor uses; or a function of the
+                model metadata returning it
+            load_predictor (callable): Returns a loaded predictor with
+                predict_batch(), or None if no model is available
+
+        Returns:
+            list: One result per input, the same as predictor.predict_batch
+
+        Raises:
+            ModelUnavailable: load_predictor() returned None
+        """
+        predictor = None
+        with stage('cache'):
+            model, header = self.model_hash(model_path)
+        if model is None:
+            predictor = load_predictor()
+            if predictor is None:
+                raise ModelUnavailable(model_path)
+            model, header = self.model_hash(model_path)
+            if model is None:
+                # Read-only data directory: the model lives in memory only, nothing to key on
+                return predictor.predict_batch(inputs)
+
+        with stage('cache'):
+            # The same normalization the predictor applies, compiled from the header
+            if callable(fallback_schema):
+                fallback_schema = fallback_schema(header['metadata'])
+            transformer = FeatureSchema.from_metadata(header['metadata'], fallback_schema).compile()
+            X, errors = transformer.transform(inputs)
+            keys = [None if i in errors else row_key(model, X[i]) for i in range(len(inputs))]
+            cached = self.lookup([key for key in keys if key is not None])
+
+            results = [cached.get(key) if key is not None else None for key in keys]
+            missing = [i for i, result in enumerate(results) if result is None]
+            self.count(len(inputs) - len(missing), sum(1 for i in missing if keys[i] is not None))
+        if not missing:
+            return results
+
+        if predictor is None:
+            predictor = load_predictor()
+            if predictor is None:
+                raise ModelUnavailable(model_path)
+        predicted = predictor.predict_batch([inputs[i] for i in missing])
+        for i, result in zip(missing, predicted):
+            results[i] = result
+
+        # Only keep results of the model version the keys were made for
+        with stage('cache'):
+            if self.model_hash(model_path)[0] == model:
+                self.store(model, [(keys[i], results[i]) for i in missing
+                                   if keys[i] is not None and results[i].get('success')])
+        return results
+
+def open_cache(path=None):
+    """The prediction cache, or None if it cannot be opened (read-only or locked data directory)"""
+    try:
+        return PredictionCache(path)
+    except (sqlite3.Error, OSError):
+        return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or clear the persistent prediction cache")
+    parser.add_argument('command', choices=['stats', 'clear'])
+    parser.add_argument('--path', default=None, help="Cache file (default: data/prediction_cache.sqlite)")
+    args = parser.parse_args(argv)
+
+    cache = PredictionCache(args.path)
+    if args.command == 'clear':
+        cache.clear()
+    print(json.dumps(cache.stats()))
+    cache.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,13 @@
+"""
+Alamat server prediksi yang dipakai bersama predict_server.py dan
+predict_client.py. Hanya memakai modul standar ringan, karena client
+mengimpornya di setiap request dari PHP.
+"""
+
+import os
+
+DEFAULT_SOCKET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'predict_server.sock')
+
+def socket_path():
+    """Unix socket of the prediction server: PREDICT_SERVER_SOCKET, or the default under data/"""
+    return os.getenv('PREDICT_SERVER_SOCKET', DEFAULT_SOCKET_PATH)
@@ -0,0 +1,424 @@
+"""
+Metrik agregat proses prediksi dalam format teks Prometheus
+Setiap proses (script CLI, worker predict_server) mencatat counter dan
+histogram di memori: jumlah request, error per jenis, latency, ukuran
+batch dan micro-batch server, jumlah dan durasi load model, hit/miss
+cache dan versi (content hash) model. Pencatatan hanya menambah angka
+di dict/list (sekitar satu mikrodetik per request), jadi selalu aktif
+kecuali PREDICT_METRICS=off.
+
+Delta dikumpulkan ke satu file SQLite bersama (default data/metrics.sqlite)
+saat proses CLI selesai, atau paling lambat setiap FLUSH_INTERVAL detik di
+server. Scrape membaca file itu: `python service_metrics.py` mencetak teks
+Prometheus (atau --output untuk textfile collector node_exporter), dan
+predict_server.py --port melayani GET /metrics. p50/p95/p99 latency
+diestimasi dari bucket histogram seperti histogram_quantile().
+
+Usage:
+    python service_metrics.py                       # teks Prometheus ke stdout
+    python service_metrics.py --output /var/lib/node_exporter/knn.prom
+    python service_metrics.py reset
+"""
+
+import argparse
+import atexit
+import bisect
+import json
+import os
+import sys
+import time
+
+DEFAULT_METRICS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'metrics.sqlite')
+METRICS_ENV = 'PREDICT_METRICS'
+METRICS_PATH_ENV = 'PREDICT_METRICS_PATH'
+# Longest time a long-running process keeps deltas in memory
+FLUSH_INTERVAL = 5.0
+PREFIX = 'knn_predict_'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BATCH_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 50000, 100000)
+MICRO_BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+LOAD_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Error message prefix -> error type label (first match wins)
+ERROR_TYPES = (
+    ('Invalid JSON', 'invalid_json'),
+    ('Missing input', 'missing_input'),
+    ('Prediction error', 'prediction'),
+    ('Failed to', 'model_unavailable'),
+    ('Unexpected error', 'unexpected')
+)
+
+# name -> (type, help); histograms also get _bucket/_sum/_count samples
+METRICS = {
+    'requests_total': ('counter', "Prediction requests (one CLI call, batch or server request)"),
+    'rows_total': ('counter', "Input rows predicted"),
+    'errors_total': ('counter', "Failed rows by error type"),
+    'request_duration_seconds': ('histogram', "Request latency (CLI: since process start)"),
+    'request_latency_quantile_seconds': ('gauge', "Latency quantiles estimated from the histogram buckets"),
+    'batch_size': ('histogram', "Input rows per request"),
+    'micro_batch_size': ('histogram', "Server requests computed together by the micro-batching scheduler"),
+    'model_loads_total': ('counter', "Model loads"),
+    'model_load_duration_seconds': ('histogram', "Model load time"),
+    'cache_hits_total': ('counter', "Rows answered from the prediction cache"),
+    'cache_misses_total': ('counter', "Rows not found in the prediction cache"),
+    'cache_hit_ratio': ('gauge', "cache_hits_total / (cache_hits_total + cache_misses_total)"),
+    'model_info': ('gauge', "Model last loaded by a source, with its content hash"),
+    'model_loaded_timestamp_seconds': ('gauge', "Unix time of that model load")
+}
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS samples (name TEXT NOT NULL, labels TEXT NOT NULL, value REAL NOT NULL,"
+    " PRIMARY KEY (name, labels))",
+    "CREATE TABLE IF NOT EXISTS gauges (name TEXT NOT NULL, source TEXT NOT NULL, labels TEXT NOT NULL,"
+    " value REAL NOT NULL, PRIMARY KEY (name, source))"
+]
+
+def error_type(message):
+    """Error type label of a result's error message"""
+    for prefix, label in ERROR_TYPES:
+        if message.startswith(prefix):
+            return label
+    return 'other'
+
+class Histogram:
+    """Non-cumulative bucket counts; the last slot is +Inf"""
+
+    __slots__ = ('bounds', 'counts', 'sum')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+class Registry:
+    """In-memory metric deltas of one process, flushed to the shared store"""
+
+    def __init__(self, source, path=None):
+        self.source = source
+        self.path = path or os.getenv(METRICS_PATH_ENV, DEFAULT_METRICS_PATH)
+        self.reset()
+
+    def reset(self):
+        """Forget unflushed deltas (after a flush, or in a forked child)"""
+        self.counters = {}
+        self.histograms = {
+            'request_duration_seconds': Histogram(LATENCY_BUCKETS),
+            'batch_size': Histogram(BATCH_BUCKETS),
+            'micro_batch_size': Histogram(MICRO_BATCH_BUCKETS),
+            'model_load_duration_seconds': Histogram(LOAD_BUCKETS)
+        }
+        self.gauges = {}
+        self.last_flush = time.monotonic()
+
+    def count(self, name, value=1, label=None):
+        key = (name, label)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def request(self, seconds, results):
+        """One answered request: its latency, batch size and failed rows"""
+        self.count('requests_total')
+        self.count('rows_total', len(results))
+        self.histograms['request_duration_seconds'].observe(seconds)
+        self.histograms['batch_size'].observe(len(results))
+        for result in results:
+            if result is not None and not result.get('success', True):
+                self.count('errors_total', 1, ('type', error_type(str(result.get('error', '')))))
+
+    def request_errors(self, seconds, n_rows, errors):
+        """Like request() for column output: errors is {row: message}"""
+        self.count('requests_total')
+        self.count('rows_total', n_rows)
+        self.histograms['request_duration_seconds'].observe(seconds)
+        self.histograms['batch_size'].observe(n_rows)
+        for message in errors.values():
+            self.count('errors_total', 1, ('type', error_type(message)))
+
+    def model_load(self, seconds, model_path=None, model_hash=None):
+        self.count('model_loads_total')
+        self.histograms['model_load_duration_seconds'].observe(seconds)
+        labels = {}
+        if model_path:
+            labels['model'] = os.path.splitext(os.path.basename(model_path))[0]
+        if model_hash:
+            labels['hash'] = model_hash
+        self.gauges['model_info'] = (labels, 1.0)
+        self.gauges['model_loaded_timestamp_seconds'] = ({}, time.time())
+
+    def micro_batch(self, size):
+        self.histograms['micro_batch_size'].observe(size)
+
+    def cache(self, hits, misses):
+        self.count('cache_hits_total', hits)
+        self.count('cache_misses_total', misses)
+
+    def samples(self):
+        """(name, labels JSON, delta) rows of the unflushed counters and histograms"""
+        rows = []
+        for (name, label), value in self.counters.items():
+            labels = {'source': self.source}
+            if label is not None:
+                labels[label[0]] = label[1]
+            rows.append((name, json.dumps(labels, sort_keys=True), value))
+        for name, histogram in self.histograms.items():
+            if not any(histogram.counts):
+                continue
+            for bound, count in zip(list(histogram.bounds) + ['+Inf'], histogram.counts):
+                if count:
+                    rows.append((name + '_bucket', json.dumps({'le': str(bound), 'source': self.source},
+                                                              sort_keys=True), count))
+            labels = json.dumps({'source': self.source})
+            rows.append((name + '_sum', labels, histogram.sum))
+            rows.append((name + '_count', labels, sum(histogram.counts)))
+        return rows
+
+    def flush(self):
+        """Add the deltas to the shared store; kept in memory if it cannot be written"""
+        rows = self.samples()
+        gauges = [(name, self.source, json.dumps(dict(labels, source=self.source), sort_keys=True), value)
+                  for name, (labels, value) in self.gauges.items()]
+        if not rows and not gauges:
+            self.last_flush = time.monotonic()
+            return True
+        import sqlite3
+
+        try:
+            conn = connect(self.path)
+            try:
+                with conn:
+                    conn.execute('BEGIN IMMEDIATE')
+                    conn.executemany(
+                        "INSERT INTO samples VALUES (?, ?, ?) "
+                        "ON CONFLICT(name, labels) DO UPDATE SET value = value + excluded.value", rows
+                    )
+                    conn.executemany("INSERT OR REPLACE INTO gauges VALUES (?, ?, ?, ?)", gauges)
+            finally:
+                conn.close()
+        except (sqlite3.Error, OSError):
+            return False
+        self.reset()
+        return True
+
+    def maybe_flush(self):
+        """Flush when the last one is FLUSH_INTERVAL seconds old (long-running processes)"""
+        if time.monotonic() - self.last_flush >= FLUSH_INTERVAL:
+            self.flush()
+
+def connect(path):
+    import sqlite3
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=5.0, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    for statement in SCHEMA:
+        conn.execute(statement)
+    return conn
+
+def enabled():
+    """False when PREDICT_METRICS turns recording off"""
+    return os.getenv(METRICS_ENV, '').strip().lower() not in ('0', 'false', 'no', 'off')
+
+_registry = None
+_flush_at_exit = False
+
+def registry():
+    """This process's registry (source = script name), None when metrics are off"""
+    global _registry, _flush_at_exit
+    if _registry is None and enabled():
+        _registry = Registry(os.path.splitext(os.path.basename(sys.argv[0] or 'python'))[0] or 'python')
+    if _registry is not None and not _flush_at_exit:
+        _flush_at_exit = True
+        atexit.register(flush)
+    return _registry
+
+def flush():
+    """Write this process's deltas now (before fork, at exit, before serving /metrics)"""
+    if _registry is not None:
+        _registry.flush()
+
+def record_request(seconds, results):
+    """Record one answered request (list of result dicts)"""
+    metrics = registry()
+    if metrics is not None:
+        metrics.request(seconds, results)
+
+def record_column_request(seconds, n_rows, errors):
+    """Record one column-output request ({row: message} errors)"""
+    metrics = registry()
+    if metrics is not None:
+        metrics.request_errors(seconds, n_rows, errors)
+
+def record_model_load(seconds, model_path=None):
+    """Record a model load; the hash is the artifact's content hash when there is one"""
+    metrics = registry()
+    if metrics is None:
+        return
+    model_hash = None
+    if model_path:
+        from model_store import fresh_artifact, read_header
+
+        # Artifacts written before headers carried a hash are reported without one
+        artifact = fresh_artifact(model_path)
+        header = read_header(artifact) if artifact else None
+        model_hash = header.get('content_hash') if header else None
+    metrics.model_load(seconds, model_path, model_hash)
+
+def record_micro_batch(size):
+    """Record the size of one micro-batch of the server scheduler"""
+    metrics = registry()
+    if metrics is not None:
+        metrics.micro_batch(size)
+
+def record_cache(hits, misses):
+    metrics = registry()
+    if metrics is not None:
+        metrics.cache(hits, misses)
+
+def histogram_quantile(q, bounds, cumulative):
+    """Estimate a quantile from cumulative bucket counts, interpolating linearly like Prometheus"""
+    total = cumulative[-1]
+    if total == 0:
+        return None
+    rank = q * total
+    i = bisect.bisect_left(cumulative, rank)
+    if i >= len(bounds):
+        # In the +Inf bucket: the highest finite bound is the best estimate
+        return bounds[-1]
+    lower = bounds[i - 1] if i > 0 else 0.0
+    below = cumulative[i - 1] if i > 0 else 0
+    in_bucket = cumulative[i] - below
+    return lower + (bounds[i] - lower) * ((rank - below) / in_bucket if in_bucket else 0.0)
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    pairs = []
+    for key, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{key}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+def format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+def render(samples, gauges):
+    """
+    Prometheus text exposition of stored samples
+
+    Args:
+        samples (list): (name, labels JSON, value) rows, histogram buckets non-cumulative
+        gauges (list): (name, labels JSON, value) rows
+    """
+    series = {}
+    for name, labels, value in samples:
+        series.setdefault(name, []).append((json.loads(labels), value))
+    for name, labels, value in gauges:
+        series.setdefault(name, []).append((json.loads(labels), value))
+
+    bounds_of = {'request_duration_seconds': LATENCY_BUCKETS, 'batch_size': BATCH_BUCKETS,
+                 'micro_batch_size': MICRO_BATCH_BUCKETS, 'model_load_duration_seconds': LOAD_BUCKETS}
+    sources = sorted({labels['source'] for rows in series.values() for labels, _ in rows})
+    derived = {'request_latency_quantile_seconds': [], 'cache_hit_ratio': []}
+    lines = []
+    buckets_of = {}
+    for name, bounds in bounds_of.items():
+        for source in sources:
+            counts = {labels['le']: value for labels, value in series.get(name + '_bucket', [])
+                      if labels['source'] == source}
+            if counts:
+                cumulative = []
+                total = 0
+                for le in [str(bound) for bound in bounds] + ['+Inf']:
+                    total += counts.get(le, 0)
+                    cumulative.append(total)
+                buckets_of[(name, source)] = cumulative
+    for source in sources:
+        cumulative = buckets_of.get(('request_duration_seconds', source))
+        if cumulative:
+            for q in QUANTILES:
+                value = histogram_quantile(q, LATENCY_BUCKETS, cumulative)
+                derived['request_latency_quantile_seconds'].append(({'quantile': str(q), 'source': source}, value))
+        hits = sum(v for labels, v in series.get('cache_hits_total', []) if labels['source'] == source)
+        misses = sum(v for labels, v in series.get('cache_misses_total', []) if labels['source'] == source)
+        if hits + misses:
+            derived['cache_hit_ratio'].append(({'source': source}, hits / (hits + misses)))
+
+    for name, (kind, help_text) in METRICS.items():
+        full = PREFIX + name
+        if kind == 'histogram':
+            stored = [source for source in sources if (name, source) in buckets_of]
+            if not stored:
+                continue
+            lines += [f"# HELP {full} {help_text}", f"# TYPE {full} histogram"]
+            bounds = bounds_of[name]
+            for source in stored:
+                cumulative = buckets_of[(name, source)]
+                for le, value in zip([format_value(bound) for bound in bounds] + ['+Inf'], cumulative):
+                    lines.append(f"{full}_bucket{format_labels({'le': le, 'source': source})} {format_value(value)}")
+                total = sum(v for labels, v in series.get(name + '_sum', []) if labels['source'] == source)
+                lines.append(f"{full}_sum{format_labels({'source': source})} {format_value(total)}")
+                lines.append(f"{full}_count{format_labels({'source': source})} {format_value(cumulative[-1])}")
+            continue
+        rows = derived.get(name, series.get(name, []))
+        if not rows:
+            continue
+        lines += [f"# HELP {full} {help_text}", f"# TYPE {full} {kind}"]
+        for labels, value in sorted(rows, key=lambda row: sorted(row[0].items())):
+            lines.append(f"{full}{format_labels(labels)} {format_value(value)}")
+    return '\n'.join(lines) + '\n'
+
+def exposition(path=None):
+    """Prometheus text of everything flushed to the store"""
+    path = path or os.getenv(METRICS_PATH_ENV, DEFAULT_METRICS_PATH)
+    conn = connect(path)
+    try:
+        samples = conn.execute("SELECT name, labels, value FROM samples").fetchall()
+        gauges = conn.execute("SELECT name, labels, value FROM gauges").fetchall()
+    finally:
+        conn.close()
+    return render(samples, gauges)
+
+def write_textfile(text, path):
+    """Replace a textfile collector file atomically"""
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def reset_store(path=None):
+    """Drop every stored sample"""
+    conn = connect(path or os.getenv(METRICS_PATH_ENV, DEFAULT_METRICS_PATH))
+    try:
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute("DELETE FROM samples")
+            conn.execute("DELETE FROM gauges")
+    finally:
+        conn.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Print or reset the aggregated prediction metrics")
+    parser.add_argument('command', nargs='?', choices=['show', 'reset'], default='show')
+    parser.add_argument('--path', default=None, help="Metrics store (default: data/metrics.sqlite)")
+    parser.add_argument('--output', default=None, help="Write a textfile-collector file instead of stdout")
+    args = parser.parse_args(argv)
+
+    if args.command == 'reset':
+        reset_store(args.path)
+        return 0
+    text = exposition(args.path)
+    if args.output:
+        write_textfile(text, args.output)
+    else:
+        sys.stdout.write(text)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
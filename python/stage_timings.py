@@ -0,0 +1,142 @@
+"""
+Timing per tahap untuk script prediksi (opt-in)
+Diaktifkan dengan --timings / --timings-stderr atau env
+PREDICT_TIMINGS=json|stderr. Durasi diukur dengan jam monotonic
+(time.perf_counter) per tahap: imports, load model, cache, build fitur,
+scaling, query tetangga, voting, format hasil dan encoding JSON, ditambah
+peak RSS proses. Response normal tidak
+berubah: timings ditambahkan sebagai key "timings" atau ditulis ke stderr.
+Request id dari caller (--request-id / PREDICT_REQUEST_ID) dikembalikan
+sebagai "request_id" agar log Laravel bisa dikorelasikan.
+
+Modul ini harus di-import sebelum numpy oleh script prediksi: waktu import
+modul ini adalah awal tahap "imports".
+"""
+
+import contextlib
+import json
+import os
+import sys
+import time
+
+import service_metrics
+
+PROCESS_START = time.perf_counter()
+
+TIMINGS_ENV = 'PREDICT_TIMINGS'
+REQUEST_ID_ENV = 'PREDICT_REQUEST_ID'
+
+_NO_STAGE = contextlib.nullcontext()
+_active = None
+
+class Timings:
+    """Accumulated seconds per named stage, in first-seen order"""
+
+    def __init__(self, start=PROCESS_START):
+        self.start = start
+        self.stages = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        begin = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - begin)
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def report(self):
+        """Durations in milliseconds plus the peak resident set size"""
+        return {
+            'stages_ms': {name: round(seconds * 1000, 3) for name, seconds in self.stages.items()},
+            'total_ms': round((time.perf_counter() - self.start) * 1000, 3),
+            'peak_rss_kb': peak_rss_kb()
+        }
+
+def peak_rss_kb():
+    """Peak resident set size of this process in KiB, None where unavailable"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+def enable():
+    """Start recording; the time since this module was imported counts as imports"""
+    global _active
+    _active = Timings()
+    _active.add('imports', time.perf_counter() - PROCESS_START)
+    return _active
+
+def active():
+    """The recording Timings, or None when timings are off"""
+    return _active
+
+def stage(name):
+    """Context manager timing one stage; does nothing unless enabled"""
+    if _active is None:
+        return _NO_STAGE
+    return _active.stage(name)
+
+def parse_mode(value):
+    """Normalize a timings setting (flag or PREDICT_TIMINGS) to 'json', 'stderr' or None"""
+    if value is None:
+        return None
+    value = value.strip().lower()
+    if value in ('', '0', 'false', 'no', 'off'):
+        return None
+    return 'stderr' if value == 'stderr' else 'json'
+
+def add_arguments(parser):
+    """Add --timings, --timings-stderr and --request-id to an entry point's argument parser"""
+    parser.add_argument('--timings', action='store_const', const='json', default=os.getenv(TIMINGS_ENV),
+                        help="Add per-stage durations and peak RSS to the JSON output as \"timings\"")
+    parser.add_argument('--timings-stderr', dest='timings', action='store_const', const='stderr',
+                        help="Write the timings as a JSON line on stderr instead")
+    parser.add_argument('--request-id', default=os.getenv(REQUEST_ID_ENV),
+                        help="Caller request id, echoed back as request_id")
+
+def start(args):
+    """Enable recording if the parsed arguments ask for it; returns the mode"""
+    mode = parse_mode(args.timings)
+    if mode:
+        enable()
+    return mode
+
+def emit(result, args, output=None, **dumps_kwargs):
+    """
+    Print a single JSON response with the request id and timings added
+
+    Without --timings and --request-id the output is exactly
+    json.dumps(result).
+    """
+    output = output or sys.stdout
+    service_metrics.record_request(time.perf_counter() - PROCESS_START, [result])
+    request_id = getattr(args, 'request_id', None)
+    if request_id is not None:
+        result = dict(result, request_id=request_id)
+
+    if _active is None:
+        print(json.dumps(result, **dumps_kwargs), file=output)
+        return
+
+    with stage('json_encode'):
+        encoded = json.dumps(result, **dumps_kwargs)
+    if parse_mode(args.timings) == 'stderr':
+        print(encoded, file=output)
+        report_stderr(request_id)
+    else:
+        print(json.dumps(dict(result, timings=_active.report()), **dumps_kwargs), file=output)
+
+def report_stderr(request_id=None):
+    """Write the timings as one JSON line on stderr (batch mode, or --timings-stderr)"""
+    if _active is None:
+        return
+    report = {'timings': _active.report()}
+    if request_id is not None:
+        report['request_id'] = request_id
+    print(json.dumps(report), file=sys.stderr)
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Generator data training sintetis untuk model KNN (21 fitur)
+Distribusi nilai dan aturan pemilihan jurusan sama dengan
+create_enhanced_dummy_model di predict_silent.py (profil 'silent') dan
+predict_db.py (profil 'database'), tetapi dihitung per array dengan
+np.random.Generator sehingga jutaan baris bisa dibuat dalam hitungan detik.
+
+Usage:
+    python synthetic_data.py --rows 1000000 --output data/synthetic.csv
+    python synthetic_data.py --profile database --rows 500000 --output data/synthetic.npz
+    python synthetic_data.py --rows 2000000 --output data/synthetic_silent.model --k 7
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+from feature_schema import database_schema, silent_schema
+
+DEFAULT_CHUNK_SIZE = 100_000
+
+FEATURE_NAMES = silent_schema().names
+
+# (feature, parent score, noise mean, noise std): score = parent + N(mean, std)
+SILENT_SCORES = [
+    ('matematika', 'base', 0, 5), ('bahasa_indonesia', 'base', 0, 3), ('bahasa_inggris', 'base', 0, 4),
+    ('fisika', 'matematika', -2, 4), ('kimia', 'matematika', -1, 4), ('biologi', 'base', 0, 5),
+    ('sejarah', 'base', 0, 4), ('geografi', 'base', 0, 4), ('ekonomi', 'base', 2, 4),
+    ('sosiologi', 'base', 1, 4), ('pkn', 'base', 3, 3), ('seni_budaya', 'base', 0, 6),
+    ('prakarya', 'base', 2, 5), ('pjok', 'base', 5, 4), ('peminatan_1', 'base', 5, 5),
+    ('peminatan_2', 'base', 4, 5)
+]
+
+DATABASE_SCORES = [
+    ('matematika', 'base', 0, 5), ('fisika', 'matematika', -5, 8), ('kimia', 'matematika', -3, 6),
+    ('biologi', 'base', 2, 7), ('bahasa_indonesia', 'base', 0, 5), ('bahasa_inggris', 'base', -2, 6),
+    ('sejarah', 'base', 1, 5), ('geografi', 'base', 0, 6), ('ekonomi', 'base', -1, 5),
+    ('sosiologi', 'base', 1, 5), ('pkn', 'base', 0, 4), ('seni_budaya', 'base', 3, 8),
+    ('prakarya', 'base', 2, 6), ('pjok', 'base', 5, 10), ('peminatan_1', 'base', 3, 7),
+    ('peminatan_2', 'base', 2, 6)
+]
+
+SILENT_MAJORS = [
+    'Teknik Informatika', 'Manajemen', 'Akuntansi', 'Teknik Sipil',
+    'Kedokteran', 'Psikologi', 'Hukum', 'Farmasi', 'Teknik Elektro',
+    'Ekonomi Pembangunan', 'Ilmu Komunikasi', 'Sastra Inggris',
+    'Matematika', 'Fisika', 'Kimia', 'Biologi', 'Teknik Mesin',
+    'Arsitektur', 'Pendidikan', 'Ilmu Politik'
+]
+
+DATABASE_MAJORS = [
+    'Teknik Informatika', 'Teknik Sipil', 'Teknik Mesin', 'Teknik Elektro',
+    'Kedokteran', 'Farmasi', 'Keperawatan', 'Kedokteran Gigi',
+    'Manajemen', 'Akuntansi', 'Ekonomi Pembangunan', 'Administrasi Bisnis',
+    'Hukum', 'Ilmu Politik', 'Hubungan Internasional', 'Komunikasi',
+    'Psikologi', 'Sosiologi', 'Pendidikan', 'Sastra Inggris'
+]
+
+_STEM = ['Teknik Informatika', 'Teknik Sipil', 'Teknik Elektro',
+         'Teknik Mesin', 'Matematika', 'Fisika', 'Kimia', 'Farmasi']
+_SOCIAL = ['Manajemen', 'Akuntansi', 'Hukum', 'Ilmu Politik',
+           'Ekonomi Pembangunan', 'Ilmu Komunikasi', 'Psikologi']
+
+# Candidate pools; a row's major is drawn uniformly from its pool (repeats weigh more)
+SILENT_POOLS = [
+    _STEM,                                                                   # 0 science
+    _STEM + ['Teknik Informatika', 'Teknik Elektro'],                        # 1 + math > 80
+    _STEM + ['Kedokteran', 'Farmasi', 'Biologi'],                            # 2 + biology > 80
+    _STEM + ['Teknik Informatika', 'Teknik Elektro', 'Kedokteran', 'Farmasi', 'Biologi'],
+    _SOCIAL,                                                                 # 4 social
+    _SOCIAL + ['Manajemen', 'Akuntansi', 'Ekonomi Pembangunan'],             # 5 + economics > 80
+    SILENT_MAJORS                                                            # 6 balanced
+]
+
+DATABASE_POOLS = [
+    ['Teknik Informatika', 'Teknik Elektro', 'Teknik Mesin'],    # Saintek, math/physics
+    ['Kedokteran', 'Farmasi', 'Keperawatan'],                    # Saintek, biology/chemistry
+    ['Teknik Sipil', 'Kedokteran Gigi', 'Teknik Mesin'],         # Saintek, other
+    ['Manajemen', 'Akuntansi', 'Ekonomi Pembangunan'],           # Soshum, economics
+    ['Hukum', 'Ilmu Politik', 'Komunikasi'],                     # Soshum, sociology/history
+    ['Psikologi', 'Pendidikan', 'Sastra Inggris']                # Soshum, other
+]
+
+# rencana_kuliah code probabilities [Tidak, Masih ragu, Iya] per average band
+DATABASE_PLAN_PROBABILITIES = np.array([
+    [0.2, 0.4, 0.4],    # average < 70
+    [0.1, 0.3, 0.6],    # 70 <= average < 80
+    [0.0, 0.2, 0.8]     # average >= 80
+])
+
+PROFILES = {
+    'silent': {'majors': SILENT_MAJORS, 'schema': silent_schema, 'k': 7},
+    'database': {'majors': DATABASE_MAJORS, 'schema': database_schema, 'k': 5}
+}
+
+def class_names(profile='silent'):
+    """Major names indexed by the label codes of a profile"""
+    return np.array(PROFILES[profile]['majors'])
+
+def _scores(rng, n, base_mean, base_std, specs, clip):
+    """Correlated subject scores, clipped like max(lo, min(hi, x))"""
+    scores = {'base': rng.normal(base_mean, base_std, n)}
+    for name, parent, mean, std in specs:
+        scores[name] = np.clip(scores[parent] + rng.normal(mean, std, n), clip[0], clip[1])
+    return scores
+
+def _pool_table(pools, majors):
+    """Pools as a padded (n_pools, max_len) table of major codes plus pool lengths"""
+    code = {name: i for i, name in enumerate(majors)}
+    lengths = np.array([len(pool) for pool in pools])
+    table = np.zeros((len(pools), lengths.max()), dtype=np.int64)
+    for i, pool in enumerate(pools):
+        table[i, :len(pool)] = [code[name] for name in pool]
+    return table, lengths
+
+def _draw_from_pools(rng, pools, majors, pool_ids):
+    table, lengths = _pool_table(pools, majors)
+    pick = (rng.random(len(pool_ids)) * lengths[pool_ids]).astype(np.int64)
+    return table[pool_ids, pick]
+
+def _assemble(n, scores, gender, average, plan, category, confidence):
+    X = np.empty((n, len(FEATURE_NAMES)))
+    X[:, 0] = gender
+    for j, name in enumerate(FEATURE_NAMES[1:17], start=1):
+        X[:, j] = scores[name]
+    X[:, 17] = average
+    X[:, 18] = plan
+    X[:, 19] = category
+    X[:, 20] = confidence
+    return X
+
+def silent_chunk(rng, n):
+    """One chunk of the SilentKNNPredictor dummy distribution"""
+    gender = rng.integers(0, 2, n)
+    scores = _scores(rng, n, 77, 8, SILENT_SCORES, (60, 100))
+    average = (scores['matematika'] + scores['bahasa_indonesia'] + scores['bahasa_inggris']
+               + scores['fisika'] + scores['kimia'] + scores['biologi'] + scores['sejarah']) / 7
+
+    plan = rng.choice([0, 1, 2], size=n, p=[0.1, 0.2, 0.7])
+    category = rng.integers(0, 2, n)
+    confidence = np.clip(rng.normal(75, 15, n), 50, 100)
+
+    science_avg = (scores['matematika'] + scores['fisika'] + scores['kimia'] + scores['biologi']) / 4
+    social_avg = (scores['sejarah'] + scores['geografi'] + scores['ekonomi'] + scores['sosiologi']) / 4
+    science = science_avg > social_avg + 5
+    social = ~science & (social_avg > science_avg + 5)
+
+    pool_ids = np.full(n, 6)
+    pool_ids[science] = (0 + (scores['matematika'] > 80) + 2 * (scores['biologi'] > 80))[science]
+    pool_ids[social] = (4 + (scores['ekonomi'] > 80))[social]
+    y = _draw_from_pools(rng, SILENT_POOLS, SILENT_MAJORS, pool_ids)
+
+    return _assemble(n, scores, gender, average, plan, category, confidence), y
+
+def database_chunk(rng, n):
+    """One chunk of the DatabaseKNNPredictor dummy distribution"""
+    gender = rng.integers(0, 2, n)
+    scores = _scores(rng, n, 75, 10, DATABASE_SCORES, (50, 100))
+    average = sum(scores[name] for name, _, _, _ in DATABASE_SCORES) / len(DATABASE_SCORES)
+
+    band = (average >= 70).astype(np.int64) + (average >= 80)
+    cumulative = np.cumsum(DATABASE_PLAN_PROBABILITIES, axis=1)[band]
+    plan = (rng.random(n)[:, None] >= cumulative[:, :-1]).sum(axis=1)
+
+    science_avg = (scores['matematika'] + scores['fisika'] + scores['kimia'] + scores['biologi']) / 4
+    social_avg = (scores['sejarah'] + scores['geografi'] + scores['ekonomi'] + scores['sosiologi']) / 4
+    undecided = ~(science_avg > social_avg + 5) & ~(social_avg > science_avg + 5)
+    category = np.where(undecided, rng.integers(0, 2, n), science_avg > social_avg + 5).astype(np.int64)
+
+    confidence = np.clip(rng.normal(75, 15, n), 30, 100)
+
+    math, physics = scores['matematika'], scores['fisika']
+    biology, chemistry = scores['biologi'], scores['kimia']
+    saintek_pool = np.where((math >= 80) & (physics >= 75), 0, np.where((biology >= 80) & (chemistry >= 75), 1, 2))
+    soshum_pool = np.where(scores['ekonomi'] >= 80, 3,
+                           np.where((scores['sosiologi'] >= 80) | (scores['sejarah'] >= 80), 4, 5))
+    pool_ids = np.where(category == 1, saintek_pool, soshum_pool)
+    y = _draw_from_pools(rng, DATABASE_POOLS, DATABASE_MAJORS, pool_ids)
+
+    return _assemble(n, scores, gender, average, plan, category, confidence), y
+
+CHUNK_GENERATORS = {'silent': silent_chunk, 'database': database_chunk}
+
+def generate_chunks(n_samples, profile='silent', seed=42, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield (X, y) chunks: (m, 21) features and (m,) major codes
+
+    Every chunk has its own generator spawned from the seed, so the same
+    seed and chunk size always give the same rows.
+    """
+    chunk = CHUNK_GENERATORS[profile]
+    n_chunks = -(-n_samples // chunk_size)
+    for i, child in enumerate(np.random.SeedSequence(seed).spawn(n_chunks)):
+        size = min(chunk_size, n_samples - i * chunk_size)
+        yield chunk(np.random.default_rng(child), size)
+
+def generate(n_samples, profile='silent', seed=42, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Generate a full dataset
+
+    Returns:
+        tuple: (X, y) - (n_samples, 21) features and major codes into
+        class_names(profile)
+    """
+    X = np.empty((n_samples, len(FEATURE_NAMES)))
+    y = np.empty(n_samples, dtype=np.int64)
+    start = 0
+    for X_chunk, y_chunk in generate_chunks(n_samples, profile, seed, chunk_size):
+        X[start:start + len(X_chunk)] = X_chunk
+        y[start:start + len(y_chunk)] = y_chunk
+        start += len(X_chunk)
+    return X, y
+
+def build_engine(X, y, profile='silent', k=None):
+    """
+    Fit a KNNEngine directly on generated data (all rows, no split)
+
+    Scaling matches StandardScaler and classes are sorted by name like
+    LabelEncoder, so the result behaves like a predictor-trained model.
+    """
+    from knn_engine import KNNEngine
+
+    names = class_names(profile)
+    present = np.flatnonzero(np.bincount(y, minlength=len(names)))
+    present = present[np.argsort(names[present], kind='stable')]
+    remap = np.zeros(len(names), dtype=np.int64)
+    remap[present] = np.arange(len(present))
+
+    mean = X.mean(axis=0)
+    scale = X.std(axis=0)
+    scale[scale == 0.0] = 1.0
+    k = k or PROFILES[profile]['k']
+    schema = PROFILES[profile]['schema']()
+
+    return KNNEngine(
+        X=(X - mean) / scale,
+        labels=remap[y],
+        classes=names[present],
+        k=k,
+        mean=mean,
+        inv_std=1.0 / scale,
+        metadata={'k': k, 'feature_names': list(FEATURE_NAMES), 'feature_schema': schema.to_dict()}
+    )
+
+def write_csv(path, chunks, profile='silent'):
+    """Stream chunks to CSV: the 21 feature columns plus jurusan"""
+    import io
+
+    names = class_names(profile)
+    fmt = ['%d'] + ['%.2f'] * 17 + ['%d', '%d', '%.2f']
+    n_rows = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(','.join(FEATURE_NAMES + ['jurusan']) + '\n')
+        for X, y in chunks:
+            buffer = io.StringIO()
+            np.savetxt(buffer, X, fmt=fmt, delimiter=',')
+            f.write(''.join(f"{row},{name}\n" for row, name in zip(buffer.getvalue().splitlines(), names[y])))
+            n_rows += len(X)
+    return n_rows
+
+def write_output(path, n_samples, profile='silent', seed=42, chunk_size=DEFAULT_CHUNK_SIZE, k=None):
+    """
+    Generate data and write it by output extension
+
+    .csv streams chunk by chunk, .npz stores X, y and the class table,
+    .model builds the engine and saves a memory-mapped model artifact.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    if path.endswith('.csv'):
+        n_rows = write_csv(path, generate_chunks(n_samples, profile, seed, chunk_size), profile)
+        return {'format': 'csv', 'n_rows': n_rows}
+
+    X, y = generate(n_samples, profile, seed, chunk_size)
+    if path.endswith('.npz'):
+        np.savez(path, X=X, y=y, classes=class_names(profile), feature_names=np.array(FEATURE_NAMES))
+        return {'format': 'npz', 'n_rows': len(X)}
+    if path.endswith('.model'):
+        from model_store import save_artifact
+
+        engine = build_engine(X, y, profile, k)
+        save_artifact(engine, path)
+        return {'format': 'artifact', 'n_rows': len(X), 'n_classes': int(len(engine.classes)), 'k': engine.k}
+    raise ValueError(f"Unsupported output type (use .csv, .npz or .model): {path}")
+
+def parse_args(argv=None):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Generate synthetic KNN training data")
+    parser.add_argument('--rows', type=int, default=DEFAULT_CHUNK_SIZE, help="Number of rows to generate")
+    parser.add_argument('--profile', choices=sorted(PROFILES), default='silent',
+                        help="Distribution of predict_silent.py or predict_db.py dummy data")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--k', type=int, help="Neighbors for a .model output (default: profile's k)")
+    parser.add_argument('--output', required=True, help="Output path: .csv, .npz or .model")
+    return parser.parse_args(argv)
+
+def main():
+    """Main function for command line usage"""
+    import time
+
+    args = parse_args()
+    start = time.perf_counter()
+    try:
+        result = write_output(args.output, args.rows, args.profile, args.seed, args.chunk_size, args.k)
+        result.update({
+            'success': True,
+            'output': args.output,
+            'profile': args.profile,
+            'seed': args.seed,
+            'seconds': round(time.perf_counter() - start, 3)
+        })
+    except Exception as e:
+        result = {'success': False, 'error': f"Generation error: {str(e)}"}
+    print(json.dumps(result, indent=2))
+    if not result['success']:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
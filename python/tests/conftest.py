@@ -0,0 +1,4 @@
+import os
+
+# Keep test runs out of the shared metrics store (data/metrics.sqlite)
+os.environ.setdefault('PREDICT_METRICS', 'off')
@@ -0,0 +1,115 @@
+"""
+Column output must carry the same predictions as the per-row JSON results
+and round-trip through every writer; top_n must equal a stable argsort.
+"""
+
+import io
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_predict import run_batch_columns, write_columns
+from knn_engine import KNNEngine
+from predict_db import DatabaseKNNPredictor
+from predict_silent import SilentKNNPredictor
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+INPUTS = [
+    {"jenis_kelamin": "Laki-laki", "matematika": 85, "fisika": 88, "rencana_kuliah": "Iya",
+     "kategori_jurusan": "Saintek", "tingkat_keyakinan": 85},
+    {"matematika": 60, "sejarah": 90, "kategori_jurusan": "Soshum"},
+    {"matematika": "not a number"}
+]
+
+@pytest.fixture
+def predictor(tmp_path):
+    source = os.path.join(DATA_DIR, 'knn_model_db.pkl')
+    if not os.path.exists(source):
+        pytest.skip("knn_model_db.pkl not available")
+    target = str(tmp_path / 'knn_model_db.pkl')
+    shutil.copy(source, target)
+    predictor = DatabaseKNNPredictor()
+    assert predictor.load_model(target)
+    return predictor
+
+@pytest.fixture
+def silent_predictor(tmp_path):
+    source = os.path.join(DATA_DIR, 'knn_model_silent.pkl')
+    if not os.path.exists(source):
+        pytest.skip("knn_model_silent.pkl not available")
+    target = str(tmp_path / 'knn_model_silent.pkl')
+    shutil.copy(source, target)
+    predictor = SilentKNNPredictor()
+    assert predictor.load_model(target)
+    return predictor
+
+# Below and above FULL_SORT_MAX_CLASSES
+@pytest.mark.parametrize('n_classes', [20, 200])
+def test_top_n_matches_stable_argsort(n_classes):
+    engine = KNNEngine(np.zeros((1, 1)), [0], ['a'], 1, np.zeros(1), np.ones(1))
+    rng = np.random.default_rng(0)
+    # Coarse probabilities: many ties at the n-th place
+    P = rng.integers(0, 5, (500, n_classes)) / 4
+    assert np.array_equal(engine.top_n(P, 7), np.argsort(-P, axis=1, kind='stable')[:, :7])
+
+def test_columns_match_row_results(predictor):
+    rows = predictor.predict_batch(INPUTS)
+    columns = predictor.predict_columns(INPUTS)
+    classes = columns['classes']
+
+    for i, row in enumerate(rows[:2]):
+        data = row['data']
+        assert classes[columns['predicted'][i]] == data['predicted_major']
+        assert columns['confidence'][i] == pytest.approx(data['confidence'], abs=0.01)
+        assert list(classes[columns['top_classes'][i]]) == [r['major'] for r in data['recommendations']]
+        assert np.allclose(columns['top_probability'][i], [r['probability'] for r in data['recommendations']])
+
+    assert columns['predicted'][2] == -1 and np.isnan(columns['confidence'][2])
+    assert columns['errors'][2] == rows[2]['error']
+
+def test_writers_round_trip(predictor, tmp_path, monkeypatch):
+    source = tmp_path / 'input.jsonl'
+    source.write_text('\n'.join(json.dumps(row) for row in INPUTS) + '\n[1]\n', encoding='utf-8')
+    columns = run_batch_columns(str(source), predictor.predict_columns, 'npz', str(tmp_path / 'out.npz'))
+    assert columns['errors'][3] == "Invalid JSON input: expected an object"
+
+    stored = np.load(tmp_path / 'out.npz')
+    assert list(stored['classes']) == list(columns['classes'])
+    assert np.array_equal(stored['top_classes'], columns['top_classes'])
+    assert list(stored['error_rows']) == [2, 3]
+
+    write_columns(columns, 'npy', str(tmp_path / 'npy'))
+    assert np.array_equal(np.load(tmp_path / 'npy' / 'predicted.npy'), columns['predicted'])
+
+    stdout = io.StringIO()
+    monkeypatch.setattr(sys, 'stdout', stdout)
+    write_columns(columns, 'json')
+    encoded = json.loads(stdout.getvalue())
+    assert encoded['predicted'] == columns['predicted'].tolist()
+    assert encoded['confidence'][2] is None and encoded['top_probability'][3] is None
+    assert encoded['errors']['2'] == columns['errors'][2]
+
+def test_tied_votes_rank_alike(silent_predictor):
+    # k=7 uniform votes over 20 classes: every row has tied classes
+    rng = np.random.default_rng(0)
+    subjects = ['matematika', 'fisika', 'kimia', 'biologi', 'ekonomi', 'sejarah', 'geografi', 'sosiologi']
+    inputs = [dict(zip(subjects, rng.integers(60, 100, len(subjects)).tolist())) for _ in range(50)]
+    rows = silent_predictor.predict_batch(inputs)
+    columns = silent_predictor.predict_columns(inputs)
+    classes = columns['classes']
+
+    tied = 0
+    for i, row in enumerate(rows):
+        recommendations = row['data']['recommendations']
+        probabilities = [r['probability'] for r in recommendations]
+        tied += len(set(probabilities)) < len(probabilities)
+        assert list(classes[columns['top_classes'][i]]) == [r['major'] for r in recommendations]
+        assert classes[columns['predicted'][i]] == row['data']['predicted_major'] == recommendations[0]['major']
+    assert tied
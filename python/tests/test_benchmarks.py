@@ -0,0 +1,29 @@
+"""
+Regression check of the benchmark suite: slower timings and lower
+throughput beyond the tolerance are flagged, anything else is not.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+from run_benchmarks import compare, rate, seconds
+
+def test_compare_flags_regressions_beyond_tolerance():
+    baseline = {'metrics': {
+        'cold_start.predict_silent.median': seconds(0.10),
+        'warm.predict_silent.median': seconds(0.001),
+        'batch.predict_silent.n1000': rate(20000.0),
+        'batch.predict_silent.n10000': rate(20000.0)
+    }}
+    current = {
+        'cold_start.predict_silent.median': seconds(0.13),
+        'warm.predict_silent.median': seconds(0.0011),
+        'batch.predict_silent.n1000': rate(15000.0),
+        'batch.predict_silent.n10000': rate(30000.0),
+        'training.predict_db.n1000': seconds(1.0)
+    }
+
+    regressions = compare(current, baseline, tolerance=0.2)
+    assert sorted(r['name'] for r in regressions) == ['batch.predict_silent.n1000', 'cold_start.predict_silent.median']
@@ -0,0 +1,141 @@
+"""
+Cohort job against the SQLite stand-in: one anti-join selects students
+without a prediction, rows are written in chunks, and an interrupted run
+resumes from its checkpoint without duplicating or skipping students.
+"""
+
+import json
+import os
+import random
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cohort_job import INSERT_COLUMNS, run_cohort
+from db_pool import SQLitePool
+from feature_schema import ACADEMIC_FIELDS
+from predict_db import DatabaseKNNPredictor
+
+SCHEMA = [
+    "CREATE TABLE siswa_lengkap (id INTEGER PRIMARY KEY, jenis_kelamin TEXT, kelas TEXT)",
+    "CREATE TABLE nilai_akademik (id INTEGER PRIMARY KEY AUTOINCREMENT, siswa_lengkap_id INTEGER, %s)"
+    % ', '.join(f"{f} REAL" for f in ACADEMIC_FIELDS),
+    "CREATE TABLE survei_minat_bakat (id INTEGER PRIMARY KEY AUTOINCREMENT, siswa_lengkap_id INTEGER,"
+    " rencana_kuliah TEXT, jurusan_diminati TEXT, kategori_jurusan TEXT, tingkat_keyakinan INTEGER)",
+    "CREATE TABLE prediksi_jurusan (id INTEGER PRIMARY KEY AUTOINCREMENT, siswa_lengkap_id INTEGER, %s)"
+    % ', '.join(INSERT_COLUMNS[1:]),
+    # Indexes of the Laravel migrations the anti-join relies on
+    "CREATE INDEX nilai_siswa ON nilai_akademik (siswa_lengkap_id)",
+    "CREATE INDEX survei_siswa ON survei_minat_bakat (siswa_lengkap_id)",
+    "CREATE INDEX prediksi_siswa ON prediksi_jurusan (siswa_lengkap_id)"
+]
+
+@pytest.fixture(scope='module')
+def predictor():
+    predictor = DatabaseKNNPredictor()
+    assert predictor.create_enhanced_dummy_model()
+    return predictor
+
+@pytest.fixture
+def database(tmp_path):
+    path = str(tmp_path / 'database.sqlite')
+    rng = random.Random(0)
+    conn = sqlite3.connect(path)
+    for statement in SCHEMA:
+        conn.execute(statement)
+    for i in range(1, 121):
+        conn.execute("INSERT INTO siswa_lengkap VALUES (?, ?, ?)",
+                     (i, rng.choice(['Laki-laki', 'Perempuan']), 'XII IPA' if i % 2 else 'XII IPS'))
+        if i % 20 != 0:
+            conn.execute("INSERT INTO nilai_akademik (siswa_lengkap_id, %s) VALUES (%s)"
+                         % (', '.join(ACADEMIC_FIELDS), ','.join('?' * 18)),
+                         [i] + [round(rng.uniform(50, 100), 2) for _ in ACADEMIC_FIELDS])
+        conn.execute("INSERT INTO survei_minat_bakat (siswa_lengkap_id, rencana_kuliah, jurusan_diminati,"
+                     " kategori_jurusan, tingkat_keyakinan) VALUES (?, ?, ?, ?, ?)",
+                     (i, 'Iya', 'x', rng.choice(['Saintek', 'Soshum']), rng.randint(1, 5)))
+    # Students 1-10 already have a prediction
+    conn.executemany("INSERT INTO prediksi_jurusan (siswa_lengkap_id, jurusan_prediksi) VALUES (?, 'Hukum')",
+                     [(i,) for i in range(1, 11)])
+    conn.commit()
+    conn.close()
+    return path
+
+def predicted_ids(path):
+    conn = sqlite3.connect(path)
+    ids = [row[0] for row in conn.execute("SELECT siswa_lengkap_id FROM prediksi_jurusan WHERE id > 10")]
+    conn.close()
+    return ids
+
+def test_kelas_run_writes_missing_students(database, predictor, tmp_path):
+    checkpoint = str(tmp_path / 'checkpoint.json')
+    report = run_cohort(predictor, SQLitePool(database), kelas='XII IPA', chunk_size=16, checkpoint_path=checkpoint)
+
+    expected = [i for i in range(11, 121, 2)]
+    assert report['selected'] == len(expected)
+    # Every 20th student has no nilai_akademik row; all of them are even, so none is in XII IPA
+    assert report['predicted'] == len(expected) and report['failed'] == 0
+    assert sorted(predicted_ids(database)) == expected
+    assert not os.path.exists(checkpoint)
+
+    conn = sqlite3.connect(database)
+    row = conn.execute("SELECT jurusan_prediksi, confidence_score, parameter_input FROM prediksi_jurusan"
+                       " WHERE siswa_lengkap_id = 11").fetchone()
+    conn.close()
+    parameter_input = json.loads(json.loads(row[2]))
+    single = predictor.predict_batch([parameter_input['input_data']])[0]['data']
+    assert row[0] == single['predicted_major']
+    assert row[1] == pytest.approx(single['confidence'] / 100)
+
+    # Nothing left to do on a second run
+    assert run_cohort(predictor, SQLitePool(database), kelas='XII IPA', checkpoint_path=checkpoint)['selected'] == 0
+
+def test_all_missing_reports_students_without_grades(database, predictor, tmp_path):
+    report = run_cohort(predictor, SQLitePool(database), checkpoint_path=str(tmp_path / 'checkpoint.json'))
+    missing_grades = [i for i in range(20, 121, 20)]
+    assert report['failed'] == len(missing_grades)
+    assert [f['siswa_id'] for f in report['failures']] == missing_grades
+    assert report['predicted'] == 110 - len(missing_grades)
+
+class Interrupted(Exception):
+    pass
+
+class FlakyPredictor:
+    """Delegates to a real predictor but dies on a given call"""
+
+    def __init__(self, predictor, fail_on_call):
+        self.predictor = predictor
+        self.k = predictor.k
+        self.calls = 0
+        self.fail_on_call = fail_on_call
+
+    def predict_batch(self, inputs):
+        self.calls += 1
+        if self.calls == self.fail_on_call:
+            raise Interrupted()
+        return self.predictor.predict_batch(inputs)
+
+def test_interrupted_run_resumes_from_checkpoint(database, predictor, tmp_path):
+    checkpoint = str(tmp_path / 'checkpoint.json')
+    with pytest.raises(Interrupted):
+        run_cohort(FlakyPredictor(predictor, 3), SQLitePool(database), chunk_size=25, checkpoint_path=checkpoint)
+
+    with open(checkpoint) as f:
+        state = json.load(f)['all-missing']
+    written = predicted_ids(database)
+    # Two chunks of 25 committed: students 11-60, 20, 40 and 60 failed for missing grades
+    assert state['last_id'] == 60
+    assert state['predicted'] == len(written) == 47
+
+    # A different scope neither picks up nor drops this checkpoint
+    assert run_cohort(predictor, SQLitePool(database), kelas='nope', checkpoint_path=checkpoint)['resumed'] is False
+    assert os.path.exists(checkpoint)
+
+    report = run_cohort(predictor, SQLitePool(database), chunk_size=25, checkpoint_path=checkpoint)
+    assert report['resumed'] and report['resumed_from_id'] == state['last_id']
+    ids = predicted_ids(database)
+    assert len(ids) == len(set(ids)) == report['predicted']
+    assert report['failed'] == 6
+    assert not os.path.exists(checkpoint)
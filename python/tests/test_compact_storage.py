@@ -0,0 +1,100 @@
+"""
+Compact storage must find the same neighbors as the float64 engine when
+every feature is representable (ties included), survive the artifact
+round trip and be kept when an artifact is rebuilt.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import compact_storage
+from compact_storage import CompactKNNEngine, accuracy_check, choose_encoding
+from knn_engine import KNNEngine
+from knn_index import build_index
+from model_store import load_artifact, read_header, replace_engine, save_artifact
+
+def make_engine(n, seed=0):
+    """Grades 60-100, 0/1 flags and 0.1-step interests, like the model features"""
+    rng = np.random.default_rng(seed)
+    raw = np.hstack([
+        rng.integers(60, 101, (n, 5)),
+        rng.integers(0, 2, (n, 2)),
+        rng.integers(0, 11, (n, 2)) / 10
+    ]).astype(float)
+    # Duplicate rows give equal distances
+    raw[n // 2:n // 2 + 50] = raw[:50]
+    mean, inv_std = raw.mean(axis=0), 1 / raw.std(axis=0)
+    return KNNEngine((raw - mean) * inv_std, rng.integers(0, 3, n), ['a', 'b', 'c'], 5, mean, inv_std), raw
+
+def test_encoding_is_lossless_for_model_features():
+    _, raw = make_engine(300)
+    offset, step, lossless = choose_encoding(raw)
+    assert lossless.all()
+    assert list(step) == [1.0] * 7 + [0.1] * 2
+
+    # A spread wider than 255 codes needs uint16
+    with pytest.raises(ValueError):
+        choose_encoding(np.array([[0.0], [1000.0]]))
+    assert choose_encoding(np.array([[0.0], [1000.0]]), np.uint16)[2].all()
+
+def test_same_neighbors_as_float64(monkeypatch):
+    # Small blocks: exercise the merge of per-block shortlists
+    monkeypatch.setattr(compact_storage, 'TRAINING_BLOCK_ROWS', 64)
+    engine, raw = make_engine(1000)
+    compact = CompactKNNEngine.from_engine(engine)
+    assert compact.codes.dtype == np.uint8 and compact.labels.dtype == np.uint8
+
+    Q = engine.transform(np.vstack([raw[:40], raw[::25] + 0.3]))
+    expected_d, expected_i = engine.kneighbors(Q)
+    distances, indices = compact.kneighbors(Q)
+    assert (indices == expected_i).all()
+    assert np.allclose(distances, expected_d, atol=1e-6)
+
+    report = accuracy_check(engine, compact, n_random=200)
+    assert report['neighbor_agreement'] == 1.0 and report['max_proba_diff'] == 0.0
+
+def test_artifact_round_trip_keeps_storage(tmp_path):
+    engine, raw = make_engine(400)
+    compact = CompactKNNEngine.from_engine(engine)
+    path = str(tmp_path / 'model.model')
+    save_artifact(compact, path)
+    assert read_header(path)['storage'] == 'compact'
+
+    loaded = load_artifact(path)
+    assert loaded.storage == 'compact'
+    Q = engine.transform(raw[:20] + 0.5)
+    assert (loaded.kneighbors(Q)[1] == engine.kneighbors(Q)[1]).all()
+    assert np.allclose(loaded.X, engine.X)
+
+    # A float64 engine replacing a compact artifact is re-encoded
+    replace_engine(engine, path)
+    assert read_header(path)['storage'] == 'compact'
+    assert not os.path.exists(os.path.join(path, 'X.npy'))
+
+@pytest.mark.parametrize('kind,params', [
+    ('kd_tree', {'leaf_size': 16}),
+    ('ivf', {'nlist': 10, 'nprobe': 3}),
+    ('collapsed', {})
+])
+def test_index_queries_do_not_build_float64_matrix(tmp_path, kind, params):
+    engine, raw = make_engine(600)
+    if kind == 'collapsed':
+        params = dict(labels=engine.labels, n_classes=len(engine.classes))
+    engine.index = build_index(kind, engine.X, **params)
+    compact = CompactKNNEngine.from_engine(engine)
+    compact.index = engine.index
+    path = str(tmp_path / 'model.model')
+    save_artifact(compact, path)
+
+    X_probe = np.vstack([raw[:30], raw[::20] + 0.3])
+    for candidate in (compact, load_artifact(path)):
+        distances, indices = candidate.kneighbors(candidate.transform(X_probe))
+        expected_d, expected_i = engine.kneighbors(engine.transform(X_probe))
+        assert (indices == expected_i).all() and np.allclose(distances, expected_d, atol=1e-6)
+        assert np.array_equal(candidate.predict_proba(X_probe), engine.predict_proba(X_probe))
+        assert candidate._X is None and candidate._X_norms is None
@@ -0,0 +1,184 @@
+"""
+Connection pool tests against the SQLite stand-in, plus the database
+training and update paths of DatabaseKNNPredictor running through it.
+"""
+
+import os
+import random
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_pool
+from db_pool import PoolExhausted, SQLitePool
+from feature_schema import ACADEMIC_FIELDS
+
+SCHEMA = [
+    "CREATE TABLE siswa_lengkap (id INTEGER PRIMARY KEY, jenis_kelamin TEXT)",
+    "CREATE TABLE nilai_akademik (siswa_lengkap_id INTEGER, %s)" % ', '.join(f"{f} REAL" for f in ACADEMIC_FIELDS),
+    "CREATE TABLE survei_minat_bakat (siswa_lengkap_id INTEGER, rencana_kuliah TEXT, jurusan_diminati TEXT,"
+    " kategori_jurusan TEXT, tingkat_keyakinan INTEGER)",
+    "CREATE TABLE prediksi_jurusan (id INTEGER PRIMARY KEY AUTOINCREMENT, siswa_lengkap_id INTEGER,"
+    " jurusan_prediksi TEXT)"
+]
+
+def add_students(path, first_id, count, majors, seed=0, survey=True):
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    for i in range(first_id, first_id + count):
+        conn.execute("INSERT INTO siswa_lengkap VALUES (?, ?)", (i, rng.choice(['Laki-laki', 'Perempuan'])))
+        conn.execute("INSERT INTO nilai_akademik VALUES (%s)" % ','.join('?' * 18),
+                     [i] + [round(rng.uniform(50, 100), 2) for _ in ACADEMIC_FIELDS])
+        if survey:
+            add_survey(conn, i, rng)
+        conn.execute("INSERT INTO prediksi_jurusan (siswa_lengkap_id, jurusan_prediksi) VALUES (?, ?)",
+                     (i, rng.choice(majors)))
+    conn.commit()
+    conn.close()
+
+def add_survey(conn, student_id, rng):
+    conn.execute("INSERT INTO survei_minat_bakat VALUES (?, ?, ?, ?, ?)",
+                 (student_id, rng.choice(['Iya', 'Masih ragu', 'Tidak']), 'x', rng.choice(['Saintek', 'Soshum']),
+                  rng.randint(1, 5)))
+
+@pytest.fixture
+def database(tmp_path):
+    path = str(tmp_path / 'database.sqlite')
+    conn = sqlite3.connect(path)
+    for statement in SCHEMA:
+        conn.execute(statement)
+    conn.close()
+    add_students(path, 1, 200, ['Hukum', 'Farmasi', 'Teknik Informatika'])
+    return path
+
+def test_lease_reuses_connection(database):
+    pool = SQLitePool(database, pool_size=2)
+    with pool.lease() as first:
+        pass
+    with pool.lease() as second:
+        assert second.execute("SELECT COUNT(*) FROM siswa_lengkap").fetchone() == (200,)
+    assert first is second
+    assert pool.stats == {'leases': 2, 'opened': 1, 'replaced': 0}
+
+def test_broken_connection_is_replaced(database):
+    pool = SQLitePool(database, pool_size=1)
+    with pool.lease() as conn:
+        conn.close()
+    with pool.lease() as conn:
+        assert conn.execute("SELECT 1").fetchone() == (1,)
+    assert pool.stats['replaced'] == 1
+
+def test_pool_size_is_bounded(database):
+    pool = SQLitePool(database, pool_size=1, lease_timeout=0.05)
+    with pool.lease():
+        with pytest.raises(PoolExhausted):
+            pool.acquire()
+
+def test_config_is_read_once(monkeypatch, tmp_path):
+    monkeypatch.setattr(db_pool, '_config', None)
+    monkeypatch.setenv('DB_CONNECTION', 'sqlite')
+    monkeypatch.setenv('DB_DATABASE', str(tmp_path / 'app.sqlite'))
+    monkeypatch.setenv('DB_POOL_SIZE', '3')
+    config = db_pool.load_config()
+
+    monkeypatch.setenv('DB_POOL_SIZE', '9')
+    assert db_pool.load_config() is config
+    pool = db_pool.create_pool()
+    assert isinstance(pool, SQLitePool)
+    assert pool.pool_size == 3
+
+def test_database_predictor_trains_and_updates_through_pool(database, tmp_path):
+    from predict_db import DatabaseKNNPredictor
+
+    pool = SQLitePool(database)
+    model_path = str(tmp_path / 'knn_model_db.pkl')
+    predictor = DatabaseKNNPredictor(pool=pool)
+    assert predictor.train_model()
+    assert predictor.save_model(model_path)
+    assert predictor.engine.metadata['watermark'] == 200
+
+    add_students(database, 201, 30, ['Hukum', 'Kimia'], seed=1)
+    report = DatabaseKNNPredictor(pool=pool).update(model_path)
+    assert report['success'], report
+    assert report['n_added'] == 30
+    assert report['new_classes'] == ['Kimia']
+    assert report['watermark'] == 230
+
+    updated = DatabaseKNNPredictor()
+    assert updated.load_model(model_path)
+    assert len(updated.engine.X) == len(predictor.engine.X) + 30
+    assert 'Kimia' in updated.engine.classes
+    assert pool.stats['opened'] == 1
+
+def test_update_picks_up_late_rows_and_rewrites_the_pickle(database, tmp_path):
+    import shutil
+    import numpy as np
+    from model_store import artifact_path, load_engine
+    from predict_db import DatabaseKNNPredictor
+
+    pool = SQLitePool(database)
+    model_path = str(tmp_path / 'knn_model_db.pkl')
+    # Student 201 has a prediction but fills in the survey only later,
+    # student 202 has no grades yet; both are below the watermark (203)
+    add_students(database, 201, 1, ['Hukum'], seed=2, survey=False)
+    add_students(database, 202, 2, ['Hukum'], seed=5)
+    conn = sqlite3.connect(database)
+    conn.execute("DELETE FROM nilai_akademik WHERE siswa_lengkap_id = 202")
+    conn.commit()
+    conn.close()
+    predictor = DatabaseKNNPredictor(pool=pool)
+    assert predictor.train_model()
+    assert predictor.save_model(model_path)
+    assert predictor.engine.metadata['watermark'] == 203
+    assert predictor.engine.metadata['pending_ids'] == [201, 202]
+
+    add_students(database, 204, 10, ['Hukum'], seed=3)
+    report = DatabaseKNNPredictor(pool=pool).update(model_path)
+    assert (report['n_added'], report['watermark'], report['pending']) == (10, 213, 2)
+
+    conn = sqlite3.connect(database)
+    add_survey(conn, 201, random.Random(4))
+    conn.commit()
+    conn.close()
+    updater = DatabaseKNNPredictor(pool=pool)
+    report = updater.update(model_path, drift_threshold=0)
+    assert (report['n_added'], report['watermark'], report['pending']) == (1, 213, 1)
+    assert report['restandardized']
+    assert DatabaseKNNPredictor(pool=pool).update(model_path)['n_added'] == 0
+
+    # The pickle alone gives the updated engine
+    updated = updater.engine
+    shutil.rmtree(artifact_path(model_path))
+    converted = load_engine(model_path)
+    for name in ('X', 'labels', 'classes', 'mean', 'inv_std'):
+        assert np.array_equal(getattr(converted, name), getattr(updated, name)), name
+    assert converted.metadata['watermark'] == 213 and converted.metadata['pending_ids'] == [202]
+
+def test_pending_ids_expire_behind_the_watermark(database, tmp_path, monkeypatch):
+    import training_data
+    from predict_db import DatabaseKNNPredictor
+
+    monkeypatch.setattr(training_data, 'PENDING_MAX_LAG', 5)
+    pool = SQLitePool(database)
+    model_path = str(tmp_path / 'knn_model_db.pkl')
+    # 194 is already too far behind when the model is trained
+    conn = sqlite3.connect(database)
+    conn.execute("DELETE FROM survei_minat_bakat WHERE siswa_lengkap_id IN (194, 199)")
+    conn.commit()
+    conn.close()
+    predictor = DatabaseKNNPredictor(pool=pool)
+    assert predictor.train_model()
+    assert predictor.save_model(model_path)
+    assert predictor.engine.metadata['pending_ids'] == [199]
+
+    add_students(database, 201, 3, ['Hukum'], seed=3)
+    report = DatabaseKNNPredictor(pool=pool).update(model_path)
+    assert (report['watermark'], report['pending'], report['pending_expired']) == (203, 1, 0)
+
+    add_students(database, 204, 3, ['Hukum'], seed=4)
+    report = DatabaseKNNPredictor(pool=pool).update(model_path)
+    assert (report['watermark'], report['pending'], report['pending_expired']) == (206, 0, 1)
+    assert DatabaseKNNPredictor(pool=pool).update(model_path)['n_added'] == 0
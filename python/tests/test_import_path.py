@@ -0,0 +1,102 @@
+"""
+Regression test: the prediction path must not import training-only packages
+(pandas, mysql). Each case runs in a fresh interpreter where importing those
+packages raises ImportError, so any import on the serving path fails the test.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+PYTHON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(PYTHON_DIR, 'data')
+
+BLOCKER = textwrap.dedent('''
+    import sys
+
+    class BlockTrainingImports:
+        blocked = {'pandas', 'mysql'}
+
+        def find_spec(self, name, path=None, target=None):
+            if name.split('.')[0] in self.blocked:
+                raise ImportError(f"{name} imported on the prediction path")
+            return None
+
+    sys.meta_path.insert(0, BlockTrainingImports())
+    sys.path.insert(0, %r)
+''') % PYTHON_DIR
+
+SILENT_INPUT = {
+    "jenis_kelamin": "Laki-laki", "matematika": 85, "bahasa_indonesia": 80, "fisika": 88,
+    "rencana_kuliah": "Iya", "kategori_jurusan": "Saintek", "tingkat_keyakinan": 85
+}
+
+CSV_INPUT = {
+    "jenis_kelamin": "Perempuan", "mata_pelajaran_dikuasai": ["matematika", "fisika"],
+    "minat_ipa": 0.9, "minat_ips": 0.2, "minat_bahasa": 0.4, "minat_seni": 0.1
+}
+
+def run_isolated(body):
+    """Run body after the blocker; return the JSON it prints on its last line"""
+    proc = subprocess.run(
+        [sys.executable, '-W', 'ignore', '-c', BLOCKER + textwrap.dedent(body)],
+        capture_output=True, text=True, cwd=PYTHON_DIR
+    )
+    assert proc.returncode == 0, proc.stderr
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def copy_model(tmp_path, name):
+    path = os.path.join(DATA_DIR, name)
+    if not os.path.exists(path):
+        pytest.skip(f"{name} not available")
+    target = tmp_path / name
+    shutil.copy(path, target)
+    return str(target)
+
+@pytest.mark.parametrize('module', ['predict_silent', 'predict_db', 'predict', 'knn_predictor'])
+def test_module_import_does_not_load_training_packages(module):
+    result = run_isolated(f'''
+        import json
+        import {module}
+        # Tuning helpers are only needed by the tune command
+        print(json.dumps({{"success": 'knn_tuning' not in sys.modules}}))
+    ''')
+    assert result["success"]
+
+def test_silent_predict_path(tmp_path):
+    model_path = copy_model(tmp_path, 'knn_model_silent.pkl')
+    result = run_isolated(f'''
+        import json
+        from predict_silent import load_predictor
+        predictor = load_predictor({model_path!r})
+        print(json.dumps(predictor.predict({SILENT_INPUT!r})))
+    ''')
+    assert result["success"], result
+
+def test_db_predict_path(tmp_path):
+    model_path = copy_model(tmp_path, 'knn_model_db.pkl')
+    result = run_isolated(f'''
+        import json
+        from predict_db import DatabaseKNNPredictor
+        predictor = DatabaseKNNPredictor()
+        assert predictor.load_model({model_path!r})
+        print(json.dumps(predictor.predict_batch([{SILENT_INPUT!r}])[0]))
+    ''')
+    assert result["success"], result
+
+def test_csv_predict_path(tmp_path):
+    model_path = copy_model(tmp_path, 'knn_model.pkl')
+    result = run_isolated(f'''
+        import json
+        from knn_predictor import KNNPredictor
+        from predict import to_student_data
+        knn = KNNPredictor()
+        assert knn.load_model({model_path!r})
+        print(json.dumps(knn.predict_single(to_student_data({CSV_INPUT!r}))))
+    ''')
+    assert result["success"], result
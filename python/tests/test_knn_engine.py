@@ -0,0 +1,95 @@
+"""
+An exported engine must give the same neighbors and probabilities as the
+sklearn model it was exported from. Tied rows that share a label make no
+difference; where a tie with different labels crosses the k-th neighbor,
+sklearn keeps an arbitrary row and the engine the lowest training index.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from knn_engine import KNNEngine, export_model
+
+CLASSES = ['Agama', 'Bahasa', 'IPA', 'IPS']
+
+def make_data(n=300, seed=0):
+    """Continuous grades, then duplicated rows (equal distances)"""
+    rng = np.random.default_rng(seed)
+    X = rng.normal(80, 8, (n, 4))
+    names = rng.choice(CLASSES, n)
+    # Same-label duplicates, several copies of some rows
+    dupes = rng.integers(0, n, n // 3)
+    return np.vstack([X, X[dupes]]), np.concatenate([names, names[dupes]]), rng
+
+def fit_and_export(tmp_path, X, names, weights, p):
+    import joblib
+    from sklearn.neighbors import KNeighborsClassifier
+    from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+    label_encoder = LabelEncoder().fit(names)
+    scaler = StandardScaler().fit(X)
+    model = KNeighborsClassifier(n_neighbors=5, weights=weights, p=p)
+    model.fit(scaler.transform(X), label_encoder.transform(names))
+
+    model_path = str(tmp_path / 'model.pkl')
+    joblib.dump({'model': model, 'scaler': scaler, 'label_encoder': label_encoder,
+                 'feature_names': ['f0', 'f1', 'f2', 'f3'], 'k': 5}, model_path)
+    result = export_model(model_path)
+    assert result['success'] and result['n_classes'] == len(CLASSES)
+    return model, scaler, KNNEngine.load(result['output_path']), result
+
+def probes(X, rng):
+    # Training rows (exact matches) and points around them
+    return np.vstack([X, X[rng.integers(0, len(X), 200)] + rng.normal(0, 4, (200, X.shape[1]))])
+
+@pytest.mark.parametrize('weights', ['uniform', 'distance'])
+@pytest.mark.parametrize('p', [2, 1])
+def test_exported_engine_matches_sklearn(tmp_path, weights, p):
+    X, names, rng = make_data()
+    model, scaler, engine, result = fit_and_export(tmp_path, X, names, weights, p)
+    assert list(engine.classes) == CLASSES and engine.p == p
+    assert result['verification']['label_agreement'] == 1.0
+
+    Q = probes(X, rng)
+    expected_d, expected_i = model.kneighbors(scaler.transform(Q))
+    distances, indices = engine.kneighbors(engine.transform(Q))
+    assert np.allclose(distances, expected_d, atol=1e-6)
+    # Tied duplicates may be different rows, but with the same labels
+    assert (np.sort(engine.labels[indices], axis=1) == np.sort(model._y[expected_i], axis=1)).all()
+
+    expected = model.predict_proba(scaler.transform(Q))
+    actual = engine.predict_proba(Q)
+    assert np.allclose(actual, expected, atol=1e-6)
+    assert (np.argmax(actual, axis=1) == np.argmax(expected, axis=1)).all()
+
+def test_conflicting_ties_keep_the_lowest_rows(tmp_path):
+    X, names, rng = make_data()
+    # Copies of the same rows with another label
+    conflicts = rng.integers(0, 300, 60)
+    X = np.vstack([X, X[conflicts]])
+    names = np.concatenate([names, np.roll(CLASSES, 1)[np.searchsorted(CLASSES, names[conflicts])]])
+    model, scaler, engine, _ = fit_and_export(tmp_path, X, names, 'uniform', 2)
+
+    Q = probes(X, rng)
+    expected_d, expected_i = model.kneighbors(scaler.transform(Q))
+    distances, indices = engine.kneighbors(engine.transform(Q))
+    assert np.allclose(distances, expected_d, atol=1e-6)
+
+    # Row distances of every probe, ranked by (distance, training index)
+    full = np.linalg.norm(engine.transform(Q)[:, None, :] - engine.X[None, :, :], axis=2)
+    kth = np.sort(full, axis=1)[:, 4:6]
+    straddling = np.isclose(kth[:, 0], kth[:, 1])
+    assert straddling.any() and not straddling.all()
+
+    for r in np.flatnonzero(straddling):
+        order = np.lexsort((np.arange(len(X)), np.round(full[r], 9)))
+        assert sorted(indices[r]) == sorted(order[:5])
+
+    expected = model.predict_proba(scaler.transform(Q))
+    actual = engine.predict_proba(Q)
+    assert np.allclose(actual[~straddling], expected[~straddling], atol=1e-6)
@@ -0,0 +1,68 @@
+"""
+The single-graph leave-one-out sweep must give the same accuracy for
+every k as refitting KNeighborsClassifier without each row in turn.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from knn_engine import KNNEngine
+from knn_evaluation import loo_neighbors, loo_sweep
+
+def sklearn_loo_accuracy(X, y, k, weights):
+    from sklearn.neighbors import KNeighborsClassifier
+
+    correct = 0
+    for i in range(len(y)):
+        keep = np.arange(len(y)) != i
+        model = KNeighborsClassifier(n_neighbors=k, weights=weights, algorithm='brute').fit(X[keep], y[keep])
+        correct += model.predict(X[i:i + 1])[0] == y[i]
+    return correct / len(y)
+
+def engine_loo_accuracy(X, y, k, weights):
+    correct = 0
+    for i in range(len(y)):
+        keep = np.arange(len(y)) != i
+        engine = KNNEngine(X[keep], y[keep], np.arange(3), k, np.zeros(X.shape[1]), np.ones(X.shape[1]), weights)
+        correct += engine.predict(X[i:i + 1])[0] == y[i]
+    return correct / len(y)
+
+@pytest.mark.parametrize('weights', ['uniform', 'distance'])
+def test_sweep_matches_sklearn(weights):
+    rng = np.random.default_rng(3)
+    X = rng.normal(size=(60, 4))
+    y = (X[:, 0] > 0).astype(int) + (X[:, 1] > 0.5)
+
+    report = loo_sweep(X, y, ['a', 'b', 'c'], k_max=6, weights=weights)
+    for k in range(1, 7):
+        assert report['results'][k]['accuracy'] == pytest.approx(sklearn_loo_accuracy(X, y, k, weights))
+
+    best = max(report['results'], key=lambda k: (report['results'][k]['accuracy'], -k))
+    assert report['best_k'] == best
+    confusion = np.array(report['results'][best]['confusion_matrix'])
+    assert confusion.sum() == 60
+    assert np.trace(confusion) / 60 == pytest.approx(report['best_accuracy'])
+
+@pytest.mark.parametrize('weights', ['uniform', 'distance'])
+def test_sweep_with_ties_matches_engine(weights):
+    rng = np.random.default_rng(3)
+    # Small integer grid: plenty of duplicate rows and distance ties, broken by row order
+    X = rng.integers(0, 3, size=(60, 4)).astype(float)
+    y = (X[:, 0] + rng.integers(0, 2, size=60)).astype(int) % 3
+
+    report = loo_sweep(X, y, ['a', 'b', 'c'], k_max=6, weights=weights)
+    for k in range(1, 7):
+        assert report['results'][k]['accuracy'] == pytest.approx(engine_loo_accuracy(X, y, k, weights))
+
+def test_neighbors_exclude_self():
+    X = np.array([[0.0], [0.0], [0.0], [1.0], [5.0]])
+    distances, indices = loo_neighbors(X, 10)
+    assert indices.shape == (5, 4)
+    assert not (indices == np.arange(5)[:, None]).any()
+    assert indices[0].tolist() == [1, 2, 3, 4]
+    assert distances[4].tolist() == [4.0, 5.0, 5.0, 5.0]
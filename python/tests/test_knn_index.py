@@ -0,0 +1,129 @@
+"""
+Exact indexes must return the same neighbors as brute force, ties
+included; the approximate IVF index reports its recall; the chosen index
+survives the artifact round trip.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from knn_engine import KNNEngine
+from knn_index import build_index, recall, select_index
+from model_store import load_artifact, save_artifact
+
+def make_engine(n, dim, k=5, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, dim))
+    # Rounded rows give duplicates and equal distances
+    X[:n // 4] = np.round(X[:n // 4])
+    return KNNEngine(X, rng.integers(0, 4, n), ['a', 'b', 'c', 'd'], k, np.zeros(dim), np.ones(dim))
+
+@pytest.mark.parametrize('kind', ['kd_tree', 'ball_tree'])
+@pytest.mark.parametrize('dim', [3, 12])
+def test_exact_trees_match_brute(kind, dim):
+    engine = make_engine(800, dim)
+    rng = np.random.default_rng(1)
+    Q = np.vstack([rng.normal(size=(40, dim)), np.round(rng.normal(size=(40, dim)))])
+
+    expected_d, expected_i = engine.brute_kneighbors(Q)
+    engine.index = build_index(kind, engine.X, leaf_size=16)
+    distances, indices = engine.kneighbors(Q)
+    assert (indices == expected_i).all()
+    assert np.allclose(distances, expected_d)
+
+def test_ivf_recall_and_full_probe():
+    engine = make_engine(2000, 6)
+    Q = np.random.default_rng(2).normal(size=(50, 6))
+    _, exact = engine.brute_kneighbors(Q)
+
+    index = build_index('ivf', engine.X, nlist=20, nprobe=2)
+    _, found = index.query(engine.X, Q, 5)
+    assert 0 < recall(exact, found) <= 1
+
+    # Probing every list is an exhaustive search
+    index.nprobe = 20
+    _, found = index.query(engine.X, Q, 5)
+    assert recall(exact, found) == 1.0
+
+def test_small_training_set_stays_brute():
+    engine = make_engine(300, 5)
+    index, report = select_index(engine)
+    assert index is None
+    assert report['kind'] == 'brute' and report['recall'] == 1.0
+
+def test_selection_reports_every_candidate():
+    engine = make_engine(12000, 3)
+    index, report = select_index(engine, kinds=['brute', 'kd_tree', 'ivf'])
+    assert set(report['benchmark']) == {'brute', 'kd_tree', 'ivf'}
+    assert report['benchmark'][report['kind']]['recall'] >= report['min_recall']
+    assert (index is None) == (report['kind'] == 'brute')
+
+@pytest.mark.parametrize('kind,params', [('kd_tree', {'leaf_size': 16}), ('ivf', {'nlist': 30, 'nprobe': 3})])
+def test_index_persists_in_artifact(tmp_path, kind, params):
+    engine = make_engine(3000, 3)
+    engine.index = build_index(kind, engine.X, **params)
+    engine.metadata['index'] = {'kind': kind, 'params': engine.index.params}
+    loaded = load_artifact(save_artifact(engine, str(tmp_path / 'm.model')))
+    assert loaded.index.kind == kind
+    assert loaded.index.params == engine.index.params
+
+    Q = np.random.default_rng(3).normal(size=(30, 3))
+    assert (loaded.kneighbors(Q)[1] == engine.kneighbors(Q)[1]).all()
+
+    # Sources without index arrays rebuild the same index from the metadata
+    rebuilt = KNNEngine(engine.X, engine.labels, engine.classes, engine.k, engine.mean, engine.inv_std,
+                        metadata=engine.metadata)
+    rebuilt.restore_index()
+    assert (rebuilt.kneighbors(Q)[1] == engine.kneighbors(Q)[1]).all()
+
+def reference_kneighbors(X, Q, k):
+    """Direct differences: identical training rows get exactly equal distances"""
+    sq_dist = ((Q[:, None, :] - X[None, :, :]) ** 2).sum(axis=2)
+    order = np.lexsort((np.broadcast_to(np.arange(len(X)), sq_dist.shape), sq_dist), axis=1)[:, :k]
+    return order
+
+def make_duplicated_engine(n, k, seed=0):
+    """0/1 flags and a 0/0.5/1 column: few distinct rows, many exact ties"""
+    rng = np.random.default_rng(seed)
+    raw = rng.integers(0, 2, (n, 6)).astype(float)
+    raw[:, -1] = rng.integers(0, 3, n) / 2
+    return KNNEngine(raw, rng.integers(0, 4, n), ['a', 'b', 'c', 'd'], k, np.zeros(6), np.ones(6)), raw
+
+@pytest.mark.parametrize('k', [1, 5, 40])
+def test_collapsed_index_matches_full_set(k):
+    engine, raw = make_duplicated_engine(1500, k)
+    rng = np.random.default_rng(1)
+    Q = raw[rng.integers(0, len(raw), 60)] + rng.normal(0, 0.2, (60, 6))
+    expected = reference_kneighbors(engine.X, Q, k)
+    expected_proba = engine.vote(None, expected)
+
+    index, report = select_index(engine)
+    assert report['kind'] == 'collapsed'
+    assert report['collapse']['n_groups'] == len(np.unique(raw, axis=0))
+    assert report['collapse']['ratio'] > 10
+    engine.index = index
+
+    distances, indices = engine.kneighbors(Q)
+    assert (indices == expected).all()
+    # Histogram vote and expanded neighbors give the same probabilities
+    assert np.array_equal(engine.predict_proba(Q), expected_proba)
+    assert np.array_equal(engine.vote(distances, indices), expected_proba)
+
+def test_collapsed_index_persists_in_artifact(tmp_path):
+    engine, raw = make_duplicated_engine(800, 5)
+    engine.choose_index()
+    loaded = load_artifact(save_artifact(engine, str(tmp_path / 'm.model')))
+    assert loaded.index.kind == 'collapsed'
+
+    Q = raw[:40] + 0.1
+    assert (loaded.kneighbors(Q)[1] == engine.kneighbors(Q)[1]).all()
+
+    rebuilt = KNNEngine(engine.X, engine.labels, engine.classes, engine.k, engine.mean, engine.inv_std,
+                        metadata=engine.metadata)
+    rebuilt.restore_index()
+    assert np.array_equal(rebuilt.predict_proba(Q), engine.predict_proba(Q))
@@ -0,0 +1,101 @@
+"""
+Cross-validation from one neighbor graph per fold must score every grid
+point like refitting KNeighborsClassifier on each fold, and the Minkowski
+engine must match sklearn so the tuned configuration can be served.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from knn_engine import KNNEngine
+from knn_tuning import cross_validate, stratified_folds
+from model_store import read_header
+
+def make_data(n=120, seed=5):
+    rng = np.random.default_rng(seed)
+    X = np.hstack([rng.normal(70, 10, (n, 3)), rng.integers(0, 2, (n, 1))])
+    y = (X[:, 0] > 70).astype(int) + (X[:, 1] > 75)
+    return X, y
+
+def sklearn_cv(X, y, folds, columns, k, weights, p):
+    from sklearn.neighbors import KNeighborsClassifier
+    from sklearn.preprocessing import StandardScaler
+
+    accuracies = []
+    for fold in range(folds.max() + 1):
+        test = folds == fold
+        scaler = StandardScaler().fit(X[~test][:, columns])
+        model = KNeighborsClassifier(n_neighbors=k, weights=weights, p=p, algorithm='brute')
+        model.fit(scaler.transform(X[~test][:, columns]), y[~test])
+        accuracies.append(model.score(scaler.transform(X[test][:, columns]), y[test]))
+    return np.mean(accuracies)
+
+def test_folds_are_stratified():
+    y = np.repeat([0, 1, 2], [50, 30, 7])
+    folds = stratified_folds(y, 5, seed=1)
+    counts = np.array([np.bincount(folds[y == c], minlength=5) for c in range(3)])
+    assert (counts.max(axis=1) - counts.min(axis=1) <= 1).all()
+
+def test_grid_matches_refitting_sklearn():
+    X, y = make_data()
+    names = ['a', 'b', 'c', 'flag']
+    subsets = {'all': names, 'without_flag': ['a', 'b', 'c']}
+    report = cross_validate(X, y, names, k_max=9, p_values=(2, 1, 3), subsets=subsets, n_folds=4, workers=1)
+    folds = stratified_folds(y, 4)
+
+    results = {(r['features'], r['p'], r['weights'], r['k']): r['accuracy'] for r in report['results']}
+    assert len(results) == 2 * 3 * 2 * 9
+    for (label, p, weights, k) in [('all', 2, 'uniform', 1), ('all', 1, 'distance', 4), ('without_flag', 3, 'uniform', 9),
+                                   ('without_flag', 2, 'distance', 6)]:
+        columns = [names.index(name) for name in subsets[label]]
+        assert results[(label, p, weights, k)] == pytest.approx(sklearn_cv(X, y, folds, columns, k, weights, p))
+
+    best = report['best']
+    assert best['accuracy'] == max(results.values())
+    assert report['wall_seconds'] > 0
+
+def test_pool_gives_same_report():
+    X, y = make_data(80)
+    options = dict(k_max=5, p_values=(2, 1), n_folds=3)
+    single = cross_validate(X, y, ['a', 'b', 'c', 'd'], workers=1, **options)
+    pooled = cross_validate(X, y, ['a', 'b', 'c', 'd'], workers=2, **options)
+    assert single['results'] == pooled['results'] and single['best'] == pooled['best']
+
+@pytest.mark.parametrize('p', [1, 3])
+def test_minkowski_engine_matches_sklearn(p):
+    from sklearn.neighbors import KNeighborsClassifier
+    from sklearn.preprocessing import StandardScaler
+
+    X, y = make_data()
+    scaler = StandardScaler().fit(X)
+    model = KNeighborsClassifier(n_neighbors=5, weights='distance', p=p).fit(scaler.transform(X), y)
+    engine = KNNEngine.from_sklearn(model, scaler)
+    assert engine.p == p and engine.metadata['p'] == p
+
+    probe = X + np.random.default_rng(0).normal(0, 3, X.shape)
+    expected_d, expected_i = model.kneighbors(scaler.transform(probe))
+    distances, indices = engine.kneighbors(engine.transform(probe))
+    assert np.allclose(distances, expected_d)
+    assert np.allclose(engine.predict_proba(probe), model.predict_proba(scaler.transform(probe)))
+
+def test_tune_saves_best_configuration(tmp_path):
+    from predict_silent import SilentKNNPredictor
+
+    path = str(tmp_path / 'knn_model_silent.pkl')
+    result = SilentKNNPredictor().tune(path, k_max=5, p_values=(2, 1), n_folds=3, workers=1)
+    assert result['success'] and len(result['top_results']) == 10
+
+    header = read_header(str(tmp_path / 'knn_model_silent.model'))
+    best = header['metadata']['tuning']['best']
+    assert header['k'] == best['k'] and header['weights'] == best['weights']
+    assert header['metadata'].get('p', 2) == best['p']
+    assert header['metadata']['feature_names'] == best['feature_names']
+
+    loaded = SilentKNNPredictor()
+    assert loaded.load_model(path)
+    assert loaded.predict({'matematika': 90})['success']
@@ -0,0 +1,143 @@
+"""
+Concurrent single requests must be predicted together (up to the cap or
+the window) with every caller getting its own result, while a request on
+an idle scheduler runs at once.
+"""
+
+import asyncio
+import contextlib
+import json
+import os
+import socket
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from micro_batch import MicroBatcher
+
+class Recorder:
+    """predict_batch stand-in that remembers every batch"""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, inputs):
+        self.batches.append(list(inputs))
+        return [{'success': True, 'data': value * 10} for value in inputs]
+
+def test_concurrent_requests_share_batches():
+    recorder = Recorder()
+    batcher = MicroBatcher(recorder, max_batch=4, window=0.05)
+
+    async def run():
+        return await asyncio.gather(*(batcher.predict(value) for value in range(10)))
+
+    results = asyncio.run(run())
+    assert [result['data'] for result in results] == [value * 10 for value in range(10)]
+    # The first request finds the scheduler idle; the rest fill batches up to the cap,
+    # and the last one goes when the window ends
+    assert [len(batch) for batch in recorder.batches] == [1, 4, 4, 1]
+    stats = batcher.stats()
+    assert stats['requests'] == 10 and stats['batches'] == 4
+    assert stats['batch_sizes'] == {'1': 2, '4': 2} and stats['batch_size_quantiles']['p50'] == 1
+
+def test_idle_request_is_not_delayed():
+    batcher = MicroBatcher(Recorder(), window=10.0)
+
+    async def run():
+        first = batcher.submit(1)
+        done_at_once = first.done()
+        await asyncio.sleep(0)
+        return done_at_once, await first
+
+    done_at_once, result = asyncio.run(run())
+    assert done_at_once and result['data'] == 10
+
+def test_failed_batch_reaches_every_caller():
+    def fail(inputs):
+        raise RuntimeError("engine down")
+
+    batcher = MicroBatcher(fail, window=0.01)
+
+    async def run():
+        return await asyncio.gather(*(batcher.predict(value) for value in range(3)), return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in asyncio.run(run()))
+
+@pytest.fixture
+def batched_server(tmp_path):
+    """predict_server's micro-batching worker on a temporary Unix socket, in a thread"""
+    from predict_server import create_server, serve_batched
+
+    class Predictor:
+        def __init__(self):
+            self.predict_batch = Recorder()
+
+    server = create_server(str(tmp_path / 'predict.sock'))
+    server.predictor = Predictor()
+    loop = asyncio.new_event_loop()
+    task = loop.create_task(serve_batched(server, max_batch=8, window=0.05))
+
+    def run():
+        # Teardown stops the worker by cancelling it
+        with contextlib.suppress(asyncio.CancelledError):
+            loop.run_until_complete(task)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    yield server
+    loop.call_soon_threadsafe(task.cancel)
+    thread.join()
+    loop.close()
+    server.server_close()
+
+def test_server_answers_pipelined_lines_in_order(batched_server):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(5)
+        sock.connect(batched_server.server_address)
+        sock.sendall(b''.join(json.dumps(value).encode() + b'\n' for value in range(5)) + b'not json\n')
+        # Half-close: the lines still waiting in a batch are answered first
+        sock.shutdown(socket.SHUT_WR)
+        with sock.makefile('rb') as reader:
+            responses = [json.loads(line) for line in reader]
+
+    assert [response.get('data') for response in responses[:5]] == [0, 10, 20, 30, 40]
+    assert responses[5] == {'success': False, 'error': 'Invalid JSON input'}
+    assert [len(batch) for batch in batched_server.predictor.predict_batch.batches] == [1, 4]
+
+def test_client_not_reading_does_not_block_others(batched_server):
+    import time
+
+    n_requests = 20000
+    slow = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    slow.settimeout(10)
+    slow.connect(batched_server.server_address)
+
+    def send_all():
+        # More responses than the socket buffers hold; nothing is read yet
+        slow.sendall(b''.join(b'%d\n' % value for value in range(n_requests)))
+        slow.shutdown(socket.SHUT_WR)
+
+    sender = threading.Thread(target=send_all, daemon=True)
+    sender.start()
+    # Let the worker get through what it read of the backlog (CPU work, not blocking)
+    time.sleep(1.0)
+
+    started = time.perf_counter()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(5)
+        sock.connect(batched_server.server_address)
+        sock.sendall(b'7\n')
+        sock.shutdown(socket.SHUT_WR)
+        with sock.makefile('rb') as reader:
+            assert json.loads(reader.readline())['data'] == 70
+    assert time.perf_counter() - started < 0.5
+
+    # The slow client still gets every response, in order, once it reads
+    with slow, slow.makefile('rb') as reader:
+        responses = [json.loads(line)['data'] for line in reader]
+    sender.join()
+    assert responses == [value * 10 for value in range(n_requests)]
@@ -0,0 +1,63 @@
+"""
+The process-pool executor must return exactly what the single-process
+engine returns, in input order, and free its shared memory on close.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from knn_engine import KNNEngine
+from knn_index import build_index
+from parallel_predict import ParallelEngine
+
+def make_engine(n=3000, dim=6, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, dim))
+    # Duplicates and distance ties among the training rows
+    X[:n // 3] = np.round(X[:n // 3])
+    return KNNEngine(X, rng.integers(0, 5, n), list('abcde'), 7, rng.normal(size=dim), np.full(dim, 1.5),
+                     weights='distance')
+
+def queries(dim=6, n=600, seed=1):
+    rng = np.random.default_rng(seed)
+    Q = rng.normal(size=(n, dim)) / 1.5
+    Q[::3] = np.round(Q[::3])
+    return Q
+
+@pytest.mark.parametrize('kind', ['brute', 'kd_tree'])
+def test_matches_single_process(kind):
+    engine = make_engine()
+    engine.index = build_index(kind, engine.X)
+    X = queries()
+
+    with ParallelEngine(engine, workers=3, chunk_rows=97) as parallel:
+        distances, indices = parallel.kneighbors(engine.transform(X))
+        proba = parallel.predict_proba(X)
+
+    expected_d, expected_i = engine.kneighbors(engine.transform(X))
+    assert (indices == expected_i).all()
+    assert (distances == expected_d).all()
+    assert (proba == engine.predict_proba(X)).all()
+
+def test_small_batches_stay_in_process():
+    engine = make_engine()
+    parallel = ParallelEngine(engine, workers=2)
+    parallel.predict_proba(queries(n=10))
+    assert parallel._pool is None
+    assert list(parallel.classes) == list('abcde')
+
+def test_close_frees_shared_memory():
+    from multiprocessing import shared_memory
+
+    parallel = ParallelEngine(make_engine(), workers=2)
+    parallel.predict_proba(queries())
+    names = [block.name for block in parallel._blocks]
+    parallel.close()
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
@@ -0,0 +1,74 @@
+"""
+predict_client must predict in-process only when no server accepts the
+connection; a slow or failing server is answered with a JSON error.
+"""
+
+import http.server
+import json
+import os
+import socket
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import predict_client
+
+@pytest.fixture
+def run_client(monkeypatch, capsys):
+    """Run predict_client.main() with a stand-in for the in-process fallback"""
+    import predict_silent
+
+    fallbacks = []
+    monkeypatch.setattr(predict_silent, 'main', lambda: fallbacks.append(1) or print('{"fallback": true}'))
+    monkeypatch.setenv('PREDICT_SERVER_TIMEOUT', '0.2')
+    monkeypatch.delenv('PREDICT_SERVER_URL', raising=False)
+
+    def run():
+        monkeypatch.setattr(sys, 'argv', ['predict_client.py', '{"matematika": 85}'])
+        predict_client.main()
+        return json.loads(capsys.readouterr().out.strip().splitlines()[-1]), len(fallbacks)
+
+    return run
+
+def test_missing_server_falls_back(run_client, monkeypatch, tmp_path):
+    monkeypatch.setenv('PREDICT_SERVER_SOCKET', str(tmp_path / 'missing.sock'))
+    assert run_client() == ({"fallback": True}, 1)
+
+    # A stale socket file nobody listens on
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(str(tmp_path / 'stale.sock'))
+    stale.close()
+    monkeypatch.setenv('PREDICT_SERVER_SOCKET', str(tmp_path / 'stale.sock'))
+    assert run_client() == ({"fallback": True}, 2)
+
+def test_slow_server_is_not_predicted_twice(run_client, monkeypatch, tmp_path):
+    path = str(tmp_path / 'slow.sock')
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as listener:
+        # Accepts (in the backlog) but never answers
+        listener.bind(path)
+        listener.listen(1)
+        monkeypatch.setenv('PREDICT_SERVER_SOCKET', path)
+        result, fallbacks = run_client()
+    assert result == {"success": False, "error": "Prediction server timed out"}
+    assert fallbacks == 0
+
+def test_server_error_is_reported(run_client, monkeypatch):
+    class Failing(http.server.BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.send_error(503)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = http.server.HTTPServer(('127.0.0.1', 0), Failing)
+    thread = threading.Thread(target=server.handle_request)
+    thread.start()
+    monkeypatch.setenv('PREDICT_SERVER_URL', f"http://127.0.0.1:{server.server_address[1]}")
+    result, fallbacks = run_client()
+    thread.join()
+    server.server_close()
+    assert result == {"success": False, "error": "Prediction server error: Prediction server returned HTTP 503"}
+    assert fallbacks == 0
@@ -0,0 +1,98 @@
+"""
+Prefork server: workers that lose the accept race must keep running their
+service actions (metrics flush) instead of blocking in accept(), and a
+live server's socket is never unlinked by a second one.
+"""
+
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class EchoPredictor:
+    def predict(self, input_data):
+        return {'success': True, 'data': input_data}
+
+def run_server(socket_path, heartbeat_dir):
+    from predict_server import create_server, serve
+
+    server = create_server(socket_path)
+    server.predictor = EchoPredictor()
+
+    def heartbeat():
+        with open(os.path.join(heartbeat_dir, str(os.getpid())), 'a') as f:
+            f.write(f"{time.monotonic()} {int(server.socket.getblocking())}\n")
+
+    # Kept by serve() when metrics are off (tests/conftest.py)
+    server.service_actions = heartbeat
+    serve(server, workers=2)
+
+def ask(socket_path, value):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(5)
+        sock.connect(socket_path)
+        sock.sendall(json.dumps(value).encode() + b'\n')
+        sock.shutdown(socket.SHUT_WR)
+        with sock.makefile('rb') as reader:
+            return json.loads(reader.readline())
+
+@pytest.fixture
+def prefork_server(tmp_path):
+    socket_path = str(tmp_path / 'predict.sock')
+    heartbeats = tmp_path / 'heartbeats'
+    heartbeats.mkdir()
+    process = multiprocessing.get_context('fork').Process(target=run_server, args=(socket_path, str(heartbeats)))
+    process.start()
+    deadline = time.monotonic() + 10
+    while len(os.listdir(heartbeats)) < 2 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    yield socket_path, heartbeats
+    os.kill(process.pid, signal.SIGTERM)
+    process.join(10)
+
+def beats(heartbeats):
+    return {worker: [line.split() for line in (heartbeats / worker).read_text().splitlines()]
+            for worker in os.listdir(heartbeats)}
+
+def test_workers_keep_serving_after_accept_race(prefork_server):
+    socket_path, heartbeats = prefork_server
+    assert len(os.listdir(heartbeats)) == 2
+
+    for value in range(8):
+        assert ask(socket_path, value) == {'success': True, 'data': value}
+    answered = time.monotonic()
+    # serve_forever polls every 0.5 s: both workers must be back in it
+    time.sleep(1.5)
+    for worker, lines in beats(heartbeats).items():
+        assert float(lines[-1][0]) > answered, f"worker {worker} stopped polling"
+        # A blocking listener would park the loser of a race in accept()
+        assert all(blocking == '0' for _, blocking in lines)
+
+def test_live_socket_is_not_taken_over(prefork_server):
+    from predict_server import create_server
+
+    socket_path, _ = prefork_server
+    with pytest.raises(OSError, match='already listening'):
+        create_server(socket_path)
+    assert ask(socket_path, 'still here') == {'success': True, 'data': 'still here'}
+
+def test_stale_socket_is_replaced(tmp_path):
+    from predict_server import create_server
+
+    socket_path = str(tmp_path / 'stale.sock')
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(socket_path)
+    stale.close()
+
+    server = create_server(socket_path)
+    try:
+        assert server.server_address == socket_path
+    finally:
+        server.server_close()
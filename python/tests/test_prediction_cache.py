@@ -0,0 +1,128 @@
+"""
+Persistent prediction cache: repeat predictions must return the same
+results without loading the model, and a changed model must not be
+served from entries of the previous version.
+"""
+
+import os
+import shutil
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from feature_schema import silent_schema
+from model_store import load_engine, replace_engine
+from prediction_cache import ModelUnavailable, PredictionCache
+from predict_silent import SilentKNNPredictor
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+INPUTS = [
+    {"jenis_kelamin": "Laki-laki", "matematika": 85, "fisika": 88, "rencana_kuliah": "Iya",
+     "kategori_jurusan": "Saintek", "tingkat_keyakinan": 85},
+    {"matematika": 60, "sejarah": 90, "kategori_jurusan": "Soshum"},
+    {"matematika": "not a number"}
+]
+
+@pytest.fixture
+def model_path(tmp_path):
+    source = os.path.join(DATA_DIR, 'knn_model_silent.pkl')
+    if not os.path.exists(source):
+        pytest.skip("knn_model_silent.pkl not available")
+    target = str(tmp_path / 'knn_model_silent.pkl')
+    shutil.copy(source, target)
+    return target
+
+class CountingLoader:
+    def __init__(self, model_path):
+        self.model_path = model_path
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        predictor = SilentKNNPredictor()
+        return predictor if predictor.load_model(self.model_path) else None
+
+def test_repeat_predictions_skip_model_loading(model_path, tmp_path):
+    cache = PredictionCache(str(tmp_path / 'cache.sqlite'))
+    loader = CountingLoader(model_path)
+    expected = loader().predict_batch(INPUTS)
+
+    assert cache.predict_batch(model_path, INPUTS, silent_schema(), loader) == expected
+    assert loader.calls == 2
+
+    # Same feature vector with a different spelling of the input
+    again = [dict(INPUTS[0], matematika=85.0), INPUTS[1]]
+    assert cache.predict_batch(model_path, again, silent_schema(), loader) == expected[:2]
+    assert loader.calls == 2
+    assert (cache.hits, cache.misses) == (2, 2)
+    assert cache.stats()['entries'] == 2
+
+def test_changed_model_invalidates_entries(model_path, tmp_path):
+    cache = PredictionCache(str(tmp_path / 'cache.sqlite'))
+    loader = CountingLoader(model_path)
+    cache.predict_batch(model_path, INPUTS[:1], silent_schema(), loader)
+
+    engine = load_engine(model_path, mmap=False)
+    engine.k = 3
+    replace_engine(engine, model_path)
+
+    result = cache.predict_batch(model_path, INPUTS[:1], silent_schema(), loader)
+    assert loader.calls == 2
+    assert result == loader().predict_batch(INPUTS[:1])
+    assert cache.stats()['entries'] == 1
+
+def test_lru_eviction(model_path, tmp_path):
+    cache = PredictionCache(str(tmp_path / 'cache.sqlite'), max_entries=2)
+    loader = CountingLoader(model_path)
+    inputs = [{"matematika": float(score)} for score in np.arange(60, 64)]
+    for row in inputs:
+        cache.predict_batch(model_path, [row], silent_schema(), loader)
+    assert cache.stats()['entries'] == 2
+
+    calls = loader.calls
+    cache.predict_batch(model_path, inputs[-2:], silent_schema(), loader)
+    assert loader.calls == calls
+    cache.predict_batch(model_path, inputs[:1], silent_schema(), loader)
+    assert loader.calls == calls + 1
+
+def test_missing_model_raises(tmp_path):
+    cache = PredictionCache(str(tmp_path / 'cache.sqlite'))
+    with pytest.raises(ModelUnavailable):
+        cache.predict_batch(str(tmp_path / 'missing.pkl'), INPUTS, silent_schema(), lambda: None)
+
+def test_csv_model_responses_are_cached(tmp_path):
+    import predict
+    from knn_predictor import KNNPredictor
+
+    source = os.path.join(DATA_DIR, 'knn_model.pkl')
+    if not os.path.exists(source):
+        pytest.skip("knn_model.pkl not available")
+    model_path = str(tmp_path / 'knn_model.pkl')
+    shutil.copy(source, model_path)
+    calls = []
+
+    def load():
+        calls.append(1)
+        knn = KNNPredictor()
+        assert knn.load_model(model_path)
+        return predict.ResponsePredictor(knn)
+
+    inputs = [
+        {"jenis_kelamin": "Perempuan", "mata_pelajaran_dikuasai": ["Matematika", "fisika"],
+         "minat_ipa": 0.9, "minat_ips": 0.2, "minat_bahasa": 0.4, "minat_seni": 0.1},
+        {"jenis_kelamin": "Laki-laki", "mata_pelajaran_dikuasai": []}
+    ]
+    expected = predict.predict_batch(load().predict_batch, inputs)
+    cache = PredictionCache(str(tmp_path / 'cache.sqlite'))
+
+    def predict_students(students):
+        return cache.predict_batch(model_path, students, predict.fallback_schema, load)
+
+    assert predict.predict_batch(predict_students, inputs) == expected
+    assert predict.predict_batch(predict_students, inputs) == expected
+    assert expected[0]['success'] and not expected[1]['success']
+    assert len(calls) == 2 and (cache.hits, cache.misses) == (1, 1)
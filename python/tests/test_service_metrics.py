@@ -0,0 +1,80 @@
+"""
+Metrics recorded by several processes must add up in the shared store
+and render as valid Prometheus text; quantiles follow histogram_quantile.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import service_metrics
+from service_metrics import LATENCY_BUCKETS, Registry, exposition, histogram_quantile
+
+def parse(text):
+    """{sample line without value: value} of a Prometheus text exposition"""
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith('#'):
+            name, value = line.rsplit(' ', 1)
+            samples[name] = float(value)
+    return samples
+
+def test_processes_add_up_in_the_store(tmp_path):
+    path = str(tmp_path / 'metrics.sqlite')
+    first, second = Registry('predict_silent', path), Registry('predict_silent', path)
+    first.request(0.004, [{'success': True}, {'success': False, 'error': "Prediction error: bad"}])
+    first.cache(3, 1)
+    second.request(0.2, [{'success': False, 'error': "Invalid JSON input"}])
+    second.cache(0, 4)
+    second.model_load(0.02, '/x/knn_model_silent.pkl', 'abc123')
+    assert first.flush() and second.flush()
+    # Flushed deltas are not written twice
+    assert first.flush()
+
+    samples = parse(exposition(path))
+    assert samples['knn_predict_requests_total{source="predict_silent"}'] == 2
+    assert samples['knn_predict_rows_total{source="predict_silent"}'] == 3
+    assert samples['knn_predict_errors_total{source="predict_silent",type="prediction"}'] == 1
+    assert samples['knn_predict_errors_total{source="predict_silent",type="invalid_json"}'] == 1
+    assert samples['knn_predict_request_duration_seconds_bucket{le="0.005",source="predict_silent"}'] == 1
+    assert samples['knn_predict_request_duration_seconds_bucket{le="+Inf",source="predict_silent"}'] == 2
+    assert samples['knn_predict_request_duration_seconds_sum{source="predict_silent"}'] == pytest.approx(0.204)
+    assert samples['knn_predict_batch_size_count{source="predict_silent"}'] == 2
+    assert samples['knn_predict_cache_hit_ratio{source="predict_silent"}'] == pytest.approx(3 / 8)
+    assert samples['knn_predict_model_info{hash="abc123",model="knn_model_silent",source="predict_silent"}'] == 1
+    assert samples['knn_predict_model_loads_total{source="predict_silent"}'] == 1
+
+def test_quantiles_interpolate_like_prometheus():
+    rng = np.random.default_rng(0)
+    values = rng.uniform(0.01, 0.025, 1000)
+    counts = np.bincount(np.searchsorted(LATENCY_BUCKETS, values), minlength=len(LATENCY_BUCKETS) + 1)
+    cumulative = list(np.cumsum(counts))
+    # Uniform inside one bucket: linear interpolation is exact up to sampling
+    assert histogram_quantile(0.5, LATENCY_BUCKETS, cumulative) == pytest.approx(0.0175)
+    assert histogram_quantile(0.99, LATENCY_BUCKETS, cumulative) == pytest.approx(0.02485)
+    assert histogram_quantile(0.5, LATENCY_BUCKETS, [0] * (len(LATENCY_BUCKETS) + 1)) is None
+
+def test_server_requests_are_recorded(tmp_path, monkeypatch):
+    from predict_server import handle_request
+
+    class Predictor:
+        def predict(self, input_data):
+            return {'success': True, 'data': input_data}
+
+    registry = Registry('predict_server', str(tmp_path / 'metrics.sqlite'))
+    monkeypatch.setattr(service_metrics, '_registry', registry)
+    monkeypatch.setattr(service_metrics, '_flush_at_exit', True)
+    handle_request(Predictor(), b'{"matematika": 80}')
+    handle_request(Predictor(), b'not json')
+    assert registry.counters[('requests_total', None)] == 2
+    assert registry.counters[('errors_total', ('type', 'invalid_json'))] == 1
+
+def test_metrics_can_be_turned_off(monkeypatch):
+    monkeypatch.setattr(service_metrics, '_registry', None)
+    monkeypatch.setenv('PREDICT_METRICS', 'off')
+    assert service_metrics.registry() is None
+    service_metrics.record_request(0.1, [{'success': True}])
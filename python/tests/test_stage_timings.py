@@ -0,0 +1,64 @@
+"""
+Opt-in stage timings: the response is unchanged unless asked for, and
+when enabled every prediction stage and the request id are reported.
+"""
+
+import io
+import json
+import os
+import shutil
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import stage_timings
+from predict_silent import SilentKNNPredictor, parse_args
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+INPUT = {"jenis_kelamin": "Laki-laki", "matematika": 85, "fisika": 88, "kategori_jurusan": "Saintek"}
+
+@pytest.fixture(autouse=True)
+def timings_off(monkeypatch):
+    monkeypatch.delenv(stage_timings.TIMINGS_ENV, raising=False)
+    monkeypatch.delenv(stage_timings.REQUEST_ID_ENV, raising=False)
+    monkeypatch.setattr(stage_timings, '_active', None)
+
+def emitted(result, argv):
+    args = parse_args(argv + ['{}'])
+    stage_timings.start(args)
+    output = io.StringIO()
+    stage_timings.emit(result, args, output=output)
+    return output.getvalue()
+
+def test_output_unchanged_by_default():
+    result = {"success": False, "error": "Missing input data"}
+    assert emitted(result, []) == json.dumps(result) + '\n'
+    assert stage_timings.active() is None
+
+def test_request_id_echoed_without_timings(monkeypatch):
+    monkeypatch.setenv(stage_timings.REQUEST_ID_ENV, 'req-42')
+    assert json.loads(emitted({"success": True}, [])) == {"success": True, "request_id": "req-42"}
+
+def test_timings_cover_prediction_stages(tmp_path):
+    source = os.path.join(DATA_DIR, 'knn_model_silent.pkl')
+    if not os.path.exists(source):
+        pytest.skip("knn_model_silent.pkl not available")
+    model_path = str(tmp_path / 'knn_model_silent.pkl')
+    shutil.copy(source, model_path)
+
+    args = parse_args(['--timings', '--request-id', 'abc', json.dumps(INPUT)])
+    assert stage_timings.start(args) == 'json'
+    predictor = SilentKNNPredictor()
+    with stage_timings.stage('model_load'):
+        assert predictor.load_model(model_path)
+    output = io.StringIO()
+    stage_timings.emit(predictor.predict(INPUT), args, output=output)
+
+    response = json.loads(output.getvalue())
+    assert response['success'] and response['request_id'] == 'abc'
+    stages = response['timings']['stages_ms']
+    assert list(stages) == ['imports', 'model_load', 'features', 'scale', 'neighbors', 'vote', 'format', 'json_encode']
+    assert all(value >= 0 for value in stages.values())
+    assert response['timings']['total_ms'] >= sum(stages.values()) - stages['imports'] - 1e-3
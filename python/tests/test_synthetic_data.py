@@ -0,0 +1,98 @@
+"""
+Synthetic rows must stay in the value ranges of each profile, draw every
+major from the pool its scores select, and be reproducible from the seed.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic_data import (DATABASE_POOLS, DATABASE_SCORES, FEATURE_NAMES, SILENT_POOLS, class_names,
+                            generate, generate_chunks)
+
+# (score clip, confidence clip) per profile
+RANGES = {'silent': ((60, 100), (50, 100)), 'database': ((50, 100), (30, 100))}
+
+def columns(X):
+    return {name: X[:, j] for j, name in enumerate(FEATURE_NAMES)}
+
+def group_averages(c):
+    science = (c['matematika'] + c['fisika'] + c['kimia'] + c['biologi']) / 4
+    social = (c['sejarah'] + c['geografi'] + c['ekonomi'] + c['sosiologi']) / 4
+    return science, social
+
+def silent_pools(c):
+    science, social = group_averages(c)
+    pools = np.full(len(science), 6)
+    is_science = science > social + 5
+    is_social = ~is_science & (social > science + 5)
+    pools[is_science] = (0 + (c['matematika'] > 80) + 2 * (c['biologi'] > 80))[is_science]
+    pools[is_social] = (4 + (c['ekonomi'] > 80))[is_social]
+    return pools, SILENT_POOLS
+
+def database_pools(c):
+    saintek = np.where((c['matematika'] >= 80) & (c['fisika'] >= 75), 0,
+                       np.where((c['biologi'] >= 80) & (c['kimia'] >= 75), 1, 2))
+    soshum = np.where(c['ekonomi'] >= 80, 3, np.where((c['sosiologi'] >= 80) | (c['sejarah'] >= 80), 4, 5))
+    return np.where(c['kategori_jurusan_encoded'] == 1, saintek, soshum), DATABASE_POOLS
+
+@pytest.mark.parametrize('profile', ['silent', 'database'])
+def test_columns_stay_in_profile_ranges(profile):
+    X, y = generate(20000, profile, seed=1, chunk_size=6000)
+    c = columns(X)
+    (lo, hi), (conf_lo, conf_hi) = RANGES[profile]
+
+    assert X.shape == (20000, 21) and np.isfinite(X).all()
+    scores = X[:, 1:17]
+    assert scores.min() >= lo and scores.max() <= hi
+    assert set(np.unique(X[:, 0])) == {0, 1}
+    assert set(np.unique(X[:, 18])) <= {0, 1, 2}
+    assert set(np.unique(X[:, 19])) == {0, 1}
+    assert X[:, 20].min() >= conf_lo and X[:, 20].max() <= conf_hi
+
+    if profile == 'silent':
+        subjects = ['matematika', 'bahasa_indonesia', 'bahasa_inggris', 'fisika', 'kimia', 'biologi', 'sejarah']
+    else:
+        subjects = [name for name, _, _, _ in DATABASE_SCORES]
+    assert np.allclose(X[:, 17], sum(c[name] for name in subjects) / len(subjects))
+
+    if profile == 'database':
+        # Nobody with an average of 80 or more answers "Tidak"
+        assert not ((X[:, 17] >= 80) & (X[:, 18] == 0)).any()
+        # Decided rows follow their stronger group
+        science, social = group_averages(c)
+        assert (X[science > social + 5, 19] == 1).all() and (X[social > science + 5, 19] == 0).all()
+
+@pytest.mark.parametrize('profile', ['silent', 'database'])
+def test_majors_come_from_their_pool(profile):
+    X, y = generate(20000, profile, seed=2)
+    names = class_names(profile)
+    pool_ids, pools = (silent_pools if profile == 'silent' else database_pools)(columns(X))
+
+    for pool_id, pool in enumerate(pools):
+        drawn = set(names[y[pool_ids == pool_id]])
+        assert drawn, f"pool {pool_id} never selected"
+        assert drawn <= set(pool)
+    # Every pooled major occurs (the database profile lists some no pool has)
+    assert set(names[y]) == set().union(*pools)
+
+@pytest.mark.parametrize('profile', ['silent', 'database'])
+def test_seed_reproducibility(profile):
+    X, y = generate(5000, profile, seed=7, chunk_size=2000)
+    X_again, y_again = generate(5000, profile, seed=7, chunk_size=2000)
+    assert np.array_equal(X, X_again) and np.array_equal(y, y_again)
+
+    chunks = list(generate_chunks(5000, profile, seed=7, chunk_size=2000))
+    assert [len(chunk) for chunk, _ in chunks] == [2000, 2000, 1000]
+    assert np.array_equal(np.vstack([chunk for chunk, _ in chunks]), X)
+
+    # A longer run with the same seed and chunk size shares its full chunks
+    X_longer, _ = generate(7000, profile, seed=7, chunk_size=2000)
+    assert np.array_equal(X_longer[:4000], X[:4000])
+
+    X_other, _ = generate(5000, profile, seed=8, chunk_size=2000)
+    assert not np.array_equal(X, X_other)
@@ -0,0 +1,100 @@
+"""
+Typed training files: chunked CSV, shards and columnar files must give
+the same frame as one read, and a model identical to one trained from
+read_csv's inferred float64 columns.
+"""
+
+import importlib.util
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from training_files import (TRAINING_COLUMNS, TRAINING_DTYPES, convert, feature_matrix, read_training_data,
+                            read_training_file)
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'training_data.csv')
+HAS_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+def write_shards(directory, n_shards=3):
+    with open(DATA_PATH, encoding='utf-8') as f:
+        header, *rows = f.read().splitlines()
+    size = -(-len(rows) // n_shards)
+    paths = []
+    for i in range(n_shards):
+        path = os.path.join(str(directory), f'part-{i}.csv')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join([header] + rows[i * size:(i + 1) * size]) + '\n')
+        paths.append(path)
+    return paths
+
+def trained(source):
+    from knn_predictor import KNNPredictor
+
+    predictor = KNNPredictor()
+    assert predictor.train(source)['success']
+    return predictor
+
+def test_csv_is_read_with_the_schema():
+    data = read_training_file(DATA_PATH, TRAINING_COLUMNS)
+    assert list(data.columns) == TRAINING_COLUMNS
+    assert {name: str(data[name].dtype) for name in TRAINING_COLUMNS} == \
+        {name: TRAINING_DTYPES[name] for name in TRAINING_COLUMNS}
+
+def test_chunks_and_shards_give_one_frame(tmp_path):
+    import pandas as pd
+
+    whole = read_training_file(DATA_PATH, TRAINING_COLUMNS)
+    # Small chunks see different categories; they are merged, not turned into objects
+    pd.testing.assert_frame_equal(read_training_file(DATA_PATH, TRAINING_COLUMNS, chunk_rows=4), whole)
+
+    paths = write_shards(tmp_path)
+    for source in (str(tmp_path), str(tmp_path / 'part-*.csv'), paths):
+        pd.testing.assert_frame_equal(read_training_data(source, TRAINING_COLUMNS, workers=3), whole)
+    # An explicit list keeps its own order
+    reversed_rows = read_training_data(paths[::-1], TRAINING_COLUMNS, workers=2)
+    assert reversed_rows['jurusan_aktual'].iloc[0] == whole['jurusan_aktual'].iloc[28]
+
+def test_model_matches_inferred_dtypes(tmp_path):
+    import pandas as pd
+    from sklearn.preprocessing import StandardScaler
+
+    predictor = trained(DATA_PATH)
+    raw = pd.read_csv(DATA_PATH)
+    raw['jenis_kelamin_encoded'] = predictor.gender_encoder.transform(raw['jenis_kelamin'])
+    scaler = StandardScaler().fit(raw[predictor.feature_columns])
+    assert np.array_equal(predictor.scaler.mean_, scaler.mean_)
+    assert np.array_equal(predictor.scaler.scale_, scaler.scale_)
+
+    typed = read_training_file(DATA_PATH, TRAINING_COLUMNS)
+    assert np.array_equal(feature_matrix(typed, ['minat_ipa', 'fisika']), raw[['minat_ipa', 'fisika']].to_numpy())
+
+    write_shards(tmp_path)
+    sharded = trained(str(tmp_path))
+    assert np.array_equal(sharded.engine.X, predictor.engine.X)
+
+def test_bad_sources_are_reported(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        read_training_data(str(tmp_path / 'missing-*.csv'))
+    with pytest.raises(ValueError, match="Unsupported"):
+        read_training_file(str(tmp_path / 'data.xlsx'))
+
+@pytest.mark.skipif(HAS_PYARROW, reason="pyarrow is installed")
+def test_columnar_formats_need_pyarrow(tmp_path):
+    with pytest.raises(ValueError, match="pyarrow"):
+        convert(DATA_PATH, str(tmp_path / 'training_data.feather'))
+
+@pytest.mark.skipif(not HAS_PYARROW, reason="pyarrow is not installed")
+@pytest.mark.parametrize('extension', ['parquet', 'feather'])
+def test_columnar_round_trip(tmp_path, extension):
+    import pandas as pd
+
+    output = str(tmp_path / f'training_data.{extension}')
+    result = convert(DATA_PATH, output)
+    assert result['format'] == extension and result['n_rows'] == 41
+    pd.testing.assert_frame_equal(read_training_data(output, TRAINING_COLUMNS),
+                                  read_training_file(DATA_PATH, TRAINING_COLUMNS))
+    assert np.array_equal(trained(output).engine.X, trained(DATA_PATH).engine.X)
@@ -4,54 +4,66 @@ Training script untuk KNN model
 Sistem Prediksi Jurusan SMA Mathlaul Anwar
 """
 
+import argparse
 import os
 import sys
+from knn_evaluation import DEFAULT_K_MAX
 from knn_predictor import KNNPredictor
+from training_files import resolve_paths
 
-def train_model():
-    """Train the KNN model with different k values"""
+def print_confusion_matrix(matrix, classes):
+    """Print a confusion matrix with numbered class columns"""
+    width = max(3, len(str(max(max(row) for row in matrix))))
+    print("      " + " ".join(f"{c:>{width}}" for c in range(len(classes))))
+    for c, row in enumerate(matrix):
+        print(f"{c:>4}: " + " ".join(f"{count:>{width}}" for count in row) + f"  {classes[c]}")
+
+def train_model(k_max=DEFAULT_K_MAX, data_path=None):
+    """Train the KNN model, choosing k by leave-one-out over every k <= k_max"""
     
-    # Path to training data
+    # Path to training data: one file, a glob or a directory of shards
     current_dir = os.path.dirname(os.path.abspath(__file__))
-    data_path = os.path.join(current_dir, "data", "training_data.csv")
+    data_path = data_path or os.path.join(current_dir, "data", "training_data.csv")
     
-    if not os.path.exists(data_path):
+    try:
+        resolve_paths(data_path)
+    except FileNotFoundError:
         print(f"Error: Training data not found at {data_path}")
         return
     
     print("=== Training KNN Model untuk Prediksi Jurusan ===\n")
     
-    # Test different k values
-    k_values = [3, 5, 7]
-    best_k = 3
-    best_accuracy = 0
+    # One neighbor graph at k_max gives the leave-one-out result of every k
+    knn = KNNPredictor()
+    result = knn.select_k(data_path, k_max=k_max)
+    if not result["success"]:
+        print(f"Training failed: {result.get('error', 'Unknown error')}")
+        return
     
-    for k in k_values:
-        print(f"Training with k = {k}...")
-        
-        knn = KNNPredictor(k=k)
-        result = knn.train(data_path)
-        
-        if result["success"]:
-            accuracy = result["accuracy"]
-            print(f"Accuracy with k={k}: {accuracy:.4f}")
-            
-            if accuracy > best_accuracy:
-                best_accuracy = accuracy
-                best_k = k
-                
-                # Save the best model
-                model_path = os.path.join(current_dir, "data", "knn_model.pkl")
-                knn.save_model(model_path)
-                print(f"Best model saved with k={k}")
-        else:
-            print(f"Training failed: {result.get('error', 'Unknown error')}")
-        
-        print("-" * 50)
+    sweep = result["sweep"]
+    print(f"Leave-one-out accuracy ({sweep['n_samples']} samples):")
+    for k, k_result in sweep["results"].items():
+        marker = "  <- best" if k == sweep["best_k"] else ""
+        print(f"  k={k:>2}: {k_result['accuracy']:.4f}{marker}")
+    print("-" * 50)
+    
+    best_k = sweep["best_k"]
+    best = sweep["results"][best_k]
+    print(f"Per-class report (k={best_k}):")
+    for name, scores in best["classification_report"].items():
+        print(f"  {name}: precision={scores['precision']:.2f} recall={scores['recall']:.2f} "
+              f"f1={scores['f1-score']:.2f} support={scores['support']}")
+    print(f"\nConfusion matrix (k={best_k}, rows = actual):")
+    print_confusion_matrix(best["confusion_matrix"], sweep["classes"])
+    
+    # Save the model fitted on every row with the best k
+    model_path = os.path.join(current_dir, "data", "knn_model.pkl")
+    knn.save_model(model_path)
+    print(f"\nBest model saved with k={best_k}")
     
     print(f"\n=== Training Complete ===")
     print(f"Best k value: {best_k}")
-    print(f"Best accuracy: {best_accuracy:.4f}")
+    print(f"Best accuracy: {sweep['best_accuracy']:.4f}")
     
     # Test prediction with sample data
     print(f"\n=== Testing Prediction ===")
@@ -98,5 +110,14 @@ def train_model():
     
     print(f"\n=== Training and Testing Complete ===")
 
+def parse_args(argv=None):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Train the KNN model, choosing k by leave-one-out")
+    parser.add_argument('--k-max', type=int, default=DEFAULT_K_MAX, help="Largest k evaluated in the sweep")
+    parser.add_argument('--data', default=None,
+                        help="Training CSV/Parquet/Feather file, glob or shard directory (default: data/training_data.csv)")
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
-    train_model()
\ No newline at end of file
+    args = parse_args()
+    train_model(args.k_max, args.data)
\ No newline at end of file
@@ -0,0 +1,295 @@
+"""
+Ekstraksi data training dari database MySQL Laravel secara streaming
+Hasil join siswa_lengkap, nilai_akademik, survei_minat_bakat dan
+prediksi_jurusan dibaca per chunk (cursor unbuffered + fetchmany) dan
+langsung di-decode ke kolom NumPy bertipe: nilai float32, kode kategori
+int8/int16. Tidak ada DataFrame atau list of dict, jadi memori puncak
+sebanding dengan ukuran kolom akhir, bukan beberapa salinan objek Python.
+"""
+
+import numpy as np
+
+from feature_schema import ACADEMIC_FIELDS, RENCANA_KULIAH_MAP
+
+DEFAULT_FETCH_SIZE = 5000
+
+# Incomplete ids more than this many prediction ids below the watermark are
+# given up, which also bounds the IN list of incremental_query
+PENDING_MAX_LAG = 5000
+
+# Query untuk mengambil data training dari database
+# Data siswa yang sudah ada prediksi manual dipakai sebagai training data
+TRAINING_QUERY = """
+SELECT
+    sl.jenis_kelamin,
+    na.matematika, na.bahasa_indonesia, na.bahasa_inggris,
+    na.fisika, na.kimia, na.biologi, na.sejarah, na.geografi,
+    na.ekonomi, na.sosiologi, na.pkn, na.seni_budaya,
+    na.prakarya, na.pjok, na.peminatan_1, na.peminatan_2,
+    na.rata_rata_keseluruhan,
+    smb.rencana_kuliah, smb.jurusan_diminati, smb.kategori_jurusan,
+    smb.tingkat_keyakinan,
+    pj.jurusan_prediksi as target_jurusan,
+    pj.id as prediksi_id
+FROM siswa_lengkap sl
+LEFT JOIN nilai_akademik na ON sl.id = na.siswa_lengkap_id
+LEFT JOIN survei_minat_bakat smb ON sl.id = smb.siswa_lengkap_id
+LEFT JOIN prediksi_jurusan pj ON sl.id = pj.siswa_lengkap_id
+WHERE pj.jurusan_prediksi IS NOT NULL
+AND na.rata_rata_keseluruhan IS NOT NULL
+AND smb.rencana_kuliah IS NOT NULL
+"""
+
+# Id prediksi yang dilewati TRAINING_QUERY karena nilai atau surveinya belum
+# lengkap. Hanya id yang diambil, supaya bisa dibaca ulang saat update
+# setelah datanya lengkap (lihat TrainingData.pending)
+PENDING_QUERY = """
+SELECT pj.id
+FROM siswa_lengkap sl
+LEFT JOIN nilai_akademik na ON sl.id = na.siswa_lengkap_id
+LEFT JOIN survei_minat_bakat smb ON sl.id = smb.siswa_lengkap_id
+LEFT JOIN prediksi_jurusan pj ON sl.id = pj.siswa_lengkap_id
+WHERE pj.jurusan_prediksi IS NOT NULL
+AND (na.rata_rata_keseluruhan IS NULL OR smb.rencana_kuliah IS NULL)
+"""
+
+# Positions in a TRAINING_QUERY row
+_GENDER = 0
+_SCORES = slice(1, 18)
+_RENCANA = 18
+_JURUSAN_DIMINATI = 19
+_KATEGORI = 20
+_KEYAKINAN = 21
+_TARGET = 22
+_PREDIKSI_ID = 23
+
+FEATURE_NAMES = (
+    ['jenis_kelamin_encoded'] + ACADEMIC_FIELDS
+    + ['rencana_kuliah_encoded', 'kategori_jurusan_encoded', 'tingkat_keyakinan']
+)
+
+# siswa_lengkap.jenis_kelamin is an enum of exactly these two values
+GENDER_CODES = {'Laki-laki': 1, 'Perempuan': 0}
+
+# Code for a value outside the encoding map (pandas .map gives NaN, filled with 0)
+UNKNOWN_CODE = -1
+
+class TrainingData:
+    """Typed columns of the training join, one entry per usable row"""
+
+    def __init__(self, gender, scores, rencana, kategori, kategori_classes, keyakinan, target, target_classes,
+                 watermark=None, pending=None, expired=0):
+        self.gender = gender                        # int8, GENDER_CODES code or UNKNOWN_CODE
+        self.scores = scores                        # (n, 17) float32, ACADEMIC_FIELDS order
+        self.rencana = rencana                      # int8, RENCANA_KULIAH_MAP code or UNKNOWN_CODE
+        self.kategori = kategori                    # int16, index into kategori_classes
+        self.kategori_classes = kategori_classes    # sorted, as LabelEncoder would
+        self.keyakinan = keyakinan                  # float32
+        self.target = target                        # int32, index into target_classes
+        self.target_classes = target_classes        # sorted major names
+        self.watermark = watermark                  # highest prediksi_jurusan.id read, or None
+        self.pending = pending or []                # ids up to the watermark whose rows were incomplete
+        self.expired = expired                      # incomplete ids that fell behind PENDING_MAX_LAG
+
+    def __len__(self):
+        return len(self.target)
+
+    def features(self):
+        """(n, 21) float64 feature matrix in FEATURE_NAMES order"""
+        X = np.empty((len(self), len(FEATURE_NAMES)))
+        X[:, 0] = np.where(self.gender == UNKNOWN_CODE, 0, self.gender)
+        X[:, 1:18] = self.scores
+        X[:, 18] = np.where(self.rencana == UNKNOWN_CODE, 0, self.rencana)
+        X[:, 19] = self.kategori
+        X[:, 20] = self.keyakinan
+        return X
+
+    def align_kategori(self, known_classes):
+        """
+        Re-code kategori_jurusan against the classes of an existing model
+
+        Known categories keep their model code and unseen ones are appended,
+        so new rows line up with an index built earlier.
+        """
+        classes = list(known_classes)
+        codes = {value: code for code, value in enumerate(classes)}
+        for value in self.kategori_classes:
+            if value not in codes:
+                codes[value] = len(classes)
+                classes.append(value)
+        remap = np.array([codes[value] for value in self.kategori_classes], dtype=np.int16)
+        self.kategori = remap[self.kategori] if len(remap) else self.kategori
+        self.kategori_classes = classes
+        return classes
+
+    def labels(self):
+        """Target major name of every row"""
+        return np.asarray(self.target_classes)[self.target]
+
+class _ColumnBuilder:
+    """Appends fetched row chunks into geometrically grown typed buffers"""
+
+    def __init__(self, capacity):
+        self.size = 0
+        self.dropped = 0
+        self.watermark = None
+        self.incomplete = set()
+        self.pending_floor = None
+        self.kategori_codes = {}
+        self.target_codes = {}
+        self._allocate(max(1, capacity))
+
+    def _allocate(self, capacity):
+        old = getattr(self, 'columns', None)
+        self.columns = {
+            'gender': np.empty(capacity, dtype=np.int8),
+            'scores': np.empty((capacity, len(ACADEMIC_FIELDS)), dtype=np.float32),
+            'rencana': np.empty(capacity, dtype=np.int8),
+            'kategori': np.empty(capacity, dtype=np.int16),
+            'keyakinan': np.empty(capacity, dtype=np.float32),
+            'target': np.empty(capacity, dtype=np.int32),
+            'prediksi_id': np.empty(capacity, dtype=np.int64)
+        }
+        if old is not None:
+            for name, column in old.items():
+                self.columns[name][:self.size] = column[:self.size]
+
+    def append(self, rows):
+        # Every fetched row counts for the watermark, kept or not
+        last_id = max(row[_PREDIKSI_ID] for row in rows)
+        if self.watermark is None or last_id > self.watermark:
+            self.watermark = last_id
+
+        scores = np.array([row[_SCORES] for row in rows], dtype=np.float32)
+        keyakinan = np.array([row[_KEYAKINAN] for row in rows], dtype=np.float32)
+
+        # Same rows as DataFrame.dropna(): NULL anywhere in the selected columns
+        keep = ~np.isnan(scores).any(axis=1) & ~np.isnan(keyakinan)
+        for i, row in enumerate(rows):
+            if keep[i] and (row[_GENDER] is None or row[_RENCANA] is None or row[_JURUSAN_DIMINATI] is None
+                            or row[_KATEGORI] is None or row[_TARGET] is None):
+                keep[i] = False
+        kept = [row for row, ok in zip(rows, keep) if ok]
+        self.dropped += len(rows) - len(kept)
+        self.incomplete.update(row[_PREDIKSI_ID] for row, ok in zip(rows, keep) if not ok)
+        if not kept:
+            return
+
+        stop = self.size + len(kept)
+        if stop > len(self.columns['target']):
+            self._allocate(max(stop, 2 * len(self.columns['target'])))
+
+        part = slice(self.size, stop)
+        columns = self.columns
+        columns['scores'][part] = scores[keep]
+        columns['keyakinan'][part] = keyakinan[keep]
+        columns['gender'][part] = [GENDER_CODES.get(row[_GENDER], UNKNOWN_CODE) for row in kept]
+        columns['rencana'][part] = [RENCANA_KULIAH_MAP.get(row[_RENCANA], UNKNOWN_CODE) for row in kept]
+        # First-seen codes; remapped to sorted order in finish()
+        kategori_codes = self.kategori_codes
+        target_codes = self.target_codes
+        columns['kategori'][part] = [kategori_codes.setdefault(row[_KATEGORI], len(kategori_codes)) for row in kept]
+        columns['target'][part] = [target_codes.setdefault(row[_TARGET], len(target_codes)) for row in kept]
+        columns['prediksi_id'][part] = [row[_PREDIKSI_ID] for row in kept]
+        self.size = stop
+
+    @staticmethod
+    def _sorted_codes(codes, column):
+        """Renumber first-seen codes so classes are sorted, like LabelEncoder"""
+        classes = sorted(codes)
+        remap = np.empty(len(classes), dtype=column.dtype)
+        for new_code, value in enumerate(classes):
+            remap[codes[value]] = new_code
+        return remap[column], classes
+
+    def finish(self):
+        n = self.size
+        columns = {name: column[:n].copy() for name, column in self.columns.items()}
+        self.columns = None
+        kategori, kategori_classes = self._sorted_codes(self.kategori_codes, columns['kategori'])
+        target, target_classes = self._sorted_codes(self.target_codes, columns['target'])
+        # An id with any usable row is in the model; re-reading it would add that row twice
+        pending = np.setdiff1d(np.fromiter(self.incomplete, dtype=np.int64, count=len(self.incomplete)),
+                               columns['prediksi_id'])
+        expired = 0
+        if self.pending_floor is not None:
+            expired = int(np.count_nonzero(pending <= self.pending_floor))
+            pending = pending[pending > self.pending_floor]
+        return TrainingData(
+            gender=columns['gender'],
+            scores=columns['scores'],
+            rencana=columns['rencana'],
+            kategori=kategori,
+            kategori_classes=kategori_classes,
+            keyakinan=columns['keyakinan'],
+            target=target,
+            target_classes=target_classes,
+            watermark=self.watermark,
+            pending=[int(i) for i in pending],
+            expired=expired
+        )
+
+def _new_rows(watermark, pending):
+    """SQL condition for rows after a watermark plus the pending ids"""
+    condition = f"pj.id > {int(watermark)}"
+    if len(pending):
+        condition += f" OR pj.id IN ({', '.join(str(int(i)) for i in pending)})"
+    return condition
+
+def incremental_query(watermark, pending=()):
+    """
+    TRAINING_QUERY restricted to prediksi_jurusan rows added after a
+    watermark, plus the pending ids whose grades or survey were missing
+    when they were last read
+    """
+    return TRAINING_QUERY + f"AND ({_new_rows(watermark, pending)})\n"
+
+def pending_query(upto, watermark=None, pending=()):
+    """
+    PENDING_QUERY for ids up to a new watermark (later ones are read as new
+    rows anyway), restricted like incremental_query when the previous
+    watermark is given, else to the last PENDING_MAX_LAG ids
+    """
+    query = PENDING_QUERY + f"AND pj.id <= {int(upto)}\n"
+    if watermark is not None:
+        return query + f"AND ({_new_rows(watermark, pending)})\n"
+    return query + f"AND pj.id > {int(upto) - PENDING_MAX_LAG}\n"
+
+def _fetch(conn, query, fetch_size, consume):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query)
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            consume(rows)
+    finally:
+        cursor.close()
+
+def stream_training_data(conn, fetch_size=DEFAULT_FETCH_SIZE, watermark=None, pending=()):
+    """
+    Run the training query and decode it chunk by chunk
+
+    The default mysql.connector cursor is unbuffered, so rows stay on the
+    server until fetchmany asks for them and only one chunk of Python
+    tuples exists at a time. With a watermark only rows after it and the
+    pending ids are read (see incremental_query). The ids of incomplete
+    rows then come from PENDING_QUERY, which returns nothing else; those
+    more than PENDING_MAX_LAG ids below the new watermark are dropped and
+    counted in TrainingData.expired.
+
+    Returns:
+        tuple: (TrainingData, dropped) - the usable rows and the number of
+        rows skipped for NULL values
+    """
+    builder = _ColumnBuilder(fetch_size)
+    query = TRAINING_QUERY if watermark is None else incremental_query(watermark, pending)
+    _fetch(conn, query, fetch_size, builder.append)
+
+    upto = builder.watermark if watermark is None else max(watermark, builder.watermark or watermark)
+    if upto is not None:
+        builder.pending_floor = upto - PENDING_MAX_LAG
+        _fetch(conn, pending_query(upto, watermark, pending), fetch_size,
+               lambda rows: builder.incomplete.update(row[0] for row in rows))
+    return builder.finish(), builder.dropped
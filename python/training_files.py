@@ -0,0 +1,265 @@
+"""
+Pembacaan file data training KNNPredictor (format training_data.csv)
+CSV dibaca per chunk dengan skema dtype eksplisit: jenis_kelamin,
+kategori_jurusan dan jurusan_aktual sebagai category, flag mata pelajaran
+uint8, minat float32. Parquet dan Feather (butuh pyarrow) dibaca langsung
+per kolom. Beberapa file shard (daftar path, pola glob atau direktori)
+dibaca paralel di thread pool lalu digabung sesuai urutan nama file.
+
+Usage:
+    python training_files.py convert data/training_data.csv --format parquet
+    data = read_training_data('data/shards/*.parquet', columns=TRAINING_COLUMNS)
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+
+import numpy as np
+
+SUBJECT_FLAGS = [
+    'matematika', 'fisika', 'kimia', 'biologi',
+    'b_indonesia', 'b_inggris', 'sejarah', 'geografi',
+    'informatika', 'seni_budaya'
+]
+INTEREST_FIELDS = ['minat_ipa', 'minat_ips', 'minat_bahasa', 'minat_seni']
+CATEGORY_FIELDS = ['jenis_kelamin', 'kategori_jurusan', 'jurusan_aktual']
+
+# nama_lengkap is left to pandas' string inference
+TRAINING_DTYPES = dict(
+    [(name, 'category') for name in CATEGORY_FIELDS]
+    + [(name, 'uint8') for name in SUBJECT_FLAGS]
+    + [(name, 'float32') for name in INTEREST_FIELDS]
+)
+# Columns KNNPredictor.preprocess_data needs; nama_lengkap is never read for training
+TRAINING_COLUMNS = ['jenis_kelamin'] + SUBJECT_FLAGS + INTEREST_FIELDS + ['kategori_jurusan', 'jurusan_aktual']
+
+# float32 keeps about 7 significant digits; interests are written with at
+# most 2 decimals, so rounding to 6 restores the float64 read_csv would give
+FLOAT32_DECIMALS = 6
+
+DEFAULT_CHUNK_ROWS = 50000
+
+FORMATS = {
+    '.csv': 'csv',
+    '.parquet': 'parquet',
+    '.pq': 'parquet',
+    '.feather': 'feather',
+    '.ftr': 'feather'
+}
+COLUMNAR_FORMATS = ('parquet', 'feather')
+
+def file_format(path):
+    """Format of a training file from its extension"""
+    fmt = FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt is None:
+        raise ValueError(f"Unsupported training file (use {', '.join(FORMATS)}): {path}")
+    return fmt
+
+def require_engine(fmt):
+    """Raise a clear error when no pandas engine for a columnar format is installed"""
+    import importlib.util
+
+    engines = ('pyarrow', 'fastparquet') if fmt == 'parquet' else ('pyarrow',)
+    if not any(importlib.util.find_spec(engine) for engine in engines):
+        raise ValueError(f"{fmt.capitalize()} files need {' or '.join(engines)}, which is not installed")
+
+def resolve_paths(source):
+    """
+    Shard files of a source, in a deterministic order
+
+    Args:
+        source: A file path, a glob pattern, a directory (every supported
+            file in it) or a list of those
+
+    Returns:
+        list: Sorted file paths
+    """
+    if isinstance(source, (list, tuple)):
+        return [path for item in source for path in resolve_paths(item)]
+    if os.path.isdir(source):
+        paths = sorted(os.path.join(source, name) for name in os.listdir(source)
+                       if os.path.splitext(name)[1].lower() in FORMATS)
+    elif glob.has_magic(source):
+        paths = sorted(glob.glob(source))
+    else:
+        paths = [source] if os.path.exists(source) else []
+    if not paths:
+        raise FileNotFoundError(f"No training files found at {source}")
+    return paths
+
+def apply_schema(frame):
+    """Cast columns to TRAINING_DTYPES in place (no-op for files written by convert)"""
+    for name, dtype in TRAINING_DTYPES.items():
+        if name in frame.columns and str(frame[name].dtype) != dtype:
+            frame[name] = frame[name].astype(dtype)
+    return frame
+
+def concat_frames(frames):
+    """
+    Concatenate frames with the same columns, keeping categoricals
+
+    pd.concat turns categoricals with different categories into object
+    columns; union_categoricals merges them, with sorted categories so the
+    result does not depend on how rows were split into chunks or shards.
+    """
+    import pandas as pd
+    from pandas.api.types import union_categoricals
+
+    if len(frames) == 1:
+        return frames[0]
+    names = list(frames[0].columns)
+    for frame in frames[1:]:
+        if list(frame.columns) != names:
+            raise ValueError(f"Shard columns differ: {list(frame.columns)} vs {names}")
+
+    columns = {}
+    for name in names:
+        parts = [frame[name] for frame in frames]
+        if all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            columns[name] = union_categoricals(parts, sort_categories=True)
+        else:
+            columns[name] = pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(columns)
+
+def read_training_file(path, columns=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Read one training file with the TRAINING_DTYPES schema
+
+    Args:
+        path (str): .csv, .parquet or .feather file
+        columns (list): Columns to read, None for all
+        chunk_rows (int): CSV rows parsed per chunk
+
+    Returns:
+        pandas.DataFrame
+    """
+    import pandas as pd
+
+    fmt = file_format(path)
+    if fmt == 'csv':
+        # dtype makes the parser validate and store each chunk compactly
+        # instead of inferring int64/float64/object columns
+        reader = pd.read_csv(path, usecols=columns, dtype=TRAINING_DTYPES, chunksize=chunk_rows)
+        with reader:
+            frame = concat_frames(list(reader))
+        if columns is not None:
+            frame = frame[list(columns)]
+        return frame
+
+    require_engine(fmt)
+    if fmt == 'parquet':
+        frame = pd.read_parquet(path, columns=columns)
+    else:
+        frame = pd.read_feather(path, columns=columns)
+    return apply_schema(frame)
+
+def read_training_data(source, columns=None, workers=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Read every shard of a source and concatenate them in path order
+
+    Shards are read in a thread pool: the CSV parser and pyarrow release
+    the GIL while parsing, and threads hand frames back without pickling.
+
+    Args:
+        source: Path, glob, directory or list of paths (see resolve_paths)
+        columns (list): Columns to read, None for all
+        workers (int): Threads reading shards, None or 0 for every usable core
+
+    Returns:
+        pandas.DataFrame
+    """
+    paths = resolve_paths(source)
+    if len(paths) == 1:
+        return read_training_file(paths[0], columns, chunk_rows)
+
+    from concurrent.futures import ThreadPoolExecutor
+    from parallel_predict import default_workers
+
+    workers = min(max(1, int(workers or default_workers())), len(paths))
+    with ThreadPoolExecutor(workers) as pool:
+        frames = list(pool.map(lambda path: read_training_file(path, columns, chunk_rows), paths))
+    return concat_frames(frames)
+
+def feature_matrix(frame, columns, out=None):
+    """
+    (n, F) float64 matrix of numeric columns, column-major like the block
+    pandas hands to scikit-learn (so StandardScaler sums in the same order)
+
+    float32 columns are widened by rounding to FLOAT32_DECIMALS, so a
+    model trained from typed files matches one trained from read_csv's
+    float64 values bit for bit.
+
+    Args:
+        out (numpy.ndarray): Optional (n, F) float64 view to fill instead
+    """
+    if out is None:
+        out = np.empty((len(frame), len(columns)), dtype=np.float64, order='F')
+    for j, name in enumerate(columns):
+        values = frame[name].to_numpy()
+        if values.dtype == np.float32:
+            np.round(values.astype(np.float64), FLOAT32_DECIMALS, out=out[:, j])
+        else:
+            out[:, j] = values
+    return out
+
+def convert(source, output=None, fmt='parquet', workers=None):
+    """
+    Convert training files to one Parquet or Feather file with the schema dtypes
+
+    Args:
+        source: Path, glob, directory or list of paths
+        output (str): Output path, default the first source path with the
+            new extension
+        fmt (str): 'parquet' or 'feather'; taken from output's extension
+            when it has one
+
+    Returns:
+        dict: Output path, format, row count and in-memory size
+    """
+    if output is not None and os.path.splitext(output)[1]:
+        fmt = file_format(output)
+    if fmt not in COLUMNAR_FORMATS:
+        raise ValueError(f"Convert writes {' or '.join(COLUMNAR_FORMATS)}, not {fmt}")
+    require_engine(fmt)
+
+    data = read_training_data(source, workers=workers)
+    if output is None:
+        output = os.path.splitext(resolve_paths(source)[0])[0] + '.' + fmt
+    if fmt == 'parquet':
+        data.to_parquet(output, index=False)
+    else:
+        data.to_feather(output)
+    return {
+        'output': output,
+        'format': fmt,
+        'n_rows': len(data),
+        'memory_bytes': int(data.memory_usage(deep=True).sum()),
+        'file_bytes': os.path.getsize(output)
+    }
+
+def parse_args(argv=None):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Convert KNN training data to a columnar format")
+    parser.add_argument('command', choices=['convert'])
+    parser.add_argument('source', nargs='+', help="CSV/Parquet/Feather files, glob patterns or directories")
+    parser.add_argument('--format', choices=COLUMNAR_FORMATS, default='parquet')
+    parser.add_argument('--output', default=None, help="Output path (default: first source with the new extension)")
+    parser.add_argument('--workers', type=int, default=0, help="Threads reading shards (0 = all cores)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Main function for command line usage"""
+    args = parse_args(argv)
+    try:
+        result = convert(args.source, args.output, args.format, args.workers)
+        result['success'] = True
+    except Exception as e:
+        result = {'success': False, 'error': f"Conversion error: {str(e)}"}
+    print(json.dumps(result, indent=2))
+    return 0 if result['success'] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())